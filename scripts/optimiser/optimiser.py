@@ -40,18 +40,26 @@ OPTIMISER
     )
 )
 
-
+Every batch of candidates proposed by the optimiser is evaluated in a local
+pool of `n_cores` processes. The cost of every finished case is stored in a
+content-addressed cache (one small yaml file per case, named after the hash of
+the design vector and of the settings that affect the result). Cases found in
+the cache are never re-run, and an interrupted optimisation is resumed from the
+cached cases when the script is launched again with the same input file.
 
 """
 
 import os
 import sys
 import glob
+import json
 import shutil
+import hashlib
 import argparse
 import warnings
 import random
 import pprint
+import multiprocessing as mpr
 import numpy as np
 import scipy
 import scipy.optimize as optimize
@@ -218,30 +226,69 @@ def optimiser(in_dict, previous_x, previous_y):
 
     gpyopt_wrapper = lambda x: wrapper(x, in_dict)
     batch_size = in_dict['optimiser']['numerics']['batch_size']
-    num_cores = in_dict['optimiser']['numerics']['n_cores']
+    n_iter = in_dict['optimiser']['numerics']['n_iter']
+    n_initial = in_dict['optimiser']['numerics']['initial_design_numdata']
+
+    # resume from the cache of finished cases
+    cached_x, cached_y = read_cache(in_dict)
+    print('Found {} cached cases'.format(cached_x.shape[0]))
+    x_all = cached_x
+    y_all = cached_y
+    if previous_x is not None:
+        x_all = np.vstack((previous_x, x_all))
+        y_all = np.vstack((previous_y, y_all))
+
+    space = GPyOpt.Design_space(space=bounds, constraints=constraints)
+    if cached_x.shape[0] < n_initial:
+        x_initial = GPyOpt.experiment_design.initial_design('random', space, n_initial - cached_x.shape[0])
+        y_initial = evaluate_batch(x_initial, in_dict)
+        x_all = np.vstack((x_all, x_initial))
+        y_all = np.vstack((y_all, y_initial))
+        save_evaluations(output_route, x_all, y_all)
+
+    # iterations completed before the restart
+    i_start = max(cached_x.shape[0] - n_initial, 0)//batch_size
+    for i_iter in range(i_start, n_iter):
+        opt = GPyOpt.methods.BayesianOptimization(
+            f=None,
+            domain=bounds,
+            exact_feval=True,
+            model_type='GP',
+            acquisition_type='EI',
+            normalize_y=False,
+            evaluator_type='local_penalization',
+            batch_size=batch_size,
+            acquisition_jitter=0,
+            de_duplication=True,
+            constraints=constraints,
+            X=x_all,
+            Y=y_all)
+        x_next = opt.suggest_next_locations()
+        print('Iteration {} of {}: evaluating {} candidates'.format(i_iter + 1, n_iter, x_next.shape[0]))
+        y_next = evaluate_batch(x_next, in_dict)
+        x_all = np.vstack((x_all, x_next))
+        y_all = np.vstack((y_all, y_next))
+        save_evaluations(output_route, x_all, y_all)
+
+    # final surrogate model including all the evaluations
     opt = GPyOpt.methods.BayesianOptimization(
-        f=gpyopt_wrapper,
+        f=None,
         domain=bounds,
         exact_feval=True,
         model_type='GP',
         acquisition_type='EI',
         normalize_y=False,
-        initial_design_numdata=in_dict['optimiser']['numerics']['initial_design_numdata'],
         evaluator_type='local_penalization',
         batch_size=batch_size,
-        num_cores=num_cores,
         acquisition_jitter=0,
         de_duplication=True,
         constraints=constraints,
-        X=previous_x,
-        Y=previous_y)
-
-    opt.run_optimization(in_dict['optimiser']['numerics']['n_iter'],
-                         report_file=output_route + 'report.log',
-                         evaluations_file=output_route + 'evaluations.log',
-                         models_file=output_route + 'models.log',
-                         verbosity=True
-                        )
+        X=x_all,
+        Y=y_all)
+    opt.suggest_next_locations()
+    i_opt = np.argmin(y_all[:, 0])
+    opt.x_opt = x_all[i_opt, :]
+    opt.fx_opt = y_all[i_opt, 0]
 
     print('*'*60)
     print('Best one cost: ', opt.fx_opt)
@@ -369,6 +416,129 @@ def create_rbf_surrogate(X, Y):
     return rbf
 
 
+def save_evaluations(output_route, x, y):
+    np.savetxt(output_route + 'evaluations.log', np.hstack((y, x)))
+
+
+def settings_hash(yaml_dict):
+    """
+    Hash of the settings that affect the result of a case: the base case
+    (including the contents of its generate file), the optimisation
+    parameters and the cost function.
+    """
+    hashed = {'base': yaml_dict['base'],
+              'parameters': yaml_dict['optimiser']['parameters'],
+              'cost': yaml_dict['optimiser']['cost']}
+    sha = hashlib.sha1(json.dumps(hashed, sort_keys=True, default=str).encode())
+    try:
+        with open(yaml_dict['base']['route'] + '/' + yaml_dict['base']['generate_file'], 'rb') as generate_file:
+            sha.update(generate_file.read())
+    except (IOError, KeyError):
+        warnings.warn('The generate file of the base case could not be hashed')
+    return sha.hexdigest()
+
+
+def case_key(x_dict, settings_hash_value):
+    """
+    Content address of a case. The design variables are rounded as in
+    ``case_id`` so that cases with the same name share the same key.
+    """
+    rounded = {k: '{:7.5f}'.format(v) for k, v in x_dict.items()}
+    content = json.dumps({'x': rounded, 'settings': settings_hash_value}, sort_keys=True)
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def cache_route(yaml_dict):
+    try:
+        route = yaml_dict['settings']['cache_folder']
+    except KeyError:
+        route = yaml_dict['settings']['cases_folder'] + '/' + yaml_dict['case']['name'] + '/cache/'
+    route = (route + '/').replace('//', '/')
+    os.makedirs(route, exist_ok=True)
+    return route
+
+
+def read_cache(yaml_dict):
+    """
+    Reads all the cached cases that were run with the current settings.
+
+    Returns:
+        tuple: design vectors (n_cases x n_params) and costs (n_cases x 1)
+    """
+    parameters = yaml_dict['optimiser']['parameters']
+    current_hash = settings_hash(yaml_dict)
+    x_list = []
+    y_list = []
+    for f in sorted(glob.glob(cache_route(yaml_dict) + '*.yaml')):
+        with open(f, 'r') as cache_file:
+            entry = yaml.safe_load(cache_file)
+        if entry is None or entry['settings_hash'] != current_hash:
+            continue
+        x_list.append([entry['x'][parameters[k]] for k in sorted(parameters.keys())])
+        y_list.append([entry['cost']])
+
+    x_out = np.array(x_list, dtype=float).reshape((-1, len(parameters)))
+    y_out = np.array(y_list, dtype=float).reshape((-1, 1))
+    return x_out, y_out
+
+
+def read_cache_entry(x_dict, yaml_dict):
+    key = case_key(x_dict, settings_hash(yaml_dict))
+    try:
+        with open(cache_route(yaml_dict) + key + '.yaml', 'r') as cache_file:
+            entry = yaml.safe_load(cache_file)
+    except FileNotFoundError:
+        return None
+    return entry
+
+
+def write_cache_entry(x_dict, case_name, cost, yaml_dict):
+    current_hash = settings_hash(yaml_dict)
+    key = case_key(x_dict, current_hash)
+    entry = {'case_name': case_name,
+             'x': {k: float(v) for k, v in x_dict.items()},
+             'cost': float(cost),
+             'settings_hash': current_hash}
+    file_name = cache_route(yaml_dict) + key + '.yaml'
+    # write to a temporary file first so that interrupted writes do not
+    # leave corrupted entries behind
+    with open(file_name + '.tmp', 'w') as cache_file:
+        yaml.safe_dump(entry, cache_file)
+    os.replace(file_name + '.tmp', file_name)
+
+
+def evaluate_batch(x, yaml_dict):
+    """
+    Evaluates a batch of design vectors (one per row of ``x``) in a local
+    pool of ``n_cores`` processes. Cached cases are not run.
+
+    Returns:
+        np.ndarray: costs (n_cases x 1)
+    """
+    x = np.atleast_2d(x)
+    x_dicts = [unfold_x(x[i, :], yaml_dict['optimiser']['parameters']) for i in range(x.shape[0])]
+
+    y = np.zeros((x.shape[0], 1))
+    to_run = []
+    for i, x_dict in enumerate(x_dicts):
+        entry = read_cache_entry(x_dict, yaml_dict)
+        if entry is None:
+            to_run.append(i)
+        else:
+            print('   Case: ' + entry['case_name'] + ' found in cache; cost = ', entry['cost'])
+            y[i, 0] = entry['cost']
+
+    if to_run:
+        n_cores = min(yaml_dict['optimiser']['numerics']['n_cores'], len(to_run))
+        # a fresh process for every case, SHARPy keeps global state
+        with mpr.Pool(n_cores, maxtasksperchild=1) as pool:
+            costs = pool.starmap(evaluate, [(x_dicts[i], yaml_dict) for i in to_run])
+        for i, cost in zip(to_run, costs):
+            y[i, 0] = cost
+
+    return y
+
+
 def case_id(case, x_dict):
     case_name = case
     for k, v in x_dict.items():
@@ -381,6 +551,11 @@ def case_id(case, x_dict):
 def evaluate(x_dict, yaml_dict):
     case_name = case_id(yaml_dict['case']['name'], x_dict)
 
+    entry = read_cache_entry(x_dict, yaml_dict)
+    if entry is not None:
+        print('   Case: ' + str(case_name) + ' found in cache; cost = ', entry['cost'])
+        return entry['cost']
+
     print('Running ' + case_name)
     files, case_name = set_case(case_name,
                                 yaml_dict['base'],
@@ -404,9 +579,10 @@ def evaluate(x_dict, yaml_dict):
                 pass
             with open(yaml_dict['settings']['cases_folder'] +
                       '/' + yaml_dict['case']['name'] + '/' +
-                      'data.pkl', 'wb') as data_file:
+                      case_name + '.pkl', 'wb') as data_file:
                 pickle.dump(data, data_file, -1)
 
+    write_cache_entry(x_dict, case_name, cost, yaml_dict)
     return cost
 
 
@@ -0,0 +1,219 @@
+"""Far-field approximation of the velocity induced by vortex rings
+
+Tree-based (Barnes-Hut) evaluation of the velocity induced by a large number of vortex rings, such as the panels of a
+UVLM wake, at a set of target points.
+
+The rings are sorted in a binary tree of clusters. A cluster that is far enough from a target point, i.e. whose
+radius :math:`r_c` and distance :math:`d` to the target satisfy :math:`r_c < \\theta d`, is replaced by a vortex
+dipole located at its centre with a moment equal to the sum of the moments :math:`\\Gamma_i \\mathbf{A}_i` of its rings,
+where :math:`\\mathbf{A}_i` is the area vector of each ring. The contributions of close clusters are computed exactly
+with the Biot-Savart law. The opening angle :math:`\\theta` sets the accuracy of the approximation: ``theta = 0``
+recovers the exact result, and the error decreases as :math:`\\theta^2`.
+"""
+import numpy as np
+
+cfact_biot = 0.25/np.pi
+VORTEX_RADIUS = 1e-6  # numerical radius of vortex, as in sharpy.linear.src.uvlmutils
+VORTEX_RADIUS_SQ = VORTEX_RADIUS**2
+
+# vertices of the (m, n) panel, as in sharpy.linear.src.surface
+dmver = np.array([0, 1, 1, 0])
+dnver = np.array([0, 0, 1, 1])
+
+
+def surface_rings(zeta, gamma):
+    """
+    Vortex rings of a UVLM surface.
+
+    Args:
+        zeta (np.ndarray): ``(3, M + 1, N + 1)`` vertices coordinates of the surface
+        gamma (np.ndarray): ``(M, N)`` circulation of the panels
+
+    Returns:
+        tuple: ``(M*N, 4, 3)`` vertices coordinates and ``(M*N,)`` circulation of the rings
+    """
+    m, n = gamma.shape
+    i_m, i_n = np.meshgrid(np.arange(m), np.arange(n), indexing='ij')
+    rings = zeta[:, i_m.reshape(-1, 1) + dmver, i_n.reshape(-1, 1) + dnver].transpose(1, 2, 0)
+    return rings, gamma.ravel()
+
+
+def ring_velocity(targets, rings, gamma, max_block_size=500000):
+    """
+    Exact velocity induced by a set of vortex rings at the target points.
+
+    Args:
+        targets (np.ndarray): ``(n_targets, 3)`` target points
+        rings (np.ndarray): ``(n_rings, 4, 3)`` vertices coordinates of the rings
+        gamma (np.ndarray): ``(n_rings,)`` circulation of the rings
+        max_block_size (int): Maximum number of target-ring interactions evaluated at once
+
+    Returns:
+        np.ndarray: ``(n_targets, 3)`` induced velocity
+    """
+    uind = np.zeros((targets.shape[0], 3))
+    if rings.shape[0] == 0:
+        return uind
+    block = max(1, max_block_size//rings.shape[0])
+    for i_start in range(0, targets.shape[0], block):
+        r = targets[i_start:i_start + block, None, None, :] - rings[None, :, :, :]
+        r_norm = np.linalg.norm(r, axis=3)
+        r_norm[r_norm == 0.] = 1.
+        r_unit = r/r_norm[..., None]
+        for i_a, i_b in [(0, 1), (1, 2), (2, 3), (3, 0)]:
+            rab = rings[:, i_b, :] - rings[:, i_a, :]
+            vcross = np.cross(r[:, :, i_a, :], r[:, :, i_b, :])
+            vcross_sq = np.sum(vcross**2, axis=2)
+            core = vcross_sq < VORTEX_RADIUS_SQ*np.sum(rab**2, axis=1)
+            vcross_sq[core] = 1.
+            coef = cfact_biot*gamma*np.einsum('tri,ri->tr', r_unit[:, :, i_a, :] - r_unit[:, :, i_b, :], rab)/vcross_sq
+            coef[core] = 0.
+            uind[i_start:i_start + block, :] += np.einsum('tr,tri->ti', coef, vcross)
+    return uind
+
+
+def dipole_velocity(targets, centre, moment):
+    """
+    Velocity induced by a vortex dipole, the far-field limit of a vortex ring of moment :math:`\\Gamma \\mathbf{A}`.
+
+    Args:
+        targets (np.ndarray): ``(n_targets, 3)`` target points
+        centre (np.ndarray): ``(3,)`` location of the dipole
+        moment (np.ndarray): ``(3,)`` dipole moment
+
+    Returns:
+        np.ndarray: ``(n_targets, 3)`` induced velocity
+    """
+    r = targets - centre
+    r_norm = np.linalg.norm(r, axis=1)
+    r_dot_moment = np.dot(r, moment)
+    return cfact_biot*(3.*r_dot_moment[:, None]*r/r_norm[:, None]**5 - moment/r_norm[:, None]**3)
+
+
+class VortexRingTree(object):
+    """
+    Binary tree of clusters of vortex rings for the Barnes-Hut evaluation of their induced velocity.
+
+    Args:
+        rings (np.ndarray): ``(n_rings, 4, 3)`` vertices coordinates of the rings
+        gamma (np.ndarray): ``(n_rings,)`` circulation of the rings
+        leaf_size (int): Maximum number of rings in the clusters at the bottom of the tree
+
+    Examples:
+
+        >>> rings, gamma = surface_rings(tstep.zeta_star[0], tstep.gamma_star[0])
+        >>> tree = VortexRingTree(rings, gamma)
+        >>> uind = tree.velocity(target_points, theta=0.3)
+    """
+
+    def __init__(self, rings, gamma, leaf_size=32):
+        self.rings = rings
+        self.gamma = gamma
+        self.leaf_size = max(int(leaf_size), 1)
+
+        centroids = np.mean(rings, axis=1)
+        moments = 0.5*gamma[:, None]*np.cross(rings[:, 2, :] - rings[:, 0, :], rings[:, 3, :] - rings[:, 1, :])
+        ring_radius = np.max(np.linalg.norm(rings - centroids[:, None, :], axis=2), axis=1)
+
+        # nodes are stored in flat lists: [indices of rings, children, centre, radius, moment]
+        self.indices = []
+        self.children = []
+        self.centre = []
+        self.radius = []
+        self.moment = []
+        if rings.shape[0] > 0:
+            self.build(np.arange(rings.shape[0]), centroids, moments, ring_radius)
+
+    def build(self, indices, centroids, moments, ring_radius):
+        i_node = len(self.indices)
+        self.indices.append(indices)
+        self.children.append([])
+
+        weight = np.linalg.norm(moments[indices], axis=1)
+        if np.sum(weight) > 0.:
+            centre = np.average(centroids[indices], axis=0, weights=weight)
+        else:
+            centre = np.mean(centroids[indices], axis=0)
+        self.centre.append(centre)
+        self.radius.append(np.max(np.linalg.norm(centroids[indices] - centre, axis=1) + ring_radius[indices]))
+        self.moment.append(np.sum(moments[indices], axis=0))
+
+        if len(indices) > self.leaf_size:
+            # split along the longest side of the bounding box
+            extent = np.ptp(centroids[indices], axis=0)
+            i_dim = np.argmax(extent)
+            if extent[i_dim] > 0.:
+                order = np.argsort(centroids[indices, i_dim], kind='stable')
+                half = len(indices)//2
+                for child_indices in [indices[order[:half]], indices[order[half:]]]:
+                    self.children[i_node].append(self.build(child_indices, centroids, moments, ring_radius))
+        return i_node
+
+    def velocity(self, targets, theta=0.5):
+        """
+        Velocity induced by the rings at the target points.
+
+        Args:
+            targets (np.ndarray): ``(n_targets, 3)`` target points
+            theta (float): Opening angle. Clusters whose radius is smaller than ``theta`` times their distance to a
+              target are replaced by a dipole for that target.
+
+        Returns:
+            np.ndarray: ``(n_targets, 3)`` induced velocity
+        """
+        targets = np.ascontiguousarray(targets, dtype=float).reshape(-1, 3)
+        uind = np.zeros_like(targets)
+        if len(self.indices) == 0:
+            return uind
+
+        stack = [(0, np.arange(targets.shape[0]))]
+        while stack:
+            i_node, i_targets = stack.pop()
+            distance = np.linalg.norm(targets[i_targets] - self.centre[i_node], axis=1)
+            far = self.radius[i_node] < theta*distance
+            if np.any(far):
+                uind[i_targets[far]] += dipole_velocity(targets[i_targets[far]],
+                                                        self.centre[i_node],
+                                                        self.moment[i_node])
+            near = i_targets[~far]
+            if len(near) == 0:
+                continue
+            if self.children[i_node]:
+                for i_child in self.children[i_node]:
+                    stack.append((i_child, near))
+            else:
+                ring_indices = self.indices[i_node]
+                uind[near] += ring_velocity(targets[near], self.rings[ring_indices], self.gamma[ring_indices])
+        return uind
+
+
+def induced_velocity_at_points(aero_tstep, targets, for_pos=np.zeros((3,)), theta=0.5, leaf_size=32):
+    """
+    Velocity induced by the bound and wake vortex rings of a UVLM time step at the target points.
+
+    The bound rings are evaluated exactly, and the wake rings with a :class:`VortexRingTree` with opening angle
+    ``theta``.
+
+    Args:
+        aero_tstep (sharpy.utils.datastructures.AeroTimeStepInfo): Aerodynamic time step
+        targets (np.ndarray): ``(n_targets, 3)`` target points
+        for_pos (np.ndarray): Position of the A frame of reference, which is added to the vertices of the rings
+        theta (float): Opening angle of the far-field approximation of the wake
+        leaf_size (int): Maximum number of rings in the clusters at the bottom of the tree
+
+    Returns:
+        np.ndarray: ``(n_targets, 3)`` induced velocity
+    """
+    targets = np.asarray(targets, dtype=float).reshape(-1, 3) - for_pos[0:3]
+    bound = [surface_rings(aero_tstep.zeta[i_surf], aero_tstep.gamma[i_surf])
+             for i_surf in range(aero_tstep.n_surf)]
+    wake = [surface_rings(aero_tstep.zeta_star[i_surf], aero_tstep.gamma_star[i_surf])
+            for i_surf in range(aero_tstep.n_surf)]
+
+    uind = ring_velocity(targets,
+                         np.concatenate([rings for rings, _ in bound]),
+                         np.concatenate([gamma for _, gamma in bound]))
+    tree = VortexRingTree(np.concatenate([rings for rings, _ in wake]),
+                          np.concatenate([gamma for _, gamma in wake]),
+                          leaf_size=leaf_size)
+    return uind + tree.velocity(targets, theta)
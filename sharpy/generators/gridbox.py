@@ -72,11 +72,9 @@ class GridBox(generator_interface.BaseGenerator):
         grid = []
         for iz in range(nz):
             grid.append(np.zeros((3, nx, ny), dtype=ct.c_double))
-            for ix in range(nx):
-                for iy in range(ny):
-                    grid[iz][0, ix, iy] = xarray[ix]
-                    grid[iz][1, ix, iy] = yarray[iy]
-                    grid[iz][2, ix, iy] = zarray[iz]
+            grid[iz][0, :, :] = xarray[:, None]
+            grid[iz][1, :, :] = yarray[None, :]
+            grid[iz][2, :, :] = zarray[iz]
 
 
         vtk_info = tvtk.RectilinearGrid()
@@ -3,6 +3,8 @@ Control surface deflector for linear systems
 """
 import sharpy.linear.utils.ss_interface as ss_interface
 import numpy as np
+import scipy.sparse as sp
+import sharpy.linear.src.libsparse as libsp
 import sharpy.utils.algebra as algebra
 
 @ss_interface.linear_system
@@ -69,6 +71,10 @@ class LinControlSurfaceDeflector(object):
 
         The parsing of arguments is optional if the class has been previously initialised.
 
+        The vertices aft of the hinge of each control surface are first gathered by
+        :meth:`control_surface_vertices`, and the gains of all of them are then evaluated at once. The gains are
+        returned as :class:`sharpy.linear.src.libsparse.csc_matrix` if the UVLM is sparse and as arrays otherwise.
+
         Args:
             linuvlm:
             tsaero0:
@@ -77,7 +83,8 @@ class LinControlSurfaceDeflector(object):
             structure:
 
         Returns:
-
+            tuple: Gains mapping the control surface deflections onto the displacements and velocities of the
+              aerodynamic grid, of size ``3 * Kzeta x n_control_surfaces``.
         """
 
         if self.aero is not None:
@@ -87,160 +94,162 @@ class LinControlSurfaceDeflector(object):
             tsaero0 = self.tsaero0
             tsstruct0 = self.tsstruct0
 
-        # Find the vertices corresponding to a control surface from beam coordinates to aerogrid
-        aero_dict = aero.aero_dict
         n_surf = aero.timestep_info[0].n_surf
         n_control_surfaces = self.n_control_surfaces
 
-        if self.under_development:
-            try:
-                import matplotlib.pyplot as plt  # Part of the testing process
-            except ModuleNotFoundError:
-                import warnings
-                warnings.warn('Unable to import matplotlib, skipping plots')
-                self.under_development = False
-
-        Kdisp = np.zeros((3 * linuvlm.Kzeta, n_control_surfaces))
-        Kvel = np.zeros((3 * linuvlm.Kzeta, n_control_surfaces))
-        Kmom = np.zeros((3 * linuvlm.Kzeta, n_control_surfaces))
         zeta0 = np.concatenate([tsaero0.zeta[i_surf].reshape(-1, order='C') for i_surf in range(n_surf)])
 
         Cga = algebra.quat2rotation(tsstruct0.quat).T
         Cag = Cga.T
 
-        # Initialise these parameters
-        hinge_axis = None  # Will be set once per control surface to the hinge axis
-        with_control_surface = False  # Will be set to true if the spanwise node contains a control surface
-
-        for global_node in range(structure.num_node):
-
-            # Retrieve elements and local nodes to which a single node is attached
-            for i_elem in range(structure.num_elem):
-                if global_node in structure.connectivities[i_elem, :]:
-                    i_local_node = np.where(structure.connectivities[i_elem, :] == global_node)[0][0]
-
-                    for_delta = structure.frame_of_reference_delta[i_elem, :, 0]
-
-                    # CRV to transform from G to B frame
-                    psi = tsstruct0.psi[i_elem, i_local_node]
-                    Cab = algebra.crv2rotation(psi)
-                    Cba = Cab.T
-                    Cbg = np.dot(Cab.T, Cag)
-                    Cgb = Cbg.T
-
-                    # print(global_node)
-                    if self.under_development:
-                        print('Node -- ' + str(global_node))
-                    # Map onto aerodynamic coordinates. Some nodes may be part of two aerodynamic surfaces. This will happen
-                    # at the surface boundary
-                    for structure2aero_node in aero.struct2aero_mapping[global_node]:
-                        # Retrieve surface and span-wise coordinate
-                        i_surf, i_node_span = structure2aero_node['i_surf'], structure2aero_node['i_n']
-
-                        # Surface panelling
-                        M = aero.aero_dimensions[i_surf][0]
-                        N = aero.aero_dimensions[i_surf][1]
-
-                        K_zeta_start = 3 * sum(linuvlm.MS.KKzeta[:i_surf])
-                        shape_zeta = (3, M + 1, N + 1)
-
-                        i_control_surface = aero_dict['control_surface'][i_elem, i_local_node]
-                        if i_control_surface >= 0:
-                            if not with_control_surface:
-                                i_start_of_cs = i_node_span.copy()
-                                with_control_surface = True
-                            control_surface_chord = aero_dict['control_surface_chord'][i_control_surface]
-                            i_node_hinge = M - control_surface_chord
-                            i_vertex_hinge = [K_zeta_start +
-                                              np.ravel_multi_index((i_axis, i_node_hinge, i_node_span), shape_zeta)
-                                              for i_axis in range(3)]
-                            i_vertex_next_hinge = [K_zeta_start +
-                                                   np.ravel_multi_index((i_axis, i_node_hinge, i_start_of_cs + 1),
-                                                                        shape_zeta) for i_axis in range(3)]
-                            zeta_hinge = zeta0[i_vertex_hinge]
-                            zeta_next_hinge = zeta0[i_vertex_next_hinge]
-
-                            if hinge_axis is None:
-                                # Hinge axis not yet set for current control surface
-                                # Hinge axis is in G frame
-                                hinge_axis = zeta_next_hinge - zeta_hinge
-                                hinge_axis = hinge_axis / np.linalg.norm(hinge_axis)
-                            for i_node_chord in range(M + 1):
-                                i_vertex = [K_zeta_start +
-                                            np.ravel_multi_index((i_axis, i_node_chord, i_node_span), shape_zeta)
-                                            for i_axis in range(3)]
-
-                                if i_node_chord > i_node_hinge:
-                                    # Zeta in G frame
-                                    zeta_node = zeta0[i_vertex]  # Gframe
-                                    zeta_nodeA = Cag.dot(zeta_node)
-                                    zeta_hingeA = Cag.dot(zeta_hinge)
-                                    zeta_hingeB = Cbg.dot(zeta_hinge)
-                                    zeta_nodeB = Cbg.dot(zeta_node)
-                                    chord_vec = (zeta_node - zeta_hinge)
-                                    if self.under_development:
-                                        print('G Frame')
-                                        print('Hinge axis = ' + str(hinge_axis))
-                                        print('\tHinge = ' + str(zeta_hinge))
-                                        print('\tNode = ' + str(zeta_node))
-                                        print('A Frame')
-                                        print('\tHinge = ' + str(zeta_hingeA))
-                                        print('\tNode = ' + str(zeta_nodeA))
-                                        print('B Frame')
-                                        print('\tHinge axis = ' + str(Cbg.dot(hinge_axis)))
-                                        print('\tHinge = ' + str(zeta_hingeB))
-                                        print('\tNode = ' + str(zeta_nodeB))
-                                        print('Chordwise Vector')
-                                        print('GVec = ' + str(chord_vec/np.linalg.norm(chord_vec)))
-                                        print('BVec = ' + str(Cbg.dot(chord_vec/np.linalg.norm(chord_vec))))
-                                        # pass
-                                    # Removing the += because cs where being added twice
-                                    Kdisp[i_vertex, i_control_surface] = \
-                                        Cgb.dot(der_R_arbitrary_axis_times_v(Cbg.dot(hinge_axis),
-                                                                             0,
-                                                                             -for_delta * Cbg.dot(chord_vec)))
-                                    # Kdisp[i_vertex, i_control_surface] = \
-                                    #     der_R_arbitrary_axis_times_v(hinge_axis, 0, chord_vec)
-
-                                    # Flap velocity
-                                    Kvel[i_vertex, i_control_surface] = -algebra.skew(chord_vec).dot(
-                                        hinge_axis)
-
-                                    # Flap hinge moment - future work
-                                    # Kmom[i_vertex, i_control_surface] += algebra.skew(chord_vec)
-
-                                    # Testing progress
-                                    if self.under_development:
-                                        plt.scatter(zeta_hingeB[1], zeta_hingeB[2], color='k')
-                                        plt.scatter(zeta_nodeB[1], zeta_nodeB[2], color='b')
-                                        # plt.scatter(zeta_hinge[1], zeta_hinge[2], color='k')
-                                        # plt.scatter(zeta_node[1], zeta_node[2], color='b')
-
-                                        # Testing out
-                                        delta = 5*np.pi/180
-                                        # zeta_newB = Cbg.dot(Kdisp[i_vertex, 1].dot(delta)) + zeta_nodeB
-                                        zeta_newB = Cbg.dot(Kdisp[i_vertex, -1].dot(delta)) + zeta_nodeB
-                                        plt.scatter(zeta_newB[1], zeta_newB[2], color='r')
-
-                                        old_vector = zeta_nodeB - zeta_hingeB
-                                        new_vector = zeta_newB - zeta_hingeB
-
-                                        angle = np.arccos(new_vector.dot(old_vector) /
-                                                          (np.linalg.norm(new_vector) * np.linalg.norm(old_vector)))
-                                        print(angle)
-
-                            if self.under_development:
-                                plt.axis('equal')
-                                plt.show()
-                        else:
-                            with_control_surface = False
-                            hinge_axis = None  # Reset for next control surface
+        i_vertex, i_vertex_hinge, hinge_axis, i_elem, i_local_node, i_control_surface = \
+            self.control_surface_vertices(linuvlm, aero, structure, zeta0)
+
+        # Zeta in G frame
+        zeta_node = zeta0[i_vertex]
+        zeta_hinge = zeta0[i_vertex_hinge]
+        chord_vec = zeta_node - zeta_hinge
+
+        # CRV to transform from G to B frame
+        Cab = algebra.crv2rotation_array(tsstruct0.psi[i_elem, i_local_node])
+        Cbg = np.matmul(Cab.transpose(0, 2, 1), Cag)
+        for_delta = structure.frame_of_reference_delta[i_elem, :, 0]
+
+        # Flap displacement, computed in B frame and projected back onto G
+        hinge_axisB = np.einsum('nij,nj->ni', Cbg, hinge_axis)
+        chord_vecB = -for_delta * np.einsum('nij,nj->ni', Cbg, chord_vec)
+        disp = np.einsum('nji,nj->ni', Cbg, der_R_arbitrary_axis_times_v_array(hinge_axisB, 0, chord_vecB))
+
+        # Flap velocity
+        vel = -np.cross(chord_vec, hinge_axis)
+
+        shape = (3 * linuvlm.Kzeta, n_control_surfaces)
+        rows = i_vertex.reshape(-1)
+        cols = np.repeat(i_control_surface, 3)
+        Kdisp = sp.csc_matrix((disp.reshape(-1), (rows, cols)), shape=shape)
+        Kvel = sp.csc_matrix((vel.reshape(-1), (rows, cols)), shape=shape)
+
+        if linuvlm.use_sparse:
+            Kdisp = libsp.csc_matrix(Kdisp)
+            Kvel = libsp.csc_matrix(Kvel)
+        else:
+            Kdisp = Kdisp.toarray()
+            Kvel = Kvel.toarray()
+
+        if self.under_development:
+            self.plot_deflection(zeta_node, zeta_hinge, disp, Cbg)
 
         self.Kzeta_delta = Kdisp
         self.Kdzeta_ddelta = Kvel
-        # self.Kmom = Kmom
         return Kdisp, Kvel
 
+    @staticmethod
+    def control_surface_vertices(linuvlm, aero, structure, zeta0):
+        """
+        Finds the vertices of the aerodynamic grid that are deflected by the control surfaces.
+
+        The structural nodes are scanned in order, together with the elements they belong to and their aerodynamic
+        spanwise sections. The hinge axis of each control surface is defined by its first two spanwise hinge points,
+        and each vertex aft of the hinge is assigned to the last element it is found in.
+
+        Args:
+            linuvlm (sharpy.linear.src.linuvlm.Dynamic): Linear UVLM
+            aero (sharpy.aero.models.aerogrid.Aerogrid): Aerodynamic grid
+            structure (sharpy.structure.models.beam.Beam): Structure
+            zeta0 (np.ndarray): Coordinates of the vertices at the linearisation point, as in the UVLM input vector
+
+        Returns:
+            tuple: For each deflected vertex, the ``(n, 3)`` indices of its coordinates and of the coordinates of the
+              hinge point, the ``(n, 3)`` hinge axis and the ``(n, )`` element, local node and control surface indices.
+        """
+        aero_dict = aero.aero_dict
+
+        # elements and local nodes to which each node is attached, ordered by node and element
+        elems, local_nodes = np.nonzero(structure.connectivities[:, :] >= 0)
+        nodes = structure.connectivities[elems, local_nodes]
+        order = np.lexsort((elems, nodes))
+        nodes, elems, local_nodes = nodes[order], elems[order], local_nodes[order]
+
+        # Initialise these parameters
+        hinge_axis = None  # Will be set once per control surface to the hinge axis
+        i_start_of_cs = None  # Will be set to the first spanwise node of the control surface
+
+        records = dict()
+        for global_node, i_elem, i_local_node in zip(nodes, elems, local_nodes):
+            i_control_surface = aero_dict['control_surface'][i_elem, i_local_node]
+
+            # Some nodes may be part of two aerodynamic surfaces. This will happen at the surface boundary
+            for structure2aero_node in aero.struct2aero_mapping[global_node]:
+                if i_control_surface < 0:
+                    i_start_of_cs = None
+                    hinge_axis = None  # Reset for next control surface
+                    continue
+
+                # Retrieve surface and span-wise coordinate
+                i_surf, i_node_span = structure2aero_node['i_surf'], structure2aero_node['i_n']
+                M, N = aero.aero_dimensions[i_surf]
+                K_zeta_start = 3 * sum(linuvlm.MS.KKzeta[:i_surf])
+                shape_zeta = (3, M + 1, N + 1)
+
+                if i_start_of_cs is None:
+                    i_start_of_cs = i_node_span
+                i_node_hinge = M - aero_dict['control_surface_chord'][i_control_surface]
+                i_vertex_hinge = K_zeta_start + np.ravel_multi_index((np.arange(3), i_node_hinge, i_node_span),
+                                                                     shape_zeta)
+
+                if hinge_axis is None:
+                    # Hinge axis not yet set for current control surface
+                    # Hinge axis is in G frame
+                    i_vertex_next_hinge = K_zeta_start + np.ravel_multi_index(
+                        (np.arange(3), i_node_hinge, i_start_of_cs + 1), shape_zeta)
+                    hinge_axis = zeta0[i_vertex_next_hinge] - zeta0[i_vertex_hinge]
+                    hinge_axis = hinge_axis / np.linalg.norm(hinge_axis)
+
+                # vertices aft of the hinge, the last element found overwrites the previous ones
+                for i_node_chord in range(i_node_hinge + 1, M + 1):
+                    i_vertex = K_zeta_start + np.ravel_multi_index((0, i_node_chord, i_node_span), shape_zeta)
+                    records[(i_vertex, i_control_surface)] = (i_vertex_hinge, hinge_axis, i_elem, i_local_node,
+                                                              M, N)
+
+        n_vertices = len(records)
+        i_vertex = np.zeros((n_vertices, 3), dtype=int)
+        i_vertex_hinge = np.zeros((n_vertices, 3), dtype=int)
+        hinge_axes = np.zeros((n_vertices, 3))
+        i_elem = np.zeros((n_vertices, ), dtype=int)
+        i_local_node = np.zeros((n_vertices, ), dtype=int)
+        i_control_surface = np.zeros((n_vertices, ), dtype=int)
+        for i_record, ((i_vertex_x, i_cs), (i_hinge, axis, i_el, i_lnode, M, N)) in enumerate(records.items()):
+            i_vertex[i_record] = i_vertex_x + np.arange(3) * (M + 1) * (N + 1)
+            i_vertex_hinge[i_record] = i_hinge
+            hinge_axes[i_record] = axis
+            i_elem[i_record] = i_el
+            i_local_node[i_record] = i_lnode
+            i_control_surface[i_record] = i_cs
+
+        return i_vertex, i_vertex_hinge, hinge_axes, i_elem, i_local_node, i_control_surface
+
+    @staticmethod
+    def plot_deflection(zeta_node, zeta_hinge, disp, Cbg, delta=5*np.pi/180):
+        """
+        Plots the hinge and the undeflected and deflected vertices of the control surfaces in B frame, for testing
+        purposes.
+        """
+        try:
+            import matplotlib.pyplot as plt  # Part of the testing process
+        except ModuleNotFoundError:
+            import warnings
+            warnings.warn('Unable to import matplotlib, skipping plots')
+            return
+
+        zeta_hingeB = np.einsum('nij,nj->ni', Cbg, zeta_hinge)
+        zeta_nodeB = np.einsum('nij,nj->ni', Cbg, zeta_node)
+        zeta_newB = np.einsum('nij,nj->ni', Cbg, delta * disp) + zeta_nodeB
+        plt.scatter(zeta_hingeB[:, 1], zeta_hingeB[:, 2], color='k')
+        plt.scatter(zeta_nodeB[:, 1], zeta_nodeB[:, 2], color='b')
+        plt.scatter(zeta_newB[:, 1], zeta_newB[:, 2], color='r')
+        plt.axis('equal')
+        plt.show()
+
 
 def der_Cx_by_v(delta, v):
     sd = np.sin(delta)
@@ -331,7 +340,7 @@ def der_R_arbitrary_axis_times_v(u, theta, v):
 
     dR31 = uz * ux * s - uy * c
     dR32 = uz * uy * s + ux * c
-    dR33 = -s + uz ** 2
+    dR33 = -s + uz ** 2 * s
 
     dRv = np.zeros((3, ))
     dRv[0] = dR11 * v1 + dR12 * v2 + dR13 * v3
@@ -340,3 +349,29 @@ def der_R_arbitrary_axis_times_v(u, theta, v):
 
     return dRv
 
+
+
+def der_R_arbitrary_axis_times_v_array(u, theta, v):
+    r"""
+    Array version of :func:`der_R_arbitrary_axis_times_v` for several axes and vectors at once.
+
+    Using Rodrigues' formula, the linearised rotation reads
+
+    .. math:: \frac{\partial}{\partial\theta}\left(\mathbf{R}(\mathbf{u}, \theta_0)\right)\mathbf{v} =
+        -\sin\theta_0\,(\mathbf{v} - (\mathbf{u}\cdot\mathbf{v})\mathbf{u}) +
+        \cos\theta_0\,\mathbf{u}\times\mathbf{v}
+
+    Args:
+        u (numpy.ndarray): ``(n, 3)`` arbitrary rotation axes
+        theta (float or numpy.ndarray): Rotation angle (radians), scalar or of dimension ``(n, )``
+        v (numpy.ndarray): ``(n, 3)`` vectors to rotate
+
+    Returns:
+        numpy.ndarray: ``(n, 3)`` linearised rotation vectors
+    """
+    u = u / np.linalg.norm(u, axis=-1)[..., None]
+    c = np.cos(np.asarray(theta))[..., None]
+    s = np.sin(np.asarray(theta))[..., None]
+
+    u_dot_v = np.sum(u * v, axis=-1)[..., None]
+    return -s * (v - u_dot_v * u) + c * np.cross(u, v)
@@ -1,7 +1,9 @@
 import sharpy.linear.utils.ss_interface as ss_interface
 import numpy as np
 import sharpy.linear.src.libss as libss
+import sharpy.linear.src.libsparse as libsp
 import scipy.linalg as sclalg
+import scipy.sparse as sp
 import warnings
 import sharpy.utils.settings as settings
 import sharpy.utils.cout_utils as cout
@@ -63,10 +65,13 @@ class LinearAeroelastic(ss_interface.BaseElement):
         self.beam = None
 
         self.load_uvlm_from_file = False
+        self.cache = None  # linearisation cache, see sharpy.linear.utils.linearisation_cache
+        self.cache_entry = None  # cached UVLM projected onto the structural dofs
 
         self.settings = dict()
         self.state_variables = None
         self.couplings = dict()
+        self.coupling_factors = None  # velocity independent coupling terms, see update()
         self.linearisation_vectors = dict()
 
         # Aeroelastic coupling gains
@@ -98,10 +103,13 @@ class LinearAeroelastic(ss_interface.BaseElement):
         # Create Linear UVLM
         self.uvlm = ss_interface.initialise_system('LinearUVLM')
         self.uvlm.initialise(data, custom_settings=self.settings['aero_settings'])
-        if self.settings['uvlm_filename'] == '':
-            self.uvlm.assemble(track_body=self.settings['track_body'])
-        else:
+        self.cache = data.linear.cache
+        if self.settings['uvlm_filename'] != '':
             self.load_uvlm_from_file = True
+        elif self.cache is not None and self.cache.hit():
+            self.cache_entry = self.cache.load()
+        else:
+            self.uvlm.assemble(track_body=self.settings['track_body'])
 
         # Create beam
         self.beam = ss_interface.initialise_system('LinearBeam')
@@ -172,18 +180,23 @@ class LinearAeroelastic(ss_interface.BaseElement):
         else:
             beam.assemble()
 
-        if not self.load_uvlm_from_file:
-            # Projecting the UVLM inputs and outputs onto the structural degrees of freedom
-            Ksa = self.Kforces[:beam.sys.num_dof, :]  # maps aerodynamic grid forces to nodal forces
+        # Projecting the UVLM inputs and outputs onto the structural degrees of freedom
+        Ksa = libsp.csc_matrix(self.Kforces[:beam.sys.num_dof, :])  # maps aerodynamic grid forces to nodal forces
+
+        if self.cache_entry is not None:
+            self.load_cache_entry(self.cache_entry)
+            self.couplings['Ksa'] = Ksa
 
+        elif not self.load_uvlm_from_file:
             # Map the nodal displacement and velocities onto the grid displacements and velocities
-            Kas = np.zeros((uvlm.ss.inputs, 2*beam.sys.num_dof + (uvlm.ss.inputs - 2*self.Kdisp.shape[0])))
-            Kas[:2*self.Kdisp.shape[0], :2*beam.sys.num_dof] = \
-                np.block([[self.Kdisp[:, :beam.sys.num_dof], self.Kdisp_vel[:, :beam.sys.num_dof]],
-                [self.Kvel_disp[:, :beam.sys.num_dof], self.Kvel_vel[:, :beam.sys.num_dof]]])
+            Kas = [[self.Kdisp[:, :beam.sys.num_dof], self.Kdisp_vel[:, :beam.sys.num_dof]],
+                   [self.Kvel_disp[:, :beam.sys.num_dof], self.Kvel_vel[:, :beam.sys.num_dof]]]
 
             # Retain other inputs
-            Kas[2*self.Kdisp.shape[0]:, 2*beam.sys.num_dof:] = np.eye(uvlm.ss.inputs - 2 * self.Kdisp.shape[0])
+            num_other_inputs = uvlm.ss.inputs - 2 * self.Kdisp.shape[0]
+            if num_other_inputs > 0:
+                Kas = [row + [None] for row in Kas] + [[None, None, sp.eye(num_other_inputs, format='csc')]]
+            Kas = libsp.csc_matrix(sp.bmat(Kas, format='csc'))
 
             # Scaling
             if uvlm.scaled:
@@ -215,6 +228,9 @@ class LinearAeroelastic(ss_interface.BaseElement):
                     for k, rom in uvlm.rom.items():
                         uvlm.ss = rom.run(uvlm.ss)
 
+            if self.cache is not None:
+                self.save_cache_entry()
+
         else:
             uvlm.ss = self.load_uvlm(self.settings['uvlm_filename'])
 
@@ -234,6 +250,7 @@ class LinearAeroelastic(ss_interface.BaseElement):
                     Tas /= uvlm.sys.ScalingFacts['length']
 
         ss = libss.couple(ss01=uvlm.ss, ss02=beam.ss, K12=Tas, K21=Tsa)
+        self.coupling_factors = None
 
         self.couplings['Tas'] = Tas
         self.couplings['Tsa'] = Tsa
@@ -245,7 +262,7 @@ class LinearAeroelastic(ss_interface.BaseElement):
 
         if self.settings['beam_settings']['modal_projection'] is True and \
                 self.settings['beam_settings']['inout_coords'] == 'modes':
-            self.linearisation_vectors['forces_aero_beam_dof'] = out_mode_matrix.dot(self.linearisation_vectors['forces_aero_beam_dof'])
+            self.linearisation_vectors['forces_aero_beam_dof'] = beam.sys.U.T.dot(self.linearisation_vectors['forces_aero_beam_dof'])
 
         cout.cout_wrap('Aeroelastic system assembled:')
         cout.cout_wrap('\tAerodynamic states: %g' % uvlm.ss.states, 1)
@@ -256,12 +273,60 @@ class LinearAeroelastic(ss_interface.BaseElement):
 
         return ss
 
+    def save_cache_entry(self):
+        """
+        Saves the UVLM projected onto the structural degrees of freedom (after any ROM), the input coupling gain,
+        the UVLM output to vertex forces gain, the gust generator and the ROM reduction bases to the linearisation
+        cache.
+        """
+        uvlm = self.uvlm
+        cached_ss = {'uvlm': uvlm.ss}
+        if uvlm.gust_assembler is not None:
+            cached_ss['gust'] = uvlm.gust_assembler.ss_gust
+
+        rom_bases = dict()
+        if uvlm.rom:
+            for rom_name, rom in uvlm.rom.items():
+                rom_bases[rom_name] = {basis: getattr(rom, basis) for basis in ['V', 'W']
+                                       if getattr(rom, basis, None) is not None}
+
+        self.cache.save(ss=cached_ss,
+                        matrices={'Kas': self.couplings['Kas'],
+                                  'C_to_vertex_forces': uvlm.C_to_vertex_forces},
+                        rom_bases=rom_bases)
+
+    def load_cache_entry(self, entry):
+        """
+        Retrieves the UVLM system and related gains from an entry of the linearisation cache. See
+        :meth:`save_cache_entry`.
+
+        Args:
+            entry (dict): Linearisation cache entry
+        """
+        uvlm = self.uvlm
+        uvlm.ss = entry['ss']['uvlm']
+        uvlm.C_to_vertex_forces = entry['matrices']['C_to_vertex_forces']
+        if uvlm.gust_assembler is not None:
+            uvlm.gust_assembler.ss_gust = entry['ss']['gust']
+        if uvlm.rom:
+            for rom_name, bases in entry['rom_bases'].items():
+                for basis, value in bases.items():
+                    setattr(uvlm.rom[rom_name], basis, value)
+
+        self.couplings['Kas'] = entry['matrices']['Kas']
+
     def update(self, u_infty):
         """
         Updates the aeroelastic scaled system with the new reference velocity.
 
         Only the beam equations need updating since the only dependency in the forward flight velocity resides there.
 
+        The terms of the coupling that depend solely on the (scaled) UVLM and the coupling gains are computed in the
+        first call and cached in ``coupling_factors`` (see :func:`sharpy.linear.src.libss.couple_factors`). Subsequent
+        updates only rescale and reassemble the beam, and the blocks of the coupled system are then obtained as
+        low-rank updates of the UVLM matrices, whose rank is the number of beam inputs/outputs
+        (see :func:`sharpy.linear.src.libss.couple_from_factors`). The cache is reset when the system is assembled.
+
         Args:
               u_infty (float): New reference velocity
 
@@ -275,8 +340,11 @@ class LinearAeroelastic(ss_interface.BaseElement):
         self.beam.sys.assemble()
         self.beam.ss = self.beam.sys.SSdisc
 
-        self.ss = libss.couple(ss01=self.uvlm.ss, ss02=self.beam.ss,
-                               K12=self.couplings['Tas'], K21=self.couplings['Tsa'])
+        if self.coupling_factors is None:
+            self.coupling_factors = libss.couple_factors(ss01=self.uvlm.ss,
+                                                         K12=self.couplings['Tas'], K21=self.couplings['Tsa'])
+
+        self.ss = libss.couple_from_factors(self.coupling_factors, ss02=self.beam.ss)
 
         return self.ss
 
@@ -346,6 +414,8 @@ class LinearAeroelastic(ss_interface.BaseElement):
                and ``jj`` indices will unintuitively refer to columns and rows,
               respectively.
 
+        The gain matrices are sparse (:class:`sharpy.linear.src.libsparse.csc_matrix`) and are assembled at once for
+        all the bound vertices from arrays of indices and blocks.
 
         And the stiffening/damping terms accounting for non-zero aerodynamic
         forces at the linearisation point:
@@ -509,6 +579,7 @@ class LinearAeroelastic(ss_interface.BaseElement):
         structure = data.structure
         tsaero = self.uvlm.tsaero0
         tsstr = self.beam.tsstruct0
+        track_body = self.settings['track_body']
 
         Kzeta = self.uvlm.sys.Kzeta
         num_dof_str = self.beam.sys.num_dof_str
@@ -516,13 +587,7 @@ class LinearAeroelastic(ss_interface.BaseElement):
         num_dof_flex = self.beam.sys.num_dof_flex
         use_euler = self.beam.sys.use_euler
 
-        # allocate output
-        Kdisp = np.zeros((3 * Kzeta, num_dof_str))
-        Kdisp_vel = np.zeros((3 * Kzeta, num_dof_str))  # Orientation is in velocity DOFs
-        Kvel_disp = np.zeros((3 * Kzeta, num_dof_str))
-        Kvel_vel = np.zeros((3 * Kzeta, num_dof_str))
-        Kforces = np.zeros((num_dof_str, 3 * Kzeta))
-
+        # stiffening factors (these are added to the dense beam matrices)
         Kss = np.zeros((num_dof_flex, num_dof_flex))
         Csr = np.zeros((num_dof_flex, num_dof_rig))
         Crs = np.zeros((num_dof_rig, num_dof_flex))
@@ -540,312 +605,221 @@ class LinearAeroelastic(ss_interface.BaseElement):
         skew_for_rot = algebra.skew(for_rot)
         Der_vel_Ra = np.dot(Cga, skew_for_rot)
 
-        Faero = np.zeros(3)
-        FaeroA = np.zeros(3)
-
         # GEBM degrees of freedom
-        jj_for_tra = range(num_dof_str - num_dof_rig,
-                           num_dof_str - num_dof_rig + 3)
-        jj_for_rot = range(num_dof_str - num_dof_rig + 3,
-                           num_dof_str - num_dof_rig + 6)
+        jj_for_tra = np.arange(num_dof_str - num_dof_rig, num_dof_str - num_dof_rig + 3)
+        jj_for_rot = np.arange(num_dof_str - num_dof_rig + 3, num_dof_str - num_dof_rig + 6)
 
+        # Derivatives of the rotation (C) and projection (CT) of a vector with respect to the orientation. These are
+        # linear in the vector, hence they are evaluated once per basis vector and combined for all vertices
         if use_euler:
-            jj_euler = range(num_dof_str - 3, num_dof_str)
             euler = algebra.quat2euler(tsstr.quat)
             tsstr.euler = euler
+            num_orient = 3
+            der_C_orient = der_by_v_basis(algebra.der_Ceuler_by_v, euler)
+            der_CT_orient = der_by_v_basis(algebra.der_Peuler_by_v, euler)
         else:
-            jj_quat = range(num_dof_str - 4, num_dof_str)
-
-        jj = 0  # nodal dof index
+            num_orient = 4
+            der_C_orient = der_by_v_basis(algebra.der_Cquat_by_v, tsstr.quat)
+            der_CT_orient = der_by_v_basis(algebra.der_CquatT_by_v, tsstr.quat)
+        jj_orient = np.arange(num_dof_str - num_orient, num_dof_str)
+        jj_orient_rig = np.arange(num_dof_rig - num_orient, num_dof_rig)  # orientation dofs within the rigid dofs
+
+        ### nodal quantities
+        bc = structure.boundary_conditions
+        for node_glob in range(structure.num_node):
+            if bc[node_glob] not in [-1, 0, 1]:
+                raise NameError('Invalid boundary condition (%d) at node %d!' % (bc[node_glob], node_glob))
+
+        # retrieve element and local index
+        ee = structure.node_master_elem[:structure.num_node, 0]
+        node_loc = structure.node_master_elem[:structure.num_node, 1]
+        psi = tsstr.psi[ee, node_loc, :]
+        psi_dot = tsstr.psi_dot[ee, node_loc, :]
+        Rg = np.dot(tsstr.pos, Cag)  # in G FoR, w.r.t. origin A-G
+        Cab_node = algebra.crv2rotation_array(psi)
+        Tan_node = np.array([algebra.crv2tan(psi_here) for psi_here in psi])
+
+        # flexible dofs of each node (only meaningful in non-clamped nodes)
+        jj_tra_node = 6 * structure.vdof[:structure.num_node, None] + np.array([0, 1, 2])
+        jj_rot_node = 6 * structure.vdof[:structure.num_node, None] + np.array([3, 4, 5])
+
+        ### str -> aero mapping: one entry per bound vertex
+        # some nodes may be linked to multiple surfaces...
+        vertex_node = []
+        vertex_global = []  # vertex index within the whole lattice
+        vertex_ii = []  # UVLM input/output coordinate indices
         for node_glob in range(structure.num_node):
-
-            ### detect bc at node (and no. of dofs)
-            bc_here = structure.boundary_conditions[node_glob]
-
-            if bc_here == 1:  # clamp (only rigid-body)
-                dofs_here = 0
-                jj_tra, jj_rot = [], []
-            # continue
-
-            elif bc_here == -1 or bc_here == 0:  # (rigid+flex body)
-                dofs_here = 6
-                jj_tra = 6 * structure.vdof[node_glob] + np.array([0, 1, 2], dtype=int)
-                jj_rot = 6 * structure.vdof[node_glob] + np.array([3, 4, 5], dtype=int)
-            else:
-                raise NameError('Invalid boundary condition (%d) at node %d!' \
-                                % (bc_here, node_glob))
-
-            jj += dofs_here
-
-            # retrieve element and local index
-            ee, node_loc = structure.node_master_elem[node_glob, :]
-
-            # get position, crv and rotation matrix
-            Ra = tsstr.pos[node_glob, :]  # in A FoR, w.r.t. origin A-G
-            Rg = np.dot(Cag.T, Ra)  # in G FoR, w.r.t. origin A-G
-            psi = tsstr.psi[ee, node_loc, :]
-            psi_dot = tsstr.psi_dot[ee, node_loc, :]
-            Cab = algebra.crv2rotation(psi)
-            Cba = Cab.T
-            Cbg = np.dot(Cab.T, Cag)
-            Tan = algebra.crv2tan(psi)
-
-            track_body = self.settings['track_body']
-
-            ### str -> aero mapping
-            # some nodes may be linked to multiple surfaces...
             for str2aero_here in aero.struct2aero_mapping[node_glob]:
-
                 # detect surface/span-wise coordinate (ss,nn)
                 nn, ss = str2aero_here['i_n'], str2aero_here['i_surf']
-                # print('%.2d,%.2d'%(nn,ss))
-
-                # surface panelling
-                M = aero.aero_dimensions[ss][0]
-                N = aero.aero_dimensions[ss][1]
-
-                Kzeta_start = 3 * sum(self.uvlm.sys.MS.KKzeta[:ss])
-                shape_zeta = (3, M + 1, N + 1)
-
-                for mm in range(M + 1):
-                    # get bound vertex index
-                    ii_vert = [Kzeta_start + np.ravel_multi_index(
-                        (cc, mm, nn), shape_zeta) for cc in range(3)]
-
-                    # get position vectors
-                    zetag = tsaero.zeta[ss][:, mm, nn]  # in G FoR, w.r.t. origin A-G
-                    zetaa = np.dot(Cag, zetag)  # in A FoR, w.r.t. origin A-G
-                    Xg = zetag - Rg  # in G FoR, w.r.t. origin B
-                    Xb = np.dot(Cbg, Xg)  # in B FoR, w.r.t. origin B
-
-                    # get rotation terms
-                    Xbskew = algebra.skew(Xb)
-                    XbskewTan = np.dot(Xbskew, Tan)
-
-                    # get velocity terms
-                    zetag_dot = tsaero.zeta_dot[ss][:, mm, nn] - Cga.dot(for_vel)  # in G FoR, w.r.t. origin A-G
-                    zetaa_dot = np.dot(Cag, zetag_dot)  # in A FoR, w.r.t. origin A-G
-
-                    # get aero force
-                    faero = tsaero.forces[ss][:3, mm, nn]
-                    Faero += faero
-                    faero_a = np.dot(Cag, faero)
-                    FaeroA += faero_a
-                    maero_g = np.cross(Xg, faero)
-                    maero_b = np.dot(Cbg, maero_g)
-
-                    ### ---------------------------------------- allocate Kdisp
-
-                    if bc_here != 1:
-                        # wrt pos - Eq 25 second term
-                        Kdisp[np.ix_(ii_vert, jj_tra)] += Cga
-
-                        # wrt psi - Eq 26
-                        Kdisp[np.ix_(ii_vert, jj_rot)] -= np.dot(Cbg.T, XbskewTan)
-
-                    # w.r.t. position of FoR A (w.r.t. origin G)
-                    # null as A and G have always same origin in SHARPy
-
-                    # # ### w.r.t. quaternion (attitude changes)
-                    if use_euler:
-                        Kdisp_vel[np.ix_(ii_vert, jj_euler)] += \
-                            algebra.der_Ceuler_by_v(tsstr.euler, zetaa)
-
-                        # Track body - project inputs as for A not moving
-                        if track_body:
-                            Kdisp_vel[np.ix_(ii_vert, jj_euler)] += \
-                                Cga.dot(algebra.der_Peuler_by_v(tsstr.euler, zetag))
-                    else:
-                        # Equation 25
-                        # Kdisp[np.ix_(ii_vert, jj_quat)] += \
-                        #     algebra.der_Cquat_by_v(tsstr.quat, zetaa)
-                        Kdisp_vel[np.ix_(ii_vert, jj_quat)] += \
-                            algebra.der_Cquat_by_v(tsstr.quat, zetaa)
-
-                        # Track body - project inputs as for A not moving
-                        if track_body:
-                            Kdisp_vel[np.ix_(ii_vert, jj_quat)] += \
-                                Cga.dot(algebra.der_CquatT_by_v(tsstr.quat, zetag))
-
-                    ### ------------------------------------ allocate Kvel_disp
-
-                    if bc_here != 1:
-                        # # wrt pos
-                        Kvel_disp[np.ix_(ii_vert, jj_tra)] += Der_vel_Ra
-
-                        # wrt psi (at zero psi_dot)
-                        Kvel_disp[np.ix_(ii_vert, jj_rot)] -= \
-                            np.dot(Cga,
-                                   np.dot(skew_for_rot,
-                                          np.dot(Cab, XbskewTan)))
-
-                        # # wrt psi (psi_dot contributions - verified)
-                        Kvel_disp[np.ix_(ii_vert, jj_rot)] += np.dot(Cbg.T, np.dot(
-                            algebra.skew(np.dot(XbskewTan, psi_dot)), Tan))
-
-                        if np.linalg.norm(psi) >= 1e-6:
-                            Kvel_disp[np.ix_(ii_vert, jj_rot)] -= \
-                                np.dot(Cbg.T,
-                                       np.dot(Xbskew,
-                                              algebra.der_Tan_by_xv(psi, psi_dot)))
-
-                    # # w.r.t. position of FoR A (w.r.t. origin G)
-                    # # null as A and G have always same origin in SHARPy
-
-                    # # ### w.r.t. quaternion (attitude changes) - Eq 30
-                    if use_euler:
-                        Kvel_vel[np.ix_(ii_vert, jj_euler)] += \
-                            algebra.der_Ceuler_by_v(tsstr.euler, zetaa_dot)
-
-                        # Track body if ForA is rotating
-                        if track_body:
-                            Kvel_vel[np.ix_(ii_vert, jj_euler)] += \
-                                Cga.dot(algebra.der_Peuler_by_v(tsstr.euler, zetag_dot))
-                    else:
-                        Kvel_vel[np.ix_(ii_vert, jj_quat)] += \
-                            algebra.der_Cquat_by_v(tsstr.quat, zetaa_dot)
-
-                        # Track body if ForA is rotating
-                        if track_body:
-                            Kvel_vel[np.ix_(ii_vert, jj_quat)] += \
-                                Cga.dot(algebra.der_CquatT_by_v(tsstr.quat, zetag_dot))
-
-                    ### ------------------------------------- allocate Kvel_vel
-
-                    if bc_here != 1:
-                        # wrt pos_dot
-                        Kvel_vel[np.ix_(ii_vert, jj_tra)] += Cga
-
-                        # # wrt crv_dot
-                        Kvel_vel[np.ix_(ii_vert, jj_rot)] -= np.dot(Cbg.T, XbskewTan)
-
-                    # # wrt velocity of FoR A
-                    Kvel_vel[np.ix_(ii_vert, jj_for_tra)] += Cga
-                    Kvel_vel[np.ix_(ii_vert, jj_for_rot)] -= \
-                        np.dot(Cga, algebra.skew(zetaa))
-
-                    # wrt rate of change of quaternion: not implemented!
-
-                    ### -------------------------------------- allocate Kforces
-
-                    if bc_here != 1:
-                        # nodal forces
-                        Kforces[np.ix_(jj_tra, ii_vert)] += Cag
-
-                        # nodal moments
-                        Kforces[np.ix_(jj_rot, ii_vert)] += \
-                            np.dot(Tan.T, np.dot(Cbg, algebra.skew(Xg)))
-                    # or, equivalently, np.dot( algebra.skew(Xb),Cbg)
-
-                    # total forces
-                    Kforces[np.ix_(jj_for_tra, ii_vert)] += Cag
-
-                    # total moments
-                    Kforces[np.ix_(jj_for_rot, ii_vert)] += \
-                        np.dot(Cag, algebra.skew(zetag))
-
-                    # quaternion equation
-                    # null, as not dep. on external forces
-
-                    ### --------------------------------------- allocate Kstiff
-
-                    ### flexible dof equations (Kss and Csr)
-                    if bc_here != 1:
-                        # nodal forces
-                        if use_euler:
-                            if not track_body:
-                                Csr[jj_tra, -3:] -= algebra.der_Peuler_by_v(tsstr.euler, faero)
-                                # Csr[jj_tra, -3:] -= algebra.der_Ceuler_by_v(tsstr.euler, Cga.T.dot(faero))
-
-                        else:
-                            if not track_body:
-                                Csr[jj_tra, -4:] -= algebra.der_CquatT_by_v(tsstr.quat, faero)
-
-                            # Track body
-                            # if track_body:
-                            #     Csr[jj_tra, -4:] -= algebra.der_Cquat_by_v(tsstr.quat, Cga.T.dot(faero))
-
-                        ### moments
-                        TanTXbskew = np.dot(Tan.T, Xbskew)
-                        # contrib. of TanT (dpsi) - Eq 37 - Integration of UVLM and GEBM
-                        Kss[np.ix_(jj_rot, jj_rot)] -= algebra.der_TanT_by_xv(psi, maero_b)
-                        # contrib of delta aero moment (dpsi) - Eq 36
-                        Kss[np.ix_(jj_rot, jj_rot)] -= \
-                            np.dot(TanTXbskew, algebra.der_CcrvT_by_v(psi, np.dot(Cag, faero)))
-                        # contribution of delta aero moment (dquat)
-                        if use_euler:
-                            if not track_body:
-                                Csr[jj_rot, -3:] -= \
-                                    np.dot(TanTXbskew,
-                                           np.dot(Cba,
-                                                  algebra.der_Peuler_by_v(tsstr.euler, faero)))
-
-                            # if track_body:
-                            #     Csr[jj_rot, -3:] -= \
-                            #         np.dot(TanTXbskew,
-                            #                np.dot(Cbg,
-                            #                       algebra.der_Peuler_by_v(tsstr.euler, Cga.T.dot(faero))))
-                        else:
-                            if not track_body:
-                                Csr[jj_rot, -4:] -= \
-                                    np.dot(TanTXbskew,
-                                           np.dot(Cba,
-                                                  algebra.der_CquatT_by_v(tsstr.quat, faero)))
-
-                            # Track body
-                            # if track_body:
-                            #     Csr[jj_rot, -4:] -= \
-                            #         np.dot(TanTXbskew,
-                            #                np.dot(Cbg,
-                            #                       algebra.der_CquatT_by_v(tsstr.quat, Cga.T.dot(faero))))
-
-                    ### rigid body eqs (Crs and Crr)
-
-                    if bc_here != 1:
-                        # Changed Crs to Krs - NG 14/5/19
-                        # moments contribution due to delta_Ra (+ sign intentional)
-                        Krs[3:6, jj_tra] += algebra.skew(faero_a)
-                        # moment contribution due to delta_psi (+ sign intentional)
-                        Krs[3:6, jj_rot] += np.dot(algebra.skew(faero_a),
-                                                   algebra.der_Ccrv_by_v(psi, Xb))
-
-                    if use_euler:
-                        if not track_body:
-                            # total force
-                            Crr[:3, -3:] -= algebra.der_Peuler_by_v(tsstr.euler, faero)
-
-                            # total moment contribution due to change in euler angles
-                            Crr[3:6, -3:] -= algebra.der_Peuler_by_v(tsstr.euler, np.cross(zetag, faero))
-                            Crr[3:6, -3:] += np.dot(
-                                np.dot(Cag, algebra.skew(faero)),
-                                algebra.der_Peuler_by_v(tsstr.euler, np.dot(Cab, Xb)))
-
-                    else:
-                        if not track_body:
-                            # total force
-                            Crr[:3, -4:] -= algebra.der_CquatT_by_v(tsstr.quat, faero)
-
-                            # total moment contribution due to quaternion
-                            Crr[3:6, -4:] -= algebra.der_CquatT_by_v(tsstr.quat, np.cross(zetag, faero))
-                            Crr[3:6, -4:] += np.dot(
-                                np.dot(Cag, algebra.skew(faero)),
-                                algebra.der_CquatT_by_v(tsstr.quat, np.dot(Cab, Xb)))
-
-                        # # Track body
-                        # if track_body:
-                        #     # NG 20/8/19 - is the Cag needed here? Verify
-                        #     Crr[:3, -4:] -= Cag.dot(algebra.der_Cquat_by_v(tsstr.quat, Cga.T.dot(faero)))
-                        #
-                        #     Crr[3:6, -4:] -= Cag.dot(algebra.skew(zetag).dot(algebra.der_Cquat_by_v(tsstr.quat, Cga.T.dot(faero))))
-                        #     Crr[3:6, -4:] += Cag.dot(algebra.skew(faero)).dot(algebra.der_Cquat_by_v(tsstr.quat, Cga.T.dot(zetag)))
-
+                M, N = aero.aero_dimensions[ss]
+                K_start = sum(self.uvlm.sys.MS.KKzeta[:ss])
+                K_surf = (M + 1) * (N + 1)
+
+                local_vertex = np.arange(M + 1) * (N + 1) + nn
+                vertex_node.append(np.full(M + 1, node_glob))
+                vertex_global.append(K_start + local_vertex)
+                vertex_ii.append(3 * K_start + local_vertex[:, None] + K_surf * np.arange(3))
+
+        vertex_node = np.concatenate(vertex_node)
+        vertex_global = np.concatenate(vertex_global)
+        ii_vert = np.concatenate(vertex_ii)
+        flex = bc[vertex_node] != 1
+
+        # gather vertex quantities
+        zetag = np.concatenate([zeta.reshape(3, -1) for zeta in tsaero.zeta], axis=1)[:, vertex_global].T
+        zetag_dot = np.concatenate([zeta_dot.reshape(3, -1) for zeta_dot in tsaero.zeta_dot],
+                                   axis=1)[:, vertex_global].T
+        faero = np.concatenate([forces[:3].reshape(3, -1) for forces in tsaero.forces], axis=1)[:, vertex_global].T
+
+        Cab = Cab_node[vertex_node]
+        Cbg = np.matmul(Cab.transpose(0, 2, 1), Cag)
+        Tan = Tan_node[vertex_node]
+
+        # get position vectors
+        zetaa = np.dot(zetag, Cga)  # in A FoR, w.r.t. origin A-G
+        Xg = zetag - Rg[vertex_node]  # in G FoR, w.r.t. origin B
+        Xb = np.einsum('nij,nj->ni', Cbg, Xg)  # in B FoR, w.r.t. origin B
+
+        # get rotation terms
+        Xbskew = algebra.skew_array(Xb)
+        XbskewTan = np.matmul(Xbskew, Tan)
+        CgbXbskewTan = np.matmul(Cbg.transpose(0, 2, 1), XbskewTan)
+
+        # get velocity terms
+        zetag_dot = zetag_dot - Cga.dot(for_vel)  # in G FoR, w.r.t. origin A-G
+        zetaa_dot = np.dot(zetag_dot, Cga)  # in A FoR, w.r.t. origin A-G
+
+        # get aero force
+        faero_a = np.dot(faero, Cga)
+        maero_b = np.einsum('nij,nj->ni', Cbg, np.cross(Xg, faero))
+
+        ii_flex = ii_vert[flex]
+        jj_tra = jj_tra_node[vertex_node[flex]]
+        jj_rot = jj_rot_node[vertex_node[flex]]
+
+        ### ---------------------------------------- allocate Kdisp
+        Kdisp = []
+        # wrt pos - Eq 25 second term
+        Kdisp.append((ii_flex, jj_tra, Cga))
+        # wrt psi - Eq 26
+        Kdisp.append((ii_flex, jj_rot, -CgbXbskewTan[flex]))
+        # w.r.t. position of FoR A (w.r.t. origin G)
+        # null as A and G have always same origin in SHARPy
+
+        ### w.r.t. quaternion (attitude changes) - Eq 25
+        Kdisp_vel = [(ii_vert, jj_orient, np.einsum('nk,kij->nij', zetaa, der_C_orient))]
+        # Track body - project inputs as for A not moving
+        if track_body:
+            Kdisp_vel.append((ii_vert, jj_orient, np.matmul(Cga, np.einsum('nk,kij->nij', zetag, der_CT_orient))))
+
+        ### ------------------------------------ allocate Kvel_disp
+        Kvel_disp = []
+        # wrt pos
+        Kvel_disp.append((ii_flex, jj_tra, Der_vel_Ra))
+        # wrt psi (at zero psi_dot)
+        Kvel_disp.append((ii_flex, jj_rot, -np.matmul(np.dot(Cga, skew_for_rot), np.matmul(Cab, XbskewTan)[flex])))
+        # wrt psi (psi_dot contributions - verified)
+        XbskewTan_psi_dot = np.einsum('nij,nj->ni', XbskewTan, psi_dot[vertex_node])
+        Kvel_disp.append((ii_flex, jj_rot, np.matmul(Cbg.transpose(0, 2, 1),
+                                                     np.matmul(algebra.skew_array(XbskewTan_psi_dot), Tan))[flex]))
+        rotated = np.linalg.norm(psi, axis=1) >= 1e-6
+        if np.any(rotated[vertex_node[flex]]):
+            der_Tan_psi_dot = np.zeros((structure.num_node, 3, 3))
+            for node_glob in np.where(rotated)[0]:
+                der_Tan_psi_dot[node_glob] = algebra.der_Tan_by_xv(psi[node_glob], psi_dot[node_glob])
+            Kvel_disp.append((ii_flex, jj_rot,
+                              -np.matmul(np.matmul(Cbg.transpose(0, 2, 1), Xbskew),
+                                         der_Tan_psi_dot[vertex_node])[flex]))
+        # w.r.t. position of FoR A (w.r.t. origin G)
+        # null as A and G have always same origin in SHARPy
+
+        ### ------------------------------------- allocate Kvel_vel
+        # w.r.t. quaternion (attitude changes) - Eq 30
+        Kvel_vel = [(ii_vert, jj_orient, np.einsum('nk,kij->nij', zetaa_dot, der_C_orient))]
+        # Track body if ForA is rotating
+        if track_body:
+            Kvel_vel.append((ii_vert, jj_orient,
+                             np.matmul(Cga, np.einsum('nk,kij->nij', zetag_dot, der_CT_orient))))
+        # wrt pos_dot
+        Kvel_vel.append((ii_flex, jj_tra, Cga))
+        # wrt crv_dot
+        Kvel_vel.append((ii_flex, jj_rot, -CgbXbskewTan[flex]))
+        # wrt velocity of FoR A
+        Kvel_vel.append((ii_vert, jj_for_tra, Cga))
+        Kvel_vel.append((ii_vert, jj_for_rot, -np.matmul(Cga, algebra.skew_array(zetaa))))
+        # wrt rate of change of quaternion: not implemented!
+
+        ### -------------------------------------- allocate Kforces
+        Kforces = []
+        # nodal forces
+        Kforces.append((jj_tra, ii_flex, Cag))
+        # nodal moments
+        Kforces.append((jj_rot, ii_flex, np.matmul(Tan.transpose(0, 2, 1),
+                                                   np.matmul(Cbg, algebra.skew_array(Xg)))[flex]))
+        # or, equivalently, np.dot( algebra.skew(Xb),Cbg)
+        # total forces
+        Kforces.append((jj_for_tra, ii_vert, Cag))
+        # total moments
+        Kforces.append((jj_for_rot, ii_vert, np.matmul(Cag, algebra.skew_array(zetag))))
+        # quaternion equation
+        # null, as not dep. on external forces
+
+        ### --------------------------------------- allocate Kstiff
+        # accumulated per vertex through np.add.at, since several vertices contribute to the same node
+        if np.any(flex):
+            node_flex = vertex_node[flex]
+            TanTXbskew = np.matmul(Tan.transpose(0, 2, 1), Xbskew)[flex]
+
+            ### flexible dof equations (Kss and Csr)
+            nodes_here = np.unique(node_flex)
+            der_TanT_node = np.zeros((structure.num_node, 3, 3, 3))
+            der_CcrvT_node = np.zeros((structure.num_node, 3, 3, 3))
+            der_Ccrv_node = np.zeros((structure.num_node, 3, 3, 3))
+            for node_glob in nodes_here:
+                der_TanT_node[node_glob] = der_by_v_basis(algebra.der_TanT_by_xv, psi[node_glob])
+                der_CcrvT_node[node_glob] = der_by_v_basis(algebra.der_CcrvT_by_v, psi[node_glob])
+                der_Ccrv_node[node_glob] = der_by_v_basis(algebra.der_Ccrv_by_v, psi[node_glob])
+
+            # contrib. of TanT (dpsi) - Eq 37 - Integration of UVLM and GEBM
+            Kss_vert = np.einsum('nk,nkij->nij', maero_b[flex], der_TanT_node[node_flex])
+            # contrib of delta aero moment (dpsi) - Eq 36
+            Kss_vert += np.matmul(TanTXbskew, np.einsum('nk,nkij->nij', faero_a[flex], der_CcrvT_node[node_flex]))
+            np.add.at(Kss, (jj_rot[:, :, None], jj_rot[:, None, :]), -Kss_vert)
+
+            if not track_body:
+                # nodal forces
+                der_CT_faero = np.einsum('nk,kij->nij', faero[flex], der_CT_orient)
+                np.add.at(Csr, (jj_tra[:, :, None], jj_orient_rig), -der_CT_faero)
+                # contribution of delta aero moment (dquat)
+                np.add.at(Csr, (jj_rot[:, :, None], jj_orient_rig),
+                          -np.matmul(TanTXbskew, np.matmul(Cab[flex].transpose(0, 2, 1), der_CT_faero)))
+
+            ### rigid body eqs (Crs and Crr)
+            # Changed Crs to Krs - NG 14/5/19
+            skew_faero_a = algebra.skew_array(faero_a[flex])
+            # moments contribution due to delta_Ra (+ sign intentional)
+            np.add.at(Krs, (np.arange(3, 6)[:, None], jj_tra[:, None, :]), skew_faero_a)
+            # moment contribution due to delta_psi (+ sign intentional)
+            np.add.at(Krs, (np.arange(3, 6)[:, None], jj_rot[:, None, :]),
+                      np.matmul(skew_faero_a, np.einsum('nk,nkij->nij', Xb[flex], der_Ccrv_node[node_flex])))
+
+        if not track_body:
+            # total force
+            Crr[:3, jj_orient_rig] -= np.einsum('k,kij->ij', np.sum(faero, axis=0), der_CT_orient)
+            # total moment contribution due to change in orientation
+            Crr[3:6, jj_orient_rig] -= np.einsum('k,kij->ij', np.sum(np.cross(zetag, faero), axis=0), der_CT_orient)
+            Crr[3:6, jj_orient_rig] += np.sum(np.matmul(np.matmul(Cag, algebra.skew_array(faero)),
+                                                        np.einsum('nk,kij->nij', np.einsum('nij,nj->ni', Cab, Xb),
+                                                                  der_CT_orient)),
+                                              axis=0)
 
         # transfer
-        self.Kdisp = Kdisp
-        self.Kvel_disp = Kvel_disp
-        self.Kdisp_vel = Kdisp_vel
-        self.Kvel_vel = Kvel_vel
-        self.Kforces = Kforces
+        self.Kdisp = sparse_from_blocks(Kdisp, (3 * Kzeta, num_dof_str))
+        self.Kvel_disp = sparse_from_blocks(Kvel_disp, (3 * Kzeta, num_dof_str))
+        self.Kdisp_vel = sparse_from_blocks(Kdisp_vel, (3 * Kzeta, num_dof_str))
+        self.Kvel_vel = sparse_from_blocks(Kvel_vel, (3 * Kzeta, num_dof_str))
+        self.Kforces = sparse_from_blocks(Kforces, (num_dof_str, 3 * Kzeta))
 
         # stiffening factors
         self.Kss = Kss
@@ -863,3 +837,51 @@ class LinearAeroelastic(ss_interface.BaseElement):
         # uvlm_ss_read = read_data.linear.linear_system.uvlm.ss
         uvlm_ss_read = read_data
         return libss.ss(uvlm_ss_read.A, uvlm_ss_read.B, uvlm_ss_read.C, uvlm_ss_read.D, dt=uvlm_ss_read.dt)
+
+
+def der_by_v_basis(der_by_v, p):
+    """
+    Evaluates a derivative function of the form ``der_by_v(p, v)``, which returns the derivative with respect to ``p``
+    of a matrix times the constant vector ``v`` and is therefore linear in ``v``, for each of the three unit vectors.
+
+    The derivative for any vector ``v`` (or any array of vectors ``V``) is then recovered as
+
+    >>> np.einsum('k,kij->ij', v, basis)
+    >>> np.einsum('nk,kij->nij', V, basis)
+
+    Args:
+        der_by_v (function): Derivative function, such as :func:`sharpy.utils.algebra.der_Cquat_by_v`
+        p (np.ndarray): Parameters about which the derivative is evaluated
+
+    Returns:
+        np.ndarray: ``(3, n, m)`` derivative of each unit vector
+    """
+    return np.array([der_by_v(p, e_k) for e_k in np.eye(3)])
+
+
+def sparse_from_blocks(blocks, shape):
+    """
+    Assembles a sparse matrix from a list of ``(rows, cols, values)`` entries, where ``values`` is an ``(n, r, c)``
+    array of ``n`` blocks (or a single ``(r, c)`` block common to all) allocated in ``rows`` and ``cols``, which are
+    ``(n, r)`` and ``(n, c)`` arrays (or ``(r,)`` and ``(c,)`` if common to all). Overlapping entries are summed.
+
+    Args:
+        blocks (list(tuple)): List of ``(rows, cols, values)`` entries
+        shape (tuple): Shape of the matrix
+
+    Returns:
+        libsp.csc_matrix: Assembled matrix
+    """
+    rows, cols, vals = [], [], []
+    for rows_here, cols_here, vals_here in blocks:
+        rows_here = np.asarray(rows_here)[..., :, None]
+        cols_here = np.asarray(cols_here)[..., None, :]
+        shape_here = np.broadcast(rows_here, cols_here, vals_here).shape
+        rows.append(np.broadcast_to(rows_here, shape_here).ravel())
+        cols.append(np.broadcast_to(cols_here, shape_here).ravel())
+        vals.append(np.broadcast_to(vals_here, shape_here).ravel())
+
+    if len(vals) == 0:
+        return libsp.csc_matrix(shape)
+    return libsp.csc_matrix(sp.csc_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                                          shape=shape))
@@ -3,56 +3,135 @@ import numpy as np
 import sharpy.utils.algebra as algebra
 import scipy.sparse as scsp
 import sharpy.linear.src.libss as libss
+import sharpy.linear.src.libsparse as libsp
+import sharpy.utils.settings as settings
+
 
 @ss_interface.linear_system
 class LinearGustGenerator(object):
     """Reduces the entire gust field input to a user-defined set of more comprehensive inputs
+
+    The gust velocity is prescribed at the leading edge and convected downstream by a discrete-time shift register,
+    such that the gust velocity at the ``m``-th chordwise vertex is that applied at the leading edge ``m`` time steps
+    earlier.
+
+    Each of the ``gust_components`` is an independent gust input. If ``span_stations`` are given, the gust is also
+    allowed to vary along the span: one input (and one shift register) is created per component and spanwise station,
+    and the gust velocity at each vertex is linearly interpolated between the two closest stations from its
+    spanwise coordinate ``y``. The inputs are ordered by component and, within each component, by station.
+
+    The system matrices are assembled in sparse format if the UVLM is sparse.
     """
     sys_id = 'LinearGustGenerator'
 
+    settings_types = dict()
+    settings_default = dict()
+    settings_description = dict()
+    settings_options = dict()
+
+    settings_types['gust_components'] = 'list(str)'
+    settings_default['gust_components'] = ['z']
+    settings_description['gust_components'] = 'Components of the gust velocity that are inputs to the system, ' \
+                                              '``y`` for lateral and ``z`` for vertical gusts.'
+    settings_options['gust_components'] = ['x', 'y', 'z']
+
+    settings_types['span_stations'] = 'list(float)'
+    settings_default['span_stations'] = np.array([])
+    settings_description['span_stations'] = 'Spanwise coordinates of the stations at which the gust velocity is ' \
+                                            'prescribed. If empty, the gust is uniform along the span.'
+
+    settings_table = settings.SettingsTable()
+    __doc__ += settings_table.generate(settings_types, settings_default, settings_description, settings_options)
+
     def __init__(self):
         self.aero = None
         self.ss_gust = None
         self.Kout = None
+        self.settings = dict()
 
-    def initialise(self, aero):
+    def initialise(self, aero, custom_settings=None):
         self.aero = aero
 
+        if custom_settings is not None:
+            self.settings = custom_settings
+        settings.to_custom_types(self.settings, self.settings_types, self.settings_default,
+                                 self.settings_options, no_ctype=True)
+
+    def span_weights(self, y):
+        """
+        Weights of the spanwise stations at the spanwise coordinates ``y``.
+
+        Args:
+            y (np.ndarray): Spanwise coordinate of the vertices
+
+        Returns:
+            tuple: Index of the two closest stations and their weights, each of the same shape as ``y``. The weights
+              are constant beyond the first and last station.
+        """
+        stations = np.sort(self.settings['span_stations'])
+        if len(stations) < 2:
+            zeros = np.zeros(y.shape, dtype=int)
+            return zeros, zeros, np.ones(y.shape), np.zeros(y.shape)
+
+        i_right = np.clip(np.searchsorted(stations, y, side='right'), 1, len(stations) - 1)
+        i_left = i_right - 1
+        t = np.clip((y - stations[i_left]) / (stations[i_right] - stations[i_left]), 0., 1.)
+        return i_left, i_right, 1. - t, t
+
     def generate(self, linuvlm, aero):
 
         if aero is None:
             aero = self.aero
 
         Kzeta = linuvlm.Kzeta
-        M = linuvlm.MS.MM[0]
+        M = max(linuvlm.MS.MM)
 
-        # Create state-space to convect gust downstream
-        A_gust = np.zeros((M+1, M+1))
-        A_gust[1:, :-1] = np.eye(M, M)
+        components = ['xyz'.index(component) for component in self.settings['gust_components']]
+        n_stations = max(len(self.settings['span_stations']), 1)
+        n_gust = len(components) * n_stations  # number of gust inputs, one shift register each
+        n_states = n_gust * (M + 1)
 
-        B_gust = np.zeros((M+1, 6 * Kzeta + 1))
-        B_gust[0, 6 * Kzeta] = 1
-
-        C_gust = np.zeros((9 * Kzeta, M+1))
-
-        D_gust = np.zeros((9*Kzeta, 6*Kzeta + 1))
+        # Create state-space to convect gust downstream
+        A_gust = scsp.kron(scsp.eye(n_gust), scsp.eye(M + 1, k=-1), format='csc')
 
-        Kout = np.zeros((3 * Kzeta, M+1))
+        B_gust = scsp.csc_matrix((np.ones(n_gust),
+                                  (np.arange(n_gust) * (M + 1), 6 * Kzeta + np.arange(n_gust))),
+                                 shape=(n_states, 6 * Kzeta + n_gust))
 
+        # Map the gust states to the velocity at the vertices
+        rows = []
+        cols = []
+        vals = []
         for i_surf in range(aero.n_surf):
 
             M_surf, N_surf = aero.aero_dimensions[i_surf]
             Kzeta_start = 3 * sum(linuvlm.MS.KKzeta[:i_surf])  # number of coordinates up to current surface
             shape_zeta = (3, M_surf + 1, N_surf + 1)
 
-            for i_node_span in range(N_surf + 1):
-                for i_node_chord in range(M_surf + 1):
-                    i_vertex = [Kzeta_start + np.ravel_multi_index((i_axis, i_node_chord, i_node_span),
-                                                                   shape_zeta) for i_axis in range(3)]
-                    Kout[i_vertex, i_node_chord] = np.array([0, 0, 1])
-
-        C_gust[-3 * Kzeta:] = Kout
-        D_gust[:6 * Kzeta, :6 * Kzeta] = np.eye(6 * Kzeta)
+            i_node_chord, i_node_span = np.meshgrid(np.arange(M_surf + 1), np.arange(N_surf + 1), indexing='ij')
+            i_left, i_right, w_left, w_right = self.span_weights(linuvlm.MS.Surfs[i_surf].zeta[1])
+
+            for i_comp, i_axis in enumerate(components):
+                i_vertex = Kzeta_start + np.ravel_multi_index((i_axis, i_node_chord, i_node_span), shape_zeta)
+                for i_station, weight in [(i_left, w_left), (i_right, w_right)]:
+                    rows.append(i_vertex.ravel())
+                    cols.append(((i_comp * n_stations + i_station) * (M + 1) + i_node_chord).ravel())
+                    vals.append(weight.ravel())
+
+        Kout = scsp.csc_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                               shape=(3 * Kzeta, n_states))
+        Kout.eliminate_zeros()
+
+        C_gust = scsp.vstack((scsp.csc_matrix((6 * Kzeta, n_states)), Kout), format='csc')
+        D_gust = scsp.csc_matrix((np.ones(6 * Kzeta), (np.arange(6 * Kzeta), np.arange(6 * Kzeta))),
+                                 shape=(9 * Kzeta, 6 * Kzeta + n_gust))
+
+        if linuvlm.use_sparse:
+            A_gust, B_gust, C_gust, D_gust, Kout = [libsp.csc_matrix(M_gust)
+                                                    for M_gust in (A_gust, B_gust, C_gust, D_gust, Kout)]
+        else:
+            A_gust, B_gust, C_gust, D_gust, Kout = [M_gust.toarray()
+                                                    for M_gust in (A_gust, B_gust, C_gust, D_gust, Kout)]
 
         self.Kout = Kout
         return A_gust, B_gust, C_gust, D_gust
@@ -113,6 +113,10 @@ class LinearUVLM(ss_interface.BaseElement):
     settings_description['gust_assembler'] = 'Selected linear gust assembler.'
     settings_options['gust_assembler'] = ['leading_edge']
 
+    settings_types['gust_assembler_settings'] = 'dict'
+    settings_default['gust_assembler_settings'] = dict()
+    settings_description['gust_assembler_settings'] = 'Settings of the selected linear gust assembler.'
+
     settings_types['rom_method'] = 'list(str)'
     settings_default['rom_method'] = []
     settings_description['rom_method'] = 'List of model reduction methods to reduce UVLM.'
@@ -230,7 +234,7 @@ class LinearUVLM(ss_interface.BaseElement):
         if 'u_gust' not in self.settings['remove_inputs'] and self.settings['gust_assembler'] == 'leading_edge':
             import sharpy.linear.assembler.lineargustassembler as lineargust
             self.gust_assembler = lineargust.LinearGustGenerator()
-            self.gust_assembler.initialise(data.aero)
+            self.gust_assembler.initialise(data.aero, self.settings['gust_assembler_settings'])
 
     def assemble(self, track_body=False):
         r"""
@@ -271,10 +275,10 @@ class LinearUVLM(ss_interface.BaseElement):
             # Modify the state space system with a gain at the input side
             # such that the control surface deflections are last
             if self.sys.use_sparse:
-                gain_cs = sp.eye(self.ss.inputs, self.ss.inputs + 2 * self.control_surface.n_control_surfaces,
-                                 format='lil')
-                gain_cs[:n_zeta, self.ss.inputs: self.ss.inputs + n_ctrl_sfc] = Kzeta_delta
-                gain_cs[n_zeta: 2*n_zeta, self.ss.inputs + n_ctrl_sfc: self.ss.inputs + 2 * n_ctrl_sfc] = Kdzeta_ddelta
+                gain_cs = sp.hstack((sp.eye(self.ss.inputs),
+                                     sp.vstack((sp.block_diag((Kzeta_delta, Kdzeta_ddelta)),
+                                                sp.csc_matrix((self.ss.inputs - 2 * n_zeta, 2 * n_ctrl_sfc))))),
+                                    format='csc')
                 gain_cs = libsp.csc_matrix(gain_cs)
             else:
                 gain_cs = np.eye(self.ss.inputs, self.ss.inputs + 2 * self.control_surface.n_control_surfaces)
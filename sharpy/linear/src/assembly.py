@@ -19,7 +19,7 @@ import numpy as np
 import scipy.sparse as sparse
 import itertools
 
-from sharpy.aero.utils.uvlmlib import dvinddzeta_cpp, eval_panel_cpp
+from sharpy.aero.utils.uvlmlib import dvinddzeta_cpp
 import sharpy.linear.src.libsparse as libsp
 import sharpy.linear.src.lib_dbiot as dbiot
 import sharpy.linear.src.lib_ucdncdzeta as lib_ucdncdzeta
@@ -331,39 +331,22 @@ def uc_dncdzeta(Surf):
     if not hasattr(Map.Mpv, 'Mpv'):
         Map.map_panels_to_vertices()
 
-    # map u_normal 2d to 1d
-    # map_panels_1d_to_2d=np.unravel_index(range(K),
-    # 						   				  dims=Map.shape_pan_scal,order='C')
-    # for ii in range(K):
+    # total velocity at the collocation points, in panels 1D order
+    u_tot_coll = (Surf.u_input_coll + Surf.u_ind_coll).reshape((3, K)).T
 
-    for ii in Map.ind_1d_pan_scal:
+    # vertices coordinates of all panels: (K,4,3)
+    mpv = Map.Mpv.reshape((K, 4, 2))
+    zeta_panels = Surf.zeta[:, mpv[:, :, 0], mpv[:, :, 1]].transpose(1, 2, 0)
 
-        # panel m,n coordinates
-        m_pan, n_pan = Map.ind_2d_pan_scal[0][ii], Map.ind_2d_pan_scal[1][ii]
-        # extract u_input_coll
-        u_tot_coll_here = \
-            Surf.u_input_coll[:, m_pan, n_pan] + Surf.u_ind_coll[:, m_pan, n_pan]
+    # calculate derivatives of all panels: (K,4,3)
+    Dlocal = lib_ucdncdzeta.eval_batch(zeta_panels[:, 0, :], zeta_panels[:, 1, :],
+                                       zeta_panels[:, 2, :], zeta_panels[:, 3, :],
+                                       u_tot_coll)
 
-        # find vertices
-        mpv = Map.Mpv[m_pan, n_pan, :, :]
-
-        # extract m,n coordinates of vertices
-        zeta00 = Surf.zeta[:, mpv[0, 0], mpv[0, 1]]
-        zeta01 = Surf.zeta[:, mpv[1, 0], mpv[1, 1]]
-        zeta02 = Surf.zeta[:, mpv[2, 0], mpv[2, 1]]
-        zeta03 = Surf.zeta[:, mpv[3, 0], mpv[3, 1]]
-
-        # calculate derivative
-        Dlocal = lib_ucdncdzeta.eval(zeta00, zeta01, zeta02, zeta03, u_tot_coll_here)
-
-        for vv in range(4):
-            # find 1D position of vertices
-            jj = Map.Mpv1d_scalar[ii, vv]
-
-            # allocate derivatives
-            Der[ii, jj] = Dlocal[vv, 0]  # w.r.t. x
-            Der[ii, jj + Kzeta] = Dlocal[vv, 1]  # w.r.t. y
-            Der[ii, jj + 2 * Kzeta] = Dlocal[vv, 2]  # w.r.t. z
+    # allocate derivatives w.r.t. x, y, z of the vertices
+    ii = np.arange(K)[:, None, None]
+    jj = Map.Mpv1d_scalar[:, :, None] + Kzeta * np.arange(3)
+    Der[ii, jj] = Dlocal
 
     return Der
 
@@ -862,36 +845,30 @@ def dvinddzeta(zetac, Surf_in, IsBound, M_in_bound=None):
     """
 
     M_in, N_in = Surf_in.maps.M, Surf_in.maps.N
-    Kzeta_in = Surf_in.maps.Kzeta
-    shape_zeta_in = (3, M_in + 1, N_in + 1)
 
-    # allocate matrices
-    Dercoll = np.zeros((3, 3))
+    # vertices coordinates of all panels: (M_in*N_in,4,3)
+    mm_in, nn_in = np.meshgrid(range(M_in), range(N_in), indexing='ij')
+    zeta_panels_in = Surf_in.zeta[:, mm_in.reshape((-1, 1)) + dmver,
+                                  nn_in.reshape((-1, 1)) + dnver].transpose(1, 2, 0)
+    gamma_in = Surf_in.gamma.reshape(-1)
 
     if IsBound:
         """ Bound: scan everthing, and include every derivative. The TE is not
         scanned twice"""
 
-        Dervert = np.zeros((3, 3 * Kzeta_in))
-
-        for pp_in in itertools.product(range(0, M_in), range(0, N_in)):
-            mm_in, nn_in = pp_in
-            # zeta_panel_in=Surf_in.get_panel_vertices_coords(mm_in,nn_in)
-            zeta_panel_in = Surf_in.zeta[:, [mm_in + 0, mm_in + 1, mm_in + 1, mm_in + 0],
-                            [nn_in + 0, nn_in + 0, nn_in + 1, nn_in + 1]].T
-            # get local derivatives
-            der_zetac, der_zeta_panel = eval_panel_cpp(
-                zetac, zeta_panel_in, gamma_pan=Surf_in.gamma[mm_in, nn_in])
-            ### Mid-segment point contribution
-            Dercoll += der_zetac
-            ### Panel vertices contribution
-            for vv_in in range(4):
-                # get vertices m,n indices
-                mm_v, nn_v = mm_in + dmver[vv_in], nn_in + dnver[vv_in]
-                # get vertices 1d index
-                jj_v = [np.ravel_multi_index(
-                    (cc, mm_v, nn_v), shape_zeta_in) for cc in range(3)]
-                Dervert[:, jj_v] += der_zeta_panel[vv_in, :, :]
+        # Dervert is allocated as (3,3,M_in+1,N_in+1) to sum the contribution
+        # of each local vertex over all panels at once
+        Dervert = np.zeros((3, 3, M_in + 1, N_in + 1))
+
+        # get local derivatives
+        der_zetac, der_zeta_panel = dbiot.eval_panel_batch(
+            zetac, zeta_panels_in, gamma_pan=gamma_in)
+        ### Mid-segment point contribution
+        Dercoll = np.sum(der_zetac[0], axis=0)
+        ### Panel vertices contribution
+        for vv_in in range(4):
+            Dervert[:, :, dmver[vv_in]:dmver[vv_in] + M_in, dnver[vv_in]:dnver[vv_in] + N_in] += \
+                der_zeta_panel[0, :, vv_in, :, :].reshape((M_in, N_in, 3, 3)).transpose(2, 3, 0, 1)
 
     else:
         """
@@ -901,48 +878,21 @@ def dvinddzeta(zetac, Surf_in, IsBound, M_in_bound=None):
         paneling of the associated bound surface (M_in_bound).
         """
 
-        Kzeta_in_bound = (M_in_bound + 1) * (N_in + 1)
-        Dervert = np.zeros((3, 3 * Kzeta_in_bound))
-
-        ### loop all panels (coll. contrib)
-        for pp_in in itertools.product(range(0, M_in), range(0, N_in)):
-            mm_in, nn_in = pp_in
-            # zeta_panel_in=Surf_in.get_panel_vertices_coords(mm_in,nn_in)
-            zeta_panel_in = Surf_in.zeta[:, [mm_in + 0, mm_in + 1, mm_in + 1, mm_in + 0],
-                            [nn_in + 0, nn_in + 0, nn_in + 1, nn_in + 1]].T
-            # get local derivatives
-            der_zetac = dbiot.eval_panel_cpp_coll(
-                zetac, zeta_panel_in, gamma_pan=Surf_in.gamma[mm_in, nn_in])
-            # der_zetac_fast=dbiot.eval_panel_fast_coll(
-            # 		zetac,zeta_panel_in,gamma_pan=Surf_in.gamma[mm_in,nn_in])
-            # if np.max(np.abs(der_zetac-der_zetac_fast))>1e-10:
-            # 	embed()
-
-            ### Mid-segment point contribution
-            Dercoll += der_zetac
+        Dervert = np.zeros((3, 3, M_in_bound + 1, N_in + 1))
+
+        ### all panels (coll. contrib)
+        Dercoll = np.sum(dbiot.eval_panel_batch_coll(
+            zetac, zeta_panels_in, gamma_pan=gamma_in)[0], axis=0)
 
         ### Re-scan the TE to include vertex contrib.
         # vertex 0 of wake is vertex 1 of bound (local no.)
         # vertex 3 of wake is vertex 2 of bound (local no.)
-        vvec = [0, 3]  # vertices to include
-        dn = [0, 1]  # delta to go from (m,n) panel to (m,n) vertices (on bound)
-
-        shape_zeta_in_bound = (3, M_in_bound + 1, N_in + 1)
-        for nn_in in range(N_in):
-            # zeta_panel_in=Surf_in.get_panel_vertices_coords(0,nn_in)
-            zeta_panel_in = Surf_in.zeta[:, [0, 1, 1, 0],
-                            [nn_in + 0, nn_in + 0, nn_in + 1, nn_in + 1]].T
-            # get local derivatives
-            _, der_zeta_panel = eval_panel_cpp(
-                zetac, zeta_panel_in, gamma_pan=Surf_in.gamma[0, nn_in])
-
-            for vv in range(2):
-                nn_v = nn_in + dn[vv]
-                jj_v = []
-                for cc in range(3):
-                    jj_v.append(np.ravel_multi_index(
-                        (cc, M_in_bound, nn_v), shape_zeta_in_bound))
-                Dervert[:, jj_v] += der_zeta_panel[vvec[vv], :, :]
+        _, der_zeta_panel = dbiot.eval_panel_batch(
+            zetac, zeta_panels_in[:N_in], gamma_pan=gamma_in[:N_in])
+        Dervert[:, :, M_in_bound, :N_in] += der_zeta_panel[0, :, 0, :, :].transpose(1, 2, 0)
+        Dervert[:, :, M_in_bound, 1:] += der_zeta_panel[0, :, 3, :, :].transpose(1, 2, 0)
+
+    Dervert = Dervert.reshape((3, -1))
 
     return Dercoll, Dervert
 
@@ -12,6 +12,10 @@ Methods:
 - eval_seg_comp and eval_seg_comp_loop: profide ders in format 
     [Q_{x,y,z},ZetaPoint_{x,y,z}]
   and use compact analytical formula.
+
+- eval_seg_batch, eval_panel_batch and eval_panel_batch_coll: array-batched
+  versions of the compact formula, evaluating a set of target points against a
+  set of segments/panels in one call.
 """
 
 import numpy as np
@@ -481,6 +485,148 @@ def eval_panel_fast_coll(zetaP, ZetaPanel, gamma_pan=1.0):
     return DerP
 
 
+
+# ------------------------------------------------------------------------------
+#	Array-batched Formula
+# ------------------------------------------------------------------------------
+
+
+def skew_batch(rv):
+    """
+    Skew-symmetric matrices of an array of vectors ``rv`` of shape ``(...,3)``.
+    The output has shape ``(...,3,3)``.
+    """
+    Skew = np.zeros(rv.shape + (3,))
+    Skew[..., 0, 1] = -rv[..., 2]
+    Skew[..., 0, 2] = rv[..., 1]
+    Skew[..., 1, 0] = rv[..., 2]
+    Skew[..., 1, 2] = -rv[..., 0]
+    Skew[..., 2, 0] = -rv[..., 1]
+    Skew[..., 2, 1] = rv[..., 0]
+    return Skew
+
+
+def eval_seg_batch(ZetaP, ZetaA, ZetaB, gamma_seg=1.0, coll_only=False):
+    """
+    Array-batched version of eval_seg_comp. The target points ZetaP, the
+    segments vertices ZetaA and ZetaB, of shape (...,3), and the circulation
+    gamma_seg, of shape (...), are broadcast against each other, so that a set
+    of target points can be evaluated against a set of segments in one call.
+
+    The derivatives are returned in format:
+        [ ..., (x,y,z) of Q, (x,y,z) of Zeta ]
+    If coll_only is True, only the derivative w.r.t. ZetaP is computed.
+
+    The formula is the same as eval_seg_comp, with the derivative of the cross
+    product expressed as:
+        Dvcross * skew(rv) = a skew(rv) - b Vcr (Vcr x rv)^T
+    Segments within the numerical radius give no contribution.
+    """
+
+    RA = ZetaP - ZetaA
+    RB = ZetaP - ZetaB
+    RAB = ZetaB - ZetaA
+    Vcr = np.cross(RA, RB)
+    vcr2 = np.sum(Vcr * Vcr, axis=-1)
+
+    # numerical radius
+    active = vcr2 >= VORTEX_RADIUS_SQ * np.sum(RAB * RAB, axis=-1)
+    Cfact = np.where(active, cfact_biot * np.asarray(gamma_seg, dtype=float), 0.)
+    vcr2inv = 1. / np.where(active, vcr2, 1.)
+
+    ra1 = np.linalg.norm(RA, axis=-1)
+    rb1 = np.linalg.norm(RB, axis=-1)
+    rainv = 1. / np.where(ra1 > 0., ra1, 1.)
+    rbinv = 1. / np.where(rb1 > 0., rb1, 1.)
+    Tv = RA * rainv[..., None] - RB * rbinv[..., None]
+    dotprod = np.sum(RAB * Tv, axis=-1)
+
+    ### cross-product derivative factors
+    diag_fact = (Cfact * vcr2inv * dotprod)[..., None, None]
+    off_fact = (2. * Cfact * vcr2inv * vcr2inv * dotprod)[..., None, None]
+    Vsc = Vcr * (Cfact * vcr2inv)[..., None]
+
+    ### difference terms: Ddiff * der_runit(R) = Vsc (der_runit(R) RAB)^T
+    runit_ra = RAB * rainv[..., None] - \
+               RA * (rainv ** 3 * np.sum(RA * RAB, axis=-1))[..., None]
+    runit_rb = RAB * rbinv[..., None] - \
+               RB * (rbinv ** 3 * np.sum(RB * RAB, axis=-1))[..., None]
+
+    if coll_only:
+        return diag_fact * skew_batch(RAB) \
+               - off_fact * Vcr[..., :, None] * np.cross(Vcr, RAB)[..., None, :] \
+               + Vsc[..., :, None] * (runit_ra - runit_rb)[..., None, :]
+
+    dQ_dRA = -diag_fact * skew_batch(RB) \
+             + off_fact * Vcr[..., :, None] * np.cross(Vcr, RB)[..., None, :] \
+             + Vsc[..., :, None] * runit_ra[..., None, :]
+    dQ_dRB = diag_fact * skew_batch(RA) \
+             - off_fact * Vcr[..., :, None] * np.cross(Vcr, RA)[..., None, :] \
+             - Vsc[..., :, None] * runit_rb[..., None, :]
+    dQ_dRAB = Vsc[..., :, None] * Tv[..., None, :]
+
+    DerP = dQ_dRA + dQ_dRB  # w.r.t. P
+    DerA = -dQ_dRAB - dQ_dRA  # w.r.t. A
+    DerB = dQ_dRAB - dQ_dRB  # w.r.t. B
+
+    return DerP, DerA, DerB
+
+
+def eval_panel_batch(zetaP, ZetaPanel, gamma_pan=1.0):
+    """
+    Array-batched version of eval_panel_fast. Computes the derivatives of the
+    velocity induced by a set of panels over a set of target points, where:
+        - zetaP.shape=(n_targets,3) : target points coordinates
+        - ZetaPanel.shape=(n_panels,4,3) : panels vertices coordinates
+        - gamma_pan.shape=(n_panels,) : panels circulation
+    Returns two elements:
+        - DerP: derivative of induced velocity w.r.t. zetaP, with:
+            DerP.shape=(n_targets,n_panels,3,3) :
+            DerP[ target, panel, Uind_{x,y,z}, ZetaC_{x,y,z} ]
+        - DerVertices: derivative of induced velocity wrt panel vertices, with:
+            DerVertices.shape=(n_targets,n_panels,4,3,3) :
+            DerVertices[ target, panel, vertex number {0,1,2,3},
+                                                Uind_{x,y,z}, ZetaC_{x,y,z} ]
+    """
+
+    zetaP = np.asarray(zetaP, dtype=float).reshape(-1, 1, 3)
+    n_targets, n_panels = zetaP.shape[0], ZetaPanel.shape[0]
+    gamma_pan = np.broadcast_to(gamma_pan, (n_panels,))
+
+    DerP = np.zeros((n_targets, n_panels, 3, 3))
+    DerVertices = np.zeros((n_targets, n_panels, 4, 3, 3))
+    for aa, bb in LoopPanel:
+        DerP_seg, DerA, DerB = eval_seg_batch(
+            zetaP, ZetaPanel[:, aa, :], ZetaPanel[:, bb, :], gamma_pan)
+        DerP += DerP_seg
+        DerVertices[:, :, aa, :, :] += DerA
+        DerVertices[:, :, bb, :, :] += DerB
+
+    return DerP, DerVertices
+
+
+def eval_panel_batch_coll(zetaP, ZetaPanel, gamma_pan=1.0):
+    """
+    Array-batched version of eval_panel_fast_coll. Computes the derivatives of
+    the velocity induced by a set of panels w.r.t. the coordinates of a set of
+    target points. The inputs are as in eval_panel_batch, and the output is:
+        - DerP: derivative of induced velocity w.r.t. zetaP, with:
+            DerP.shape=(n_targets,n_panels,3,3) :
+            DerP[ target, panel, Uind_{x,y,z}, ZetaC_{x,y,z} ]
+    """
+
+    zetaP = np.asarray(zetaP, dtype=float).reshape(-1, 1, 3)
+    n_targets, n_panels = zetaP.shape[0], ZetaPanel.shape[0]
+    gamma_pan = np.broadcast_to(gamma_pan, (n_panels,))
+
+    DerP = np.zeros((n_targets, n_panels, 3, 3))
+    for aa, bb in LoopPanel:
+        DerP += eval_seg_batch(zetaP, ZetaPanel[:, aa, :], ZetaPanel[:, bb, :],
+                               gamma_pan, coll_only=True)
+
+    return DerP
+
+
 if __name__ == '__main__':
 
     import cProfile
@@ -64,6 +64,31 @@ def eval(Zeta00, Zeta01, Zeta02, Zeta03, Uc):
     return dUnorm_dZeta
 
 
+def eval_batch(Zeta00, Zeta01, Zeta02, Zeta03, Uc):
+    """
+    Array-batched version of eval. The vertices coordinates Zeta0* and the
+    velocity Uc at the collocation points are arrays of shape (...,3), one
+    entry per panel. Returns a (...,4,3) array, containing the derivative of
+    Wnc*Uc w.r.t the panel vertices coordinates.
+
+    As R02 and R13 depend on the vertices with a unit coefficient, the
+    derivatives w.r.t. vertices 0 and 1 are the opposite of those w.r.t.
+    vertices 2 and 3, respectively.
+    """
+
+    R02 = Zeta02 - Zeta00
+    R13 = Zeta03 - Zeta01
+
+    crR02R13 = np.cross(R02, R13)
+    norm_crR02R13 = np.linalg.norm(crR02R13, axis=-1)[..., None]
+    Cdot_cub = np.sum(crR02R13 * Uc, axis=-1)[..., None] / norm_crR02R13 ** 3
+
+    dUnorm_dR02 = np.cross(crR02R13, R13) * Cdot_cub + np.cross(R13, Uc) / norm_crR02R13
+    dUnorm_dR13 = -np.cross(crR02R13, R02) * Cdot_cub - np.cross(R02, Uc) / norm_crR02R13
+
+    return np.stack((-dUnorm_dR02, -dUnorm_dR13, dUnorm_dR02, dUnorm_dR13), axis=-2)
+
+
 if __name__ == '__main__':
 
     # calculate normal
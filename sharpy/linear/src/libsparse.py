@@ -22,6 +22,8 @@ operations and raises a warning if required.
 
 Methods:
 - dot: handles matrix dot products across different types.
+- add: handles matrix sums across different types.
+- block_matrix: assembles block matrices keeping the sparsity of the blocks.
 - solve: solves linear systems Ax=b with A and b dense, sparse or mixed.
 - dense: convert matrix to numpy array
 
@@ -111,10 +113,12 @@ def block_dot(A, B):
 					Continue = True
 					break
 			if Continue:
-				prow[jj] = 0.
 				for kk in range(cA):
 					if A[ii][kk] is not None and B[kk][jj] is not None:
-						prow[jj] += dot( A[ii][kk], B[kk][jj] )
+						if prow[jj] is None:
+							prow[jj] = dot( A[ii][kk], B[kk][jj] )
+						else:
+							prow[jj] = add( prow[jj], dot( A[ii][kk], B[kk][jj] ) )
 		P.append(prow)
 
 	return P
@@ -175,6 +179,40 @@ def block_sum(A, B, factA = None, factB = None):
 	return P
 
 
+def block_matrix(Blocks):
+	'''
+	Assembles a matrix from a nested list of dense/sparse blocks (see
+	numpy.block). Empty blocks can be defined with None, provided that each
+	block row and column contains at least one non-empty block.
+
+	The output is a csc_matrix if any of the blocks is sparse, a numpy.ndarray
+	otherwise.
+	'''
+
+	nrows = [None] * len(Blocks)
+	ncols = [None] * len(Blocks[0])
+	for ii, row in enumerate(Blocks):
+		assert len(row) == len(ncols), 'Rows do not contain the same number of column blocks'
+		for jj, block in enumerate(row):
+			if block is not None:
+				nrows[ii], ncols[jj] = block.shape
+
+	assert None not in nrows and None not in ncols, 'Empty block row or column'
+
+	if any(sparse.issparse(block) for row in Blocks for block in row):
+		return csc_matrix(sparse.bmat(Blocks, format='csc'))
+
+	M = np.zeros((sum(nrows), sum(ncols)))
+	row_start = np.cumsum([0] + nrows)
+	col_start = np.cumsum([0] + ncols)
+	for ii, row in enumerate(Blocks):
+		for jj, block in enumerate(row):
+			if block is not None:
+				M[row_start[ii]:row_start[ii + 1], col_start[jj]:col_start[jj + 1]] = block
+
+	return M
+
+
 def dot(A,B,type_out=None):
 	'''
 	Method to compute
@@ -221,6 +259,25 @@ def dot(A,B,type_out=None):
 	return C
 
 
+def add(A,B):
+	'''
+	Method to compute
+		C = A + B ,
+	with dense/sparse/mixed matrices. The output is sparse if both A and B are
+	sparse, dense otherwise.
+	'''
+
+	tA=type(A)
+	tB=type(B)
+
+	assert tA in SupportedTypes, 'Type of A matrix (%s) not supported'%tA
+	assert tB in SupportedTypes, 'Type of B matrix (%s) not supported'%tB
+
+	if tA==csc_matrix and tB==csc_matrix:
+		return csc_matrix(A+B)
+	return dense(A)+dense(B)
+
+
 def solve(A,b):
 	'''
 	Wrapper of
@@ -247,6 +304,8 @@ def solve(A,b):
 			x=np.linalg.solve(A,b)
 	else:
 		x=spalg.spsolve(A,b)
+		if sparse.issparse(x):
+			x=csc_matrix(x)
 
 	assert type(x) in SupportedTypes, 'Unexpected output type!'
 
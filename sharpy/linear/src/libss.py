@@ -475,8 +475,12 @@ def couple(ss01, ss02, K12, K21, out_sparse=False):
     Couples 2 dlti systems ss01 and ss02 through the gains K12 and K21, where
     K12 transforms the output of ss02 into an input of ss01.
 
+    The products between the system matrices and the gains are computed in
+    sparse format whenever both factors are sparse.
+
     Other inputs:
-    - out_sparse: if True, the output system is stored as sparse (not recommended)
+    - out_sparse: if True, the output system is stored as sparse. Otherwise, the
+    coupled system matrices are dense.
     """
 
     assert np.abs(ss01.dt - ss02.dt) < 1e-10 * ss01.dt, 'Time-steps not matching!'
@@ -494,14 +498,6 @@ def couple(ss01, ss02, K12, K21, out_sparse=False):
     Nx2, Nu2 = B2.shape
     Ny2 = C2.shape[0]
 
-    #  terms to invert
-    maxD1 = np.max(np.abs(D1))
-    maxD2 = np.max(np.abs(D2))
-    if maxD1 < 1e-32:
-        pass
-    if maxD2 < 1e-32:
-        pass
-
     # compute self-influence gains
     K11 = libsp.dot(K12, libsp.dot(D2, K21))
     K22 = libsp.dot(K21, libsp.dot(D1, K12))
@@ -519,33 +515,174 @@ def couple(ss01, ss02, K12, K21, out_sparse=False):
     cpl_11 = libsp.dot(cpl_12, libsp.dot(D2, K21))
     cpl_22 = libsp.dot(cpl_21, libsp.dot(D1, K12))
 
-    # Build coupled system
+    # Build coupled system, retaining the sparsity of the blocks
+    A = [[libsp.add(A1, libsp.dot(libsp.dot(B1, cpl_11), C1)), libsp.dot(libsp.dot(B1, cpl_12), C2)],
+         [libsp.dot(libsp.dot(B2, cpl_21), C1), libsp.add(A2, libsp.dot(libsp.dot(B2, cpl_22), C2))]]
+
+    C = [[libsp.add(C1, libsp.dot(libsp.dot(D1, cpl_11), C1)), libsp.dot(libsp.dot(D1, cpl_12), C2)],
+         [libsp.dot(libsp.dot(D2, cpl_21), C1), libsp.add(C2, libsp.dot(libsp.dot(D2, cpl_22), C2))]]
+
+    B = [[libsp.add(B1, libsp.dot(libsp.dot(B1, cpl_11), D1)), libsp.dot(libsp.dot(B1, cpl_12), D2)],
+         [libsp.dot(libsp.dot(B2, cpl_21), D1), libsp.add(B2, libsp.dot(libsp.dot(B2, cpl_22), D2))]]
+
+    D = [[libsp.add(D1, libsp.dot(libsp.dot(D1, cpl_11), D1)), libsp.dot(libsp.dot(D1, cpl_12), D2)],
+         [libsp.dot(libsp.dot(D2, cpl_21), D1), libsp.add(D2, libsp.dot(libsp.dot(D2, cpl_22), D2))]]
+
     if out_sparse:
-        raise NameError('out_sparse=True not supported yet (verify if worth it first).')
+        A, B, C, D = [libsp.csc_matrix(libsp.block_matrix(M)) for M in (A, B, C, D)]
     else:
-        A = np.block([
-            [libsp.dense(A1 + libsp.dot(libsp.dot(B1, cpl_11), C1)), libsp.dense(libsp.dot(libsp.dot(B1, cpl_12), C2))],
-            [libsp.dense(libsp.dot(libsp.dot(B2, cpl_21), C1)),
-             libsp.dense(A2 + libsp.dot(libsp.dot(B2, cpl_22), C2))]])
-
-        C = np.block([
-            [libsp.dense(C1 + libsp.dot(libsp.dot(D1, cpl_11), C1)), libsp.dense(libsp.dot(libsp.dot(D1, cpl_12), C2))],
-            [libsp.dense(libsp.dot(libsp.dot(D2, cpl_21), C1)),
-             libsp.dense(C2 + libsp.dot(libsp.dot(D2, cpl_22), C2))]])
-
-        B = np.block([
-            [libsp.dense(B1 + libsp.dot(libsp.dot(B1, cpl_11), D1)), libsp.dense(libsp.dot(libsp.dot(B1, cpl_12), D2))],
-            [libsp.dense(libsp.dot(libsp.dot(B2, cpl_21), D1)),
-             libsp.dense(B2 + libsp.dot(libsp.dot(B2, cpl_22), D2))]])
-
-        D = np.block([
-            [libsp.dense(D1 + libsp.dot(libsp.dot(D1, cpl_11), D1)), libsp.dense(libsp.dot(libsp.dot(D1, cpl_12), D2))],
-            [libsp.dense(libsp.dot(libsp.dot(D2, cpl_21), D1)),
-             libsp.dense(D2 + libsp.dot(libsp.dot(D2, cpl_22), D2))]])
+        A, B, C, D = [libsp.dense(libsp.block_matrix(M)) for M in (A, B, C, D)]
 
     return ss(A, B, C, D, dt=ss01.dt)
 
 
+def couple_factors(ss01, K12, K21):
+    """
+    Precomputes the terms of the coupling of the dlti system ss01 with a
+    second system through the gains K12 and K21 (see couple) that do not depend
+    on the second system.
+
+    These are used by couple_from_factors to couple ss01 to several instances
+    of the second system, e.g. a time-scaled structural model at different
+    free stream velocities, without repeating the products between the
+    matrices of ss01 and the gains.
+
+    Returns:
+    - factors: dictionary with the matrices of ss01, the gains and their products
+    """
+
+    A1, B1, C1, D1 = ss01.get_mats()
+    D1K12 = libsp.dot(D1, K12)
+
+    factors = {'A1': A1, 'B1': B1, 'C1': C1, 'D1': D1,
+               'K12': K12, 'K21': K21,
+               'B1K12': libsp.dot(B1, K12),
+               'D1K12': D1K12,
+               'K21C1': libsp.dot(K21, C1),
+               'K21D1': libsp.dot(K21, D1),
+               'K21D1K12': libsp.dense(libsp.dot(K21, D1K12)),
+               'dt': ss01.dt}
+
+    return factors
+
+
+def couple_from_factors(factors, ss02, out_sparse=False):
+    """
+    Couples the dlti system used to compute factors (see couple_factors) to
+    ss02, as per couple.
+
+    The coupling terms are obtained through the push-through identity
+
+        (I - K12 D2 K21 D1)^{-1} K12 = K12 (I - D2 P)^{-1},  P = K21 D1 K12
+
+    such that only systems of the size of the input/output of ss02 are solved
+    and the blocks of the coupled system are low-rank updates of those of the
+    first system.
+
+    Other inputs:
+    - out_sparse: if True, the output system is stored as sparse. Otherwise, the
+    coupled system matrices are dense.
+    """
+
+    dt = factors['dt']
+    assert np.abs(dt - ss02.dt) < 1e-10 * dt, 'Time-steps not matching!'
+    assert factors['K12'].shape[1] == ss02.outputs, \
+        'Gain K12 shape not matching with system number of outputs'
+    assert factors['K21'].shape[0] == ss02.inputs, \
+        'Gain K21 shape not matching with system number of inputs'
+
+    A1, B1, C1, D1 = factors['A1'], factors['B1'], factors['C1'], factors['D1']
+    B1K12, D1K12 = factors['B1K12'], factors['D1K12']
+    K21C1, K21D1 = factors['K21C1'], factors['K21D1']
+    P = factors['K21D1K12']
+
+    A2, B2, C2, D2 = ss02.get_mats()
+    D2 = libsp.dense(D2)
+
+    # coupling terms
+    L2 = np.eye(ss02.outputs) - D2.dot(P)
+    L1 = np.eye(ss02.inputs) - P.dot(D2)
+    S2D2 = np.linalg.solve(L2, D2)
+    S2C2 = libsp.solve(L2, C2)
+    S1P = np.linalg.solve(L1, P)
+    S1K21C1 = libsp.solve(L1, K21C1)
+    S1K21D1 = libsp.solve(L1, K21D1)
+
+    S2D2K21C1 = libsp.dot(S2D2, K21C1)
+    S2D2K21D1 = libsp.dot(S2D2, K21D1)
+    S1PC2 = libsp.dot(S1P, C2)
+    S1PD2 = S1P.dot(D2)
+
+    # Build coupled system: each block is M + U V, with low-rank U V
+    A = [[(A1, B1K12, S2D2K21C1), (None, B1K12, S2C2)],
+         [(None, B2, S1K21C1), (A2, B2, S1PC2)]]
+
+    C = [[(C1, D1K12, S2D2K21C1), (None, D1K12, S2C2)],
+         [(None, D2, S1K21C1), (C2, D2, S1PC2)]]
+
+    B = [[(B1, B1K12, S2D2K21D1), (None, B1K12, S2D2)],
+         [(None, B2, S1K21D1), (B2, B2, S1PD2)]]
+
+    D = [[(D1, D1K12, S2D2K21D1), (None, D1K12, S2D2)],
+         [(None, D2, S1K21D1), (D2, D2, S1PD2)]]
+
+    A, B, C, D = [updated_block_matrix(M, out_sparse) for M in (A, B, C, D)]
+
+    return ss(A, B, C, D, dt=dt)
+
+
+def updated_block_matrix(Blocks, out_sparse=False):
+    """
+    Assembles a 2D block matrix whose blocks are of the form M + U V, given as
+    a nested list of tuples (M, U, V), where either M or the pair (U, V) can be
+    None.
+
+    If the output is dense, the products U V are written directly onto the
+    output array and the entries of sparse M blocks are then added to it, such
+    that no intermediate dense copies of M are required.
+    """
+
+    if out_sparse:
+        Sum = []
+        for row in Blocks:
+            Sum.append([])
+            for M, U, V in row:
+                if U is None:
+                    Sum[-1].append(M)
+                elif M is None:
+                    Sum[-1].append(libsp.dot(U, V))
+                else:
+                    Sum[-1].append(libsp.add(M, libsp.dot(U, V)))
+        return libsp.csc_matrix(libsp.block_matrix(Sum))
+
+    # block sizes
+    nrows = [M.shape[0] if U is None else U.shape[0] for M, U, V in [row[0] for row in Blocks]]
+    ncols = [M.shape[1] if U is None else V.shape[1] for M, U, V in Blocks[0]]
+    row_start = np.cumsum([0] + nrows)
+    col_start = np.cumsum([0] + ncols)
+
+    out = np.empty((row_start[-1], col_start[-1]))
+    for ii, row in enumerate(Blocks):
+        for jj, (M, U, V) in enumerate(row):
+            out_block = out[row_start[ii]:row_start[ii + 1], col_start[jj]:col_start[jj + 1]]
+            if U is None:
+                out_block[:] = 0.
+            elif type(U) == np.ndarray and type(V) == np.ndarray:
+                np.matmul(U, V, out=out_block)
+            else:
+                out_block[:] = libsp.dense(libsp.dot(U, V))
+
+            if M is None:
+                continue
+            if type(M) == libsp.csc_matrix:
+                M = M.tocoo()
+                np.add.at(out_block, (M.row, M.col), M.data)
+            else:
+                out_block += M
+
+    return out
+
+
 # def couple_wrong02(ss01, ss02, K12, K21):
 #     """
 #     Couples 2 dlti systems ss01 and ss02 through the gains K12 and K21, where
@@ -741,8 +878,8 @@ def freqresp(SS, wv, dlti=True):
 def series(SS01, SS02):
     r"""
     Connects two state-space blocks in series. If these are instances of DLTI
-    state-space systems, they need to have the same type and time-step. If the input systems are sparse, they are
-    converted to dense.
+    state-space systems, they need to have the same type and time-step. The blocks of the output matrices retain the
+    format of the input matrices, so that a matrix of the combined system is sparse if any of its blocks is sparse.
 
     The connection is such that:
 
@@ -755,7 +892,7 @@ def series(SS01, SS02):
         SS02 (libss.ss): State Space 2 instance. Can be DLTI/CLTI, dense or sparse.
 
     Returns
-        libss.ss: Combined state space system in series in dense format.
+        libss.ss: Combined state space system in series.
     """
 
     if type(SS01) is not type(SS02):
@@ -763,23 +900,12 @@ def series(SS01, SS02):
     if SS01.dt != SS02.dt:
         raise NameError('DLTI systems do not have the same time-step!')
 
-    # determine size of total system
-    Nst01, Nst02 = SS01.states, SS02.states
-    Nst = Nst01 + Nst02
-    Nin = SS01.inputs
-    Nout = SS02.outputs
-
-    # Build A matrix
-    A = np.zeros((Nst, Nst))
-
-    A[:Nst01, :Nst01] = libsp.dense(SS01.A)
-    A[Nst01:, Nst01:] = libsp.dense(SS02.A)
-    A[Nst01:, :Nst01] = libsp.dense(libsp.dot(SS02.B, SS01.C))
-
-    # Build the rest
-    B = np.concatenate((libsp.dense(SS01.B), libsp.dense(libsp.dot(SS02.B, SS01.D))), axis=0)
-    C = np.concatenate((libsp.dense(libsp.dot(SS02.D, SS01.C)), libsp.dense(SS02.C)), axis=1)
-    D = libsp.dense(libsp.dot(SS02.D, SS01.D))
+    A = libsp.block_matrix([[SS01.A, None],
+                            [libsp.dot(SS02.B, SS01.C), SS02.A]])
+    B = libsp.block_matrix([[SS01.B],
+                            [libsp.dot(SS02.B, SS01.D)]])
+    C = libsp.block_matrix([[libsp.dot(SS02.D, SS01.C), SS02.C]])
+    D = libsp.dot(SS02.D, SS01.D)
 
     SStot = ss(A, B, C, D, dt=SS01.dt)
 
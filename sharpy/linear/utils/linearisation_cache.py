@@ -0,0 +1,295 @@
+"""Operating point keyed cache of linearised systems
+
+The assembly of a linearised system (in particular the UVLM AICs, their derivatives and any ROM) is the expensive part
+of :class:`sharpy.solvers.linearassembler.LinearAssembler`. The same reference condition is often linearised again
+across design iterations and sweeps, hence the assembled matrices can be stored on disk and reloaded.
+
+Each entry of the cache is an HDF5 file ``<key>.h5`` in the cache folder, where the key is a hash of everything the
+linearisation depends on (see :func:`operating_point_key`):
+
+    * the linear system settings
+
+    * the structural model: connectivities, boundary conditions, stiffness and mass properties and the orientation of
+      the elements' frames of reference
+
+    * the aerodynamic grid dimensions and inputs (``aero_dict``: airfoils, chords, twist, control surfaces...)
+
+    * the reference structural and aerodynamic time steps, including the modal information of the structure
+
+The files contain named matrices (dense or sparse), state-space systems and the reduction bases of the ROMs.
+
+Entries are validated upon loading: a file whose stored key does not match its name or that cannot be read is
+discarded and treated as a cache miss. If the total size of the cache exceeds the given limit, the least recently used
+entries are removed.
+
+The cache can be emptied with the ``clear_cache`` setting of the ``LinearAssembler`` or from the command line with::
+
+    python -m sharpy.linear.utils.linearisation_cache <cache_folder>
+
+"""
+import glob
+import hashlib
+import os
+import time
+
+import h5py
+import numpy as np
+import scipy.sparse as sp
+
+import sharpy.linear.src.libss as libss
+import sharpy.linear.src.libsparse as libsp
+import sharpy.utils.cout_utils as cout
+
+CACHE_VERSION = 1  # increase when the contents of the entries change
+
+
+def update_hash(hash_obj, value):
+    """
+    Updates a ``hashlib`` object with a (possibly nested) value.
+
+    Dictionaries are hashed in key order, such that the result does not depend on their insertion order. Arrays
+    contribute with their shape, type and data; ``ctypes`` values with their ``value``; strings, numbers, booleans and
+    ``None`` through their ``repr``.
+
+    Raises:
+        TypeError: if the value, or any of its items, is of any other type, since its ``repr`` (e.g. one containing
+          the memory address) would not identify the operating point.
+    """
+    if isinstance(value, dict):
+        hash_obj.update(b'dict')
+        for key in sorted(value.keys(), key=str):
+            hash_obj.update(str(key).encode())
+            update_hash(hash_obj, value[key])
+    elif isinstance(value, (list, tuple)):
+        hash_obj.update(b'list%d' % len(value))
+        for item in value:
+            update_hash(hash_obj, item)
+    elif isinstance(value, np.ndarray):
+        if value.dtype == object:
+            update_hash(hash_obj, value.tolist())
+        else:
+            hash_obj.update(str((value.shape, value.dtype.str)).encode())
+            hash_obj.update(np.ascontiguousarray(value).tobytes())
+    elif sp.issparse(value):
+        update_hash(hash_obj, value.toarray())
+    elif isinstance(value, np.generic):
+        update_hash(hash_obj, value.item())
+    elif value is None or isinstance(value, (str, bytes, bool, int, float)):
+        hash_obj.update(repr(value).encode())
+    elif hasattr(value, 'value'):
+        update_hash(hash_obj, value.value)  # ctypes
+    else:
+        raise TypeError('Unable to hash the operating point, unsupported type %s' % type(value).__name__)
+
+
+def operating_point_key(data, linear_settings):
+    """
+    Hash of the reference condition and settings of a linearisation.
+
+    Args:
+        data (sharpy.presharpy.PreSharpy): Problem data, with the ``data.linear`` reference time steps already defined
+        linear_settings (dict): Settings of the linear system
+
+    Returns:
+        str: Hexadecimal key of the operating point
+    """
+    hash_obj = hashlib.sha256()
+    update_hash(hash_obj, CACHE_VERSION)
+    update_hash(hash_obj, linear_settings)
+
+    structure = data.structure
+    update_hash(hash_obj, [structure.num_node, structure.num_elem,
+                           structure.connectivities, structure.boundary_conditions,
+                           structure.elem_stiffness, structure.stiffness_db,
+                           structure.elem_mass, structure.mass_db,
+                           structure.frame_of_reference_delta,
+                           getattr(structure, 'lumped_mass', None),
+                           getattr(structure, 'lumped_mass_nodes', None),
+                           getattr(structure, 'lumped_mass_inertia', None),
+                           getattr(structure, 'lumped_mass_position', None)])
+
+    update_hash(hash_obj, [data.aero.aero_dimensions, data.aero.aero_dimensions_star,
+                           getattr(data.aero, 'aero_dict', None)])
+
+    tsstruct0 = data.linear.tsstruct0
+    update_hash(hash_obj, [tsstruct0.pos, tsstruct0.pos_dot, tsstruct0.psi, tsstruct0.psi_dot,
+                           tsstruct0.quat, tsstruct0.for_vel, tsstruct0.for_acc,
+                           getattr(tsstruct0, 'modal', None)])
+
+    tsaero0 = data.linear.tsaero0
+    update_hash(hash_obj, [tsaero0.zeta, tsaero0.zeta_dot, tsaero0.zeta_star,
+                           tsaero0.gamma, tsaero0.gamma_star, tsaero0.gamma_dot,
+                           tsaero0.u_ext, tsaero0.u_ext_star, tsaero0.forces, tsaero0.dynamic_forces,
+                           getattr(tsaero0, 'control_surface_deflection', None)])
+
+    return hash_obj.hexdigest()
+
+
+class LinearisationCache(object):
+    """
+    On-disk cache of the matrices of a linearisation at a given operating point.
+
+    Args:
+        folder (str): Cache folder
+        key (str): Key of the operating point (see :func:`operating_point_key`)
+        max_size (float): Maximum size of the cache in MB. Least recently used entries are removed when exceeded.
+          Unlimited if ``0``.
+
+    Examples:
+
+        >>> cache = LinearisationCache(folder, operating_point_key(data, settings))
+        >>> if cache.hit():
+        >>>     entry = cache.load()
+        >>>     ss = entry['ss']['uvlm']
+        >>> else:
+        >>>     cache.save(ss={'uvlm': ss}, matrices={'Kas': Kas}, rom_bases={'Krylov': {'V': V, 'W': W}})
+    """
+
+    def __init__(self, folder, key, max_size=0.):
+        self.folder = folder
+        self.key = key
+        self.max_size = max_size
+        self.filename = os.path.join(folder, key + '.h5')
+
+    def hit(self):
+        """
+        Returns:
+            bool: ``True`` if a valid entry exists for the operating point. Invalid entries are removed.
+        """
+        if not os.path.isfile(self.filename):
+            return False
+        try:
+            with h5py.File(self.filename, 'r') as f:
+                valid = f.attrs['key'] == self.key and f.attrs['version'] == CACHE_VERSION \
+                        and all(group in f for group in ['ss', 'matrices', 'rom'])
+        except (OSError, KeyError):
+            valid = False
+        if not valid:
+            cout.cout_wrap('Removing invalid linearisation cache entry %s' % self.filename, 3)
+            os.remove(self.filename)
+        return valid
+
+    def load(self):
+        """
+        Loads the entry of the operating point and marks it as recently used.
+
+        Returns:
+            dict: Entry with keys ``ss`` (dictionary of :class:`sharpy.linear.src.libss.ss`), ``matrices`` (dictionary
+            of arrays or :class:`sharpy.linear.src.libsparse.csc_matrix`) and ``rom_bases`` (dictionary of
+            dictionaries of arrays).
+        """
+        cout.cout_wrap('Loading linearised system from cache %s' % self.filename, 1)
+        entry = {'ss': dict(), 'matrices': dict(), 'rom_bases': dict()}
+        with h5py.File(self.filename, 'r') as f:
+            for name, grp in f['ss'].items():
+                A, B, C, D = [read_matrix(grp[mat]) for mat in ['A', 'B', 'C', 'D']]
+                entry['ss'][name] = libss.ss(A, B, C, D, dt=grp.attrs['dt'])
+            for name, grp in f['matrices'].items():
+                entry['matrices'][name] = read_matrix(grp)
+            for name, grp in f['rom'].items():
+                entry['rom_bases'][name] = {basis: read_matrix(grp[basis]) for basis in grp}
+
+        os.utime(self.filename)
+        return entry
+
+    def save(self, ss=None, matrices=None, rom_bases=None):
+        """
+        Saves the entry of the operating point and enforces the size limit of the cache.
+
+        Args:
+            ss (dict): State-space systems (:class:`sharpy.linear.src.libss.ss`) to save
+            matrices (dict): Dense or sparse matrices to save
+            rom_bases (dict): Dictionary of reduction bases (e.g. ``V`` and ``W``) of each ROM
+        """
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+
+        # write to a temporary file first such that an interrupted write does not leave a corrupted entry
+        tmp_filename = self.filename + '.tmp'
+        with h5py.File(tmp_filename, 'w') as f:
+            f.attrs['key'] = self.key
+            f.attrs['version'] = CACHE_VERSION
+            grp_ss = f.create_group('ss')
+            for name, ss_here in (ss or dict()).items():
+                grp = grp_ss.create_group(name)
+                grp.attrs['dt'] = ss_here.dt if ss_here.dt is not None else np.nan
+                for mat_name, mat in zip(['A', 'B', 'C', 'D'], ss_here.get_mats()):
+                    write_matrix(grp.create_group(mat_name), mat)
+            grp_mat = f.create_group('matrices')
+            for name, mat in (matrices or dict()).items():
+                write_matrix(grp_mat.create_group(name), mat)
+            grp_rom = f.create_group('rom')
+            for name, bases in (rom_bases or dict()).items():
+                grp = grp_rom.create_group(name)
+                for basis_name, basis in bases.items():
+                    write_matrix(grp.create_group(basis_name), basis)
+        os.replace(tmp_filename, self.filename)
+        cout.cout_wrap('Linearised system saved to cache %s' % self.filename, 1)
+
+        self.enforce_size_limit()
+
+    def enforce_size_limit(self):
+        """
+        Removes the least recently used entries until the size of the cache is below ``max_size``. The entry of the
+        current operating point is never removed.
+        """
+        if self.max_size <= 0:
+            return
+
+        entries = sorted(glob.glob(os.path.join(self.folder, '*.h5')), key=os.path.getmtime)
+        total_size = sum(os.path.getsize(entry) for entry in entries)
+        for entry in entries:
+            if total_size <= self.max_size * 1024 ** 2:
+                break
+            if entry == self.filename:
+                continue
+            total_size -= os.path.getsize(entry)
+            os.remove(entry)
+            cout.cout_wrap('Removed linearisation cache entry %s (cache size limit)' % entry, 2)
+
+
+def clear(folder):
+    """
+    Removes all the entries of a linearisation cache.
+
+    Args:
+        folder (str): Cache folder
+
+    Returns:
+        int: Number of entries removed
+    """
+    entries = glob.glob(os.path.join(folder, '*.h5')) + glob.glob(os.path.join(folder, '*.h5.tmp'))
+    for entry in entries:
+        os.remove(entry)
+    return len(entries)
+
+
+def write_matrix(grp, mat):
+    """Writes a dense or sparse matrix onto an HDF5 group."""
+    if sp.issparse(mat):
+        mat = sp.csc_matrix(mat)
+        grp.attrs['sparse'] = True
+        grp.attrs['shape'] = mat.shape
+        grp.create_dataset('data', data=mat.data)
+        grp.create_dataset('indices', data=mat.indices)
+        grp.create_dataset('indptr', data=mat.indptr)
+    else:
+        grp.attrs['sparse'] = False
+        grp.create_dataset('data', data=np.asarray(mat))
+
+
+def read_matrix(grp):
+    """Reads a matrix written with :func:`write_matrix`. Sparse matrices are returned as ``libsparse.csc_matrix``."""
+    if grp.attrs['sparse']:
+        return libsp.csc_matrix((grp['data'][()], grp['indices'][()], grp['indptr'][()]),
+                                shape=tuple(grp.attrs['shape']))
+    return grp['data'][()]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Clears a linearisation cache folder')
+    parser.add_argument('folder', help='Cache folder')
+    args = parser.parse_args()
+    cout.cout_wrap('Removed %d linearisation cache entries from %s' % (clear(args.folder), args.folder))
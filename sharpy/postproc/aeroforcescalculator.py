@@ -21,6 +21,13 @@ class AeroForcesCalculator(BaseSolver):
 
     Calculates the total aerodynamic forces on the frame of reference ``A``.
 
+    The forces and moments about the origin of ``A`` of each surface are integrated once per time step and stored
+    in both the inertial (``inertial_steady_forces``, ``inertial_unsteady_forces``) and body-attached
+    (``body_steady_forces``, ``body_unsteady_forces``) frames of the aerodynamic time step.
+
+    When run online, only the latest time step is integrated and its line is appended to the screen and text file
+    output.
+
     """
     solver_id = 'AeroForcesCalculator'
     solver_classification = 'post-processor'
@@ -72,10 +79,15 @@ class AeroForcesCalculator(BaseSolver):
         self.ts = 0
 
         self.folder = ''
+        self.text_file = None
+        self.screen_header = False
 
-    def initialise(self, data):
+    def initialise(self, data, custom_settings=None):
         self.data = data
-        self.settings = data.settings[self.solver_id]
+        if custom_settings is None:
+            self.settings = data.settings[self.solver_id]
+        else:
+            self.settings = custom_settings
         if self.data.structure.settings['unsteady']:
             self.ts_max = self.data.ts + 1
         else:
@@ -83,10 +95,6 @@ class AeroForcesCalculator(BaseSolver):
             self.ts_max = len(self.data.structure.timestep_info)
         settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
 
-    def run(self):
-        self.ts = 0
-
-        self.calculate_forces()
         if self.settings['write_text_file']:
             self.folder = (self.settings['folder'] + '/' +
                            self.data.settings['SHARPy']['case'] + '/' +
@@ -95,103 +103,134 @@ class AeroForcesCalculator(BaseSolver):
             if not os.path.exists(self.folder):
                 os.makedirs(self.folder)
             self.folder += self.settings['text_file_name']
+        self.text_file = None
+        self.screen_header = False
+
+    def run(self, online=False):
+        if online:
+            self.ts = len(self.data.aero.timestep_info) - 1
+            self.calculate_forces(self.ts)
+            if self.settings['write_text_file']:
+                self.append_file_output(self.ts)
+            if self.settings['screen_output']:
+                if not self.screen_header:
+                    cout.cout_wrap.print_separator()
+                    cout.cout_wrap(self.screen_header_line(), 1)
+                    self.screen_header = True
+                cout.cout_wrap(self.screen_line(self.ts), 1)
+            return self.data
+
+        self.ts = 0
+
+        for ts in range(self.ts_max):
+            self.calculate_forces(ts)
+        if self.settings['write_text_file']:
             self.file_output()
         if self.settings['screen_output']:
             self.screen_output()
         cout.cout_wrap('...Finished', 1)
         return self.data
 
-    def calculate_forces(self):
-        for self.ts in range(self.ts_max):
-            rot = algebra.quat2rotation(self.data.structure.timestep_info[self.ts].quat)
-
-            force = self.data.aero.timestep_info[self.ts].forces
-            unsteady_force = self.data.aero.timestep_info[self.ts].dynamic_forces
-            n_surf = len(force)
-            for i_surf in range(n_surf):
-                total_steady_force = np.zeros((3,))
-                total_unsteady_force = np.zeros((3,))
-                _, n_rows, n_cols = force[i_surf].shape
-                for i_m in range(n_rows):
-                    for i_n in range(n_cols):
-                        total_steady_force += force[i_surf][0:3, i_m, i_n]
-                        total_unsteady_force += unsteady_force[i_surf][0:3, i_m, i_n]
-                self.data.aero.timestep_info[self.ts].inertial_steady_forces[i_surf, 0:3] = total_steady_force
-                self.data.aero.timestep_info[self.ts].inertial_unsteady_forces[i_surf, 0:3] = total_unsteady_force
-                self.data.aero.timestep_info[self.ts].body_steady_forces[i_surf, 0:3] = np.dot(rot.T, total_steady_force)
-                self.data.aero.timestep_info[self.ts].body_unsteady_forces[i_surf, 0:3] = np.dot(rot.T, total_unsteady_force)
+    def finalise(self):
+        if self.text_file is not None:
+            self.text_file.close()
+            self.text_file = None
+
+    def calculate_forces(self, ts):
+        """
+        Integrates the forces and moments of every surface for the time step ``ts``.
+
+        The moments are taken about the origin of the ``A`` frame, where the grid coordinates ``zeta`` are referred to.
+        """
+        aero_tstep = self.data.aero.timestep_info[ts]
+        rot = algebra.quat2rotation(self.data.structure.timestep_info[ts].quat)
+
+        for forces, inertial, body in [(aero_tstep.forces,
+                                        aero_tstep.inertial_steady_forces,
+                                        aero_tstep.body_steady_forces),
+                                       (aero_tstep.dynamic_forces,
+                                        aero_tstep.inertial_unsteady_forces,
+                                        aero_tstep.body_unsteady_forces)]:
+            for i_surf in range(len(forces)):
+                inertial[i_surf, 0:3] = np.sum(forces[i_surf][0:3, :, :], axis=(1, 2))
+                inertial[i_surf, 3:6] = np.sum(np.cross(aero_tstep.zeta[i_surf], forces[i_surf][0:3, :, :], axis=0) +
+                                               forces[i_surf][3:6, :, :], axis=(1, 2))
+            # rot.T projects onto the body frame, applied to the rows of (n_surf, 3) arrays
+            body[:, 0:3] = np.dot(inertial[:, 0:3], rot)
+            body[:, 3:6] = np.dot(inertial[:, 3:6], rot)
 
     def calculate_coefficients(self, fx, fy, fz):
         qS = self.settings['q_ref'].value * self.settings['S_ref'].value
         return fx/qS, fy/qS, fz/qS
 
-    def screen_output(self):
-        line = ''
-        cout.cout_wrap.print_separator()
-        # output header
+    def screen_header_line(self):
         if self.settings['coefficients']:
-            line = "{0:5s} | {1:10s} | {2:10s} | {3:10s} | {4:10s} | {5:10s} | {6:10s}".format(
+            return "{0:5s} | {1:10s} | {2:10s} | {3:10s} | {4:10s} | {5:10s} | {6:10s}".format(
                 'tstep', '  fx_g', '  fy_g', '  fz_g', '  Cfx_g', '  Cfy_g', '  Cfz_g')
-            cout.cout_wrap(line, 1)
-            for self.ts in range(self.ts_max):
-                fx = np.sum(self.data.aero.timestep_info[self.ts].inertial_steady_forces[:, 0], 0) + \
-                     np.sum(self.data.aero.timestep_info[self.ts].inertial_unsteady_forces[:, 0], 0)
-
-                fy = np.sum(self.data.aero.timestep_info[self.ts].inertial_steady_forces[:, 1], 0) + \
-                     np.sum(self.data.aero.timestep_info[self.ts].inertial_unsteady_forces[:, 1], 0)
-
-                fz = np.sum(self.data.aero.timestep_info[self.ts].inertial_steady_forces[:, 2], 0) + \
-                     np.sum(self.data.aero.timestep_info[self.ts].inertial_unsteady_forces[:, 2], 0)
-
-                Cfx, Cfy, Cfz = self.calculate_coefficients(fx, fy, fz)
+        return "{0:5s} | {1:10s} | {2:10s} | {3:10s}".format(
+            'tstep', '  fx_g', '  fy_g', '  fz_g')
 
-                line = "{0:5d} | {1: 8.3e} | {2: 8.3e} | {3: 8.3e} | {4: 8.3e} | {5: 8.3e} | {6: 8.3e}".format(
-                    self.ts, fx, fy, fz, Cfx, Cfy, Cfz)
-                cout.cout_wrap(line, 1)
-        else:
-            line = "{0:5s} | {1:10s} | {2:10s} | {3:10s}".format(
-                'tstep', '  fx_g', '  fy_g', '  fz_g')
-            cout.cout_wrap(line, 1)
-            for self.ts in range(self.ts_max):
-                fx = np.sum(self.data.aero.timestep_info[self.ts].inertial_steady_forces[:, 0], 0) + \
-                     np.sum(self.data.aero.timestep_info[self.ts].inertial_unsteady_forces[:, 0], 0)
-
-                fy = np.sum(self.data.aero.timestep_info[self.ts].inertial_steady_forces[:, 1], 0) + \
-                     np.sum(self.data.aero.timestep_info[self.ts].inertial_unsteady_forces[:, 1], 0)
-
-                fz = np.sum(self.data.aero.timestep_info[self.ts].inertial_steady_forces[:, 2], 0) + \
-                     np.sum(self.data.aero.timestep_info[self.ts].inertial_unsteady_forces[:, 2], 0)
-
-                line = "{0:5d} | {1: 8.3e} | {2: 8.3e} | {3: 8.3e}".format(
-                    self.ts, fx, fy, fz)
-                cout.cout_wrap(line, 1)
+    def screen_line(self, ts):
+        aero_tstep = self.data.aero.timestep_info[ts]
+        fx, fy, fz = np.sum(aero_tstep.inertial_steady_forces[:, 0:3] + aero_tstep.inertial_unsteady_forces[:, 0:3],
+                            axis=0)
+        if self.settings['coefficients']:
+            Cfx, Cfy, Cfz = self.calculate_coefficients(fx, fy, fz)
+            return "{0:5d} | {1: 8.3e} | {2: 8.3e} | {3: 8.3e} | {4: 8.3e} | {5: 8.3e} | {6: 8.3e}".format(
+                ts, fx, fy, fz, Cfx, Cfy, Cfz)
+        return "{0:5d} | {1: 8.3e} | {2: 8.3e} | {3: 8.3e}".format(
+            ts, fx, fy, fz)
 
-    def file_output(self):
-        # assemble forces matrix
-        # (1 timestep) + (3+3 inertial steady+unsteady) + (3+3 body steady+unsteady)
-        force_matrix = np.zeros((self.ts_max, 1 + 3 + 3 + 3 + 3))
+    def screen_output(self):
+        cout.cout_wrap.print_separator()
+        # output header
+        cout.cout_wrap(self.screen_header_line(), 1)
         for self.ts in range(self.ts_max):
-            i = 0
-            force_matrix[self.ts, i] = self.ts
-            i += 1
-            force_matrix[self.ts, i:i+3] = np.sum(self.data.aero.timestep_info[self.ts].inertial_steady_forces[:, 0:3], 0)
-            i += 3
-            force_matrix[self.ts, i:i+3] = np.sum(self.data.aero.timestep_info[self.ts].inertial_unsteady_forces[:, 0:3], 0)
-            i += 3
-            force_matrix[self.ts, i:i+3] = np.sum(self.data.aero.timestep_info[self.ts].body_steady_forces[:, 0:3], 0)
-            i += 3
-            force_matrix[self.ts, i:i+3] = np.sum(self.data.aero.timestep_info[self.ts].body_unsteady_forces[:, 0:3], 0)
-
+            cout.cout_wrap(self.screen_line(self.ts), 1)
+
+    def force_row(self, ts):
+        # (1 timestep) + (3+3 inertial steady+unsteady) + (3+3 body steady+unsteady) + the same for the moments
+        aero_tstep = self.data.aero.timestep_info[ts]
+        row = [np.array([ts])]
+        for i_start in [0, 3]:
+            for loads in [aero_tstep.inertial_steady_forces,
+                          aero_tstep.inertial_unsteady_forces,
+                          aero_tstep.body_steady_forces,
+                          aero_tstep.body_unsteady_forces]:
+                row.append(np.sum(loads[:, i_start:i_start + 3], 0))
+        return np.concatenate(row)
+
+    @staticmethod
+    def file_header():
         header = ''
         header += 'tstep, '
         header += 'fx_steady_G, fy_steady_G, fz_steady_G, '
         header += 'fx_unsteady_G, fy_unsteady_G, fz_unsteady_G, '
         header += 'fx_steady_a, fy_steady_a, fz_steady_a, '
-        header += 'fx_unsteady_a, fy_unsteady_a, fz_unsteady_a'
+        header += 'fx_unsteady_a, fy_unsteady_a, fz_unsteady_a, '
+        header += 'mx_steady_G, my_steady_G, mz_steady_G, '
+        header += 'mx_unsteady_G, my_unsteady_G, mz_unsteady_G, '
+        header += 'mx_steady_a, my_steady_a, mz_steady_a, '
+        header += 'mx_unsteady_a, my_unsteady_a, mz_unsteady_a'
+        return header
+
+    def file_output(self):
+        # assemble forces matrix
+        force_matrix = np.array([self.force_row(ts) for ts in range(self.ts_max)])
 
         np.savetxt(self.folder,
                    force_matrix,
-                   fmt='%i' + ', %10e'*12,
+                   fmt='%i' + ', %10e'*24,
                    delimiter=',',
-                   header=header,
+                   header=self.file_header(),
                    comments='#')
+
+    def append_file_output(self, ts):
+        if self.text_file is None:
+            self.text_file = open(self.folder, 'w')
+            self.text_file.write('#' + self.file_header() + '\n')
+        np.savetxt(self.text_file,
+                   self.force_row(ts).reshape((1, -1)),
+                   fmt='%i' + ', %10e'*24,
+                   delimiter=',')
+        self.text_file.flush()
@@ -1,13 +1,13 @@
 import os
 
 import numpy as np
-from tvtk.api import tvtk, write_data
 
 import sharpy.utils.algebra as algebra
 import sharpy.utils.cout_utils as cout
 from sharpy.utils.settings import str2bool
 from sharpy.utils.solver_interface import solver, BaseSolver
 import sharpy.utils.settings as settings
+import sharpy.utils.vtkutils as vtkutils
 import sharpy.aero.utils.uvlmlib as uvlmlib
 
 
@@ -16,6 +16,17 @@ class AerogridPlot(BaseSolver):
     """
     Aerodynamic Grid Plotter
 
+    The panel connectivity of each surface is generated once, and the coordinates and fields are filled with array
+    operations. The output ``format`` can be
+
+        * ``vtu``: one binary ``.vtu`` file per surface and time step for the body and the wake.
+
+        * ``vtu_merged``: one binary ``.vtu`` file per time step for the body and another one for the wake, with all
+          the surfaces. The surfaces can be told apart by the ``panel_surface_id`` cell data.
+
+        * ``xdmf``: a single ``<name_prefix>aero_<case>.h5`` file with all the time steps and surfaces, and the
+          ``.xmf`` file describing it that is opened in ParaView.
+
     """
     solver_id = 'AerogridPlot'
     solver_classification = 'post-processor'
@@ -23,6 +34,7 @@ class AerogridPlot(BaseSolver):
     settings_types = dict()
     settings_default = dict()
     settings_description = dict()
+    settings_options = dict()
 
     settings_types['folder'] = 'str'
     settings_default['folder'] = './output'
@@ -59,8 +71,15 @@ class AerogridPlot(BaseSolver):
     settings_types['num_cores'] = 'int'
     settings_default['num_cores'] = 1
 
+    settings_types['format'] = 'str'
+    settings_default['format'] = 'vtu'
+    settings_description['format'] = 'Output format. ``vtu`` writes a file per surface and time step, ``vtu_merged`` ' \
+                                      'a file per time step and ``xdmf`` a single ``h5`` file for all time steps'
+    settings_options['format'] = ['vtu', 'vtu_merged', 'xdmf']
+
     table = settings.SettingsTable()
-    __doc__ += table.generate(settings_types, settings_default, settings_description)
+    __doc__ += table.generate(settings_types, settings_default, settings_description,
+                              settings_options=settings_options)
 
     def __init__(self):
         self.settings = None
@@ -71,13 +90,17 @@ class AerogridPlot(BaseSolver):
         self.wake_filename = ''
         self.ts_max = 0
 
+        self.connectivity = dict()
+        self.xdmf = None
+
     def initialise(self, data, custom_settings=None):
         self.data = data
         if custom_settings is None:
             self.settings = data.settings[self.solver_id]
         else:
             self.settings = custom_settings
-        settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
+        settings.to_custom_types(self.settings, self.settings_types, self.settings_default,
+                                 options=self.settings_options)
         self.ts_max = self.data.ts + 1
         # create folder for containing files if necessary
         if not os.path.exists(self.settings['folder']):
@@ -93,204 +116,127 @@ class AerogridPlot(BaseSolver):
                               self.settings['name_prefix'] +
                               'wake_' +
                               self.data.settings['SHARPy']['case'])
+        self.connectivity = dict()
+        if self.settings['format'] == 'xdmf':
+            self.xdmf = vtkutils.XdmfTimeSeries(self.folder +
+                                                self.settings['name_prefix'] +
+                                                'aero_' +
+                                                self.data.settings['SHARPy']['case'])
 
     def run(self, online=False):
         # TODO: Create a dictionary to plot any variable as in beamplot
         if not online:
             for self.ts in range(self.ts_max):
-                self.plot_body()
-                self.plot_wake()
+                self.write(self.plot_body(), self.plot_wake())
+            self.finalise()
             cout.cout_wrap('...Finished', 1)
         else:
             aero_tsteps = len(self.data.aero.timestep_info) - 1
             struct_tsteps = len(self.data.structure.timestep_info) - 1
             self.ts = np.max((aero_tsteps, struct_tsteps))
-            self.plot_body()
-            self.plot_wake()
+            self.write(self.plot_body(), self.plot_wake())
         return self.data
 
+    def finalise(self):
+        if self.xdmf is not None:
+            self.xdmf.close()
+            self.xdmf = None
+
+    def quad_connectivity(self, m, n):
+        try:
+            return self.connectivity[(m, n)]
+        except KeyError:
+            self.connectivity[(m, n)] = vtkutils.quad_connectivity(m, n)
+            return self.connectivity[(m, n)]
+
+    def offset_coords(self, coords):
+        if self.settings['include_rbm']:
+            coords += self.data.structure.timestep_info[self.ts].for_pos[0:3]
+        if self.settings['include_forward_motion']:
+            coords[:, 0] -= self.settings['dt'].value*self.ts*self.settings['u_inf'].value
+        return coords
+
+    def write(self, body_grids, wake_grids):
+        if self.settings['format'] == 'vtu':
+            for i_surf in range(len(body_grids)):
+                vtkutils.write_vtu(body_grids[i_surf], self.body_filename + '_%02u_%06u' % (i_surf, self.ts))
+                vtkutils.write_vtu(wake_grids[i_surf], self.wake_filename + '_%02u_%06u' % (i_surf, self.ts))
+        elif self.settings['format'] == 'vtu_merged':
+            vtkutils.write_vtu(vtkutils.merge_grids(body_grids), self.body_filename + '_%06u' % self.ts)
+            vtkutils.write_vtu(vtkutils.merge_grids(wake_grids), self.wake_filename + '_%06u' % self.ts)
+        else:
+            grids = dict()
+            for i_surf in range(len(body_grids)):
+                grids['body_%02u' % i_surf] = body_grids[i_surf]
+                grids['wake_%02u' % i_surf] = wake_grids[i_surf]
+            self.xdmf.add_step(self.ts, self.ts, grids)
+
     def plot_body(self):
-        for i_surf in range(self.data.aero.timestep_info[self.ts].n_surf):
-            filename = (self.body_filename +
-                        '_' +
-                        '%02u_' % i_surf +
-                        '%06u' % self.ts)
-
-            dims = self.data.aero.timestep_info[self.ts].dimensions[i_surf, :]
-            point_data_dim = (dims[0]+1)*(dims[1]+1)  # + (dims_star[0]+1)*(dims_star[1]+1)
-            panel_data_dim = (dims[0])*(dims[1])  # + (dims_star[0])*(dims_star[1])
-
-            coords = np.zeros((point_data_dim, 3))
-            conn = []
-            panel_id = np.zeros((panel_data_dim,), dtype=int)
-            panel_surf_id = np.zeros((panel_data_dim,), dtype=int)
-            panel_gamma = np.zeros((panel_data_dim,))
-            panel_gamma_dot = np.zeros((panel_data_dim,))
-            normal = np.zeros((panel_data_dim, 3))
-            point_struct_id = np.zeros((point_data_dim,), dtype=int)
-            point_cf = np.zeros((point_data_dim, 3))
-            point_unsteady_cf = np.zeros((point_data_dim, 3))
-            zeta_dot = np.zeros((point_data_dim, 3))
-            u_inf = np.zeros((point_data_dim, 3))
-            if self.settings['include_velocities']:
-                vel = np.zeros((point_data_dim, 3))
-            counter = -1
+        aero_tstep = self.data.aero.timestep_info[self.ts]
+        grids = []
+        for i_surf in range(aero_tstep.n_surf):
+            dims = aero_tstep.dimensions[i_surf, :]
+            point_data_dim = (dims[0]+1)*(dims[1]+1)
+            panel_data_dim = (dims[0])*(dims[1])
 
             # coordinates of corners
-            for i_n in range(dims[1]+1):
-                for i_m in range(dims[0]+1):
-                    counter += 1
-                    coords[counter, :] = self.data.aero.timestep_info[self.ts].zeta[i_surf][:, i_m, i_n]
-                    if self.settings['include_rbm']:
-                        coords[counter, :] += self.data.structure.timestep_info[self.ts].for_pos[0:3]
-                    if self.settings['include_forward_motion']:
-                        coords[counter, 0] -= self.settings['dt'].value*self.ts*self.settings['u_inf'].value
-
-            with_incidence_angle = True
+            coords = self.offset_coords(vtkutils.grid_points(aero_tstep.zeta[i_surf]).copy())
+
+            point_data = dict()
+            point_data['n_id'] = np.arange(point_data_dim)
+            point_data['point_struct_id'] = np.repeat(self.data.aero.aero2struct_mapping[i_surf], dims[0] + 1)
+            for name, attr in [('point_steady_force', 'forces'),
+                               ('point_unsteady_force', 'dynamic_forces'),
+                               ('zeta_dot', 'zeta_dot'),
+                               ('u_inf', 'u_ext')]:
+                try:
+                    point_data[name] = vtkutils.grid_points(getattr(aero_tstep, attr)[i_surf][0:3, :, :])
+                except (AttributeError, TypeError, IndexError):
+                    point_data[name] = np.zeros((point_data_dim, 3))
+
+            if self.settings['include_velocities']:
+                point_data['velocity'] = uvlmlib.uvlm_calculate_total_induced_velocity_at_points(
+                    aero_tstep,
+                    coords,
+                    aero_tstep.for_pos,
+                    self.settings['num_cores'])
+
+            cell_data = dict()
+            cell_data['panel_n_id'] = np.arange(panel_data_dim)
+            cell_data['panel_surface_id'] = np.full((panel_data_dim,), i_surf, dtype=int)
+            cell_data['panel_gamma'] = vtkutils.grid_points(aero_tstep.gamma[i_surf])
+            cell_data['panel_gamma_dot'] = vtkutils.grid_points(aero_tstep.gamma_dot[i_surf])
             try:
-                self.data.aero.timestep_info[self.ts].postproc_cell['incidence_angle']
+                cell_data['incidence_angle'] = \
+                    vtkutils.grid_points(aero_tstep.postproc_cell['incidence_angle'][i_surf])
             except KeyError:
-                with_incidence_angle = False
-            else:
-                incidence_angle = np.zeros_like(panel_gamma)
-
-            counter = -1
-            node_counter = -1
-            for i_n in range(dims[1] + 1):
-                global_counter = self.data.aero.aero2struct_mapping[i_surf][i_n]
-                for i_m in range(dims[0] + 1):
-                    node_counter += 1
-                    # point data
-                    point_struct_id[node_counter] = global_counter
-                    point_cf[node_counter, :] = self.data.aero.timestep_info[self.ts].forces[i_surf][0:3, i_m, i_n]
-                    try:
-                        point_unsteady_cf[node_counter, :] = self.data.aero.timestep_info[self.ts].dynamic_forces[i_surf][0:3, i_m, i_n]
-                    except AttributeError:
-                        pass
-                    try:
-                        zeta_dot[node_counter, :] = self.data.aero.timestep_info[self.ts].zeta_dot[i_surf][0:3, i_m, i_n]
-                    except AttributeError:
-                        pass
-                    try:
-                        u_inf[node_counter, :] = self.data.aero.timestep_info[self.ts].u_ext[i_surf][0:3, i_m, i_n]
-                    except AttributeError:
-                        pass
-                    if i_n < dims[1] and i_m < dims[0]:
-                        counter += 1
-                    else:
-                        continue
-
-                    conn.append([node_counter + 0,
-                                 node_counter + 1,
-                                 node_counter + dims[0]+2,
-                                 node_counter + dims[0]+1])
-                    # cell data
-                    normal[counter, :] = self.data.aero.timestep_info[self.ts].normals[i_surf][:, i_m, i_n]
-                    panel_id[counter] = counter
-                    panel_surf_id[counter] = i_surf
-                    panel_gamma[counter] = self.data.aero.timestep_info[self.ts].gamma[i_surf][i_m, i_n]
-                    panel_gamma_dot[counter] = self.data.aero.timestep_info[self.ts].gamma_dot[i_surf][i_m, i_n]
-
-                    if with_incidence_angle:
-                        incidence_angle[counter] = \
-                            self.data.aero.timestep_info[self.ts].postproc_cell['incidence_angle'][i_surf][i_m, i_n]
+                pass
+            cell_data['panel_normal'] = vtkutils.grid_points(aero_tstep.normals[i_surf])
 
-            if self.settings['include_velocities']:
-                vel = uvlmlib.uvlm_calculate_total_induced_velocity_at_points(self.data.aero.timestep_info[self.ts],
-                                                                                              coords,
-                                                                                              self.data.aero.timestep_info[self.ts].for_pos,
-                                                                                              self.settings['numcores'])
-
-            ug = tvtk.UnstructuredGrid(points=coords)
-            ug.set_cells(tvtk.Quad().cell_type, conn)
-            ug.cell_data.scalars = panel_id
-            ug.cell_data.scalars.name = 'panel_n_id'
-            ug.cell_data.add_array(panel_surf_id)
-            ug.cell_data.get_array(1).name = 'panel_surface_id'
-            ug.cell_data.add_array(panel_gamma)
-            ug.cell_data.get_array(2).name = 'panel_gamma'
-            ug.cell_data.add_array(panel_gamma_dot)
-            ug.cell_data.get_array(3).name = 'panel_gamma_dot'
-            if with_incidence_angle:
-                ug.cell_data.add_array(incidence_angle)
-                ug.cell_data.get_array(4).name = 'incidence_angle'
-            ug.cell_data.vectors = normal
-            ug.cell_data.vectors.name = 'panel_normal'
-            ug.point_data.scalars = np.arange(0, coords.shape[0])
-            ug.point_data.scalars.name = 'n_id'
-            ug.point_data.add_array(point_struct_id)
-            ug.point_data.get_array(1).name = 'point_struct_id'
-            ug.point_data.add_array(point_cf)
-            ug.point_data.get_array(2).name = 'point_steady_force'
-            ug.point_data.add_array(point_unsteady_cf)
-            ug.point_data.get_array(3).name = 'point_unsteady_force'
-            ug.point_data.add_array(zeta_dot)
-            ug.point_data.get_array(4).name = 'zeta_dot'
-            ug.point_data.add_array(u_inf)
-            ug.point_data.get_array(5).name = 'u_inf'
-            if self.settings['include_velocities']:
-                ug.point_data.add_array(vel)
-                ug.point_data.get_array(6).name = 'velocity'
-            write_data(ug, filename)
+            grids.append({'points': coords,
+                          'connectivity': self.quad_connectivity(dims[0], dims[1]),
+                          'cell_type': 'quad',
+                          'cell_data': cell_data,
+                          'point_data': point_data,
+                          'vectors': {'cell_data': 'panel_normal'}})
+        return grids
 
     def plot_wake(self):
-        for i_surf in range(self.data.aero.timestep_info[self.ts].n_surf):
-            filename = (self.wake_filename +
-                        '_' +
-                        '%02u_' % i_surf +
-                        '%06u' % self.ts)
-
-            dims_star = self.data.aero.timestep_info[self.ts].dimensions_star[i_surf, :]
-            dims_star[0] -= self.settings['minus_m_star']
-
-            point_data_dim = (dims_star[0]+1)*(dims_star[1]+1)
-            panel_data_dim = (dims_star[0])*(dims_star[1])
-
-            coords = np.zeros((point_data_dim, 3))
-            conn = []
-            panel_id = np.zeros((panel_data_dim,), dtype=int)
-            panel_surf_id = np.zeros((panel_data_dim,), dtype=int)
-            panel_gamma = np.zeros((panel_data_dim,))
-            counter = -1
-            # rotation_mat = self.data.structure.timestep_info[self.ts].cga().T
+        aero_tstep = self.data.aero.timestep_info[self.ts]
+        grids = []
+        for i_surf in range(aero_tstep.n_surf):
+            m_star = aero_tstep.dimensions_star[i_surf, 0] - self.settings['minus_m_star'].value
+            n_star = aero_tstep.dimensions_star[i_surf, 1]
+
             # coordinates of corners
-            for i_n in range(dims_star[1]+1):
-                for i_m in range(dims_star[0]+1):
-                    counter += 1
-                    coords[counter, :] = self.data.aero.timestep_info[self.ts].zeta_star[i_surf][:, i_m, i_n]
-                    if self.settings['include_rbm']:
-                        coords[counter, :] += self.data.structure.timestep_info[self.ts].for_pos[0:3]
-                    if self.settings['include_forward_motion']:
-                        coords[counter, 0] -= self.settings['dt'].value*self.ts*self.settings['u_inf'].value
-
-            counter = -1
-            node_counter = -1
-            # wake
-            for i_n in range(dims_star[1]+1):
-                for i_m in range(dims_star[0]+1):
-                    node_counter += 1
-                    # cell data
-                    if i_n < dims_star[1] and i_m < dims_star[0]:
-                        counter += 1
-                    else:
-                        continue
-
-                    conn.append([node_counter + 0,
-                                 node_counter + 1,
-                                 node_counter + dims_star[0]+2,
-                                 node_counter + dims_star[0]+1])
-                    panel_id[counter] = counter
-                    panel_surf_id[counter] = i_surf
-                    panel_gamma[counter] = self.data.aero.timestep_info[self.ts].gamma_star[i_surf][i_m, i_n]
-
-            ug = tvtk.UnstructuredGrid(points=coords)
-            ug.set_cells(tvtk.Quad().cell_type, conn)
-            ug.cell_data.scalars = panel_id
-            ug.cell_data.scalars.name = 'panel_n_id'
-            ug.cell_data.add_array(panel_surf_id)
-            ug.cell_data.get_array(1).name = 'panel_surface_id'
-            ug.cell_data.add_array(panel_gamma)
-            ug.cell_data.get_array(2).name = 'panel_gamma'
-            ug.point_data.scalars = np.arange(0, coords.shape[0])
-            ug.point_data.scalars.name = 'n_id'
-            write_data(ug, filename)
+            coords = self.offset_coords(
+                vtkutils.grid_points(aero_tstep.zeta_star[i_surf][:, :m_star + 1, :]).copy())
+
+            grids.append({'points': coords,
+                          'connectivity': self.quad_connectivity(m_star, n_star),
+                          'cell_type': 'quad',
+                          'cell_data': {'panel_n_id': np.arange(m_star*n_star),
+                                        'panel_surface_id': np.full((m_star*n_star,), i_surf, dtype=int),
+                                        'panel_gamma': vtkutils.grid_points(aero_tstep.gamma_star[i_surf][:m_star, :])},
+                          'point_data': {'n_id': np.arange(coords.shape[0])}})
+        return grids
@@ -373,6 +373,8 @@ class AsymptoticStability(BaseSolver):
 
                 for postproc in postprocessor_list:
                     self.data = postprocessors[postproc].run(online=True)
+            for postproc in postprocessor_list:
+                postprocessors[postproc].finalise()
 
             # Delete 'modal' timesteps ready for next mode
             del self.data.structure.timestep_info[1:]
@@ -1,18 +1,23 @@
 import os
 
 import numpy as np
-from tvtk.api import tvtk, write_data
 
 import sharpy.utils.cout_utils as cout
 from sharpy.utils.solver_interface import solver, BaseSolver
 import sharpy.utils.settings as settings
 import sharpy.utils.algebra as algebra
+import sharpy.utils.vtkutils as vtkutils
 
 
 @solver
 class BeamPlot(BaseSolver):
     """
     Plots beam to Paraview format
+
+    The element connectivity is generated once and the nodal fields are rotated with array operations. With
+    ``format = 'vtu'`` a binary ``.vtu`` file is written per time step, and with ``format = 'xdmf'`` all the time steps
+    are saved to a single ``<name_prefix>beam_<case>.h5`` file, described by an ``.xmf`` file that is opened in
+    ParaView.
     """
     solver_id = 'BeamPlot'
     solver_classification = 'post-processor'
@@ -20,6 +25,7 @@ class BeamPlot(BaseSolver):
     settings_types = dict()
     settings_default = dict()
     settings_description = dict()
+    settings_options = dict()
 
     settings_types['folder'] = 'str'
     settings_default['folder'] = './output'
@@ -49,8 +55,15 @@ class BeamPlot(BaseSolver):
     settings_default['output_rbm'] = True
     settings_description['output_rbm'] = 'Write ``csv`` file with rigid body motion data'
 
+    settings_types['format'] = 'str'
+    settings_default['format'] = 'vtu'
+    settings_description['format'] = 'Output format. ``vtu`` writes a file per time step and ``xdmf`` a single ' \
+                                      '``h5`` file for all time steps'
+    settings_options['format'] = ['vtu', 'xdmf']
+
     settings_table = settings.SettingsTable()
-    __doc__ += settings_table.generate(settings_types, settings_default, settings_description)
+    __doc__ += settings_table.generate(settings_types, settings_default, settings_description,
+                                       settings_options=settings_options)
 
     def __init__(self):
 
@@ -60,13 +73,17 @@ class BeamPlot(BaseSolver):
         self.folder = ''
         self.filename = ''
 
+        self.connectivity = None
+        self.xdmf = None
+
     def initialise(self, data, custom_settings=None):
         self.data = data
         if custom_settings is None:
             self.settings = data.settings[self.solver_id]
         else:
             self.settings = custom_settings
-        settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
+        settings.to_custom_types(self.settings, self.settings_types, self.settings_default,
+                                 options=self.settings_options)
         # create folder for containing files if necessary
         if not os.path.exists(self.settings['folder']):
             os.makedirs(self.settings['folder'])
@@ -81,14 +98,23 @@ class BeamPlot(BaseSolver):
                          self.settings['name_prefix'] +
                          'for_' +
                          self.data.settings['SHARPy']['case'])
+        self.connectivity = None
+        if self.settings['format'] == 'xdmf':
+            self.xdmf = vtkutils.XdmfTimeSeries(self.filename)
 
     def run(self, online=False):
         self.plot(online)
         if not online:
             self.write()
+            self.finalise()
             cout.cout_wrap('...Finished', 1)
         return self.data
 
+    def finalise(self):
+        if self.xdmf is not None:
+            self.xdmf.close()
+            self.xdmf = None
+
     def write(self):
         if self.settings['output_rbm']:
             filename = self.filename + '_rbm_acc.csv'
@@ -102,250 +128,140 @@ class BeamPlot(BaseSolver):
     def plot(self, online):
         if not online:
             for it in range(len(self.data.structure.timestep_info)):
-                self.write_beam(it)
-                if self.settings['include_FoR']:
-                    self.write_for(it)
+                self.plot_step(it)
         else:
             it = len(self.data.structure.timestep_info) - 1
-            self.write_beam(it)
+            self.plot_step(it)
+
+    def plot_step(self, it):
+        grids = {'beam': self.beam_grid(it)}
+        if self.settings['include_FoR']:
+            grids['for'] = self.for_grid(it)
+
+        if self.settings['format'] == 'xdmf':
+            self.xdmf.add_step(it, it, grids)
+        else:
+            vtkutils.write_vtu(grids['beam'], self.filename + '%06u' % it)
             if self.settings['include_FoR']:
-                self.write_for(it)
+                self.write_for(grids['for'], self.filename_for + '%06u' % it)
 
-    def write_beam(self, it):
-        it_filename = (self.filename +
-                       '%06u' % it)
+    def beam_grid(self, it):
+        tstep = self.data.structure.timestep_info[it]
         num_nodes = self.data.structure.num_node
         num_elem = self.data.structure.num_elem
 
-        coords = np.zeros((num_nodes, 3))
-        conn = np.zeros((num_elem, 3), dtype=int)
-        node_id = np.zeros((num_nodes,), dtype=int)
-        elem_id = np.zeros((num_elem,), dtype=int)
-        coords_a_cell = np.zeros((num_elem, 3), dtype=int)
-        local_x = np.zeros((num_nodes, 3))
-        local_y = np.zeros((num_nodes, 3))
-        local_z = np.zeros((num_nodes, 3))
-        coords_a = np.zeros((num_nodes, 3))
+        if self.connectivity is None:
+            self.connectivity = np.array([self.data.structure.elements[i_elem].reordered_global_connectivities
+                                          for i_elem in range(num_elem)], dtype=int)
 
-        app_forces = np.zeros((num_nodes, 3))
-        app_moment = np.zeros((num_nodes, 3))
-
-        forces_constraints_nodes = np.zeros((num_nodes, 3))
-        moments_constraints_nodes = np.zeros((num_nodes, 3))
+        # coordinates of corners
+        coords = tstep.glob_pos(include_rbm=self.settings['include_rbm'])
 
         # aero2inertial rotation
-        aero2inertial = self.data.structure.timestep_info[it].cga()
-
-        # coordinates of corners
-        coords = self.data.structure.timestep_info[it].glob_pos(include_rbm=self.settings['include_rbm'])
+        aero2inertial = tstep.cga()
+        # rotation from the material frame of each node to the inertial frame
+        i_elem = self.data.structure.node_master_elem[:, 0]
+        i_local_node = self.data.structure.node_master_elem[:, 1]
+        cgb = np.matmul(aero2inertial, algebra.crv2rotation_array(tstep.psi[i_elem, i_local_node, :]))
 
-        # check if I can output gravity forces
-        with_gravity = False
-        try:
-            gravity_forces = self.data.structure.timestep_info[it].gravity_forces[:]
-            gravity_forces_g = np.zeros_like(gravity_forces)
-            with_gravity = True
-        except AttributeError:
-            pass
+        coords_a_cell = np.zeros((num_elem, 3))
+        mid_node = i_local_node == 2
+        coords_a_cell[i_elem[mid_node], :] = tstep.pos[mid_node, :]
 
         # check if postproc dicts are present and count/prepare
-        with_postproc_cell = False
-        try:
-            self.data.structure.timestep_info[it].postproc_cell
-            with_postproc_cell = True
-        except AttributeError:
-            pass
-        with_postproc_node = False
-        try:
-            self.data.structure.timestep_info[it].postproc_node
-            with_postproc_node = True
-        except AttributeError:
-            pass
-
-        # count number of arguments
-        postproc_cell_keys = self.data.structure.timestep_info[it].postproc_cell.keys()
-        postproc_cell_vals = self.data.structure.timestep_info[it].postproc_cell.values()
-        postproc_cell_scalar = []
-        postproc_cell_vector = []
-        postproc_cell_6vector = []
-        for k, v in self.data.structure.timestep_info[it].postproc_cell.items():
-            _, cols = v.shape
-            if cols == 1:
-                raise NotImplementedError('scalar cell types not supported in beamplot (Easy to implement)')
-                # postproc_cell_scalar.append(k)
-            elif cols == 3:
-                postproc_cell_vector.append(k)
-            elif cols == 6:
-                postproc_cell_6vector.append(k)
-            else:
-                raise AttributeError('Only scalar and 3-vector types supported in beamplot')
-        # count number of arguments
-        postproc_node_keys = self.data.structure.timestep_info[it].postproc_node.keys()
-        postproc_node_vals = self.data.structure.timestep_info[it].postproc_node.values()
-        postproc_node_scalar = []
-        postproc_node_vector = []
-        postproc_node_6vector = []
-        for k, v in self.data.structure.timestep_info[it].postproc_node.items():
-            _, cols = v.shape
-            if cols == 1:
-                raise NotImplementedError('scalar node types not supported in beamplot (Easy to implement)')
-                # postproc_cell_scalar.append(k)
-            elif cols == 3:
-                postproc_node_vector.append(k)
-            elif cols == 6:
-                postproc_node_6vector.append(k)
-            else:
-                raise AttributeError('Only scalar and 3-vector types supported in beamplot')
-
-        for i_node in range(num_nodes):
-            i_elem = self.data.structure.node_master_elem[i_node, 0]
-            i_local_node = self.data.structure.node_master_elem[i_node, 1]
-            node_id[i_node] = i_node
-
-            v1 = np.array([1., 0, 0])
-            v2 = np.array([0., 1, 0])
-            v3 = np.array([0., 0, 1])
-            cab = algebra.crv2rotation(
-                self.data.structure.timestep_info[it].psi[i_elem, i_local_node, :])
-            local_x[i_node, :] = np.dot(aero2inertial, np.dot(cab, v1))
-            local_y[i_node, :] = np.dot(aero2inertial, np.dot(cab, v2))
-            local_z[i_node, :] = np.dot(aero2inertial, np.dot(cab, v3))
-
-            if i_local_node == 2:
-                coords_a_cell[i_elem, :] = self.data.structure.timestep_info[it].pos[i_node, :]
-            coords_a[i_node, :] = self.data.structure.timestep_info[it].pos[i_node, :]
-
-            # applied forces
-            cab = algebra.crv2rotation(self.data.structure.timestep_info[it].psi[i_elem, i_local_node, :])
-            app_forces[i_node, :] = np.dot(aero2inertial,
-                                           np.dot(cab,
-                                                  self.data.structure.timestep_info[it].steady_applied_forces[i_node, 0:3]+
-                                                  self.data.structure.timestep_info[it].unsteady_applied_forces[i_node, 0:3]))
-            app_moment[i_node, :] = np.dot(aero2inertial,
-                                           np.dot(cab,
-                                                  self.data.structure.timestep_info[it].steady_applied_forces[i_node, 3:6]+
-                                                  self.data.structure.timestep_info[it].unsteady_applied_forces[i_node, 3:6]))
-            forces_constraints_nodes[i_node, :] = np.dot(aero2inertial,
-                                           np.dot(cab,
-                                                  self.data.structure.timestep_info[it].forces_constraints_nodes[i_node, 0:3]))
-            moments_constraints_nodes[i_node, :] = np.dot(aero2inertial,
-                                           np.dot(cab,
-                                                  self.data.structure.timestep_info[it].forces_constraints_nodes[i_node, 3:6]))
-
-            if with_gravity:
-                gravity_forces_g[i_node, 0:3] = np.dot(aero2inertial,
-                                                     gravity_forces[i_node, 0:3])
-                gravity_forces_g[i_node, 3:6] = np.dot(aero2inertial,
-                                                     gravity_forces[i_node, 3:6])
-
-        for i_elem in range(num_elem):
-            conn[i_elem, :] = self.data.structure.elements[i_elem].reordered_global_connectivities
-            elem_id[i_elem] = i_elem
-
-        ug = tvtk.UnstructuredGrid(points=coords)
-        ug.set_cells(tvtk.Line().cell_type, conn)
-        ug.cell_data.scalars = elem_id
-        ug.cell_data.scalars.name = 'elem_id'
-        counter = 1
-        if with_postproc_cell:
-            for k in postproc_cell_vector:
-                ug.cell_data.add_array(self.data.structure.timestep_info[it].postproc_cell[k])
-                ug.cell_data.get_array(counter).name = k + '_cell'
-                counter += 1
-            for k in postproc_cell_6vector:
+        postproc_cell = getattr(tstep, 'postproc_cell', dict())
+        postproc_node = getattr(tstep, 'postproc_node', dict())
+        self.check_postproc(postproc_cell, 'cell')
+        self.check_postproc(postproc_node, 'node')
+
+        cell_data = dict()
+        cell_data['elem_id'] = np.arange(num_elem)
+        for k, v in postproc_cell.items():
+            if v.shape[1] == 3:
+                cell_data[k + '_cell'] = v
+        for k, v in postproc_cell.items():
+            if v.shape[1] == 6:
                 for i in range(0, 2):
-                    ug.cell_data.add_array(self.data.structure.timestep_info[it].postproc_cell[k][:, 3*i:3*(i+1)])
-                    ug.cell_data.get_array(counter).name = k + '_' + str(i) + '_cell'
-                    counter += 1
-        ug.cell_data.add_array(coords_a_cell)
-        ug.cell_data.get_array(counter).name = 'coords_a_elem'
-        counter += 1
-
-        ug.point_data.scalars = node_id
-        ug.point_data.scalars.name = 'node_id'
-        point_vector_counter = 1
-        ug.point_data.add_array(local_x, 'vector')
-        ug.point_data.get_array(point_vector_counter).name = 'local_x'
-        point_vector_counter += 1
-        ug.point_data.add_array(local_y, 'vector')
-        ug.point_data.get_array(point_vector_counter).name = 'local_y'
-        point_vector_counter += 1
-        ug.point_data.add_array(local_z, 'vector')
-        ug.point_data.get_array(point_vector_counter).name = 'local_z'
-        point_vector_counter += 1
-        ug.point_data.add_array(coords_a, 'vector')
-        ug.point_data.get_array(point_vector_counter).name = 'coords_a'
+                    cell_data[k + '_' + str(i) + '_cell'] = v[:, 3*i:3*(i+1)]
+        cell_data['coords_a_elem'] = coords_a_cell
+
+        point_data = dict()
+        point_data['node_id'] = np.arange(num_nodes)
+        point_data['local_x'] = cgb[:, :, 0]
+        point_data['local_y'] = cgb[:, :, 1]
+        point_data['local_z'] = cgb[:, :, 2]
+        point_data['coords_a'] = tstep.pos[:num_nodes, :]
+
+        applied_forces = tstep.steady_applied_forces + tstep.unsteady_applied_forces
+        gravity_forces = getattr(tstep, 'gravity_forces', None)
         if self.settings['include_applied_forces']:
-            point_vector_counter += 1
-            ug.point_data.add_array(app_forces, 'vector')
-            ug.point_data.get_array(point_vector_counter).name = 'app_forces'
-            point_vector_counter += 1
-            ug.point_data.add_array(forces_constraints_nodes, 'vector')
-            ug.point_data.get_array(point_vector_counter).name = 'forces_constraints_nodes'
-            if with_gravity:
-                point_vector_counter += 1
-                ug.point_data.add_array(gravity_forces_g[:, 0:3], 'vector')
-                ug.point_data.get_array(point_vector_counter).name = 'gravity_forces'
-
+            point_data['app_forces'] = np.einsum('nij,nj->ni', cgb, applied_forces[:, 0:3])
+            point_data['forces_constraints_nodes'] = np.einsum('nij,nj->ni', cgb,
+                                                               tstep.forces_constraints_nodes[:, 0:3])
+            if gravity_forces is not None:
+                point_data['gravity_forces'] = np.dot(gravity_forces[:, 0:3], aero2inertial.T)
         if self.settings['include_applied_moments']:
-            point_vector_counter += 1
-            ug.point_data.add_array(app_moment, 'vector')
-            ug.point_data.get_array(point_vector_counter).name = 'app_moments'
-            point_vector_counter += 1
-            ug.point_data.add_array(moments_constraints_nodes, 'vector')
-            ug.point_data.get_array(point_vector_counter).name = 'moments_constraints_nodes'
-            if with_gravity:
-                point_vector_counter += 1
-                ug.point_data.add_array(gravity_forces_g[:, 3:6], 'vector')
-                ug.point_data.get_array(point_vector_counter).name = 'gravity_moments'
-        if with_postproc_node:
-            for k in postproc_node_vector:
-                point_vector_counter += 1
-                ug.point_data.add_array(self.data.structure.timestep_info[it].postproc_node[k])
-                ug.point_data.get_array(point_vector_counter).name = k + '_point'
-            for k in postproc_node_6vector:
+            point_data['app_moments'] = np.einsum('nij,nj->ni', cgb, applied_forces[:, 3:6])
+            point_data['moments_constraints_nodes'] = np.einsum('nij,nj->ni', cgb,
+                                                                tstep.forces_constraints_nodes[:, 3:6])
+            if gravity_forces is not None:
+                point_data['gravity_moments'] = np.dot(gravity_forces[:, 3:6], aero2inertial.T)
+        for k, v in postproc_node.items():
+            if v.shape[1] == 3:
+                point_data[k + '_point'] = v
+        for k, v in postproc_node.items():
+            if v.shape[1] == 6:
                 for i in range(0, 2):
-                    point_vector_counter += 1
-                    ug.point_data.add_array(self.data.structure.timestep_info[it].postproc_node[k][:, 3*i:3*(i+1)])
-                    ug.point_data.get_array(point_vector_counter).name = k + '_' + str(i) + '_point'
+                    point_data[k + '_' + str(i) + '_point'] = v[:, 3*i:3*(i+1)]
 
-        write_data(ug, it_filename)
+        return {'points': coords,
+                'connectivity': self.connectivity,
+                'cell_type': 'line',
+                'cell_data': cell_data,
+                'point_data': point_data}
 
-    def write_for(self, it):
-        it_filename = (self.filename_for +
-                       '%06u' % it)
+    @staticmethod
+    def check_postproc(postproc, location):
+        for k, v in postproc.items():
+            _, cols = v.shape
+            if cols == 1:
+                raise NotImplementedError('scalar %s types not supported in beamplot (Easy to implement)' % location)
+            elif cols not in [3, 6]:
+                raise AttributeError('Only scalar and 3-vector types supported in beamplot')
 
-        forces_constraints_FoR = np.zeros((self.data.structure.num_bodies, 3))
-        moments_constraints_FoR = np.zeros((self.data.structure.num_bodies, 3))
+    def for_grid(self, it):
+        tstep = self.data.structure.timestep_info[it]
+        num_bodies = self.data.structure.num_bodies
         # TODO: what should I do with the forces of the quaternion?
 
         # aero2inertial rotation
-        aero2inertial = self.data.structure.timestep_info[it].cga()
+        aero2inertial = tstep.cga()
 
         # coordinates of corners
-        FoR_coords = np.zeros((self.data.structure.num_bodies, 3))
         if self.settings['include_rbm']:
             offset = np.zeros((3,))
         else:
-            offset = self.data.structure.timestep_info[it].mb_FoR_pos[0, 0:3]
-        for ibody in range(self.data.structure.num_bodies):
-            FoR_coords[ibody, :] = self.data.structure.timestep_info[it].mb_FoR_pos[ibody, 0:3] - offset
+            offset = tstep.mb_FoR_pos[0, 0:3]
+        FoR_coords = tstep.mb_FoR_pos[:num_bodies, 0:3] - offset
 
-        for ibody in range(self.data.structure.num_bodies):
-            forces_constraints_FoR[ibody, :] = np.dot(aero2inertial,
-                                                  self.data.structure.timestep_info[it].forces_constraints_FoR[ibody, 0:3])
-            moments_constraints_FoR[ibody, :] = np.dot(aero2inertial,
-                                                  self.data.structure.timestep_info[it].forces_constraints_FoR[ibody, 3:6])
+        point_data = dict()
+        point_data['forces_constraints_FoR'] = np.dot(tstep.forces_constraints_FoR[:num_bodies, 0:3], aero2inertial.T)
+        point_data['moments_constraints_FoR'] = np.dot(tstep.forces_constraints_FoR[:num_bodies, 3:6], aero2inertial.T)
 
-        FoRmesh = tvtk.PolyData()
-        FoRmesh.points = FoR_coords
-        for_vector_counter = -1
-        for_vector_counter += 1
-        FoRmesh.point_data.add_array(forces_constraints_FoR , 'vector')
-        FoRmesh.point_data.get_array(for_vector_counter).name = 'forces_constraints_FoR'
+        return {'points': FoR_coords,
+                'connectivity': np.arange(num_bodies).reshape((num_bodies, 1)),
+                'cell_type': 'vertex',
+                'cell_data': dict(),
+                'point_data': point_data}
+
+    @staticmethod
+    def write_for(grid, filename):
+        from tvtk.api import tvtk, write_data
 
-        for_vector_counter += 1
-        FoRmesh.point_data.add_array(moments_constraints_FoR , 'vector')
-        FoRmesh.point_data.get_array(for_vector_counter).name = 'moments_constraints_FoR'
+        FoRmesh = tvtk.PolyData()
+        FoRmesh.points = grid['points']
+        for i_array, (name, values) in enumerate(grid['point_data'].items()):
+            FoRmesh.point_data.add_array(np.ascontiguousarray(values), 'vector')
+            FoRmesh.point_data.get_array(i_array).name = name
 
-        write_data(FoRmesh, it_filename)
+        write_data(FoRmesh, filename)
@@ -13,6 +13,7 @@ import sharpy.structure.utils.xbeamlib as xbeamlib
 @solver
 class Cleanup(BaseSolver):
     solver_id = 'Cleanup'
+    modifies_history = True
 
     def __init__(self):
         self.settings_types = dict()
@@ -1,8 +1,10 @@
 import os
 import pickle
+import time
 
 from sharpy.utils.solver_interface import solver, BaseSolver
 import sharpy.utils.settings as settings
+import sharpy.utils.cout_utils as cout
 
 """CreateSnapshot Solver documentation.
 
@@ -41,6 +43,17 @@ flow = [
 Before restarting the solution, we need to comment everything up to DynamicCoupled (not included).
 DynamicCoupled will restart at the last stored timestep.
 
+With the setting format = 'incremental', the snapshots are written as a checkpoint folder
+<folder>/<case>.checkpoint/ instead, whose cost does not grow with the length of the simulation:
+    * base.<n>.pkl: the data structure without the timestep_info lists (controller and generator states, linear
+      system...), rewritten in every checkpoint. Its size does not depend on the number of time steps.
+    * timesteps.pkl: append-only stream of pickled records, each of them with the structural and aerodynamic
+      timesteps added since the previous checkpoint.
+    * state.pkl: number of valid records, time steps and bytes, current time step and name of the matching base file,
+      replaced atomically after each append so that a checkpoint interrupted while writing is ignored on restart.
+The restart is done in the same way, giving the checkpoint folder (or the <case>.snapshot symlink) to -r. The
+restarted simulation keeps appending to the same checkpoint.
+
 Todo:
     * No tests have been conducted about modifying the settings (for example number of time steps, or
     relaxation factors...)
@@ -53,22 +66,39 @@ class CreateSnapshot(BaseSolver):
     def __init__(self):
         self.settings_types = dict()
         self.settings_default = dict()
+        self.settings_description = dict()
+        self.settings_options = dict()
 
         self.settings_types['frequency'] = 'int'
         self.settings_default['frequency'] = 5
+        self.settings_description['frequency'] = 'Number of time steps between snapshots'
 
         self.settings_types['keep'] = 'int'
         self.settings_default['keep'] = 2
+        self.settings_description['keep'] = 'Number of ``pickle`` snapshots kept in the folder'
 
         self.settings_types['compression'] = 'str'
         self.settings_default['compression'] = ''
+        self.settings_description['compression'] = 'Not yet implemented'
         # TODO not yet implemented
 
         self.settings_types['folder'] = 'str'
         self.settings_default['folder'] = './snapshots/'
+        self.settings_description['folder'] = 'Output folder'
 
         self.settings_types['symlink'] = 'bool'
         self.settings_default['symlink'] = True
+        self.settings_description['symlink'] = 'Point ``<case>.snapshot`` to the last snapshot'
+
+        self.settings_types['format'] = 'str'
+        self.settings_default['format'] = 'pickle'
+        self.settings_description['format'] = '``pickle`` for a full snapshot each time, ``incremental`` for an ' \
+                                              'appendable checkpoint folder'
+        self.settings_options['format'] = ['pickle', 'incremental']
+
+        self.settings_types['print_info'] = 'bool'
+        self.settings_default['print_info'] = False
+        self.settings_description['print_info'] = 'Print the time taken to write each snapshot'
 
         self.settings = None
         self.data = None
@@ -76,13 +106,20 @@ class CreateSnapshot(BaseSolver):
 
         self.filename = None
 
+        self.checkpoint = None
+        self.n_records = 0
+        self.n_struct_steps = 0
+        self.n_aero_steps = 0
+        self.base = None
+
     def initialise(self, data, custom_settings=None):
         self.data = data
         if custom_settings is None:
             self.settings = data.settings[self.solver_id]
         else:
             self.settings = custom_settings
-        settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
+        settings.to_custom_types(self.settings, self.settings_types, self.settings_default,
+                                 options=self.settings_options)
 
         # create folder for containing files if necessary
         if not os.path.exists(self.settings['folder']):
@@ -92,6 +129,35 @@ class CreateSnapshot(BaseSolver):
         self.filename = (self.settings['folder'] + '/' +
                          self.data.settings['SHARPy']['case'] +
                          '.snapshot')
+        self.checkpoint = self.filename.replace('.snapshot', '.checkpoint') + '/'
+        if self.settings['format'] == 'incremental':
+            self.resume_checkpoint()
+
+    def resume_checkpoint(self):
+        """
+        Continues an existing checkpoint if the simulation was restarted from it, so that its records are appended
+        to instead of overwritten. A checkpoint with more time steps than the current data structure belongs to
+        another simulation and is discarded.
+        """
+        try:
+            with open(self.checkpoint + 'state.pkl', 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return
+
+        aero = getattr(self.data, 'aero', None)
+        n_aero_steps = len(aero.timestep_info) if aero is not None else 0
+        if (state['n_struct_steps'] <= len(self.data.structure.timestep_info) and
+                state['n_aero_steps'] <= n_aero_steps):
+            self.n_records = state['n_records']
+            self.n_struct_steps = state['n_struct_steps']
+            self.n_aero_steps = state['n_aero_steps']
+            self.base = state['base']
+            # drops a record left incomplete by an interrupted checkpoint
+            with open(self.checkpoint + 'timesteps.pkl', 'r+b') as f:
+                f.truncate(state['size'])
+        else:
+            os.remove(self.checkpoint + 'state.pkl')
 
     def snap_name(self, ts=None):
         if ts is None:
@@ -101,14 +167,18 @@ class CreateSnapshot(BaseSolver):
     def run(self, online=True):
         self.ts = self.data.ts
         if self.ts % self.settings['frequency'].value == 0:
-            # clean older files
-            if self.settings['keep'].value:
-                self.delete_previous_snapshots()
-
-            # create file
-            file = self.snap_name()
-            with open(file, 'wb') as f:
-                pickle.dump(self.data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            t0 = time.perf_counter()
+            if self.settings['format'] == 'incremental':
+                file = self.write_checkpoint()
+            else:
+                # clean older files
+                if self.settings['keep'].value:
+                    self.delete_previous_snapshots()
+
+                # create file
+                file = self.snap_name()
+                with open(file, 'wb') as f:
+                    pickle.dump(self.data, f, protocol=pickle.HIGHEST_PROTOCOL)
 
             # update symlink
             if self.settings['symlink']:
@@ -118,8 +188,72 @@ class CreateSnapshot(BaseSolver):
                     pass
                 os.symlink(os.path.abspath(file), self.filename)
 
+            if self.settings['print_info']:
+                cout.cout_wrap('Snapshot at time step %u written in %.3f s' % (self.ts, time.perf_counter() - t0), 1)
+
         return self.data
 
+    def write_checkpoint(self):
+        """
+        Appends the time steps added since the last call to the incremental checkpoint.
+
+        Returns:
+            str: Checkpoint folder
+        """
+        structure_steps = self.data.structure.timestep_info
+        aero = getattr(self.data, 'aero', None)
+        aero_steps = aero.timestep_info if aero is not None else []
+
+        if self.n_records == 0:
+            if not os.path.exists(self.checkpoint):
+                os.makedirs(self.checkpoint)
+            mode = 'wb'
+        else:
+            mode = 'ab'
+
+        with open(self.checkpoint + 'timesteps.pkl', mode) as f:
+            # steps moved to disk by a TimeStepHistory are loaded so that the checkpoint is self-contained
+            pickle.dump((list(structure_steps[self.n_struct_steps:]), list(aero_steps[self.n_aero_steps:])), f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+
+        # rest of the data structure, without the time step history, as it is at this checkpoint.
+        # The numbering follows the records, so the base referenced by the current state is never overwritten
+        base = 'base.%06d.pkl' % (self.n_records + 1)
+        self.data.structure.timestep_info = []
+        if aero is not None:
+            aero.timestep_info = []
+        try:
+            with open(self.checkpoint + base, 'wb') as f:
+                pickle.dump(self.data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        finally:
+            self.data.structure.timestep_info = structure_steps
+            if aero is not None:
+                aero.timestep_info = aero_steps
+
+        self.n_records += 1
+        self.n_struct_steps = len(structure_steps)
+        self.n_aero_steps = len(aero_steps)
+
+        with open(self.checkpoint + 'state.pkl.tmp', 'wb') as f:
+            pickle.dump({'n_records': self.n_records,
+                         'ts': self.data.ts,
+                         'base': base,
+                         'size': size,
+                         'n_struct_steps': self.n_struct_steps,
+                         'n_aero_steps': self.n_aero_steps}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.checkpoint + 'state.pkl.tmp', self.checkpoint + 'state.pkl')
+
+        # the previous base is no longer referenced
+        if self.base is not None:
+            try:
+                os.remove(self.checkpoint + self.base)
+            except FileNotFoundError:
+                pass
+        self.base = base
+
+        return self.checkpoint[:-1]
+
     def delete_previous_snapshots(self):
         n_keep = self.settings['keep'].value - 1
 
@@ -143,3 +277,33 @@ class CreateSnapshot(BaseSolver):
             os.unlink(os.path.abspath(self.settings['folder'] + '/' + file))
 
 
+
+
+def load_checkpoint(checkpoint):
+    """
+    Rebuilds the data structure from an incremental checkpoint folder written by ``CreateSnapshot``.
+
+    Args:
+        checkpoint (str): Path to the checkpoint folder
+
+    Returns:
+        sharpy.presharpy.presharpy.PreSharpy: data structure at the last complete checkpoint
+    """
+    with open(checkpoint + '/state.pkl', 'rb') as f:
+        state = pickle.load(f)
+    with open(checkpoint + '/' + state['base'], 'rb') as f:
+        data = pickle.load(f)
+
+    structure_steps = []
+    aero_steps = []
+    with open(checkpoint + '/timesteps.pkl', 'rb') as f:
+        for i_record in range(state['n_records']):
+            new_structure_steps, new_aero_steps = pickle.load(f)
+            structure_steps.extend(new_structure_steps)
+            aero_steps.extend(new_aero_steps)
+
+    data.structure.timestep_info = structure_steps
+    if getattr(data, 'aero', None) is not None:
+        data.aero.timestep_info = aero_steps
+    data.ts = state['ts']
+    return data
@@ -1,20 +1,30 @@
 import os
 
 import numpy as np
-from tvtk.api import tvtk, write_data
 
-import sharpy.utils.algebra as algebra
 import sharpy.utils.cout_utils as cout
-from sharpy.utils.settings import str2bool
 from sharpy.utils.solver_interface import solver, BaseSolver
 import sharpy.utils.settings as settings
-from sharpy.utils.datastructures import init_matrix_structure, standalone_ctypes_pointer
-import sharpy.aero.utils.uvlmlib as uvlmlib
 
 
 @solver
 class LiftDistribution(BaseSolver):
+    """
+    Spanwise lift distribution of the lifting surfaces.
+
+    The steady and unsteady nodal forces of every spanwise strip of nodes are summed in a single array operation per
+    surface, and the lift of the strip is the component of the resultant perpendicular to the chordwise averaged
+    free stream velocity. The distribution is stored per surface, as an array with one value per spanwise node, in
+    the ``lift_distribution`` entry of the ``postproc_node`` dictionary of the aerodynamic time step.
+
+    With ``normalise``, the lift is divided by the chord of the first strip of the first surface.
+
+    With ``write_text_file``, a line with the whole distribution is appended to
+    ``<folder>/<case>/lift_distribution/<case>_lift_distribution.txt`` at every time step. The header of the file
+    lists the surface, spanwise index and structural node of each column.
+    """
     solver_id = 'LiftDistribution'
+    solver_classification = 'post-processor'
 
     def __init__(self):
         self.settings_types = dict()
@@ -26,12 +36,21 @@ class LiftDistribution(BaseSolver):
         self.settings_types['normalise'] = 'bool'
         self.settings_default['normalise'] = True
 
+        self.settings_types['folder'] = 'str'
+        self.settings_default['folder'] = './output'
+
+        self.settings_types['write_text_file'] = 'bool'
+        self.settings_default['write_text_file'] = False
+
         self.settings = None
         self.data = None
 
         self.ts_max = None
         self.ts = None
 
+        self.filename = None
+        self.text_file = None
+
     def initialise(self, data, custom_settings=None):
         self.data = data
         if custom_settings is None:
@@ -41,38 +60,65 @@ class LiftDistribution(BaseSolver):
         settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
         self.ts_max = len(self.data.structure.timestep_info)
 
+        if self.settings['write_text_file']:
+            folder = self.settings['folder'] + '/' + self.data.settings['SHARPy']['case'] + '/lift_distribution/'
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            self.filename = folder + self.data.settings['SHARPy']['case'] + '_lift_distribution.txt'
+        self.text_file = None
+
     def run(self, online=False):
         if not online:
             for self.ts in range(self.ts_max):
                 self.lift_distribution()
+            self.finalise()
             cout.cout_wrap('...Finished', 1)
         else:
             self.ts = len(self.data.structure.timestep_info) - 1
             self.lift_distribution()
         return self.data
 
+    def finalise(self):
+        if self.text_file is not None:
+            self.text_file.close()
+            self.text_file = None
+
     def lift_distribution(self):
-        # add entry to dictionary for postproc
         tstep = self.data.aero.timestep_info[self.ts]
-        tstep.postproc_cell['lift_distribution'] = init_matrix_structure(dimensions=tstep.dimensions,
-                                                                           with_dim_dimension=False)
 
         norm = 1.0
+        if self.settings['normalise']:
+            norm = np.linalg.norm(tstep.zeta[0][:, -1, 0] - tstep.zeta[0][:, 0, 0])
 
+        lift = []
         for i_surf in range(tstep.n_surf):
-            n_dim, n_m, n_n = tstep.zeta[i_surf].shape
-
-            forces = tstep.forces[i_surf] + tstep.unsteady_forces[i_surf]
-            abs_forces = np.zeros((n_m, n_n))
-            chord = np.zeros((n_n,))
-            for i_n in range(n_n):
-                chord[i_n] = np.abs(tstep[i_surf].zeta[:, -1, i_n] - tstep[i_surf].zeta[:, 0, i_n])
-                if not i_surf and not i_n:
-                    if self.settings['normalise']:
-                        norm = chord[0]
-
-                for i_m in range(n_m):
-                    abs_forces[i_n, i_m] = np.abs(forces[:, i_m, i_n])
-
-                tstep.postproc_cell['lift_distribution'][i_surf][i_n, i_m] = np.sum(abs_forces[i_n, :], axis = 2)/norm
-
+            # resultant force and mean free stream of each spanwise strip of nodes
+            strip_forces = np.sum(tstep.forces[i_surf][0:3, :, :], axis=1)
+            if tstep.dynamic_forces is not None:
+                strip_forces += np.sum(tstep.dynamic_forces[i_surf][0:3, :, :], axis=1)
+            strip_u_inf = np.mean(tstep.u_ext[i_surf], axis=1)
+            u_inf_norm = np.linalg.norm(strip_u_inf, axis=0)
+            u_inf_norm[u_inf_norm == 0.] = 1.
+            u_inf_dir = strip_u_inf/u_inf_norm
+
+            lift_vector = strip_forces - np.sum(strip_forces*u_inf_dir, axis=0)*u_inf_dir
+            lift.append(np.linalg.norm(lift_vector, axis=0)/norm)
+
+        tstep.postproc_node['lift_distribution'] = lift
+
+        if self.settings['write_text_file']:
+            self.append_file_output(lift)
+
+    def append_file_output(self, lift):
+        if self.text_file is None:
+            self.text_file = open(self.filename, 'w')
+            labels = ['tstep']
+            for i_surf in range(len(lift)):
+                for i_n in range(len(lift[i_surf])):
+                    labels.append('s%u_n%u_node%u' % (i_surf, i_n, self.data.aero.aero2struct_mapping[i_surf][i_n]))
+            self.text_file.write('# ' + ', '.join(labels) + '\n')
+        np.savetxt(self.text_file,
+                   np.concatenate([[self.ts]] + lift).reshape((1, -1)),
+                   fmt='%i' + ', %10e'*sum(len(l) for l in lift),
+                   delimiter=',')
+        self.text_file.flush()
@@ -3,6 +3,15 @@ PlotFlowField
 
 Computes the flow velocity at a set of points (grid)
 
+When run offline, the time steps can be processed in parallel by ``num_processes`` worker processes.
+
+The induced velocity is computed by the UVLM library unless ``far_field_theta`` is positive, in which case the
+bound vortex rings are evaluated exactly and the wake with the tree-based far-field approximation of
+:mod:`sharpy.aero.utils.farfield`, with ``far_field_theta`` as opening angle. Its cost grows as
+:math:`O(N_{targets} \log N_{wake})` instead of :math:`O(N_{targets} N_{wake})`, which makes dense grids around long
+wakes affordable. The relative error is of the order of 1% for ``far_field_theta = 0.3`` and decreases with the
+square of ``far_field_theta``.
+
 Args:
 
 Returns:
@@ -13,14 +22,23 @@ Notes:
 
 """
 import os
+import multiprocessing as mpr
 import numpy as np
 from tvtk.api import tvtk, write_data
 from sharpy.utils.solver_interface import solver, BaseSolver
 import sharpy.utils.generator_interface as gen_interface
 import sharpy.utils.settings as settings
 import sharpy.aero.utils.uvlmlib as uvlmlib
+import sharpy.aero.utils.farfield as farfield
 import ctypes as ct
 
+# postprocessor shared with the forked worker processes
+_worker_postproc = None
+
+
+def _output_velocity_field(ts):
+    _worker_postproc.output_velocity_field(ts)
+
 
 @solver
 class PlotFlowField(BaseSolver):
@@ -57,6 +75,15 @@ class PlotFlowField(BaseSolver):
         self.settings_types['num_cores'] = 'int'
         self.settings_default['num_cores'] = 1
 
+        self.settings_types['num_processes'] = 'int'
+        self.settings_default['num_processes'] = 1
+
+        self.settings_types['far_field_theta'] = 'float'
+        self.settings_default['far_field_theta'] = 0.
+
+        self.settings_types['far_field_leaf_size'] = 'int'
+        self.settings_default['far_field_leaf_size'] = 32
+
         self.settings = None
         self.data = None
         self.dir = 'output/'
@@ -104,24 +131,22 @@ class PlotFlowField(BaseSolver):
         array_counter = 0
         u_ind = np.zeros((nx, ny, nz, 3), dtype=float)
         if self.settings['include_induced']:
-            target_triads = np.zeros((nx*ny*nz, 3))
-            ipoint = -1
-            for iz in range(nz):
-                for ix in range(nx):
-                    for iy in range(ny):
-                        ipoint += 1
-                        target_triads[ipoint, :] = grid[iz][:, ix, iy].astype(dtype=ct.c_double, order='F', copy=True)
-
-            u_ind_points = uvlmlib.uvlm_calculate_total_induced_velocity_at_points(self.data.aero.timestep_info[ts],
-                                                                                                      target_triads,
-                                                                                                      self.data.structure.timestep_info[ts].for_pos[0:3],
-                                                                                                      self.settings['num_cores'])
-            ipoint = -1
-            for iz in range(nz):
-                for ix in range(nx):
-                    for iy in range(ny):
-                        ipoint += 1
-                        u_ind[ix, iy, iz, :] = u_ind_points[ipoint, :]
+            # points ordered by iz, ix, iy, with iy running fastest
+            target_triads = np.concatenate([grid[iz].transpose(1, 2, 0).reshape(-1, 3) for iz in range(nz)])
+            target_triads = np.ascontiguousarray(target_triads, dtype=ct.c_double)
+
+            if self.settings['far_field_theta'].value > 0.:
+                u_ind_points = farfield.induced_velocity_at_points(self.data.aero.timestep_info[ts],
+                                                                   target_triads,
+                                                                   self.data.structure.timestep_info[ts].for_pos[0:3],
+                                                                   self.settings['far_field_theta'].value,
+                                                                   self.settings['far_field_leaf_size'].value)
+            else:
+                u_ind_points = uvlmlib.uvlm_calculate_total_induced_velocity_at_points(self.data.aero.timestep_info[ts],
+                                                                                       target_triads,
+                                                                                       self.data.structure.timestep_info[ts].for_pos[0:3],
+                                                                                       self.settings['num_cores'])
+            u_ind = u_ind_points.reshape((nz, nx, ny, 3)).transpose(1, 2, 0, 3)
 
             # Write the data
             vtk_info.point_data.add_array(u_ind.reshape((-1, u_ind.shape[-1]), order='F')) # Reshape the array except from the last dimension
@@ -143,10 +168,7 @@ class PlotFlowField(BaseSolver):
                                               'dt': self.settings['dt'].value,
                                               'for_pos': 0*self.data.structure.timestep_info[ts].for_pos},
                                              u_ext)
-            for iz in range(nz):
-                for ix in range(nx):
-                    for iy in range(ny):
-                        u_ext_out[ix, iy, iz, :] += u_ext[iz][:, ix, iy]
+            u_ext_out += np.array(u_ext).transpose(2, 3, 0, 1)
 
             # Write the data
             vtk_info.point_data.add_array(u_ext_out.reshape((-1, u_ext_out.shape[-1]), order='F')) # Reshape the array except from the last dimension
@@ -171,7 +193,17 @@ class PlotFlowField(BaseSolver):
             if divmod(self.data.ts, self.settings['stride'].value)[1] == 0:
                 self.output_velocity_field(len(self.data.structure.timestep_info) - 1)
         else:
-            for ts in range(0, len(self.data.structure.timestep_info)):
-                if not self.data.structure.timestep_info[ts] is None:
+            time_steps = [ts for ts in range(0, len(self.data.structure.timestep_info))
+                          if self.data.structure.timestep_info[ts] is not None]
+            if self.settings['num_processes'].value > 1 and len(time_steps) > 1:
+                global _worker_postproc
+                _worker_postproc = self
+                try:
+                    with mpr.get_context('fork').Pool(self.settings['num_processes'].value) as pool:
+                        pool.map(_output_velocity_field, time_steps, chunksize=1)
+                finally:
+                    _worker_postproc = None
+            else:
+                for ts in time_steps:
                     self.output_velocity_field(ts)
         return self.data
@@ -24,6 +24,13 @@ class SaveData(BaseSolver):
 
         * :class:`sharpy.solvers.linearassembler.Linear` including classes in :exc:`sharpy.linear.assembler`
 
+    With ``layout = 'columnar'``, the time step information is not written as one group per time step but as a time
+    history per variable. The file is kept open for the whole simulation and each of the ``struct_variables`` and
+    ``aero_variables`` is stored in an extendible, chunked dataset with a leading time axis in
+    ``timeseries/structure/<variable>`` and ``timeseries/aero/<variable>/<surface>``, to which each time step is
+    appended as a single slab. The time step indices are saved in ``timeseries/ts``. The rest of the ``data`` classes
+    are saved as in the default layout, without the ``timestep_info`` lists.
+
     Notes:
         This method saves simply the data. If you would like to preserve the SHARPy methods of the relevant classes
         see also :class:`sharpy.solvers.pickledata.PickleData`.
@@ -87,6 +94,30 @@ class SaveData(BaseSolver):
     settings_description['format'] = 'Save linear state space to hdf5 ``.h5`` or Matlab ``.mat`` format.'
     settings_options['format'] = ['h5', 'mat']
 
+    settings_types['layout'] = 'str'
+    settings_default['layout'] = 'groups'
+    settings_description['layout'] = 'Layout of the time step information in the ``h5`` file. ``groups`` writes a ' \
+                                     'group per time step and ``columnar`` an appendable time history per variable.'
+    settings_options['layout'] = ['groups', 'columnar']
+
+    settings_types['struct_variables'] = 'list(str)'
+    settings_default['struct_variables'] = ['pos', 'psi', 'for_pos', 'for_vel', 'quat',
+                                            'steady_applied_forces', 'unsteady_applied_forces', 'total_forces']
+    settings_description['struct_variables'] = 'Structural time step variables saved in the ``columnar`` layout'
+
+    settings_types['aero_variables'] = 'list(str)'
+    settings_default['aero_variables'] = ['zeta', 'gamma', 'forces']
+    settings_description['aero_variables'] = 'Aerodynamic time step variables saved in the ``columnar`` layout'
+
+    settings_types['chunk_steps'] = 'int'
+    settings_default['chunk_steps'] = 100
+    settings_description['chunk_steps'] = 'Number of time steps per ``h5`` chunk in the ``columnar`` layout'
+
+    settings_types['compression'] = 'str'
+    settings_default['compression'] = 'none'
+    settings_description['compression'] = 'Compression filter of the time series in the ``columnar`` layout'
+    settings_options['compression'] = ['none', 'gzip', 'lzf']
+
     settings_table = settings.SettingsTable()
     __doc__ += settings_table.generate(settings_types, settings_default, settings_description,
                                        settings_options=settings_options)
@@ -101,6 +132,10 @@ class SaveData(BaseSolver):
         self.filename = ''
         self.ts_max = 0
 
+        self.hdfile = None
+        self.time_series = None
+        self.next_ts = 0
+
         ### specify which classes are saved as hdf5 group
         # see initialise and add_as_grp
         self.ClassesToSave = (sharpy.presharpy.presharpy.PreSharpy,)
@@ -184,30 +219,33 @@ class SaveData(BaseSolver):
         # self.data.aero.timestep_info[-1].generate_ctypes_pointers()
 
         if self.settings['format'] == 'h5':
-            file_exists = os.path.isfile(self.filename)
-            hdfile = h5py.File(self.filename, 'a')
-
-            if (online and file_exists):
-                if self.settings['save_aero']:
-                    h5utils.add_as_grp(self.data.aero.timestep_info[self.data.ts],
-                                       hdfile['data']['aero']['timestep_info'],
-                                       grpname=("%05d" % self.data.ts),
-                                       ClassesToSave=(sharpy.utils.datastructures.AeroTimeStepInfo,),
-                                       SkipAttr=self.settings['skip_attr'],
-                                       compress_float=self.settings['compress_float'])
-                if self.settings['save_struct']:
-                    h5utils.add_as_grp(self.data.structure.timestep_info[self.data.ts],
-                                       hdfile['data']['structure']['timestep_info'],
-                                       grpname=("%05d" % self.data.ts),
-                                       ClassesToSave=(sharpy.utils.datastructures.StructTimeStepInfo,),
-                                       SkipAttr=self.settings['skip_attr'],
-                                       compress_float=self.settings['compress_float'])
+            if self.settings['layout'] == 'columnar':
+                self.write_time_series(online)
             else:
-                h5utils.add_as_grp(self.data, hdfile, grpname='data',
-                                   ClassesToSave=self.ClassesToSave, SkipAttr=self.settings['skip_attr'],
-                                   compress_float=self.settings['compress_float'])
+                file_exists = os.path.isfile(self.filename)
+                hdfile = h5py.File(self.filename, 'a')
+
+                if (online and file_exists):
+                    if self.settings['save_aero']:
+                        h5utils.add_as_grp(self.data.aero.timestep_info[self.data.ts],
+                                           hdfile['data']['aero']['timestep_info'],
+                                           grpname=("%05d" % self.data.ts),
+                                           ClassesToSave=(sharpy.utils.datastructures.AeroTimeStepInfo,),
+                                           SkipAttr=self.settings['skip_attr'],
+                                           compress_float=self.settings['compress_float'])
+                    if self.settings['save_struct']:
+                        h5utils.add_as_grp(self.data.structure.timestep_info[self.data.ts],
+                                           hdfile['data']['structure']['timestep_info'],
+                                           grpname=("%05d" % self.data.ts),
+                                           ClassesToSave=(sharpy.utils.datastructures.StructTimeStepInfo,),
+                                           SkipAttr=self.settings['skip_attr'],
+                                           compress_float=self.settings['compress_float'])
+                else:
+                    h5utils.add_as_grp(self.data, hdfile, grpname='data',
+                                       ClassesToSave=self.ClassesToSave, SkipAttr=self.settings['skip_attr'],
+                                       compress_float=self.settings['compress_float'])
 
-            hdfile.close()
+                hdfile.close()
 
             if self.settings['save_linear_uvlm']:
                 linhdffile = h5py.File(self.filename.replace('.data.h5', '.uvlmss.h5'), 'a')
@@ -259,3 +297,65 @@ class SaveData(BaseSolver):
                 savemat(matfilename, savedict)
 
         return self.data
+
+    def write_time_series(self, online):
+        """
+        Appends the time steps not yet written to the ``columnar`` layout file.
+
+        The file is opened in the first call, where the ``data`` classes are saved without their time step
+        information, and kept open until the offline call at the end of the simulation or :meth:`finalise`.
+
+        Args:
+            online (bool): Called within the time stepping loop, in which case the file is flushed and kept open.
+        """
+        if self.hdfile is None:
+            self.hdfile = h5py.File(self.filename, 'a')
+            h5utils.add_as_grp(self.data, self.hdfile, grpname='data',
+                               ClassesToSave=self.ClassesToSave,
+                               SkipAttr=self.settings['skip_attr'] + ['timestep_info'],
+                               compress_float=self.settings['compress_float'])
+            compression = self.settings['compression']
+            if compression == 'none':
+                compression = None
+            self.time_series = h5utils.TimeSeriesWriter(self.hdfile.require_group('timeseries'),
+                                                        chunk_steps=self.settings['chunk_steps'].value,
+                                                        compression=compression,
+                                                        compress_float=self.settings['compress_float'])
+
+        if online:
+            last_ts = self.data.ts
+        else:
+            last_ts = len(self.data.structure.timestep_info) - 1
+
+        for ts in range(self.next_ts, last_ts + 1):
+            struct_tstep = None
+            aero_tstep = None
+            if self.settings['save_struct']:
+                struct_tstep = self.data.structure.timestep_info[ts]
+            if self.settings['save_aero']:
+                aero_tstep = self.data.aero.timestep_info[ts]
+            if struct_tstep is None and aero_tstep is None:
+                continue
+
+            self.time_series.append('ts', ts)
+            if struct_tstep is not None:
+                for variable in self.settings['struct_variables']:
+                    self.time_series.append('structure/' + variable, getattr(struct_tstep, variable))
+            if aero_tstep is not None:
+                for variable in self.settings['aero_variables']:
+                    self.time_series.append('aero/' + variable, getattr(aero_tstep, variable))
+        self.next_ts = max(self.next_ts, last_ts + 1)
+
+        if online:
+            self.hdfile.flush()
+        else:
+            self.finalise()
+
+    def finalise(self):
+        """
+        Closes the ``columnar`` layout file if it is open.
+        """
+        if self.hdfile is not None:
+            self.hdfile.close()
+            self.hdfile = None
+            self.time_series = None
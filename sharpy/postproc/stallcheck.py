@@ -16,6 +16,10 @@ import sharpy.aero.utils.uvlmlib as uvlmlib
 class StallCheck(BaseSolver):
     """
     Outputs the incidence angle of every panel of the surface.
+
+    The stall limits of each spanwise strip of panels are looked up once from the airfoil distribution, so every
+    time step only requires an array comparison per surface. With ``write_text_file``, the number of stalled panels
+    of each surface is appended to ``<folder>/<case>/stallcheck/<case>_stalled_panels.txt`` at every time step.
     """
     solver_id = 'StallCheck'
     solver_classification = 'post-processor'
@@ -36,6 +40,14 @@ class StallCheck(BaseSolver):
     settings_default['output_degrees'] = False
     settings_description['output_degrees'] = 'Output incidence angles in degrees vs radians'
 
+    settings_types['folder'] = 'str'
+    settings_default['folder'] = './output'
+    settings_description['folder'] = 'Output folder location'
+
+    settings_types['write_text_file'] = 'bool'
+    settings_default['write_text_file'] = False
+    settings_description['write_text_file'] = 'Write ``txt`` file with the number of stalled panels per surface'
+
     settings_table = settings.SettingsTable()
     __doc__ += settings_table.generate(settings_types, settings_default, settings_description)
 
@@ -47,6 +59,10 @@ class StallCheck(BaseSolver):
         self.ts_max = None
         self.ts = None
 
+        self.strip_limits = None
+        self.filename = None
+        self.text_file = None
+
     def initialise(self, data, custom_settings=None):
         self.data = data
         if custom_settings is None:
@@ -56,16 +72,58 @@ class StallCheck(BaseSolver):
         settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
         self.ts_max = len(self.data.structure.timestep_info)
 
+        self.strip_limits = self.compute_strip_limits()
+        if self.settings['write_text_file']:
+            folder = self.settings['folder'] + '/' + self.data.settings['SHARPy']['case'] + '/stallcheck/'
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+            self.filename = folder + self.data.settings['SHARPy']['case'] + '_stalled_panels.txt'
+        self.text_file = None
+
     def run(self, online=False):
         if not online:
             for self.ts in range(self.ts_max):
                 self.check_stall()
+            self.finalise()
             cout.cout_wrap('...Finished', 1)
         else:
             self.ts = len(self.data.structure.timestep_info) - 1
             self.check_stall()
         return self.data
 
+    def finalise(self):
+        if self.text_file is not None:
+            self.text_file.close()
+            self.text_file = None
+
+    def compute_strip_limits(self):
+        """
+        Lower and upper stall angles of each spanwise strip of panels.
+
+        Each strip takes the limits of the airfoil of the first structural node mapped to it, following the element
+        ordering. Strips without limits get ``nan``, so they are never flagged as stalled.
+
+        Returns:
+            list(np.ndarray): ``(N, 2)`` array of limits for each surface
+        """
+        dimensions = self.data.aero.timestep_info[0].dimensions
+        strip_limits = [np.full((dimensions[i_surf, 1], 2), np.nan) for i_surf in range(len(dimensions))]
+        if not self.settings['airfoil_stall_angles']:
+            return strip_limits
+
+        for i_elem in range(self.data.structure.num_elem):
+            for i_local_node in range(self.data.structure.num_node_elem):
+                airfoil_id = self.data.aero.aero_dict['airfoil_distribution'][i_elem, i_local_node]
+                i_global_node = self.data.structure.connectivities[i_elem, i_local_node]
+                for i_dict in self.data.aero.struct2aero_mapping[i_global_node]:
+                    i_surf = i_dict['i_surf']
+                    i_n = i_dict['i_n']
+                    if i_n == dimensions[i_surf][1] or not np.isnan(strip_limits[i_surf][i_n, 0]):
+                        continue
+                    limits = self.settings['airfoil_stall_angles'][str(airfoil_id)]
+                    strip_limits[i_surf][i_n, :] = [float(limits[0]), float(limits[1])]
+        return strip_limits
+
     def check_stall(self):
         # add entry to dictionary for postproc
         tstep = self.data.aero.timestep_info[self.ts]
@@ -82,37 +140,16 @@ class StallCheck(BaseSolver):
         uvlmlib.uvlm_calculate_incidence_angle(self.data.aero.timestep_info[self.ts],
                                                self.data.structure.timestep_info[self.ts])
 
-        # calculate ratio of stalled panels and print
-        stalled_panels = False
+        # count the panels of the strips whose leading edge panel is out of the limits
         stalled_surfs = np.zeros((tstep.n_surf, ), dtype=int)
-        added_panels = []
         for i_surf in range(tstep.n_surf):
-            added_panels.append([])
+            incidence_angle = tstep.postproc_cell['incidence_angle'][i_surf]
+            limits = self.strip_limits[i_surf]
+            with np.errstate(invalid='ignore'):
+                stalled_strips = (incidence_angle[0, :] < limits[:, 0]) | (incidence_angle[0, :] > limits[:, 1])
+            stalled_surfs[i_surf] = np.count_nonzero(stalled_strips)*incidence_angle.shape[0]
 
-        for i_elem in range(self.data.structure.num_elem):
-            for i_local_node in range(self.data.structure.num_node_elem):
-                airfoil_id = self.data.aero.aero_dict['airfoil_distribution'][i_elem, i_local_node]
-                if self.settings['airfoil_stall_angles']:
-                    i_global_node = self.data.structure.connectivities[i_elem, i_local_node]
-                    for i_dict in self.data.aero.struct2aero_mapping[i_global_node]:
-                        i_surf = i_dict['i_surf']
-                        i_n = i_dict['i_n']
-
-                        if i_n in added_panels[i_surf]:
-                            continue
-
-                        if i_n == tstep.dimensions[i_surf][1]:
-                            continue
-
-                        limits = self.settings['airfoil_stall_angles'][str(airfoil_id)]
-                        if tstep.postproc_cell['incidence_angle'][i_surf][0, i_n] < float(limits[0]):
-                            stalled_panels = True
-                            stalled_surfs[i_surf] += tstep.postproc_cell['incidence_angle'][i_surf].shape[1]
-                        elif tstep.postproc_cell['incidence_angle'][i_surf][0, i_n] > float(limits[1]):
-                            stalled_panels = True
-                            stalled_surfs[i_surf] += tstep.postproc_cell['incidence_angle'][i_surf].shape[1]
-
-        if stalled_panels:
+        if stalled_surfs.any():
             if self.settings['print_info']:
                 cout.cout_wrap('Some panel has an incidence angle out of the linear region', 1)
                 cout.cout_wrap('The number of stalled panels per surface id are:', 1)
@@ -120,7 +157,17 @@ class StallCheck(BaseSolver):
                     cout.cout_wrap('\ti_surf = ' + str(i_surf) + ': ' + str(stalled_surfs[i_surf]) + ' panels.', 1)
                 # cout.cout_wrap('In total, the ratio of stalled panels is: ', str(stalled_surfs.sum()/))
 
+        if self.settings['write_text_file']:
+            self.append_file_output(stalled_surfs)
+
         if self.settings['output_degrees']:
             for i_surf in range(tstep.n_surf):
                 tstep.postproc_cell['incidence_angle'][i_surf] *= 180/np.pi
 
+    def append_file_output(self, stalled_surfs):
+        if self.text_file is None:
+            self.text_file = open(self.filename, 'w')
+            self.text_file.write('# tstep, ' + ', '.join('stalled_panels_surf_%u' % i_surf
+                                                         for i_surf in range(len(stalled_surfs))) + '\n')
+        self.text_file.write('%u, ' % self.ts + ', '.join('%u' % n for n in stalled_surfs) + '\n')
+        self.text_file.flush()
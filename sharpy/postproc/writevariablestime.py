@@ -1,7 +1,9 @@
 import os
 import numpy as np
+import h5py
 from sharpy.utils.solver_interface import solver, BaseSolver
 import sharpy.utils.settings as settings
+import sharpy.utils.h5utils as h5utils
 
 
 @solver
@@ -13,6 +15,13 @@ class WriteVariablesTime(BaseSolver):
 
     It is a postprocessor that outputs the value of variables with time onto a text file.
 
+    The rows of each variable are written every ``flush_steps`` time steps, with the output files kept open in
+    between. By default every step is written as soon as it is computed. With ``flush_steps > 1``, the rows are
+    buffered in memory and the remaining ones are written when the postprocessor is finalised by the time stepping
+    solver at the end of the simulation, or when the postprocessor object is deleted. Instead of the text files, the variables can be saved
+    to binary ``.npy`` files (one per variable, with the time step as first column) or to a single ``h5`` file
+    ``<case>.variables.h5`` with one dataset per variable. The ``.npy`` and ``h5`` files are overwritten in every run.
+
     Attributes:
         settings_types (dict): Acceptable data types of the input data
         settings_default (dict): Default values for input data should the user not provide them
@@ -27,6 +36,7 @@ class WriteVariablesTime(BaseSolver):
     settings_types = dict()
     settings_default = dict()
     settings_description = dict()
+    settings_options = dict()
 
     settings_types['folder'] = 'str'
     settings_default['folder'] = './output/'
@@ -88,21 +98,39 @@ class WriteVariablesTime(BaseSolver):
     settings_default['cleanup_old_solution'] = 'false'
     settings_description['cleanup_old_solution'] = 'Remove the existing files'
 
+    settings_types['format'] = 'str'
+    settings_default['format'] = 'dat'
+    settings_description['format'] = 'Output format: text ``.dat`` files, binary ``.npy`` files or a single ``h5`` file'
+    settings_options['format'] = ['dat', 'npy', 'h5']
+
+    settings_types['flush_steps'] = 'int'
+    settings_default['flush_steps'] = 1
+    settings_description['flush_steps'] = 'Number of time steps buffered in memory before writing to the output files'
+
     settings_table = settings.SettingsTable()
-    __doc__ += settings_table.generate(settings_types, settings_default, settings_description)
+    __doc__ += settings_table.generate(settings_types, settings_default, settings_description,
+                                       settings_options=settings_options)
 
     def __init__(self):
         self.settings = None
         self.data = None
         self.dir = 'output/'
 
+        self.buffer = dict()
+        self.scalar_variables = dict()
+        self.n_buffered_steps = 0
+        self.files = dict()
+        self.h5file = None
+        self.time_series = None
+
     def initialise(self, data, custom_settings=None):
         self.data = data
         if custom_settings is None:
             self.settings = data.settings[self.solver_id]
         else:
             self.settings = custom_settings
-        settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
+        settings.to_custom_types(self.settings, self.settings_types, self.settings_default,
+                                 options=self.settings_options)
 
         self.dir = self.settings['folder'] + '/' + self.data.settings['SHARPy']['case'] + '/WriteVariablesTime/'
         if not os.path.isdir(self.dir):
@@ -179,19 +207,18 @@ class WriteVariablesTime(BaseSolver):
             if self.settings['FoR_variables'][ivariable] == '':
                 continue
             for ifor in range(len(self.settings['FoR_number'])):
-                filename = self.dir + "FoR_" + '%02d' % self.settings['FoR_number'][ifor] + "_" + self.settings['FoR_variables'][ivariable] + ".dat"
-
-                with open(filename, 'a') as fid:
-                    var = np.atleast_2d(getattr(self.data.structure.timestep_info[-1], self.settings['FoR_variables'][ivariable]))
-                    rows, cols = var.shape
-                    if ((cols == 1) and (rows == 1)):
-                        self.write_value_to_file(fid, self.data.ts, var, self.settings['delimiter'])
-                    elif ((cols > 1) and (rows == 1)):
-                        self.write_nparray_to_file(fid, self.data.ts, var, self.settings['delimiter'])
-                    elif ((cols == 1) and (rows >= 1)):
-                        self.write_value_to_file(fid, self.data.ts, var[ifor], self.settings['delimiter'])
-                    else:
-                        self.write_nparray_to_file(fid, self.data.ts, var[ifor,:], self.settings['delimiter'])
+                filename = "FoR_" + '%02d' % self.settings['FoR_number'][ifor] + "_" + self.settings['FoR_variables'][ivariable]
+
+                var = np.atleast_2d(getattr(self.data.structure.timestep_info[-1], self.settings['FoR_variables'][ivariable]))
+                rows, cols = var.shape
+                if ((cols == 1) and (rows == 1)):
+                    self.add_row(filename, var, scalar=True)
+                elif ((cols > 1) and (rows == 1)):
+                    self.add_row(filename, var)
+                elif ((cols == 1) and (rows >= 1)):
+                    self.add_row(filename, var[ifor], scalar=True)
+                else:
+                    self.add_row(filename, var[ifor,:])
 
         # Structure variables at nodes
         for ivariable in range(len(self.settings['structure_variables'])):
@@ -201,69 +228,173 @@ class WriteVariablesTime(BaseSolver):
             num_indices = len(var.shape)
             if num_indices == 1:
                 # Beam global variables (i.e. not node dependant)
-                filename = self.dir + "struct_" + self.settings['structure_variables'][ivariable] + ".dat"
-                with open(filename, 'a') as fid:
-                    self.write_nparray_to_file(fid, self.data.ts, var, self.settings['delimiter'])
+                filename = "struct_" + self.settings['structure_variables'][ivariable]
+                self.add_row(filename, var)
 
             else:  # These variables have nodal values (i.e the number of indices is either 2 or 3)
                 for inode in range(len(self.settings['structure_nodes'])):
                     node = self.settings['structure_nodes'][inode]
-                    filename = self.dir + "struct_" + self.settings['structure_variables'][ivariable] + "_node" + str(node) + ".dat"
-                    with open(filename, 'a') as fid:
-                        if num_indices == 2:
-                            self.write_nparray_to_file(fid, self.data.ts, var[node,:], self.settings['delimiter'])
-                        elif num_indices == 3:
-                            ielem, inode_in_elem = self.data.structure.node_master_elem[node]
-                            self.write_nparray_to_file(fid, self.data.ts, var[ielem,inode_in_elem,:], self.settings['delimiter'])
-
+                    filename = "struct_" + self.settings['structure_variables'][ivariable] + "_node" + str(node)
+                    if num_indices == 2:
+                        self.add_row(filename, var[node,:])
+                    elif num_indices == 3:
+                        ielem, inode_in_elem = self.data.structure.node_master_elem[node]
+                        self.add_row(filename, var[ielem,inode_in_elem,:])
 
         # Aerodynamic variables at panels
         for ivariable in range(len(self.settings['aero_panels_variables'])):
             if self.settings['aero_panels_variables'][ivariable] == '':
                 continue
+            var = getattr(self.data.aero.timestep_info[-1], self.settings['aero_panels_variables'][ivariable])
             for ipanel in range(len(self.settings['aero_panels_isurf'])):
                 i_surf = self.settings['aero_panels_isurf'][ipanel]
                 i_m = self.settings['aero_panels_im'][ipanel]
                 i_n = self.settings['aero_panels_in'][ipanel]
 
-                filename = self.dir + "aero_" + self.settings['aero_panels_variables'][ivariable] + "_panel" + "_isurf" + str(i_surf) + "_im"+ str(i_m) + "_in"+ str(i_n) + ".dat"
-
-                with open(filename, 'a') as fid:
-                    var = getattr(self.data.aero.timestep_info[-1], self.settings['aero_panels_variables'][ivariable])
-                    self.write_value_to_file(fid, self.data.ts, var.gamma[i_surf][i_m,i_n], self.settings['delimiter'])
-
+                filename = "aero_" + self.settings['aero_panels_variables'][ivariable] + "_panel" + "_isurf" + str(i_surf) + "_im"+ str(i_m) + "_in"+ str(i_n)
+                self.add_row(filename, var[i_surf][i_m,i_n], scalar=True)
 
         # Aerodynamic variables at nodes
         for ivariable in range(len(self.settings['aero_nodes_variables'])):
             if self.settings['aero_nodes_variables'][ivariable] == '':
                 continue
+            var = getattr(self.data.aero.timestep_info[-1], self.settings['aero_nodes_variables'][ivariable])
             for inode in range(len(self.settings['aero_nodes_isurf'])):
                 i_surf = self.settings['aero_nodes_isurf'][inode]
                 i_m = self.settings['aero_nodes_im'][inode]
                 i_n = self.settings['aero_nodes_in'][inode]
 
-                filename = self.dir + "aero_" + self.settings['aero_nodes_variables'][ivariable] + "_node" + "_isurf" + str(i_surf) + "_im"+ str(i_m) + "_in"+ str(i_n) + ".dat"
-
-                with open(filename, 'a') as fid:
-                    var = getattr(self.data.aero.timestep_info[-1], self.settings['aero_nodes_variables'][ivariable])
-                    self.write_nparray_to_file(fid, self.data.ts, var[i_surf][:,i_m,i_n], self.settings['delimiter'])
+                filename = "aero_" + self.settings['aero_nodes_variables'][ivariable] + "_node" + "_isurf" + str(i_surf) + "_im"+ str(i_m) + "_in"+ str(i_n)
+                self.add_row(filename, var[i_surf][:,i_m,i_n])
 
+        self.n_buffered_steps += 1
+        if not online:
+            self.finalise()
+        elif self.n_buffered_steps >= self.settings['flush_steps'].value:
+            self.flush()
 
         return self.data
 
-    def write_nparray_to_file(self, fid, ts, nparray, delimiter):
+    def add_row(self, filename, values, scalar=False):
+        """
+        Buffers the values of a variable at the current time step.
+
+        Args:
+            filename (str): Output file name, without extension
+            values (np.ndarray): Values to write
+            scalar (bool): The variable is written as a single value (``ts delimiter value``) in the text format
+        """
+        try:
+            self.buffer[filename].append((self.data.ts, np.array(values, dtype=float).flatten()))
+        except KeyError:
+            self.buffer[filename] = [(self.data.ts, np.array(values, dtype=float).flatten())]
+            self.scalar_variables[filename] = scalar
+
+    def flush(self):
+        """
+        Writes the buffered time steps to the output files, which are kept open until :meth:`finalise`.
+        """
+        delimiter = self.settings['delimiter']
+        for filename, rows in self.buffer.items():
+            if not rows:
+                continue
+
+            if self.settings['format'] == 'dat':
+                try:
+                    fid = self.files[filename]
+                except KeyError:
+                    fid = open(self.dir + filename + '.dat', 'a')
+                    self.files[filename] = fid
+                for ts, values in rows:
+                    if self.scalar_variables[filename]:
+                        self.write_value_to_file(fid, ts, values[0], delimiter)
+                    else:
+                        self.write_nparray_to_file(fid, ts, values, delimiter)
+                fid.flush()
 
-        fid.write("%d%s" % (ts,delimiter))
-        for idim in range(np.shape(nparray)[0]):
-            try:
-                for jdim in range(np.shape(nparray)[1]):
-                    fid.write("%e%s" % (nparray[idim, jdim],delimiter))
-            except IndexError:
-                fid.write("%e%s" % (nparray[idim],delimiter))
+            else:
+                block = np.array([np.concatenate(([ts], values)) for ts, values in rows])
+                if self.settings['format'] == 'npy':
+                    try:
+                        writer = self.files[filename]
+                    except KeyError:
+                        writer = NpyAppender(self.dir + filename + '.npy', block.shape[1])
+                        self.files[filename] = writer
+                    writer.append(block)
+                elif self.settings['format'] == 'h5':
+                    if self.h5file is None:
+                        self.h5file = h5py.File(self.dir + self.data.settings['SHARPy']['case'] + '.variables.h5', 'w')
+                        self.time_series = h5utils.TimeSeriesWriter(self.h5file,
+                                                                    chunk_steps=self.settings['flush_steps'].value)
+                    self.time_series.extend(filename, block)
+
+            rows.clear()
+
+        if self.h5file is not None:
+            self.h5file.flush()
+        self.n_buffered_steps = 0
+
+    def finalise(self):
+        """
+        Flushes the buffered time steps and closes the output files.
+        """
+        self.flush()
+        for fid in self.files.values():
+            fid.close()
+        self.files = dict()
+        if self.h5file is not None:
+            self.h5file.close()
+            self.h5file = None
+            self.time_series = None
+
+    def __del__(self):
+        # write the steps still buffered if the postprocessor was not finalised
+        if self.settings is not None:
+            self.finalise()
 
+    def write_nparray_to_file(self, fid, ts, nparray, delimiter):
 
-        fid.write("\n")
+        fid.write("%d%s" % (ts, delimiter) +
+                  "".join(["%e%s" % (value, delimiter) for value in np.ravel(nparray)]) +
+                  "\n")
 
     def write_value_to_file(self, fid, ts, value, delimiter):
 
         fid.write("%d%s%e\n" % (ts,delimiter,value))
+
+
+class NpyAppender(object):
+    """
+    Appends rows to a ``.npy`` file of shape ``(n_rows, n_cols)``.
+
+    The header is written with a fixed length so that it can be rewritten in place with the updated number of rows
+    after each append, keeping the file readable with ``np.load`` at all times.
+
+    Args:
+        filename (str): Path to the ``.npy`` file. Any existing file is overwritten.
+        n_cols (int): Number of columns of each row.
+    """
+    header_length = 128
+
+    def __init__(self, filename, n_cols):
+        self.n_cols = n_cols
+        self.n_rows = 0
+        self.fid = open(filename, 'wb')
+        self.write_header()
+
+    def write_header(self):
+        header = "{'descr': '<f8', 'fortran_order': False, 'shape': (%d, %d), }" % (self.n_rows, self.n_cols)
+        # magic string, version 1.0 and header length take 10 bytes
+        header = header.ljust(self.header_length - 10 - 1) + '\n'
+        self.fid.seek(0)
+        self.fid.write(b'\x93NUMPY\x01\x00' + np.uint16(len(header)).astype('<u2').tobytes() + header.encode('latin1'))
+
+    def append(self, block):
+        self.fid.seek(0, os.SEEK_END)
+        self.fid.write(np.ascontiguousarray(block, dtype='<f8').tobytes())
+        self.n_rows += block.shape[0]
+        self.write_header()
+        self.fid.flush()
+
+    def close(self):
+        self.fid.close()
@@ -10,16 +10,20 @@ The main class is :class:`.Balanced` and the other available classes:
 
 * :class:`.FrequencyLimited`
 
+* :class:`.LowRankADI`
+
 correspond to the reduction algorithm.
 
 """
 import sharpy.utils.settings as settings
 import numpy as np
+import scipy.sparse as sparse
 from abc import ABCMeta
 import sharpy.utils.cout_utils as cout
 import sharpy.utils.rom_interface as rom_interface
 import sharpy.rom.utils.librom as librom
 import sharpy.linear.src.libss as libss
+import sharpy.linear.src.libsparse as libsp
 import time
 
 dict_of_balancing_roms = dict()
@@ -295,6 +299,96 @@ class Iterative(BaseBalancedRom):
         return ssrom
 
 
+@bal_rom
+class LowRankADI(BaseBalancedRom):
+    __doc__ = librom.balreal_lradi.__doc__
+    _bal_rom_id = 'LowRankADI'
+
+    settings_types = dict()
+    settings_default = dict()
+    settings_description = dict()
+
+    settings_types['n_shifts'] = 'int'
+    settings_default['n_shifts'] = 20
+    settings_description['n_shifts'] = 'Number of ADI shifts'
+
+    settings_types['k_plus'] = 'int'
+    settings_default['k_plus'] = 40
+    settings_description['k_plus'] = 'Arnoldi steps on the plant matrix for the selection of the shifts'
+
+    settings_types['k_minus'] = 'int'
+    settings_default['k_minus'] = 20
+    settings_description['k_minus'] = 'Arnoldi steps on the inverse of the plant matrix for the selection of the shifts'
+
+    settings_types['adi_tol'] = 'float'
+    settings_default['adi_tol'] = 1e-10
+    settings_description['adi_tol'] = 'ADI iterations convergence tolerance on the relative increment of the Gramians'
+
+    settings_types['tolSVD'] = 'float'
+    settings_default['tolSVD'] = 1e-10
+    settings_description['tolSVD'] = 'Relative SVD threshold of the column compression of the Gramian factors'
+
+    settings_types['max_iter'] = 'int'
+    settings_default['max_iter'] = 200
+    settings_description['max_iter'] = 'Maximum number of ADI iterations'
+
+    settings_types['rom_size'] = 'int'
+    settings_default['rom_size'] = 0
+    settings_description['rom_size'] = 'Number of balanced states retained. All states are retained if ``0``'
+
+    settings_types['num_cores'] = 'int'
+    settings_default['num_cores'] = 1
+    settings_description['num_cores'] = 'Number of LU factorisations at the shifts computed concurrently'
+
+    settings_table = settings.SettingsTable()
+    __doc__ += settings_table.generate(settings_types, settings_default, settings_description)
+
+    def __init__(self):
+        self.settings = dict()
+        self.hsv = None
+
+    def initialise(self, in_settings=None):
+        if in_settings is not None:
+            self.settings = in_settings
+
+        settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
+
+    def run(self, ss):
+        if self.print_info:
+            cout.cout_wrap('Reducing system using low-rank ADI balancing...')
+        t0 = time.time()
+
+        A, B, C, D = ss.get_mats()
+        if sparse.issparse(A):
+            A = libsp.csc_matrix(A)
+
+        s, T, Tinv, rcmax, romax = librom.balreal_lradi(A, B, C,
+                                                        DLTI=ss.dt is not None,
+                                                        n_shifts=self.settings['n_shifts'].value,
+                                                        k_plus=self.settings['k_plus'].value,
+                                                        k_minus=self.settings['k_minus'].value,
+                                                        tol=self.settings['adi_tol'].value,
+                                                        tolSVD=self.settings['tolSVD'].value,
+                                                        max_iter=self.settings['max_iter'].value,
+                                                        num_threads=self.settings['num_cores'].value)
+        self.hsv = s
+
+        rom_size = self.settings['rom_size'].value
+        if 0 < rom_size < len(s):
+            T = T[:, :rom_size]
+            Tinv = Tinv[:rom_size, :]
+
+        Ar = Tinv.dot(libsp.dot(A, T))
+        Br = Tinv.dot(libsp.dense(B))
+        Cr = libsp.dot(C, T, type_out=np.ndarray)
+
+        if self.print_info:
+            cout.cout_wrap('\tGramian factors rank: controllability %d, observability %d' % (rcmax, romax), 1)
+            cout.cout_wrap('\t...completed balancing in %.2fs' % (time.time() - t0), 1)
+
+        return libss.ss(Ar, Br, Cr, libsp.dense(D), dt=ss.dt)
+
+
 @rom_interface.rom
 class Balanced(rom_interface.BaseRom):
     """Balancing ROM methods
@@ -309,6 +403,8 @@ class Balanced(rom_interface.BaseRom):
 
         * Frequency limited balancing :class:`.FrequencyLimited`
 
+        * Low-rank ADI balancing for large sparse systems :class:`.LowRankADI`
+
     """
     rom_id = 'Balanced'
 
@@ -324,7 +420,7 @@ class Balanced(rom_interface.BaseRom):
     settings_types['algorithm'] = 'str'
     settings_default['algorithm'] = ''
     settings_description['algorithm'] = 'Balanced realisation method'
-    settings_options['algorithm'] = ['Direct', 'Iterative', 'FrequencyLimited']
+    settings_options['algorithm'] = ['Direct', 'Iterative', 'FrequencyLimited', 'LowRankADI']
 
     settings_types['algorithm_settings'] = 'dict'
     settings_default['algorithm_settings'] = dict()
@@ -356,6 +452,12 @@ class Balanced(rom_interface.BaseRom):
 
     def run(self, ss):
 
+        if isinstance(ss, libss.ss_block):
+            mats = [libsp.block_matrix(M) for M in (ss.A, ss.B, ss.C, ss.D)]
+            if not isinstance(self.algorithm, LowRankADI):
+                # only the low-rank ADI balancing works with sparse matrices
+                mats = [libsp.dense(M) for M in mats]
+            ss = libss.ss(*mats, dt=ss.dt)
         self.ss = ss
 
         A, B, C, D = self.ss.get_mats()
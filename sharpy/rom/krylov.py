@@ -2,7 +2,9 @@
 """
 import numpy as np
 import scipy.linalg as sclalg
+import scipy.sparse as scsp
 import sharpy.linear.src.libss as libss
+import sharpy.linear.src.libsparse as libsp
 import time
 import sharpy.utils.settings as settings
 import sharpy.utils.cout_utils as cout
@@ -87,6 +89,20 @@ class Krylov(rom_interface.BaseRom):
     settings_default['restart_arnoldi'] = False
     settings_description['restart_arnoldi'] = 'Restart Arnoldi iteration with r-=1 if ROM is unstable'
 
+    settings_types['irka_max_iter'] = 'int'
+    settings_default['irka_max_iter'] = 50
+    settings_description['irka_max_iter'] = 'Maximum number of iterations of the ``irka`` algorithm'
+
+    settings_types['irka_tolerance'] = 'float'
+    settings_default['irka_tolerance'] = 1e-5
+    settings_description['irka_tolerance'] = 'Relative change in the interpolation points at which the ``irka`` ' \
+                                             'iteration is converged. Factorisations at points closer than this ' \
+                                             'tolerance to those of the previous iteration are reused.'
+
+    settings_types['num_cores'] = 'int'
+    settings_default['num_cores'] = 1
+    settings_description['num_cores'] = 'Number of LU factorisations of the interpolation points computed concurrently'
+
     settings_table = settings.SettingsTable()
     __doc__ += settings_table.generate(settings_types, settings_default, settings_description, settings_options)
 
@@ -94,7 +110,8 @@ class Krylov(rom_interface.BaseRom):
                          'two_sided_arnoldi',
                          'dual_rational_arnoldi',
                          'mimo_rational_arnoldi',
-                         'mimo_block_arnoldi')
+                         'mimo_block_arnoldi',
+                         'irka')
 
     def __init__(self):
         self.settings = dict()
@@ -114,6 +131,13 @@ class Krylov(rom_interface.BaseRom):
         self.cpu_summary = dict()
         self.eigenvalue_table = None
 
+        self.irka_shifts = None
+        self.irka_iterations = None
+        self.irka_converged = None
+
+        self.lu_factors = dict()  # LU factorisations of the full order system at each interpolation point
+        self.lu_factors_a = None  # plant matrix given to run() of the cached factorisations
+
     def initialise(self, in_settings=None):
 
         if in_settings is not None:
@@ -142,7 +166,7 @@ class Krylov(rom_interface.BaseRom):
             self.nfreq = 1
 
     def run(self, ss):
-        """
+        r"""
         Performs Model Order Reduction employing Krylov space projection methods.
 
         Supported methods include:
@@ -155,15 +179,36 @@ class Krylov(rom_interface.BaseRom):
         ``dual_rational_arnoldi``  K                     SISO systems and Tangential interpolation for MIMO systems
         ``mimo_rational_arnoldi``  K                     MIMO systems. Uses vector-wise construction (more robust)
         ``mimo_block_arnoldi``     K                     MIMO systems. Uses block Arnoldi methods (more efficient)
+        ``irka``                   r (optimised)         SISO and MIMO systems. Iterates the interpolation points
+                                                         to :math:`\mathcal{H}_2` optimal locations
         =========================  ====================  ==========================================================
 
+        Full order systems in block form (:class:`sharpy.linear.src.libss.ss_block`) are assembled and, if the plant
+        matrix is sparse, the factorisations at the interpolation points are computed using sparse LU methods.
+
+        The factorisations are kept in ``self.lu_factors``, such that restarts of the algorithm or further runs on the
+        same full order system, i.e. with the same ``ss.A`` object, reuse them (see :meth:`lu_factors_at`).
+
         Args:
-            ss (sharpy.linear.src.libss.ss): State space to reduce
+            ss (sharpy.linear.src.libss.ss or sharpy.linear.src.libss.ss_block): State space to reduce
 
         Returns:
             (libss.ss): Reduced state space system
         """
+        # the cached factorisations belong to the plant matrix given by the caller, since that of block systems is
+        # assembled again below at every run
+        full_order_a = ss.A
+        if isinstance(ss, libss.ss_block) or any(scsp.issparse(M) for M in (ss.B, ss.C, ss.D)):
+            # the plant matrix is kept sparse, the input and output matrices are dense for the Krylov iterations
+            ss = libss.ss(libsp.block_matrix(ss.A) if isinstance(ss, libss.ss_block) else ss.A,
+                          *[libsp.dense(libsp.block_matrix(M) if isinstance(ss, libss.ss_block) else M)
+                            for M in (ss.B, ss.C, ss.D)],
+                          dt=ss.dt)
         self.ss = ss
+        if full_order_a is not self.lu_factors_a:
+            self.lu_factors = dict()
+            self.lu_factors_a = full_order_a
+        self.frequency = np.array(self.settings['frequency'])
 
         if self.settings['print_info']:
             cout.cout_wrap('Model Order Reduction in progress...')
@@ -257,7 +302,8 @@ class Krylov(rom_interface.BaseRom):
         nx = A.shape[0]
 
         if frequency != np.inf and frequency is not None:
-            lu_A = krylovutils.lu_factor(frequency, A)
+            sigma = np.atleast_1d(frequency)[0]
+            lu_A = self.lu_factors_at([sigma])[sigma]
             V = krylovutils.construct_krylov(r, lu_A, B, 'Pade', 'b')
         else:
             V = krylovutils.construct_krylov(r, A, B, 'partial_realisation', 'b')
@@ -309,7 +355,8 @@ class Krylov(rom_interface.BaseRom):
         nx = A.shape[0]
 
         if frequency != np.inf and frequency is not None:
-            lu_A = krylovutils.lu_factor(frequency, A)
+            sigma = np.atleast_1d(frequency)[0]
+            lu_A = self.lu_factors_at([sigma])[sigma]
             V = krylovutils.construct_krylov(r, lu_A, B, 'Pade', 'b')
             W = krylovutils.construct_krylov(r, lu_A, C.T, 'Pade', 'c')
         else:
@@ -536,7 +583,7 @@ class Krylov(rom_interface.BaseRom):
         W = np.zeros((nx, rom_dim), dtype=complex)
 
         we = 0
-        dict_of_luas = dict()
+        dict_of_luas = self.lu_factors_at(np.concatenate((fc, fo)))
         for i in range(len(fc)):
             sigma = fc[i]
             if sigma == np.inf:
@@ -544,11 +591,7 @@ class Krylov(rom_interface.BaseRom):
                 lu_A = A
             else:
                 approx_type = 'Pade'
-                try:
-                    lu_A = dict_of_luas[sigma]
-                except KeyError:
-                    lu_A = krylovutils.lu_factor(sigma, A)
-                    dict_of_luas[sigma] = lu_A
+                lu_A = dict_of_luas[sigma]
             V[:, we:we+rc[i]] = krylovutils.construct_krylov(rc[i], lu_A, B.dot(right_tangent[:, i:i+1]), approx_type, 'b')
 
             we += rc[i]
@@ -561,11 +604,7 @@ class Krylov(rom_interface.BaseRom):
                 lu_A = A
             else:
                 approx_type = 'Pade'
-                try:
-                    lu_A = dict_of_luas[sigma]
-                except KeyError:
-                    lu_A = krylovutils.lu_factor(sigma, A)
-                    dict_of_luas[sigma] = lu_A
+                lu_A = dict_of_luas[sigma]
             W[:, we:we+ro[i]] = krylovutils.construct_krylov(ro[i], lu_A, C.T.dot(left_tangent[:, i:i+1]), approx_type, 'c')
 
             we += ro[i]
@@ -581,8 +620,6 @@ class Krylov(rom_interface.BaseRom):
         Br = W.T.dot(self.ss.B)
         Cr = self.ss.C.dot(V.dot(Tinv))
 
-        del dict_of_luas
-
         self.cpu_summary['algorithm'] = time.time() - t0
 
         return Ar, Br, Cr
@@ -639,23 +676,28 @@ class Krylov(rom_interface.BaseRom):
         V = None
         W = None
 
+        lu_factors = self.lu_factors_at(frequency)
         for i in range(self.nfreq):
 
             if self.settings['single_side'] == 'controllability' or self.settings['single_side'] == '':
                 cout.cout_wrap('\tConstructing controllability space', 1)
                 if i == 0:
-                    V = krylovutils.build_krylov_space(frequency[i], r_c, side='b', a=self.ss.A, b=self.ss.B)
+                    V = krylovutils.build_krylov_space(frequency[i], r_c, side='b', a=self.ss.A, b=self.ss.B,
+                                                       lu_a=lu_factors.get(frequency[i]))
                 else:
-                    Vi = krylovutils.build_krylov_space(frequency[i], r_c, side='b', a=self.ss.A, b=self.ss.B)
+                    Vi = krylovutils.build_krylov_space(frequency[i], r_c, side='b', a=self.ss.A, b=self.ss.B,
+                                                        lu_a=lu_factors.get(frequency[i]))
                     V = np.hstack((V, Vi))
                     V = krylovutils.mgs_ortho(V)
 
             if self.settings['single_side'] == 'observability' or self.settings['single_side'] == '':
                 cout.cout_wrap('\tConstructing observability space', 1)
                 if i == 0:
-                    W = krylovutils.build_krylov_space(frequency[i], r_o, side='c', a=self.ss.A, b=self.ss.C.T)
+                    W = krylovutils.build_krylov_space(frequency[i], r_o, side='c', a=self.ss.A, b=self.ss.C.T,
+                                                       lu_a=lu_factors.get(frequency[i]))
                 else:
-                    Wi = krylovutils.build_krylov_space(frequency[i], r_o, side='c', a=self.ss.A, b=self.ss.C.T)
+                    Wi = krylovutils.build_krylov_space(frequency[i], r_o, side='c', a=self.ss.A, b=self.ss.C.T,
+                                                        lu_a=lu_factors.get(frequency[i]))
                     W = np.hstack((W, Wi))
                     W = krylovutils.mgs_ortho(W)
 
@@ -698,13 +740,14 @@ class Krylov(rom_interface.BaseRom):
         B = self.ss.B
         C = self.ss.C
 
+        lu_factors = self.lu_factors_at(frequency)
         for i in range(self.nfreq):
 
             if self.frequency[i] == np.inf:
                 F = A
                 G = B
             else:
-                lu_a = krylovutils.lu_factor(frequency[i], A)
+                lu_a = lu_factors[frequency[i]]
                 F = krylovutils.lu_solve(lu_a, np.eye(n))
                 G = krylovutils.lu_solve(lu_a, B)
 
@@ -722,6 +765,168 @@ class Krylov(rom_interface.BaseRom):
 
         return Ar, Br, Cr
 
+    def irka(self, frequency, r):
+        r"""
+        Iterative Rational Krylov Algorithm (IRKA) [1] with tangential interpolation for MIMO systems [2].
+
+        The interpolation points do not need to be chosen by the user: the ``frequency`` setting only provides the
+        starting guess. An initial ROM of order :math:`r` is obtained by a Galerkin projection onto the Krylov spaces
+        about ``frequency`` and, at each iteration, the new interpolation points :math:`\sigma_i` and tangential
+        directions :math:`\mathbf{b}_i` and :math:`\mathbf{c}_i` are taken from the poles :math:`\lambda_i` and
+        residues of the current ROM
+
+        .. math::
+            \hat{\mathbf{A}} = \mathbf{X}\mathbf{\Lambda}\mathbf{X}^{-1}, \quad
+            \mathbf{b}_i^\top = \mathbf{e}_i^\top\mathbf{X}^{-1}\hat{\mathbf{B}}, \quad
+            \mathbf{c}_i = \hat{\mathbf{C}}\mathbf{Xe}_i
+
+        with :math:`\sigma_i = -\lambda_i` for continuous time and :math:`\sigma_i = 1/\lambda_i` for discrete time
+        systems [3]. The ROM is the oblique projection onto
+
+        .. math::
+            \mathbf{V} = [(\sigma_1\mathbf{I}_n - \mathbf{A})^{-1}\mathbf{Bb}_1, \dots,
+            (\sigma_r\mathbf{I}_n - \mathbf{A})^{-1}\mathbf{Bb}_r] \\
+            \mathbf{W} = [(\sigma_1\mathbf{I}_n - \mathbf{A})^{-T}\mathbf{C}^T\mathbf{c}_1, \dots,
+            (\sigma_r\mathbf{I}_n - \mathbf{A})^{-T}\mathbf{C}^T\mathbf{c}_r]
+
+        built in real arithmetic from the real and imaginary parts of the complex conjugate pairs. Upon convergence,
+        the ROM satisfies the first order :math:`\mathcal{H}_2` optimality conditions.
+
+        The iteration stops when the relative change of the interpolation points falls below ``irka_tolerance`` or
+        after ``irka_max_iter`` iterations, which is recorded in ``self.irka_converged``. If not converged, the ROM is
+        the projection onto the bases of the last interpolation points, stored in ``self.V`` and ``self.W``. The LU factorisations are cached (see :meth:`lu_factors_at`) and those at
+        interpolation points that move less than ``irka_tolerance`` are reused in the following iteration.
+
+        Args:
+            frequency (np.ndarray): Initial interpolation points
+            r (int): Order of the ROM
+
+        Returns:
+            tuple: The reduced order model matrices: :math:`\mathbf{A}_r`, :math:`\mathbf{B}_r` and :math:`\mathbf{C}_r`.
+
+        References:
+            [1] Gugercin, S., Antoulas, A. C., Beattie, C. H2 Model Reduction for Large-Scale Linear Dynamical Systems.
+            SIAM Journal on Matrix Analysis and Applications, 2008.
+
+            [2] Beattie, C., Gugercin, S. Model Reduction by Rational Interpolation. In Model Reduction and
+            Approximation: Theory and Algorithms. SIAM, 2017.
+
+            [3] Bunse-Gerstner, A., Kubalinska, D., Vossen, G., Wilczek, D. h2-norm Optimal Model Reduction for Large
+            Scale Discrete Dynamical MIMO Systems. Journal of Computational and Applied Mathematics, 2010.
+        """
+        A = self.ss.A
+        B = self.ss.B
+        C = self.ss.C
+        tolerance = self.settings['irka_tolerance'].value
+
+        t0 = time.time()
+
+        # Initial ROM: Galerkin projection onto the Krylov spaces about the initial interpolation points
+        frequency = np.atleast_1d(frequency)
+        lu_factors = self.lu_factors_at(frequency)
+        r_sigma = int(np.ceil(r / (self.ss.inputs * len(frequency))))
+        V = []
+        for sigma in frequency:
+            Vi = krylovutils.build_krylov_space(sigma, r_sigma, side='b', a=A, b=B, lu_a=lu_factors.get(sigma))
+            V += [Vi.real, Vi.imag]
+        V = real_basis(np.hstack(V), r)
+        W = V
+
+        sigma = None
+        converged = False
+        for i_iter in range(self.settings['irka_max_iter'].value):
+            Ar, Br, Cr = oblique_projection(A, B, C, V, W)
+
+            # Interpolation points and tangential directions from the poles and residues of the ROM
+            eigs, X = sclalg.eig(Ar)
+            if self.sstype == 'dt':
+                eigs[np.abs(eigs) < 1e-12] = 1e-12
+                sigma_new = 1. / eigs
+            else:
+                sigma_new = -eigs
+            b_tangent = sclalg.solve(X, Br)
+            c_tangent = Cr.dot(X)
+
+            if sigma is not None:
+                change = np.max(np.abs(np.sort(sigma_new) - np.sort(sigma)) / np.abs(np.sort(sigma)))
+                cout.cout_wrap('\tIRKA iteration %d - relative change in interpolation points %.2e'
+                               % (i_iter, change), 1)
+                if change < tolerance:
+                    converged = True
+                    break
+
+            # reuse the factorisations at the points that have not moved
+            sigma_new = np.array([self.closest_factorised_point(s, tolerance) for s in sigma_new])
+            sigma = sigma_new
+
+            lu_factors = self.lu_factors_at(sigma[sigma.imag >= 0])
+            for sigma_cached in list(lu_factors.keys()):
+                if sigma_cached not in sigma:
+                    del lu_factors[sigma_cached]
+
+            V = []
+            W = []
+            for i_sigma, sigma_i in enumerate(sigma):
+                if sigma_i.imag < 0:
+                    continue  # spanned by its complex conjugate
+                v = krylovutils.lu_solve(lu_factors[sigma_i], B.dot(b_tangent[i_sigma, :]))
+                w = krylovutils.lu_solve(lu_factors[sigma_i], C.T.dot(c_tangent[:, i_sigma]), trans=1)
+                V += [v.real, v.imag] if sigma_i.imag > 0 else [v.real]
+                W += [w.real, w.imag] if sigma_i.imag > 0 else [w.real]
+            V = real_basis(np.column_stack(V), r)
+            W = real_basis(np.column_stack(W), r)
+
+        if not converged:
+            cout.cout_wrap('\tIRKA did not converge in %d iterations' % self.settings['irka_max_iter'].value, 3)
+            # ROM of the bases of the last interpolation points, consistent with the stored V and W
+            Ar, Br, Cr = oblique_projection(A, B, C, V, W)
+
+        self.irka_shifts = sigma
+        self.irka_iterations = i_iter
+        self.irka_converged = converged
+        self.V = V
+        self.W = W
+        self.cpu_summary['algorithm'] = time.time() - t0
+
+        return Ar, Br, Cr
+
+    def closest_factorised_point(self, sigma, tolerance):
+        """
+        Returns the interpolation point of an available LU factorisation, or its complex conjugate, if within a
+        relative ``tolerance`` of ``sigma``. Otherwise ``sigma`` is returned.
+        """
+        for sigma_cached in self.lu_factors.keys():
+            for candidate in (sigma_cached, np.conj(sigma_cached)):
+                if np.abs(candidate - sigma) <= tolerance * np.abs(sigma) and \
+                        (candidate.imag == 0) == (sigma.imag == 0):
+                    return candidate
+        return sigma
+
+    def lu_factors_at(self, frequencies):
+        r"""
+        LU factorisations of :math:`(\sigma\mathbf{I}_n - \mathbf{A})` of the full order system at the interpolation
+        points :math:`\sigma`.
+
+        The factorisations are cached in ``self.lu_factors``. Those that are not yet available are computed
+        concurrently using ``num_cores`` threads (see :func:`sharpy.rom.utils.krylovutils.lu_factor_multiple`).
+        Points at infinity are skipped.
+
+        Args:
+            frequencies (np.ndarray): Interpolation points
+
+        Returns:
+            dict: Cached LU factorisations, with the interpolation points as keys.
+        """
+        missing = [sigma for sigma in np.unique(np.atleast_1d(frequencies))
+                   if np.isfinite(sigma) and sigma not in self.lu_factors]
+        if missing:
+            t0 = time.time()
+            self.lu_factors.update(krylovutils.lu_factor_multiple(missing, self.ss.A,
+                                                                  self.settings['num_cores'].value))
+            self.cpu_summary['lu_factor'] = self.cpu_summary.get('lu_factor', 0.) + time.time() - t0
+
+        return self.lu_factors
+
     def check_stability(self, restart_arnoldi=False):
         r"""
         Checks the stability of the ROM by computing its eigenvalues.
@@ -798,7 +1003,7 @@ class Krylov(rom_interface.BaseRom):
 
             if self.r > 1:
                 self.r -= 1
-                self.run(self.algorithm, self.r, self.frequency)
+                self.run(self.ss)
             else:
                 print('Unable to reduce ROM any further - ROM still unstable...')
 
@@ -983,6 +1188,32 @@ def check_eye(T, Tinv, msg=''):
                                % (msg, np.log10(max_diff))
 
 
+def real_basis(V, r):
+    """
+    Orthonormal basis of the first ``r`` linearly independent columns of ``V`` (QR decomposition with column pivoting).
+
+    A warning is issued if ``V`` has fewer than ``r`` linearly independent columns, in which case the basis has as
+    many columns as the rank of ``V``.
+    """
+    Q, R, P = sclalg.qr(V, mode='economic', pivoting=True)
+    rank = np.sum(np.abs(np.diag(R)) > 1e-10 * np.abs(R[0, 0]))
+    if rank < r:
+        warn.warn('Krylov basis of rank %d, lower than the requested order %d' % (rank, r))
+    return Q[:, :min(r, rank)]
+
+
+def oblique_projection(A, B, C, V, W):
+    r"""
+    Reduced order matrices of the oblique projection of ``(A, B, C)`` onto ``V`` along ``W``.
+
+    Returns:
+        tuple: :math:`\mathbf{W}^\top\mathbf{AV}(\mathbf{W}^\top\mathbf{V})^{-1}`, :math:`\mathbf{W}^\top\mathbf{B}`
+        and :math:`\mathbf{CV}(\mathbf{W}^\top\mathbf{V})^{-1}`
+    """
+    Tinv = sclalg.inv(W.T.dot(V))
+    return W.T.dot(A.dot(V.dot(Tinv))), W.T.dot(B), C.dot(V.dot(Tinv))
+
+
 def check_rank(V, W):
 
     n_cols = V.shape[1]
@@ -1,4 +1,5 @@
 """Krylov Model Reduction Methods Utilities"""
+import multiprocessing.pool as mpr_pool
 import scipy.sparse as scsp
 import numpy as np
 import scipy.linalg as sclalg
@@ -161,7 +162,7 @@ def construct_krylov(r, lu_A, B, approx_type='Pade', side='b'):
     # Initial assembly
     f[:, :1] = w - v.dot(alpha)
     V[:, :1] = v
-    H[0, 0] = alpha
+    H[0, 0] = alpha[0, 0]
 
     for j in range(0, r-1):
 
@@ -197,7 +198,8 @@ def lu_factor(sigma, A):
 
     .. math:: LU = (\sigma \mathbf{I} - \mathbf{A})
 
-    In the case of ``A`` being a sparse matrix, the sparse methods in scipy are employed
+    In the case of ``A`` being a sparse matrix, the sparse methods in scipy are employed. The factorisation is
+    performed in real arithmetic if the expansion frequency is real.
 
     Args:
         sigma (float): Expansion frequency
@@ -207,12 +209,45 @@ def lu_factor(sigma, A):
         tuple or SuperLU: tuple (dense) or SuperLU (sparse) objects containing the LU factorisation
     """
     n = A.shape[0]
-    if type(A) == libsp.csc_matrix:
-        return scsp.linalg.splu(sigma * scsp.identity(n, dtype=complex, format='csc') - A)
+    if np.imag(sigma) == 0:
+        sigma = np.real(sigma)
+    if scsp.issparse(A):
+        dtype = complex if np.iscomplexobj(sigma) else float
+        return scsp.linalg.splu(scsp.csc_matrix(sigma * scsp.identity(n, dtype=dtype, format='csc') - A))
     else:
         return sclalg.lu_factor(sigma * np.eye(n) - A)
 
 
+def lu_factor_multiple(frequencies, A, num_threads=1):
+    """
+    LU factorisations of :math:`(\sigma_i \mathbf{I} - \mathbf{A})` for several expansion frequencies.
+
+    The factorisations are independent of each other and are computed concurrently in a pool of ``num_threads``
+    threads. Both the dense (LAPACK) and sparse (SuperLU) factorisations release the GIL, and the resulting
+    factorisations remain in shared memory, which would not be possible with worker processes since ``SuperLU`` objects
+    cannot be pickled.
+
+    Args:
+        frequencies (list): Finite expansion frequencies
+        A (csc_matrix or np.ndarray): Dynamics matrix
+        num_threads (int): Number of concurrent factorisations
+
+    Returns:
+        dict: LU factorisation (see :func:`lu_factor`) for each of the ``frequencies``
+    """
+    frequencies = list(frequencies)
+    if scsp.issparse(A):
+        A = scsp.csc_matrix(A)
+
+    if num_threads > 1 and len(frequencies) > 1:
+        with mpr_pool.ThreadPool(min(num_threads, len(frequencies))) as pool:
+            lu_list = pool.map(lambda sigma: lu_factor(sigma, A), frequencies)
+    else:
+        lu_list = [lu_factor(sigma, A) for sigma in frequencies]
+
+    return dict(zip(frequencies, lu_list))
+
+
 def lu_solve(lu_A, b, trans=0):
     """
     LU solve wrapper.
@@ -241,7 +276,14 @@ def lu_solve(lu_A, b, trans=0):
     """
     transpose_mode_dict = {0: 'N', 1: 'T'}
     if type(lu_A) == scsp.linalg.SuperLU:
-        return lu_A.solve(b, trans=transpose_mode_dict[trans])
+        if np.iscomplexobj(b):
+            try:
+                return lu_A.solve(b, trans=transpose_mode_dict[trans])
+            except TypeError:
+                # real factorisation and complex right hand side
+                return lu_A.solve(np.ascontiguousarray(b.real), trans=transpose_mode_dict[trans]) + \
+                       1j * lu_A.solve(np.ascontiguousarray(b.imag), trans=transpose_mode_dict[trans])
+        return lu_A.solve(np.asarray(b, dtype=float), trans=transpose_mode_dict[trans])
     else:
         return sclalg.lu_solve(lu_A, b, trans=trans)
 
@@ -345,14 +387,15 @@ def construct_mimo_krylov(r, lu_A_input, B, approx_type='Pade', side='controllab
     return V[:, :t]
 
 
-def build_krylov_space(frequency, r, side, a, b):
+def build_krylov_space(frequency, r, side, a, b, lu_a=None):
 
     if frequency == np.inf or frequency.real == np.inf:
         approx_type = 'partial_realisation'
         lu_a = a
     else:
         approx_type = 'Pade'
-        lu_a = lu_factor(frequency, a)
+        if lu_a is None:
+            lu_a = lu_factor(frequency, a)
 
     try:
         nu = b.shape[1]
@@ -6,10 +6,12 @@ S. Maraniello, 14 Feb 2018
 import warnings
 import numpy as np
 import scipy.linalg as scalg
+import scipy.sparse as sparse
 
 # from IPython import embed
 import sharpy.linear.src.libsparse as libsp
 import sharpy.linear.src.libss as libss
+import sharpy.rom.utils.krylovutils as krylovutils
 
 
 def balreal_direct_py(A, B, C, DLTI=True, Schur=False, full_outputs=False):
@@ -664,6 +666,324 @@ def low_rank_smith(A, Q, tol=1e-10, Square=True, tolSVD=1e-12, tolAbs=False,
     return Zk
 
 
+def balreal_lradi(A, B, C, DLTI=True, n_shifts=20, k_plus=40, k_minus=20, tol=1e-10, tolSVD=1e-10,
+                  max_iter=200, num_threads=1, Print=False):
+    r"""
+    Find balanced realisation of a LTI system using low-rank factors of the Gramians from the Alternating Direction
+    Implicit (ADI) method.
+
+    The controllability and observability Gramians are obtained in the factorised form
+    :math:`\mathbf{P}=\mathbf{Z}_c\mathbf{Z}_c^\top` and :math:`\mathbf{Q}=\mathbf{Z}_o\mathbf{Z}_o^\top`
+    using :func:`low_rank_adi`, and the balancing transformation follows from the SVD of
+    :math:`\mathbf{Z}_o^\top\mathbf{Z}_c` as in :func:`balreal_iter`.
+
+    Unlike the squared Smith iterations, the method only requires the solution of shifted linear systems
+    :math:`(\sigma_i\mathbf{I} - \mathbf{A})\mathbf{x}=\mathbf{b}` and products with :math:`\mathbf{A}`, such that
+    sparse plant matrices are never converted to dense :math:`n\times n` arrays. The LU factorisations at the shifts,
+    chosen automatically with the heuristic of Penzl (see :func:`penzl_shifts`), are computed once and shared by
+    both Gramians.
+
+    Discrete-time systems are mapped to continuous time through the bilinear (Cayley) transformation
+
+    .. math::
+        \mathbf{A}_c = (\mathbf{A} + \mathbf{I})^{-1}(\mathbf{A} - \mathbf{I}), \quad
+        \mathbf{B}_c = \sqrt{2}(\mathbf{A} + \mathbf{I})^{-1}\mathbf{B}, \quad
+        \mathbf{C}_c = \sqrt{2}\mathbf{C}(\mathbf{A} + \mathbf{I})^{-1}
+
+    which preserves the Gramians, and none of the transformed matrices is formed explicitly.
+
+    Args:
+        A (np.ndarray or libsp.csc_matrix): Plant matrix
+        B (np.ndarray): Input matrix
+        C (np.ndarray): Output matrix
+        DLTI (bool): Discrete time system
+        n_shifts (int): Number of ADI shifts
+        k_plus (int): Arnoldi steps on :math:`\mathbf{A}` for the shift selection
+        k_minus (int): Arnoldi steps on :math:`\mathbf{A}^{-1}` for the shift selection
+        tol (float): Convergence tolerance of the ADI iterations on the relative increment of the Gramians
+        tolSVD (float): Relative tolerance of the column compression of the low-rank factors
+        max_iter (int): Maximum number of ADI iterations
+        num_threads (int): Number of LU factorisations computed concurrently
+        Print (bool): Print the progress of the iterations
+
+    Returns:
+        tuple: Hankel singular values, balancing transformation :math:`\mathbf{T}` and its inverse
+        :math:`\mathbf{T}^{-1}` and the ranks of the controllability and observability factors.
+
+    References:
+        Penzl, T. A Cyclic Low-Rank Smith Method for Large Sparse Lyapunov Equations. SIAM Journal on Scientific
+        Computing, 1999.
+
+        Li, J.-R., White, J. Low Rank Solution of Lyapunov Equations. SIAM Journal on Matrix Analysis and Applications,
+        2002.
+    """
+    if sparse.issparse(A):
+        A = libsp.csc_matrix(A)
+    B = libsp.dense(B)
+    C = libsp.dense(C)
+
+    shifts = penzl_shifts(A, DLTI, n_shifts, k_plus, k_minus)
+    if Print:
+        print('ADI shifts:')
+        for p in shifts:
+            print('\t%.4e + %.4ej' % (p.real, p.imag))
+
+    # (p I + A_c) in terms of (sigma I - A)
+    if DLTI:
+        sigmas = (1. - shifts) / (1. + shifts)
+    else:
+        sigmas = -shifts
+    lu_factors = krylovutils.lu_factor_multiple(sigmas, A, num_threads)
+
+    Zc = low_rank_adi(A, B, shifts, lu_factors, DLTI, trans=0, tol=tol, tolSVD=tolSVD, max_iter=max_iter,
+                      Print=Print)
+    Zo = low_rank_adi(A, C.T, shifts, lu_factors, DLTI, trans=1, tol=tol, tolSVD=tolSVD, max_iter=max_iter,
+                      Print=Print)
+    rcmax, romax = Zc.shape[1], Zo.shape[1]
+
+    # build M matrix and SVD
+    M = np.dot(Zo.T, Zc)
+    U, s, Vh = scalg.svd(M, full_matrices=False)
+
+    sinv = s ** (-0.5)
+    T = np.dot(Zc, Vh.T * sinv)
+    Tinv = np.dot((U * sinv).T, Zo.T)
+
+    if Print:
+        print('rank(Zc)=%.4d\trank(Zo)=%.4d' % (rcmax, romax))
+
+    return s, T, Tinv, rcmax, romax
+
+
+def low_rank_adi(A, B, shifts, lu_factors, DLTI=True, trans=0, tol=1e-10, tolSVD=1e-10, max_iter=200,
+                 Print=False):
+    r"""
+    Low-rank ADI iteration for the Lyapunov equation
+
+    .. math:: \mathbf{A}_c\mathbf{X} + \mathbf{XA}_c^\top + \mathbf{B}_c\mathbf{B}_c^\top = \mathbf{0}
+
+    whose solution is given in the factorised form :math:`\mathbf{X} = \mathbf{ZZ}^\top`. For continuous time
+    systems, :math:`\mathbf{A}_c=\mathbf{A}` and :math:`\mathbf{B}_c=\mathbf{B}`. For discrete time systems, the
+    equation is the continuous time equivalent of the Stein equation
+    :math:`\mathbf{AXA}^\top - \mathbf{X} + \mathbf{BB}^\top = \mathbf{0}` (see :func:`balreal_lradi`). If
+    ``trans=1`` the equation for :math:`\mathbf{A}^\top` is solved instead, i.e. ``B`` should be
+    :math:`\mathbf{C}^\top` for the observability Gramian.
+
+    The iteration of Li and White
+
+    .. math::
+        \mathbf{V}_1 &= \sqrt{-2\Re(p_1)}(\mathbf{A}_c + p_1\mathbf{I})^{-1}\mathbf{B}_c \\
+        \mathbf{V}_{i+1} &= \sqrt{\Re(p_{i+1})/\Re(p_i)}\left(\mathbf{V}_i - (p_{i+1} + \bar{p}_i)
+        (\mathbf{A}_c + p_{i+1}\mathbf{I})^{-1}\mathbf{V}_i\right)
+
+    cycles through the ``shifts``, with :math:`\mathbf{Z}=[\mathbf{V}_1, \dots, \mathbf{V}_k]`. It is stopped when
+    the relative contribution of the last block to the solution,
+    :math:`\|\mathbf{V}_k\|_F^2 / \|\mathbf{Z}\|_F^2`, falls below ``tol``.
+    The real factor :math:`[\Re(\mathbf{Z}), \Im(\mathbf{Z})]` is compressed at the end of each cycle through the
+    shifts, retaining the singular values above ``tolSVD`` relative to the largest.
+
+    Args:
+        A (np.ndarray or libsp.csc_matrix): Plant matrix
+        B (np.ndarray): Right hand side factor
+        shifts (np.ndarray): ADI shifts, with negative real part and closed under conjugation
+        lu_factors (dict): LU factorisations of :math:`(\sigma\mathbf{I} - \mathbf{A})` (see
+            :func:`sharpy.rom.utils.krylovutils.lu_factor_multiple`) with :math:`\sigma=(1-p)/(1+p)` for discrete
+            time and :math:`\sigma=-p` for continuous time systems.
+        DLTI (bool): Discrete time system
+        trans (int): Solve for :math:`\mathbf{A}^\top` if ``1``.
+        tol (float): Convergence tolerance
+        tolSVD (float): Relative tolerance of the column compression
+        max_iter (int): Maximum number of iterations
+        Print (bool): Print the progress of the iterations
+
+    Returns:
+        np.ndarray: Low-rank factor :math:`\mathbf{Z}`
+    """
+
+    def shifted_solve(p, rhs):
+        # (A_c + p I)^{-1} rhs
+        if DLTI:
+            sigma = (1. - p) / (1. + p)
+            if trans:
+                rhs = rhs + A.T.dot(rhs)
+            else:
+                rhs = rhs + A.dot(rhs)
+            return -krylovutils.lu_solve(lu_factors[sigma], rhs, trans) / (1. + p)
+        else:
+            return -krylovutils.lu_solve(lu_factors[-p], rhs, trans)
+
+    if DLTI:
+        # first block: (A_c + p I)^{-1} B_c = sqrt(2) ((1+p) A - (1-p) I)^{-1} B
+        p = shifts[0]
+        V = -np.sqrt(2.) * krylovutils.lu_solve(lu_factors[(1. - p) / (1. + p)], B.astype(complex), trans) / (1. + p)
+    else:
+        V = shifted_solve(shifts[0], B.astype(complex))
+    V *= np.sqrt(-2. * shifts[0].real)
+
+    Z = [V]
+    Z_compressed = np.zeros((B.shape[0], 0))
+    Z_norm2 = np.linalg.norm(V) ** 2
+
+    if Print:
+        print('ADI iteration (%s)\n Iter\tRel. increment\tRank' % ('observability' if trans else 'controllability'))
+
+    n_shifts = len(shifts)
+    for kk in range(1, max_iter):
+        p_prev = shifts[(kk - 1) % n_shifts]
+        p = shifts[kk % n_shifts]
+
+        V = np.sqrt(p.real / p_prev.real) * (V - (p + np.conj(p_prev)) * shifted_solve(p, V))
+        Z.append(V)
+
+        V_norm2 = np.linalg.norm(V) ** 2
+        Z_norm2 += V_norm2
+        # relative increment of the solution X = Z Z^T, which is the square of that of Z
+        converged = V_norm2 / Z_norm2 < tol
+
+        if kk % n_shifts == n_shifts - 1 or converged:
+            # column compression of the real factor
+            Z = np.hstack(Z)
+            Z_compressed = compress_columns(np.hstack((Z_compressed, Z.real, Z.imag)), tolSVD)
+            Z = []
+            if Print:
+                print('%.4d\t%.3e\t%.5d' % (kk, V_norm2 / Z_norm2, Z_compressed.shape[1]))
+
+        if converged:
+            break
+    else:
+        warnings.warn('Low-rank ADI did not converge in %d iterations' % max_iter)
+        if Z:
+            Z = np.hstack(Z)
+            Z_compressed = compress_columns(np.hstack((Z_compressed, Z.real, Z.imag)), tolSVD)
+
+    return Z_compressed
+
+
+def compress_columns(Z, tolSVD=1e-10):
+    r"""
+    Column compression of a low-rank factor :math:`\mathbf{Z}\in\mathbb{R}^{n\times k}`.
+
+    A factor :math:`\tilde{\mathbf{Z}}` with fewer columns such that
+    :math:`\tilde{\mathbf{Z}}\tilde{\mathbf{Z}}^\top \approx \mathbf{ZZ}^\top` is obtained from the economic QR
+    decomposition :math:`\mathbf{Z}=\mathbf{QR}` and the SVD of the small :math:`k\times k` factor
+    :math:`\mathbf{R}=\mathbf{U\Sigma W}^\top`, retaining the singular values above ``tolSVD`` relative to the largest
+
+    .. math:: \tilde{\mathbf{Z}} = \mathbf{QU}_r\mathbf{\Sigma}_r
+
+    Args:
+        Z (np.ndarray): Low-rank factor
+        tolSVD (float): Relative tolerance
+
+    Returns:
+        np.ndarray: Compressed factor
+    """
+    Q, R = scalg.qr(Z, mode='economic')
+    U, sv = scalg.svd(R, full_matrices=False)[:2]
+    r = np.sum(sv > tolSVD * sv[0])
+    return np.dot(Q, U[:, :r] * sv[:r])
+
+
+def penzl_shifts(A, DLTI=True, n_shifts=20, k_plus=40, k_minus=20):
+    r"""
+    ADI shifts from the heuristic of Penzl.
+
+    Approximations to the largest and smallest magnitude eigenvalues of (the continuous time equivalent of)
+    :math:`\mathbf{A}` are obtained as the Ritz values of ``k_plus`` Arnoldi steps with :math:`\mathbf{A}_c` and the
+    reciprocal of the Ritz values of ``k_minus`` Arnoldi steps with :math:`\mathbf{A}_c^{-1}`. Of the stable Ritz
+    values :math:`\mathcal{R}`, the shifts are chosen sequentially, starting from the one that minimises
+
+    .. math:: \max_{t\in\mathcal{R}} \left|\frac{t - p}{t + p}\right|
+
+    and adding the Ritz value for which the rational function
+    :math:`\prod_{j}|(t - p_j)/(t + p_j)|` of the current set of shifts is largest, until ``n_shifts`` are
+    selected. Complex shifts are added together with their conjugate.
+
+    For discrete time systems, :math:`\mathbf{A}_c` is the bilinear transformation of :math:`\mathbf{A}` (see
+    :func:`balreal_lradi`). Only sparse or dense factorisations of :math:`(\mathbf{A}\pm\mathbf{I})` (discrete
+    time) or :math:`\mathbf{A}` (continuous time) are required.
+
+    Args:
+        A (np.ndarray or libsp.csc_matrix): Plant matrix
+        DLTI (bool): Discrete time system
+        n_shifts (int): Number of shifts
+        k_plus (int): Arnoldi steps with :math:`\mathbf{A}_c`
+        k_minus (int): Arnoldi steps with :math:`\mathbf{A}_c^{-1}`
+
+    Returns:
+        np.ndarray: ADI shifts (complex)
+
+    References:
+        Penzl, T. A Cyclic Low-Rank Smith Method for Large Sparse Lyapunov Equations. SIAM Journal on Scientific
+        Computing, 1999.
+    """
+    n = A.shape[0]
+    k_plus = min(k_plus, n - 1)
+    k_minus = min(k_minus, n - 1)
+
+    if DLTI:
+        # A_c = (A + I)^{-1}(A - I), A_c^{-1} = (A - I)^{-1}(A + I)
+        lu_plus = krylovutils.lu_factor(-1., A)  # -(A + I)
+        lu_minus = krylovutils.lu_factor(1., A)  # (I - A)
+        A_c = lambda v: krylovutils.lu_solve(lu_plus, v - A.dot(v))
+        A_c_inv = lambda v: krylovutils.lu_solve(lu_minus, -v - A.dot(v))
+    else:
+        lu_a = krylovutils.lu_factor(0., A)  # -A
+        A_c = lambda v: A.dot(v)
+        A_c_inv = lambda v: -krylovutils.lu_solve(lu_a, v)
+
+    ritz = np.concatenate((arnoldi_ritz_values(A_c, n, k_plus),
+                           1. / arnoldi_ritz_values(A_c_inv, n, k_minus)))
+    ritz = ritz[ritz.real < 0]
+    if len(ritz) == 0:
+        raise ValueError('No stable Ritz values found to compute the ADI shifts. The system should be stable.')
+
+    def rational(t, shifts):
+        return np.abs(np.prod((t[:, None] - shifts[None, :]) / (t[:, None] + shifts[None, :]), axis=1))
+
+    # first shift: minimises the maximum of the rational function over the Ritz values
+    p0 = ritz[np.argmin([np.max(rational(ritz, np.array([p, np.conj(p)]))) for p in ritz])]
+    shifts = [p0] if p0.imag == 0 else [p0, np.conj(p0)]
+
+    while len(shifts) < n_shifts:
+        p = ritz[np.argmax(rational(ritz, np.array(shifts)))]
+        if np.any(np.isclose(p, shifts)):
+            break
+        shifts += [p] if p.imag == 0 else [p, np.conj(p)]
+
+    return np.array(shifts, dtype=complex)
+
+
+def arnoldi_ritz_values(operator, n, k):
+    """
+    Ritz values of ``k`` Arnoldi steps with a linear ``operator`` of size ``n``, starting from a fixed random vector.
+
+    Args:
+        operator (callable): Matrix-vector product
+        n (int): Size of the operator
+        k (int): Number of Arnoldi steps
+
+    Returns:
+        np.ndarray: Ritz values
+    """
+    V = np.zeros((n, k + 1))
+    H = np.zeros((k + 1, k))
+    v = np.random.RandomState(0).rand(n)
+    V[:, 0] = v / np.linalg.norm(v)
+
+    for jj in range(k):
+        w = np.real(operator(V[:, jj]))
+        for ii in range(jj + 1):
+            H[ii, jj] = np.dot(V[:, ii], w)
+            w -= H[ii, jj] * V[:, ii]
+        H[jj + 1, jj] = np.linalg.norm(w)
+        if H[jj + 1, jj] < 1e-12:
+            k = jj + 1
+            break
+        V[:, jj + 1] = w / H[jj + 1, jj]
+
+    return np.linalg.eigvals(H[:k, :k])
+
+
 ### utilities for balfreq
 
 def get_trapz_weights(k0, kend, Nk, knyq=False):
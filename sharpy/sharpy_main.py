@@ -15,6 +15,9 @@ def main(args=None, sharpy_input_dict=None):
     as an argument, or an equivalent dictionary given as ``sharpy_input_dict``.
     It reads the solvers specific settings and runs them in order
 
+    If called as ``sharpy campaign ...``, the arguments are passed on to :func:`sharpy.utils.campaign.main` to run a
+    campaign of cases generated from a template case.
+
     Args:
         args (str): ``.sharpy`` file with the problem information and settings
         sharpy_input_dict (dict): ``dict`` with the same contents as the
@@ -33,6 +36,7 @@ def main(args=None, sharpy_input_dict=None):
     from sharpy.utils.cout_utils import start_writer, finish_writer
     import logging
     import os
+    import sys
 
     # Loading solvers and postprocessors
     import sharpy.solvers
@@ -41,6 +45,12 @@ def main(args=None, sharpy_input_dict=None):
     import sharpy.controllers
     # ------------
 
+    if sharpy_input_dict is None:
+        cli_args = args if args is not None else sys.argv
+        if len(cli_args) > 1 and cli_args[1] == 'campaign':
+            import sharpy.utils.campaign as campaign
+            return campaign.main(cli_args)
+
     try:
         # output writer
         start_writer()
@@ -84,8 +94,13 @@ def main(args=None, sharpy_input_dict=None):
             data = PreSharpy(settings)
         else:
             try:
-                with open(args.restart, 'rb') as restart_file:
-                    data = pickle.load(restart_file)
+                if os.path.isdir(args.restart):
+                    # incremental checkpoint folder
+                    import sharpy.postproc.createsnapshot as createsnapshot
+                    data = createsnapshot.load_checkpoint(args.restart)
+                else:
+                    with open(args.restart, 'rb') as restart_file:
+                        data = pickle.load(restart_file)
             except FileNotFoundError:
                 raise FileNotFoundError('The file specified for the snapshot \
                     restart (-r) does not exist. Please check.')
@@ -94,10 +109,16 @@ def main(args=None, sharpy_input_dict=None):
             data.update_settings(settings)
 
         # Loop for the solvers specified in *.sharpy['SHARPy']['flow']
+        flow_solvers = []
         for solver_name in settings['SHARPy']['flow']:
             solver = solver_interface.initialise_solver(solver_name)
             solver.initialise(data)
             data = solver.run()
+            flow_solvers.append(solver)
+
+        # release the resources kept for the rest of the flow
+        for solver in flow_solvers:
+            solver.finalise()
 
         cpu_time = time.process_time() - t
         wall_time = time.perf_counter() - t0_wall
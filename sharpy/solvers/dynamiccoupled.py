@@ -13,6 +13,8 @@ import sharpy.utils.settings as settings
 import sharpy.utils.algebra as algebra
 import sharpy.structure.utils.xbeamlib as xbeam
 import sharpy.utils.exceptions as exc
+import sharpy.utils.datastructures as datastructures
+import sharpy.utils.asyncpostproc as asyncpostproc
 
 
 @solver
@@ -124,6 +126,28 @@ class DynamicCoupled(BaseSolver):
     settings_default['pseudosteps_ramp_unsteady_force'] = 0
     settings_description['pseudosteps_ramp_unsteady_force'] = 'Length of the ramp with which unsteady force contribution is introduced every time step during the FSI iteration process'
 
+    settings_types['postprocessors_async'] = 'bool'
+    settings_default['postprocessors_async'] = False
+    settings_description['postprocessors_async'] = 'Run the online ``postprocessors`` in a background thread, in time ' \
+                                                   'step and list order, while the solver advances. Ignored if any of ' \
+                                                   'them modifies the time step history, such as ``Cleanup``'
+
+    settings_types['postprocessors_queue_size'] = 'int'
+    settings_default['postprocessors_queue_size'] = 10
+    settings_description['postprocessors_queue_size'] = 'Maximum number of time steps pending in the background ' \
+                                                        'postprocessors before the solver waits for them'
+
+    settings_types['history_steps'] = 'int'
+    settings_default['history_steps'] = 0
+    settings_description['history_steps'] = 'Number of most recent time steps kept in memory. Older ones are moved ' \
+                                             'to disk and loaded when accessed, until the file is removed at the ' \
+                                             'end of the SHARPy flow. ``pickle`` snapshots refer to this file rather ' \
+                                             'than storing these steps. ``0`` keeps all the steps in memory'
+
+    settings_types['history_folder'] = 'str'
+    settings_default['history_folder'] = './output'
+    settings_description['history_folder'] = 'Folder for the time steps moved to disk when ``history_steps > 0``'
+
     settings_table = settings.SettingsTable()
     __doc__ += settings_table.generate(settings_types, settings_default, settings_description)
 
@@ -148,6 +172,7 @@ class DynamicCoupled(BaseSolver):
         self.residual_table = None
         self.postprocessors = dict()
         self.with_postprocessors = False
+        self.async_postprocessors = None
         self.controllers = None
 
         self.time_aero = 0.
@@ -205,6 +230,9 @@ class DynamicCoupled(BaseSolver):
             # timestep_info[0] and remove the rest
             self.cleanup_timestep_info()
 
+        if self.settings['history_steps'].value > 0:
+            self.bound_timestep_info()
+
         self.structural_solver = solver_interface.initialise_solver(
             self.settings['structural_solver'])
         self.structural_solver.initialise(
@@ -247,6 +275,31 @@ class DynamicCoupled(BaseSolver):
                                               'FoR_vel(x)', 'FoR_vel(z)'])
 
 
+    def bound_timestep_info(self):
+        """
+        Replaces the ``timestep_info`` lists by :class:`~sharpy.utils.datastructures.TimeStepHistory` objects that
+        keep ``history_steps`` steps in memory. At least the three steps needed by the aerodynamic solvers are kept.
+        """
+        n_resident = max(self.settings['history_steps'].value, 3)
+        folder = (self.settings['history_folder'] + '/' + self.data.settings['SHARPy']['case'] +
+                  '/timestep_history/')
+        if not isinstance(self.data.structure.timestep_info, datastructures.TimeStepHistory):
+            self.data.structure.timestep_info = datastructures.TimeStepHistory(self.data.structure.timestep_info,
+                                                                               n_resident,
+                                                                               folder + 'structure.pkl')
+        if not isinstance(self.data.aero.timestep_info, datastructures.TimeStepHistory):
+            self.data.aero.timestep_info = datastructures.TimeStepHistory(self.data.aero.timestep_info,
+                                                                          n_resident,
+                                                                          folder + 'aero.pkl')
+
+    def finalise(self):
+        """
+        Removes the files of the time steps moved to disk with ``history_steps``.
+        """
+        for timestep_info in [self.data.structure.timestep_info, self.data.aero.timestep_info]:
+            if isinstance(timestep_info, datastructures.TimeStepHistory):
+                timestep_info.close()
+
     def cleanup_timestep_info(self):
         if max(len(self.data.aero.timestep_info), len(self.data.structure.timestep_info)) > 1:
             # copy last info to first
@@ -318,6 +371,38 @@ class DynamicCoupled(BaseSolver):
         Run the time stepping procedure with controllers and postprocessors
         included.
         """
+        if self.with_postprocessors and self.settings['postprocessors_async']:
+            modifiers = asyncpostproc.history_modifiers(self.postprocessors)
+            if modifiers:
+                cout.cout_wrap('Postprocessors modifying the time step history cannot run in the background (%s). '
+                               'All the postprocessors are run after every time step' % ', '.join(modifiers), 3)
+            else:
+                self.async_postprocessors = asyncpostproc.AsyncPostprocessors(
+                    self.postprocessors,
+                    queue_size=self.settings['postprocessors_queue_size'].value)
+        try:
+            try:
+                self.time_loop()
+            except Exception:
+                # flush the pending steps without hiding the original error
+                self.close_async_postprocessors(raise_error=False)
+                raise
+            self.close_async_postprocessors()
+        finally:
+            # the output of the steps already computed is written even if the simulation fails
+            if self.with_postprocessors:
+                for postproc in self.postprocessors:
+                    self.postprocessors[postproc].finalise()
+
+        if self.print_info:
+            cout.cout_wrap('...Finished', 1)
+        return self.data
+
+    def time_loop(self):
+        """
+        Time stepping loop, in which the online postprocessors are run after every time step, or handed the finished
+        step if ``postprocessors_async`` is on.
+        """
         # dynamic simulations start at tstep == 1, 0 is reserved for the initial state
         for self.data.ts in range(
                 len(self.data.structure.timestep_info),
@@ -453,13 +538,31 @@ class DynamicCoupled(BaseSolver):
                                                 np.sum(structural_kstep.steady_applied_forces[:, 2])])
             self.structural_solver.extract_resultants()
             # run postprocessors
-            if self.with_postprocessors:
+            if self.async_postprocessors is not None:
+                self.async_postprocessors.submit(self.data)
+            elif self.with_postprocessors:
                 for postproc in self.postprocessors:
                     self.data = self.postprocessors[postproc].run(online=True)
 
-        if self.print_info:
-            cout.cout_wrap('...Finished', 1)
-        return self.data
+    def close_async_postprocessors(self, raise_error=True):
+        """
+        Waits for the background postprocessors to process the pending time steps and stops them.
+
+        Args:
+            raise_error (bool): Raise the first error found in the postprocessors
+        """
+        if self.async_postprocessors is None:
+            return
+        async_postprocessors = self.async_postprocessors
+        self.async_postprocessors = None
+        try:
+            async_postprocessors.close()
+        except Exception:
+            if raise_error:
+                raise
+        finally:
+            for postproc in self.postprocessors.values():
+                postproc.data = self.data
 
     def convergence(self, k, tstep, previous_tstep):
         r"""
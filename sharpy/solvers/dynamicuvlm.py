@@ -159,6 +159,10 @@ class DynamicUVLM(BaseSolver):
                 for postproc in self.postprocessors:
                     self.data = self.postprocessors[postproc].run(online=True)
 
+        if self.with_postprocessors:
+            for postproc in self.postprocessors:
+                self.postprocessors[postproc].finalise()
+
         if self.print_info:
             cout.cout_wrap('...Finished', 1)
 
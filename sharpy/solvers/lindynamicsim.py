@@ -186,6 +186,10 @@ class LinDynamicSim(BaseSolver):
                 for postproc in self.postprocessors:
                     self.data = self.postprocessors[postproc].run(online=True)
 
+        if self.with_postprocessors:
+            for postproc in self.postprocessors:
+                self.postprocessors[postproc].finalise()
+
         return self.data
 
     def read_files(self):
@@ -5,8 +5,10 @@ Linear State Space Assembler
 from sharpy.utils.solver_interface import solver, BaseSolver
 
 import sharpy.linear.utils.ss_interface as ss_interface
+import sharpy.linear.utils.linearisation_cache as linearisation_cache
 import sharpy.utils.settings as settings
 import sharpy.utils.h5utils as h5
+import sharpy.utils.cout_utils as cout
 import warnings
 
 
@@ -52,6 +54,15 @@ class LinearAssembler(BaseSolver):
     >>>        'Modal',
     >>>        'LinearAssembler']
 
+    Linearisation cache:
+
+    If a ``cache_folder`` is given, the assembled systems are stored on disk in HDF5 format, keyed by a hash of the
+    linear system settings, the structural and aerodynamic models and the reference time step (see
+    :mod:`sharpy.linear.utils.linearisation_cache`). A later run at the same operating point reloads them instead of
+    repeating the linearisation. Currently, the :class:`~sharpy.linear.assembler.linearaeroelastic.LinearAeroelastic`
+    system caches the UVLM projected onto the structural degrees of freedom (after any ROM), its coupling gains and
+    the ROM reduction bases.
+
     """
     solver_id = 'LinearAssembler'
     solver_classification = 'Linear'
@@ -72,6 +83,20 @@ class LinearAssembler(BaseSolver):
     settings_default['linearisation_tstep'] = -1
     settings_description['linearisation_tstep'] = 'Chosen linearisation time step number from available time steps'
 
+    settings_types['cache_folder'] = 'str'
+    settings_default['cache_folder'] = ''
+    settings_description['cache_folder'] = 'Folder of the on-disk cache of linearised systems. ' \
+                                           'The cache is not used if empty'
+
+    settings_types['cache_max_size'] = 'float'
+    settings_default['cache_max_size'] = 1000.
+    settings_description['cache_max_size'] = 'Maximum size of the linearisation cache in MB, beyond which the least ' \
+                                             'recently used entries are removed. Unlimited if ``0``'
+
+    settings_types['clear_cache'] = 'bool'
+    settings_default['clear_cache'] = False
+    settings_description['clear_cache'] = 'Remove all the entries of the linearisation cache before assembly'
+
     settings_table = settings.SettingsTable()
     __doc__ += settings_table.generate(settings_types, settings_default, settings_description)
 
@@ -103,6 +128,16 @@ class LinearAssembler(BaseSolver):
         # Create data.linear
         self.data.linear = Linear(tsaero0, tsstruct0)
 
+        # Linearisation cache
+        cache_folder = self.settings['cache_folder']
+        if cache_folder != '':
+            if self.settings['clear_cache'].value:
+                num_entries = linearisation_cache.clear(cache_folder)
+                cout.cout_wrap('Removed %d entries from linearisation cache %s' % (num_entries, cache_folder), 1)
+            key = linearisation_cache.operating_point_key(data, self.settings['linear_system_settings'])
+            self.data.linear.cache = linearisation_cache.LinearisationCache(cache_folder, key,
+                                                                            self.settings['cache_max_size'].value)
+
         # Load available systems
         import sharpy.linear.assembler
 
@@ -131,6 +166,8 @@ class Linear(object):
         tsaero0 (sharpy.utils.datastructures.AeroTimeStepInfo): Linearisation aerodynamic timestep
         tsstruct0 (sharpy.utils.datastructures.StructTimeStepInfo): Linearisation structural timestep
         timestep_info (list): Linear time steps
+        cache (sharpy.linear.utils.linearisation_cache.LinearisationCache): Cache of the linearisation at the
+          reference condition. ``None`` if not used.
     """
 
     def __init__(self, tsaero0, tsstruct0):
@@ -141,6 +178,7 @@ class Linear(object):
         self.timestep_info = []
         self.uvlm = None
         self.beam = None
+        self.cache = None
 
 
 if __name__ == "__main__":
@@ -159,6 +159,10 @@ class PrescribedUvlm(BaseSolver):
                 for postproc in self.postprocessors:
                     self.data = self.postprocessors[postproc].run(online=True)
 
+        if self.with_postprocessors:
+            for postproc in self.postprocessors:
+                self.postprocessors[postproc].finalise()
+
         return self.data
 
 #
@@ -0,0 +1,333 @@
+import os
+import ctypes as ct
+import h5py
+import numpy as np
+
+import sharpy.utils.cout_utils as cout
+import sharpy.utils.solver_interface as solver_interface
+from sharpy.utils.solver_interface import solver, BaseSolver
+import sharpy.utils.settings as settings
+import sharpy.utils.algebra as algebra
+import sharpy.utils.exceptions as exceptions
+
+
+@solver
+class StaticContinuation(BaseSolver):
+    """
+    The ``StaticContinuation`` solver computes a branch of static aeroelastic equilibria by marching a parameter
+    (angle of attack, free stream velocity or a nodal force such as a payload) through a sequence of values. It wraps
+    around a static coupled solver, in most cases :class:`~sharpy.solvers.staticcoupled.StaticCoupled`, which is run
+    once per point of the branch.
+
+    Rather than converging every point from the undeformed configuration, each point is started from the previous
+    equilibrium. If ``predictor`` is ``True``, the initial guess is further improved with a secant (tangent)
+    extrapolation of the structural state built from the last two converged points.
+
+    The parameter may be marched through the list given in ``parameter_values`` or, if ``adaptive_step`` is ``True``,
+    from the first to the last entry of that list with a step size that grows when the coupled solver converges
+    quickly and is halved when it fails to converge.
+
+    The equilibrium branch is written to ``<folder>/<case>/continuation/<case>.continuation.h5``, which contains the
+    parameter values, number of FSI iterations, total forces and moments, and the structural state of every point.
+
+    Notes:
+        The wrapped solver must not ramp the loads (``n_load_steps = 0`` in ``StaticCoupled``), otherwise every
+        point is restarted from the ramped state and the benefits of the continuation are lost. A nonzero
+        ``n_load_steps`` is overridden to ``0`` with a warning.
+
+    """
+    solver_id = 'StaticContinuation'
+    solver_classification = 'Coupled'
+
+    settings_types = dict()
+    settings_default = dict()
+    settings_description = dict()
+    settings_options = dict()
+
+    settings_types['print_info'] = 'bool'
+    settings_default['print_info'] = True
+    settings_description['print_info'] = 'Print info to screen'
+
+    settings_types['solver'] = 'str'
+    settings_default['solver'] = 'StaticCoupled'
+    settings_description['solver'] = 'Static coupled solver to run at every point of the branch'
+
+    settings_types['solver_settings'] = 'dict'
+    settings_default['solver_settings'] = dict()
+    settings_description['solver_settings'] = 'Solver settings dictionary'
+
+    settings_types['parameter'] = 'str'
+    settings_default['parameter'] = 'alpha'
+    settings_description['parameter'] = 'Continuation parameter. ``alpha``: angle of attack [rad], ``u_inf``: ' \
+                                        'free stream velocity, ``nodal_force``: magnitude of the force applied at ' \
+                                        '``force_nodes``'
+    settings_options['parameter'] = ['alpha', 'u_inf', 'nodal_force']
+
+    settings_types['parameter_values'] = 'list(float)'
+    settings_default['parameter_values'] = None
+    settings_description['parameter_values'] = 'Values of the parameter at which to compute the equilibrium. If ' \
+                                               '``adaptive_step`` is ``True``, only the first and last entries are ' \
+                                               'used as the limits of the branch'
+
+    settings_types['force_nodes'] = 'list(int)'
+    settings_default['force_nodes'] = [0]
+    settings_description['force_nodes'] = 'Nodes at which the ``nodal_force`` parameter is applied'
+
+    settings_types['force_direction'] = 'list(float)'
+    settings_default['force_direction'] = [0., 0., -1.]
+    settings_description['force_direction'] = 'Direction of the ``nodal_force`` parameter in the material (B) frame'
+
+    settings_types['predictor'] = 'bool'
+    settings_default['predictor'] = True
+    settings_description['predictor'] = 'Use a secant predictor of the structural state as initial guess'
+
+    settings_types['adaptive_step'] = 'bool'
+    settings_default['adaptive_step'] = False
+    settings_description['adaptive_step'] = 'Adapt the parameter step to the convergence of the coupled solver'
+
+    settings_types['initial_step'] = 'float'
+    settings_default['initial_step'] = 0.
+    settings_description['initial_step'] = 'Initial parameter step for ``adaptive_step``. If ``0``, a tenth of ' \
+                                           'the branch length is used'
+
+    settings_types['min_step'] = 'float'
+    settings_default['min_step'] = 0.
+    settings_description['min_step'] = 'Minimum parameter step for ``adaptive_step``. If ``0``, a thousandth of ' \
+                                       'the branch length is used'
+
+    settings_types['max_step'] = 'float'
+    settings_default['max_step'] = 0.
+    settings_description['max_step'] = 'Maximum parameter step for ``adaptive_step``. If ``0``, the step is not ' \
+                                       'bounded'
+
+    settings_types['step_growth'] = 'float'
+    settings_default['step_growth'] = 1.5
+    settings_description['step_growth'] = 'Factor by which the step is increased after a quickly converged point'
+
+    settings_types['target_iterations'] = 'int'
+    settings_default['target_iterations'] = 5
+    settings_description['target_iterations'] = 'The step is increased if a point converges in this number of FSI ' \
+                                                'iterations or fewer'
+
+    settings_types['folder'] = 'str'
+    settings_default['folder'] = './output/'
+    settings_description['folder'] = 'Output location for the equilibrium branch'
+
+    settings_table = settings.SettingsTable()
+    __doc__ += settings_table.generate(settings_types, settings_default, settings_description,
+                                       settings_options=settings_options)
+
+    def __init__(self):
+        self.data = None
+        self.settings = None
+        self.solver = None
+
+        self.folder = None
+        self.filename = None
+        self.table = None
+
+        self.force_orientation = None
+        self.branch = dict()
+
+    def initialise(self, data):
+        self.data = data
+        self.settings = data.settings[self.solver_id]
+        settings.to_custom_types(self.settings, self.settings_types, self.settings_default,
+                                 options=self.settings_options)
+
+        self.solver = solver_interface.initialise_solver(self.settings['solver'])
+        self.solver.initialise(self.data, self.settings['solver_settings'])
+        try:
+            n_load_steps = self.solver.settings['n_load_steps'].value
+        except (KeyError, TypeError, AttributeError):
+            n_load_steps = 0
+        if n_load_steps != 0:
+            cout.cout_wrap('StaticContinuation: n_load_steps = %u in %s overridden to 0' %
+                           (n_load_steps, self.settings['solver']), 3)
+            self.solver.settings['n_load_steps'] = ct.c_int(0)
+
+        if self.settings['parameter'] == 'nodal_force':
+            self.force_orientation = algebra.unit_vector(self.settings['force_direction'])
+
+        self.folder = self.settings['folder'] + '/' + self.data.settings['SHARPy']['case'] + '/continuation/'
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        self.filename = self.folder + self.data.settings['SHARPy']['case'] + '.continuation.h5'
+
+        self.branch = {'parameter': [],
+                       'n_iter': [],
+                       'converged': [],
+                       'total_forces': [],
+                       'pos': [],
+                       'psi': [],
+                       'quat': []}
+
+        if self.settings['print_info']:
+            self.table = cout.TablePrinter(7, 12, ['g', 'g', 'g', 'g', 'g', 'g', 'g'])
+            self.table.field_length[0] = 5
+            self.table.field_length[3] = 5
+            self.table.print_header(['point', 'parameter', 'step', 'n_iter', 'Fx', 'Fz', 'My'])
+
+    def run(self):
+        parameter_values = self.settings['parameter_values']
+        if self.settings['adaptive_step']:
+            self.adaptive_continuation(parameter_values[0], parameter_values[-1])
+        else:
+            for value in parameter_values:
+                self.solve_point(value)
+                if not self.branch['converged'][-1]:
+                    cout.cout_wrap('StaticContinuation: point %g did not converge' % value, 3)
+
+        self.save_branch()
+        return self.data
+
+    def adaptive_continuation(self, start, end):
+        """
+        Marches the parameter from ``start`` to ``end`` adapting the step size to the number of iterations
+        the coupled solver requires at each point.
+
+        Args:
+            start (float): first value of the parameter
+            end (float): last value of the parameter
+
+        Raises:
+            exceptions.NotConvergedSolver: if the step falls below ``min_step`` without convergence.
+        """
+        span = end - start
+        direction = np.sign(span)
+        step = self.settings['initial_step'].value
+        if step == 0.:
+            step = np.abs(span) / 10
+        min_step = self.settings['min_step'].value
+        if min_step == 0.:
+            min_step = np.abs(span) / 1000
+        max_step = self.settings['max_step'].value
+        if max_step == 0.:
+            max_step = np.abs(span)
+
+        self.solve_point(start)
+        if not self.branch['converged'][-1]:
+            self.save_branch()
+            raise exceptions.NotConvergedSolver('StaticContinuation did not converge at the start of the branch')
+
+        current = start
+        while direction * (end - current) > 0:
+            step = min(step, direction * (end - current))
+            restart_struct = self.data.structure.timestep_info[self.data.ts].copy()
+            restart_aero = self.data.aero.timestep_info[self.data.ts].copy()
+
+            self.solve_point(current + direction * step, step=step)
+            if self.branch['converged'][-1]:
+                current += direction * step
+                if self.branch['n_iter'][-1] <= self.settings['target_iterations'].value:
+                    step = min(step * self.settings['step_growth'].value, max_step)
+                continue
+
+            # reject the point and restart from the previous equilibrium with a smaller step
+            for k in self.branch.keys():
+                self.branch[k].pop()
+            self.data.structure.timestep_info = [restart_struct]
+            self.data.aero.timestep_info = [restart_aero]
+            self.data.ts = 0
+            self.set_parameter(current)
+            step *= 0.5
+            if step < min_step:
+                self.save_branch()
+                raise exceptions.NotConvergedSolver('StaticContinuation step fell below min_step at parameter '
+                                                    '%g' % current)
+
+    def solve_point(self, value, step=None):
+        """
+        Computes the equilibrium for the given parameter value starting from the current state, which is
+        extrapolated along the branch if ``predictor`` is ``True``.
+
+        Args:
+            value (float): value of the continuation parameter
+            step (float (optional)): parameter step used to reach this point. Only used for printing.
+        """
+        self.set_parameter(value)
+        if self.settings['predictor']:
+            self.predict(value)
+
+        self.solver.run()
+
+        tstep = self.data.structure.timestep_info[self.data.ts]
+        forces, moments = self.solver.extract_resultants(tstep)
+        self.branch['parameter'].append(value)
+        self.branch['n_iter'].append(self.solver.n_iter)
+        self.branch['converged'].append(self.solver.converged)
+        self.branch['total_forces'].append(np.concatenate((forces, moments)))
+        self.branch['pos'].append(tstep.pos.copy())
+        self.branch['psi'].append(tstep.psi.copy())
+        self.branch['quat'].append(tstep.quat.copy())
+
+        if self.settings['print_info']:
+            if step is None:
+                if len(self.branch['parameter']) > 1:
+                    step = value - self.branch['parameter'][-2]
+                else:
+                    step = 0.
+            self.table.print_line([len(self.branch['parameter']) - 1,
+                                   value,
+                                   step,
+                                   self.solver.n_iter,
+                                   forces[0],
+                                   forces[2],
+                                   moments[1]])
+
+    def predict(self, value):
+        """
+        Secant predictor of the structural state at ``value`` from the last two converged points of the branch.
+        The aerodynamic grid is regenerated from the predicted structural state.
+
+        Args:
+            value (float): value of the continuation parameter to predict
+        """
+        converged = [i for i, c in enumerate(self.branch['converged']) if c]
+        if len(converged) < 2:
+            return
+        i_prev, i_last = converged[-2:]
+        dp = self.branch['parameter'][i_last] - self.branch['parameter'][i_prev]
+        if dp == 0.:
+            return
+        ratio = (value - self.branch['parameter'][i_last]) / dp
+
+        tstep = self.data.structure.timestep_info[self.data.ts]
+        tstep.pos[:] = (self.branch['pos'][i_last] +
+                        ratio * (self.branch['pos'][i_last] - self.branch['pos'][i_prev]))
+        tstep.psi[:] = (self.branch['psi'][i_last] +
+                        ratio * (self.branch['psi'][i_last] - self.branch['psi'][i_prev]))
+        self.solver.aero_solver.update_step()
+
+    def set_parameter(self, value):
+        """
+        Modifies the problem data according to the value of the continuation parameter.
+
+        Args:
+            value (float): value of the continuation parameter
+        """
+        tstep = self.data.structure.timestep_info[self.data.ts]
+        if self.settings['parameter'] == 'alpha':
+            tstep.quat[:] = algebra.euler2quat(np.array([0.0, value, 0.0]))
+        elif self.settings['parameter'] == 'u_inf':
+            aero_solver = self.solver.aero_solver
+            aero_solver.settings['velocity_field_input']['u_inf'] = value
+            aero_solver.velocity_generator.initialise(aero_solver.settings['velocity_field_input'])
+        elif self.settings['parameter'] == 'nodal_force':
+            # the loads in the coupled iteration are taken from ``ini_info``
+            for node in self.settings['force_nodes']:
+                self.data.structure.ini_info.steady_applied_forces[node, 0:3] = self.force_orientation * value
+                tstep.steady_applied_forces[node, 0:3] = self.force_orientation * value
+
+        self.solver.aero_solver.update_step()
+
+    def save_branch(self):
+        """
+        Writes the equilibrium branch to an HDF5 file
+        """
+        if self.settings['print_info']:
+            cout.cout_wrap('Writing equilibrium branch to %s' % self.filename, 1)
+        with h5py.File(self.filename, 'w') as hdfile:
+            hdfile.attrs['parameter_name'] = self.settings['parameter']
+            for k, v in self.branch.items():
+                hdfile.create_dataset(k, data=np.array(v))
@@ -73,6 +73,9 @@ class StaticCoupled(BaseSolver):
 
         self.residual_table = None
 
+        self.converged = False
+        self.n_iter = 0
+
     def initialise(self, data, input_dict=None):
         self.data = data
         if input_dict is None:
@@ -129,7 +132,9 @@ class StaticCoupled(BaseSolver):
             if i_step > 0:
                 self.increase_ts()
 
+            self.converged = False
             for i_iter in range(self.settings['max_iter'].value):
+                self.n_iter = i_iter + 1
                 # run aero
                 self.data = self.aero_solver.run()
 
@@ -174,6 +179,7 @@ class StaticCoupled(BaseSolver):
                     # create q and dqdt vectors
                     self.structural_solver.update(self.data.structure.timestep_info[self.data.ts])
                     self.cleanup_timestep_info()
+                    self.converged = True
                     break
 
         return self.data
@@ -233,10 +239,15 @@ class StaticCoupled(BaseSolver):
 
         return return_value
 
-    def change_trim(self, alpha, thrust, thrust_nodes, tail_deflection, tail_cs_index):
+    def change_trim(self, alpha, thrust, thrust_nodes, tail_deflection, tail_cs_index, warm_start=False):
         # self.cleanup_timestep_info()
+        if warm_start:
+            # start from the last converged structural state instead of the undeformed one
+            struct_copy = self.data.structure.timestep_info[-1].copy()
+        else:
+            struct_copy = self.data.structure.ini_info.copy()
         self.data.structure.timestep_info = []
-        self.data.structure.timestep_info.append(self.data.structure.ini_info.copy())
+        self.data.structure.timestep_info.append(struct_copy)
         aero_copy = self.data.aero.timestep_info[-1]
         self.data.aero.timestep_info = []
         self.data.aero.timestep_info.append(aero_copy)
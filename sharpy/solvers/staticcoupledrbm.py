@@ -251,10 +251,15 @@ class StaticCoupledRBM(BaseSolver):
         #
         # return return_value
 
-    def change_trim(self, alpha, thrust, thrust_nodes, tail_deflection, tail_cs_index):
+    def change_trim(self, alpha, thrust, thrust_nodes, tail_deflection, tail_cs_index, warm_start=False):
         # self.cleanup_timestep_info()
+        if warm_start:
+            # start from the last converged structural state instead of the undeformed one
+            struct_copy = self.data.structure.timestep_info[-1].copy()
+        else:
+            struct_copy = self.data.structure.ini_info.copy()
         self.data.structure.timestep_info = []
-        self.data.structure.timestep_info.append(self.data.structure.ini_info.copy())
+        self.data.structure.timestep_info.append(struct_copy)
         aero_copy = self.data.aero.timestep_info[-1]
         self.data.aero.timestep_info = []
         self.data.aero.timestep_info.append(aero_copy)
@@ -1,4 +1,6 @@
 import numpy as np
+import multiprocessing as mpr
+import sys
 
 import sharpy.utils.cout_utils as cout
 import sharpy.utils.solver_interface as solver_interface
@@ -6,6 +8,10 @@ from sharpy.utils.solver_interface import solver, BaseSolver
 import sharpy.utils.settings as settings
 import os
 
+# trim solver and base structural state shared with the worker processes of the finite difference evaluations
+_trim_solver = None
+_trim_base_state = None
+
 
 @solver
 class StaticTrim(BaseSolver):
@@ -18,6 +24,24 @@ class StaticTrim(BaseSolver):
     equilibrium. The output angles are shown in degrees.
 
     The results from the trimming iteration can be saved to a text file by using the `save_info` option.
+
+    The finite difference perturbations required to estimate the gradients can be evaluated concurrently in
+    ``num_cores`` worker processes, each of them a copy of the current solver and data started from the base
+    solution. The gradients are updated throughout the iteration according to ``jacobian_update``:
+
+        * ``diagonal``: only the diagonal terms (lift/angle of attack, moment/elevator and thrust/drag) are
+          estimated and updated with secants.
+
+        * ``broyden``: the full Jacobian is estimated by finite differences in the first iteration and then
+          updated with Broyden's rank-one method, requiring no further perturbed evaluations.
+
+        * ``finite_differences``: the full Jacobian is estimated by finite differences at every iteration.
+
+    With ``broyden`` and ``finite_differences``, the ``relaxation_factor`` blends the Newton update with the
+    previous inputs, i.e. the step is scaled by ``1 - relaxation_factor``.
+
+    Notes:
+        Parallel evaluations require the ``fork`` process start method, hence they are not available on Windows.
     """
     solver_id = 'StaticTrim'
     solver_classification = 'Flight Dynamics'
@@ -25,6 +49,7 @@ class StaticTrim(BaseSolver):
     settings_types = dict()
     settings_default = dict()
     settings_description = dict()
+    settings_options = dict()
 
     settings_types['print_info'] = 'bool'
     settings_default['print_info'] = True
@@ -84,7 +109,8 @@ class StaticTrim(BaseSolver):
 
     settings_types['relaxation_factor'] = 'float'
     settings_default['relaxation_factor'] = 0.2
-    settings_description['relaxation_factor'] = 'Relaxation factor'
+    settings_description['relaxation_factor'] = 'Relaxation factor. Fraction of the previous inputs retained in ' \
+                                                'the update'
 
     settings_types['save_info'] = 'bool'
     settings_default['save_info'] = False
@@ -94,8 +120,24 @@ class StaticTrim(BaseSolver):
     settings_default['folder'] = './output/'
     settings_description['folder'] = 'Output location for trim results'
 
+    settings_types['num_cores'] = 'int'
+    settings_default['num_cores'] = 1
+    settings_description['num_cores'] = 'Number of worker processes for the finite difference evaluations'
+
+    settings_types['warm_start'] = 'bool'
+    settings_default['warm_start'] = True
+    settings_description['warm_start'] = 'Start each evaluation from the last converged solution instead of the ' \
+                                         'undeformed structure. Perturbed evaluations start from the base solution. ' \
+                                         'Disable to start every evaluation from the undeformed structure'
+
+    settings_types['jacobian_update'] = 'str'
+    settings_default['jacobian_update'] = 'diagonal'
+    settings_description['jacobian_update'] = 'Method to update the gradients between iterations'
+    settings_options['jacobian_update'] = ['diagonal', 'broyden', 'finite_differences']
+
     settings_table = settings.SettingsTable()
-    __doc__ += settings_table.generate(settings_types, settings_default, settings_description)
+    __doc__ += settings_table.generate(settings_types, settings_default, settings_description,
+                                       settings_options=settings_options)
 
     def __init__(self):
         self.data = None
@@ -114,13 +156,15 @@ class StaticTrim(BaseSolver):
         self.output_history = []
         self.gradient_history = []
         self.trimmed_values = np.zeros((3,))
+        self.jacobian = None
 
         self.table = None
 
     def initialise(self, data):
         self.data = data
         self.settings = data.settings[self.solver_id]
-        settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
+        settings.to_custom_types(self.settings, self.settings_types, self.settings_default,
+                                 options=self.settings_options)
 
         self.solver = solver_interface.initialise_solver(self.settings['solver'])
         self.solver.initialise(self.data, self.settings['solver_settings'])
@@ -214,31 +258,15 @@ class StaticTrim(BaseSolver):
                     return
 
                 # compute gradients
-                # dfz/dalpha
-                (l, m, d) = self.evaluate(self.input_history[self.i_iter][0] + self.settings['initial_angle_eps'].value,
-                                          self.input_history[self.i_iter][1],
-                                          self.input_history[self.i_iter][2])
-
-                self.gradient_history[self.i_iter][0] = ((l - self.output_history[self.i_iter][0]) /
-                                                         self.settings['initial_angle_eps'].value)
-
-                # dm/dgamma
-                (l, m, d) = self.evaluate(self.input_history[self.i_iter][0],
-                                          self.input_history[self.i_iter][1] + self.settings['initial_angle_eps'].value,
-                                          self.input_history[self.i_iter][2])
-
-                self.gradient_history[self.i_iter][1] = ((m - self.output_history[self.i_iter][1]) /
-                                                         self.settings['initial_angle_eps'].value)
-
-                # dfx/dthrust
-                (l, m, d) = self.evaluate(self.input_history[self.i_iter][0],
-                                          self.input_history[self.i_iter][1],
-                                          self.input_history[self.i_iter][2] +
-                                          self.settings['initial_thrust_eps'].value)
+                self.evaluate_gradients(self.input_history[self.i_iter], self.output_history[self.i_iter])
+                for i_dim in range(self.n_input):
+                    self.gradient_history[self.i_iter][i_dim] = self.jacobian[i_dim, i_dim]
 
-                self.gradient_history[self.i_iter][2] = ((d - self.output_history[self.i_iter][2]) /
-                                                         self.settings['initial_thrust_eps'].value)
+                continue
 
+            if self.settings['jacobian_update'] != 'diagonal':
+                if self.jacobian_iteration():
+                    return
                 continue
 
             # if not all(np.isfinite(self.gradient_history[self.i_iter - 1]))
@@ -316,6 +344,133 @@ class StaticTrim(BaseSolver):
                 self.table.close_file()
                 return
 
+    def jacobian_iteration(self):
+        """
+        Newton iteration on the full Jacobian of ``(fz, m, fx)`` with respect to ``(alpha, gamma, thrust)``.
+
+        The Jacobian is updated after the evaluation either with Broyden's rank-one update or by finite
+        differences about the new point, according to the ``jacobian_update`` setting.
+
+        Returns:
+            bool: ``True`` if the trim has converged.
+        """
+        x_prev = np.array(self.input_history[self.i_iter - 1], dtype=float)
+        f_prev = np.array(self.output_history[self.i_iter - 1], dtype=float)
+
+        x_new = x_prev - (1. - self.settings['relaxation_factor'].value)*np.linalg.solve(self.jacobian, f_prev)
+        self.input_history[self.i_iter] = list(x_new)
+        self.output_history[self.i_iter] = list(self.evaluate(*x_new))
+        f_new = np.array(self.output_history[self.i_iter], dtype=float)
+
+        if all(self.convergence(*f_new)):
+            self.trimmed_values = self.input_history[self.i_iter]
+            self.table.close_file()
+            return True
+
+        if self.settings['jacobian_update'] == 'broyden':
+            dx = x_new - x_prev
+            df = f_new - f_prev
+            self.jacobian += np.outer(df - self.jacobian.dot(dx), dx) / dx.dot(dx)
+        else:
+            self.evaluate_gradients(self.input_history[self.i_iter], self.output_history[self.i_iter])
+
+        self.gradient_history[self.i_iter] = list(np.diag(self.jacobian))
+        return False
+
+    def evaluate_gradients(self, x, f):
+        """
+        Finite difference estimation of the Jacobian of the outputs ``(fz, m, fx)`` with respect to the inputs
+        ``(alpha, gamma, thrust)`` about the base point ``x``, at which the outputs are ``f``.
+
+        The three perturbed evaluations are run in parallel if ``num_cores > 1``. The result is stored in
+        ``self.jacobian``.
+
+        Args:
+            x (list): base inputs
+            f (list): outputs at the base inputs
+        """
+        eps = np.array([self.settings['initial_angle_eps'].value,
+                        self.settings['initial_angle_eps'].value,
+                        self.settings['initial_thrust_eps'].value])
+
+        perturbed_inputs = []
+        for i_dim in range(self.n_input):
+            x_pert = np.array(x, dtype=float)
+            x_pert[i_dim] += eps[i_dim]
+            perturbed_inputs.append(tuple(x_pert))
+
+        perturbed_outputs = None
+        if self.settings['num_cores'].value > 1:
+            perturbed_outputs = self.parallel_evaluate(perturbed_inputs)
+
+        if perturbed_outputs is None:
+            base_state = self.data.structure.timestep_info[-1].copy()
+            perturbed_outputs = []
+            for inputs in perturbed_inputs:
+                if self.settings['warm_start']:
+                    self.data.structure.timestep_info[-1] = base_state.copy()
+                perturbed_outputs.append(self.evaluate(*inputs))
+            if self.settings['warm_start']:
+                self.data.structure.timestep_info[-1] = base_state
+
+        self.jacobian = np.zeros((self.n_input, self.n_input))
+        for i_dim in range(self.n_input):
+            self.jacobian[:, i_dim] = (np.array(perturbed_outputs[i_dim]) - np.array(f)) / eps[i_dim]
+
+    def parallel_evaluate(self, inputs_list):
+        """
+        Evaluates the list of inputs in a pool of forked worker processes. Each worker holds a copy of the
+        current solver and, since a worker may evaluate several inputs in sequence, its structural state is reset
+        to the current (base) solution before every evaluation.
+
+        Args:
+            inputs_list (list(tuple)): list of ``(alpha, gamma, thrust)`` to evaluate
+
+        Returns:
+            list: outputs ``(fz, m, fx)`` for each of the inputs or ``None`` if the ``fork`` start method is not
+            available.
+        """
+        global _trim_solver, _trim_base_state
+        try:
+            context = mpr.get_context('fork')
+        except ValueError:
+            cout.cout_wrap('StaticTrim: parallel evaluations are not supported in this platform. '
+                           'Running in serial', 3)
+            return None
+
+        # avoid duplicating buffered output in the workers
+        sys.stdout.flush()
+        if self.table.file is not None:
+            self.table.file.flush()
+
+        _trim_solver = self
+        _trim_base_state = self.data.structure.timestep_info[-1].copy()
+        n_processes = min(self.settings['num_cores'].value, len(inputs_list))
+        with context.Pool(n_processes) as pool:
+            results = pool.map(_evaluate_in_worker, inputs_list)
+        _trim_solver = None
+        _trim_base_state = None
+
+        outputs = []
+        for inputs, (output, forces, moments) in zip(inputs_list, results):
+            self.print_evaluation(inputs, forces, moments)
+            outputs.append(output)
+
+        return outputs
+
+    def print_evaluation(self, inputs, forces, moments):
+        alpha, deflection_gamma, thrust = inputs
+        self.table.print_line([self.i_iter,
+                               alpha*180/np.pi,
+                               (deflection_gamma - alpha)*180/np.pi,
+                               thrust,
+                               forces[0],
+                               forces[1],
+                               forces[2],
+                               moments[0],
+                               moments[1],
+                               moments[2]])
+
     def evaluate(self, alpha, deflection_gamma, thrust):
         if not np.isfinite(alpha):
             import pdb; pdb.set_trace()
@@ -334,7 +489,8 @@ class StaticTrim(BaseSolver):
                                 thrust,
                                 self.settings['thrust_nodes'],
                                 deflection_gamma - alpha,
-                                self.settings['tail_cs_index'].value)
+                                self.settings['tail_cs_index'].value,
+                                warm_start=self.settings['warm_start'].value)
         # run the solver
         self.solver.run()
         # extract resultants
@@ -348,15 +504,20 @@ class StaticTrim(BaseSolver):
         # cout.cout_wrap('fy = ' + str(forces[1]) + ' my = ' + str(moments[1]), 2)
         # cout.cout_wrap('fz = ' + str(forces[2]) + ' mz = ' + str(moments[2]), 2)
 
-        self.table.print_line([self.i_iter,
-                               alpha*180/np.pi,
-                               (deflection_gamma - alpha)*180/np.pi,
-                               thrust,
-                               forces[0],
-                               forces[1],
-                               forces[2],
-                               moments[0],
-                               moments[1],
-                               moments[2]])
+        if self.table is not None:
+            self.print_evaluation((alpha, deflection_gamma, thrust), forces, moments)
 
         return forcez, moment, forcex
+
+
+def _evaluate_in_worker(inputs):
+    # the worker's copy of the trim solver must not write to the shared output
+    _trim_solver.table = None
+    cout.cout_wrap.cout_quiet()
+    cout.cout_wrap.print_file = False
+    if _trim_solver.settings['warm_start']:
+        # start from the base solution rather than the previous perturbation evaluated by this worker
+        _trim_solver.data.structure.timestep_info[-1] = _trim_base_state.copy()
+    output = _trim_solver.evaluate(*inputs)
+    forces, moments = _trim_solver.solver.extract_resultants()
+    return output, forces, moments
@@ -121,6 +121,11 @@ class StepLinearUVLM(BaseSolver):
         self.lin_uvlm_system = None
         self.velocity_generator = None
 
+        self.vertex_slices = None
+        self.panel_slices = None
+        self.wake_slices = None
+        self.vertex_component_index = None
+
     def initialise(self, data, custom_settings=None):
         r"""
         Initialises the Linear UVLM aerodynamic solver and the chosen velocity generator.
@@ -153,6 +158,8 @@ class StepLinearUVLM(BaseSolver):
         settings.to_custom_types(self.settings['ScalingDict'], self.scaling_settings_types,
                                  self.scaling_settings_default, no_ctype=True)
 
+        self.build_index_maps(self.data.aero.timestep_info[-1])
+
         # Check whether linear UVLM has been initialised
         try:
             self.data.aero.linear
@@ -427,13 +434,16 @@ class StepLinearUVLM(BaseSolver):
 
         """
 
-        ### project forces from uvlm FoR to FoR G
-        if self.settings['track_body']:
-            Cg_uvlm = np.dot( self.Cga, self.Cga0.T )
+        gamma_vec, gamma_star_vec, gamma_dot_vec = self.data.aero.linear['System'].unpack_state(x_n)
 
+        ### project forces from uvlm FoR to FoR G
+        # - forces are in UVLM linearisation frame. Hence, these  are projected
+        # into FoR (using rotation matrix Cag0 time 0) A and back to FoR G
         f_aero = y_n
-
-        gamma_vec, gamma_star_vec, gamma_dot_vec = self.data.aero.linear['System'].unpack_state(x_n)
+        if self.settings['track_body']:
+            Cg_uvlm = np.dot(self.Cga, self.Cga0.T)
+            f_aero = y_n.copy()
+            f_aero[self.vertex_component_index] = np.dot(Cg_uvlm, y_n[self.vertex_component_index])
 
         # Reshape output into forces[i_surface] where forces[i_surface] is a (6,M+1,N+1) matrix and circulation terms
         # where gamma is a [i_surf](M+1, N+1) matrix
@@ -442,48 +452,18 @@ class StepLinearUVLM(BaseSolver):
         gamma_star = []
         gamma_dot = []
 
-        worked_points = 0
-        worked_panels = 0
-        worked_wake_panels = 0
-
         for i_surf in range(aero_tstep.n_surf):
-            # Tuple with dimensions of the aerogrid zeta, which is the same shape for forces
-            dimensions = aero_tstep.zeta[i_surf].shape
-            dimensions_gamma = self.data.aero.aero_dimensions[i_surf]
-            dimensions_wake = self.data.aero.aero_dimensions_star[i_surf]
-
-            # Number of entries in zeta
-            points_in_surface = aero_tstep.zeta[i_surf].size
-            panels_in_surface = aero_tstep.gamma[i_surf].size
-            panels_in_wake = aero_tstep.gamma_star[i_surf].size
-
-            # Append reshaped forces to each entry in list (one for each surface)
-            forces.append(f_aero[worked_points:worked_points+points_in_surface].reshape(dimensions, order='C'))
-
-            ### project forces.
-            # - forces are in UVLM linearisation frame. Hence, these  are projected
-            # into FoR (using rotation matrix Cag0 time 0) A and back to FoR G
-            if self.settings['track_body']:
-                for mm in range(dimensions[1]):
-                    for nn in range(dimensions[2]):
-                        forces[i_surf][:,mm,nn] = np.dot(Cg_uvlm, forces[i_surf][:,mm,nn])
+            vertex_slice, vertex_shape = self.vertex_slices[i_surf]
+            panel_slice, panel_shape = self.panel_slices[i_surf]
+            wake_slice, wake_shape = self.wake_slices[i_surf]
 
             # Add the null bottom 3 rows to to the forces entry
-            forces[i_surf] = np.concatenate((forces[i_surf], np.zeros(dimensions)))
+            forces.append(np.zeros((6,) + vertex_shape[1:]))
+            forces[i_surf][0:3] = f_aero[vertex_slice].reshape(vertex_shape)
 
-            # Reshape bound circulation terms
-            gamma.append(gamma_vec[worked_panels:worked_panels+panels_in_surface].reshape(
-                dimensions_gamma, order='C'))
-            gamma_dot.append(gamma_dot_vec[worked_panels:worked_panels+panels_in_surface].reshape(
-                dimensions_gamma, order='C'))
-
-            # Reshape wake circulation terms
-            gamma_star.append(gamma_star_vec[worked_wake_panels:worked_wake_panels+panels_in_wake].reshape(
-                dimensions_wake, order='C'))
-
-            worked_points += points_in_surface
-            worked_panels += panels_in_surface
-            worked_wake_panels += panels_in_wake
+            gamma.append(gamma_vec[panel_slice].reshape(panel_shape))
+            gamma_dot.append(gamma_dot_vec[panel_slice].reshape(panel_shape))
+            gamma_star.append(gamma_star_vec[wake_slice].reshape(wake_shape))
 
         return forces, gamma, gamma_dot, gamma_star
 
@@ -506,53 +486,28 @@ class StepLinearUVLM(BaseSolver):
 
         aero_tstep = self.data.aero.timestep_info[-1]
 
+        n_vertex_dof = self.vertex_component_index.size
+        u = np.empty((3*n_vertex_dof,))
+        zeta = u[:n_vertex_dof]
+        zeta_dot = u[n_vertex_dof:2*n_vertex_dof]
+        u_ext = u[2*n_vertex_dof:]
+        for i_surf in range(aero_tstep.n_surf):
+            vertex_slice = self.vertex_slices[i_surf][0]
+            zeta[vertex_slice] = aero_tstep.zeta[i_surf].reshape(-1, order='C')
+            zeta_dot[vertex_slice] = aero_tstep.zeta_dot[i_surf].reshape(-1, order='C')
+            u_ext[vertex_slice] = aero_tstep.u_ext[i_surf].reshape(-1, order='C')
+
         ### re-compute projection in G frame as if A was not rotating
         # - u_n is in FoR G. Hence, this is project in FoR A and back to FoR G
         # using rotation matrix aat time 0 (as if FoR A was not rotating).
         if self.settings['track_body']:
-
-            Cuvlm_g = np.dot( self.Cga0, self.Cga.T )
-            zeta_uvlm, zeta_dot_uvlm, u_ext_uvlm = [], [], []
-
-            for i_surf in range(aero_tstep.n_surf):
-
-                Mp1, Np1 = aero_tstep.dimensions[i_surf] + 1
-
-                zeta_uvlm.append( np.empty((3,Mp1,Np1)) )
-                zeta_dot_uvlm.append( np.empty((3,Mp1,Np1)) )
-                u_ext_uvlm.append( np.empty((3,Mp1,Np1)) )
-
-                for mm in range(Mp1):
-                    for nn in range(Np1):
-                        zeta_uvlm[i_surf][:,mm,nn] = \
-                            np.dot(Cuvlm_g, aero_tstep.zeta[i_surf][:,mm,nn])
-                        zeta_dot_uvlm[i_surf][:,mm,nn] = \
-                            np.dot(Cuvlm_g, aero_tstep.zeta_dot[i_surf][:,mm,nn])
-                        u_ext_uvlm[i_surf][:,mm,nn] = \
-                            np.dot(Cuvlm_g, aero_tstep.u_ext[i_surf][:,mm,nn])
-
-            zeta = np.concatenate([zeta_uvlm[i_surf].reshape(-1, order='C')
-                                   for i_surf in range(aero_tstep.n_surf)])
-            zeta_dot = np.concatenate([zeta_dot_uvlm[i_surf].reshape(-1, order='C')
-                                       for i_surf in range(aero_tstep.n_surf)])
-            u_ext = np.concatenate([u_ext_uvlm[i_surf].reshape(-1, order='C')
-                                    for i_surf in range(aero_tstep.n_surf)])
-
-        else:
-
-            zeta = np.concatenate([aero_tstep.zeta[i_surf].reshape(-1, order='C')
-                                   for i_surf in range(aero_tstep.n_surf)])
-            zeta_dot = np.concatenate([aero_tstep.zeta_dot[i_surf].reshape(-1, order='C')
-                                       for i_surf in range(aero_tstep.n_surf)])
-            u_ext = np.concatenate([aero_tstep.u_ext[i_surf].reshape(-1, order='C')
-                                   for i_surf in range(aero_tstep.n_surf)])
-
-        u = np.concatenate((zeta, zeta_dot, u_ext))
+            Cuvlm_g = np.dot(self.Cga0, self.Cga.T)
+            for block in [zeta, zeta_dot, u_ext]:
+                block[self.vertex_component_index] = np.dot(Cuvlm_g, block[self.vertex_component_index])
 
         return u
 
-    @staticmethod
-    def pack_state_vector(aero_tstep, aero_tstep_m1, dt, integr_order):
+    def pack_state_vector(self, aero_tstep, aero_tstep_m1, dt, integr_order):
         r"""
         Transform SHARPy Aerotimestep format into column vector containing the state information.
 
@@ -589,24 +544,71 @@ class StepLinearUVLM(BaseSolver):
 
         """
 
-        # Extract current state...
-        gamma = np.concatenate([aero_tstep.gamma[ss].reshape(-1, order='C')
-                                for ss in range(aero_tstep.n_surf)])
-        gamma_star = np.concatenate([aero_tstep.gamma_star[ss].reshape(-1, order='C')
-                                    for ss in range(aero_tstep.n_surf)])
-        gamma_dot = np.concatenate([aero_tstep.gamma_dot[ss].reshape(-1, order='C')
-                                    for ss in range(aero_tstep.n_surf)])
-
+        n_gamma = self.panel_slices[-1][0].stop
+        n_gamma_star = self.wake_slices[-1][0].stop
         if integr_order == 1:
-            gamma_m1 = []
-
+            x = np.empty((2*n_gamma + n_gamma_star,))
         else:
+            x = np.empty((3*n_gamma + n_gamma_star,))
+
+        # Extract current state...
+        gamma = x[:n_gamma]
+        gamma_star = x[n_gamma:n_gamma + n_gamma_star]
+        gamma_dot = x[n_gamma + n_gamma_star:2*n_gamma + n_gamma_star]
+        for i_surf in range(aero_tstep.n_surf):
+            panel_slice = self.panel_slices[i_surf][0]
+            gamma[panel_slice] = aero_tstep.gamma[i_surf].reshape(-1, order='C')
+            gamma_star[self.wake_slices[i_surf][0]] = aero_tstep.gamma_star[i_surf].reshape(-1, order='C')
+            gamma_dot[panel_slice] = dt*aero_tstep.gamma_dot[i_surf].reshape(-1, order='C')
+
+        if integr_order != 1:
+            gamma_m1 = x[2*n_gamma + n_gamma_star:]
             if aero_tstep_m1:
-                gamma_m1 = np.concatenate([aero_tstep_m1.gamma[ss].reshape(-1, order='C')
-                                    for ss in range(aero_tstep.n_surf)])
+                for i_surf in range(aero_tstep.n_surf):
+                    gamma_m1[self.panel_slices[i_surf][0]] = aero_tstep_m1.gamma[i_surf].reshape(-1, order='C')
             else:
-                gamma_m1 = gamma - dt * gamma_dot
-
-        x = np.concatenate((gamma, gamma_star, dt * gamma_dot, gamma_m1))
+                # gamma_dot already holds dt * gamma_dot
+                gamma_m1[:] = gamma - gamma_dot
 
         return x
+
+    def build_index_maps(self, aero_tstep):
+        """
+        Precomputes the location of the variables of each surface in the state-space vectors.
+
+        The vertex (``zeta``, ``zeta_dot``, ``u_ext`` and forces), panel (``gamma`` and ``gamma_dot``) and wake panel
+        (``gamma_star``) variables of each surface occupy a contiguous slice of their blocks of the input, state and
+        output vectors, flattened in ``C`` order. ``vertex_component_index`` is the ``(3, n_vertices)`` array with the
+        position of the ``x``, ``y`` and ``z`` components of every vertex in a vertex block, with which a frame
+        rotation is applied to all the vertices with a single matrix product.
+
+        Args:
+            aero_tstep (AeroTimeStepInfo): aerodynamic time step with the dimensions of the linear system
+        """
+        self.vertex_slices = []
+        self.panel_slices = []
+        self.wake_slices = []
+        component_index = []
+
+        i_vertex_dof = 0
+        i_panel = 0
+        i_wake_panel = 0
+        for i_surf in range(aero_tstep.n_surf):
+            vertex_shape = aero_tstep.zeta[i_surf].shape
+            panel_shape = tuple(self.data.aero.aero_dimensions[i_surf])
+            wake_shape = tuple(self.data.aero.aero_dimensions_star[i_surf])
+
+            n_vertex_dof = int(np.prod(vertex_shape))
+            n_panel = int(np.prod(panel_shape))
+            n_wake_panel = int(np.prod(wake_shape))
+
+            self.vertex_slices.append((slice(i_vertex_dof, i_vertex_dof + n_vertex_dof), vertex_shape))
+            self.panel_slices.append((slice(i_panel, i_panel + n_panel), panel_shape))
+            self.wake_slices.append((slice(i_wake_panel, i_wake_panel + n_wake_panel), wake_shape))
+            component_index.append(np.arange(i_vertex_dof, i_vertex_dof + n_vertex_dof).reshape(3, -1))
+
+            i_vertex_dof += n_vertex_dof
+            i_panel += n_panel
+            i_wake_panel += n_wake_panel
+
+        self.vertex_component_index = np.concatenate(component_index, axis=1)
@@ -1,6 +1,8 @@
 import ctypes as ct
 import numpy as np
 import scipy.optimize
+import scipy.sparse as scsp
+import scipy.sparse.linalg
 import warnings
 
 import sharpy.aero.utils.mapping as mapping
@@ -9,6 +11,7 @@ import sharpy.utils.solver_interface as solver_interface
 from sharpy.utils.solver_interface import solver, BaseSolver
 import sharpy.utils.settings as settings
 import sharpy.utils.algebra as algebra
+import sharpy.utils.exceptions as exceptions
 
 
 @solver
@@ -18,6 +21,29 @@ class Trim(BaseSolver):
     than the ``StaticTrim`` (only longitudinal) solver.
 
     We advise to start with ``StaticTrim`` even if you configuration is not totally symmetric.
+
+    Two trim methods are available through the ``trim_method`` setting:
+
+        * ``Nelder-Mead``: the weighted sum of the squares of the forces and moments is minimised with the
+          derivative free Nelder-Mead algorithm, optionally refined with BFGS (``refine_solution``).
+
+        * ``Gauss-Newton``: the forces and moments are driven to zero with Gauss-Newton steps (Newton steps if the
+          number of trim variables is six). The Jacobian of the forces and moments with respect to the trim variables
+          is computed once at the initial point and then updated with Broyden's rank-one method. It is only
+          recomputed if a step fails to reduce the residual. This method typically requires a handful of nonlinear
+          evaluations.
+
+    The Jacobian for the ``Gauss-Newton`` method is obtained according to ``jacobian_source``:
+
+        * ``finite_differences``: every column is computed by finite differences of the nonlinear static solution.
+
+        * ``linear``: the columns for the angle of attack, sideslip and control surface deflections are given by the
+          steady state gain of the linear UVLM in ``data.linear`` (thus a ``LinearAssembler`` must have been run
+          previously), following the same convention as in
+          :class:`~sharpy.postproc.stabilityderivatives.StabilityDerivatives`. The change in the gravity forces with
+          the orientation is added to the angle of attack and sideslip columns taking the aircraft as rigid, with its
+          centre of gravity given by the mass matrix of the linear beam. The thrust columns are computed
+          analytically and any remaining columns, including the roll angle, by finite differences.
     """
     solver_id = 'Trim'
     solver_classification = 'Flight dynamics'
@@ -25,6 +51,7 @@ class Trim(BaseSolver):
     settings_types = dict()
     settings_default = dict()
     settings_description = dict()
+    settings_options = dict()
 
     settings_types['print_info'] = 'bool'
     settings_default['print_info'] = True
@@ -86,8 +113,32 @@ class Trim(BaseSolver):
     settings_default['refine_solution'] = False
     settings_description['refine_solution'] = 'If ``True`` and the optimiser routine allows for it, the optimiser will try to improve the solution with hybrid methods'
 
+    settings_types['trim_method'] = 'str'
+    settings_default['trim_method'] = 'Nelder-Mead'
+    settings_description['trim_method'] = 'Method used to find the trim condition'
+    settings_options['trim_method'] = ['Nelder-Mead', 'Gauss-Newton']
+
+    settings_types['jacobian_source'] = 'str'
+    settings_default['jacobian_source'] = 'finite_differences'
+    settings_description['jacobian_source'] = 'Source of the Jacobian for the ``Gauss-Newton`` method'
+    settings_options['jacobian_source'] = ['finite_differences', 'linear']
+
+    settings_types['fd_angle_step'] = 'float'
+    settings_default['fd_angle_step'] = 0.01
+    settings_description['fd_angle_step'] = 'Finite difference step for angles and control surface deflections [rad]'
+
+    settings_types['fd_thrust_step'] = 'float'
+    settings_default['fd_thrust_step'] = 0.1
+    settings_description['fd_thrust_step'] = 'Finite difference step for the thrust'
+
+    settings_types['residual_tolerance'] = 'float'
+    settings_default['residual_tolerance'] = 1e-2
+    settings_description['residual_tolerance'] = 'Threshold for the weighted norm of the forces and moments in the ' \
+                                                 '``Gauss-Newton`` method'
+
     settings_table = settings.SettingsTable()
-    __doc__ += settings_table.generate(settings_types, settings_default, settings_description)
+    __doc__ += settings_table.generate(settings_types, settings_default, settings_description,
+                                       settings_options=settings_options)
 
     def __init__(self):
         self.data = None
@@ -99,10 +150,16 @@ class Trim(BaseSolver):
 
         self.with_special_case = False
 
+        self.jacobian = None
+        self.n_evaluations = 0
+        self.last_evaluated = None
+        self.trimmed_values = None
+
     def initialise(self, data):
         self.data = data
         self.settings = data.settings[self.solver_id]
-        settings.to_custom_types(self.settings, self.settings_types, self.settings_default)
+        settings.to_custom_types(self.settings, self.settings_types, self.settings_default,
+                                 options=self.settings_options)
 
         self.solver = solver_interface.initialise_solver(self.settings['solver'])
         self.solver.initialise(self.data, self.settings['solver_settings'])
@@ -226,7 +283,9 @@ class Trim(BaseSolver):
         return self.data
 
     def trim_algorithm(self):
-        # create bounds
+        if self.settings['trim_method'] == 'Gauss-Newton':
+            self.gauss_newton(tolerance=self.settings['tolerance'].value)
+            return
 
         # call optimiser
         self.optimise(solver_wrapper,
@@ -237,8 +296,222 @@ class Trim(BaseSolver):
                       # method='SLSQP',
                       refine=self.settings['refine_solution'])
 
-        # self.optimise(self.solver_wrapper, )
-        pass
+    def gauss_newton(self, tolerance):
+        """
+        Gauss-Newton iteration on the forces and moments with a Broyden-updated Jacobian.
+
+        The step is halved up to three times if it does not reduce the weighted residual, after which the Jacobian
+        is recomputed about the current point.
+
+        Args:
+            tolerance (float): convergence threshold on the infinity norm of the step in the trim variables
+
+        Returns:
+            np.ndarray: trim variables
+
+        Raises:
+            exceptions.NotConvergedSolver: if ``max_iter`` iterations are reached without convergence.
+        """
+        weights = np.array([1.0, 1.0, 1.0, 2, 2, 2])
+        x = self.initial_state.copy()
+        totals = self.evaluate(x)
+        residual = np.linalg.norm(weights*totals)
+        self.jacobian = self.compute_jacobian(x, totals)
+        jacobian_is_fresh = True
+
+        for i_iter in range(self.settings['max_iter'].value):
+            if residual < self.settings['residual_tolerance'].value:
+                break
+
+            dx = -np.linalg.lstsq(weights[:, None]*self.jacobian, weights*totals, rcond=None)[0]
+
+            accepted = False
+            for i_search in range(4):
+                x_new = x + dx
+                totals_new = self.evaluate(x_new)
+                residual_new = np.linalg.norm(weights*totals_new)
+                if residual_new < residual:
+                    accepted = True
+                    break
+                dx *= 0.5
+
+            if not accepted:
+                if jacobian_is_fresh:
+                    cout.cout_wrap('Gauss-Newton trim cannot reduce the residual any further', 3)
+                    break
+                # the Broyden approximation has degraded, recompute about the current point
+                self.jacobian = self.compute_jacobian(x, totals)
+                jacobian_is_fresh = True
+                continue
+
+            # Broyden rank-one update
+            self.jacobian += np.outer(totals_new - totals - self.jacobian.dot(dx), dx)/dx.dot(dx)
+            jacobian_is_fresh = False
+
+            x = x_new
+            totals = totals_new
+            residual = residual_new
+            if np.max(np.abs(dx)) < tolerance:
+                break
+        else:
+            raise exceptions.NotConvergedSolver('Gauss-Newton trim did not converge in %u iterations'
+                                                % self.settings['max_iter'].value)
+
+        if not np.array_equal(x, self.last_evaluated):
+            # leave the data at the trimmed state
+            totals = self.evaluate(x)
+
+        cout.cout_wrap('Trim solution found in %u nonlinear evaluations' % self.n_evaluations, 1)
+        cout.cout_wrap('Solution = ')
+        cout.cout_wrap(str(x))
+        self.trimmed_values = x
+        return x
+
+    def evaluate(self, x):
+        self.n_evaluations += 1
+        self.last_evaluated = x.copy()
+        return solver_wrapper(x, self.x_info, self, -1)
+
+    def compute_jacobian(self, x, totals):
+        """
+        Jacobian of the forces and moments with respect to the trim variables at ``x``.
+
+        Args:
+            x (np.ndarray): trim variables
+            totals (np.ndarray): forces and moments at ``x``
+
+        Returns:
+            np.ndarray: ``6 x n_variables`` Jacobian
+        """
+        jacobian = np.full((6, self.x_info['n_variables']), np.nan)
+        if self.settings['jacobian_source'] == 'linear':
+            self.linear_jacobian(x, jacobian)
+
+        for i_var in range(self.x_info['n_variables']):
+            if not np.any(np.isnan(jacobian[:, i_var])):
+                continue
+            if i_var in self.x_info['i_thrust'] or i_var == self.x_info.get('i_base_thrust', None):
+                eps = self.settings['fd_thrust_step'].value
+            elif i_var == self.x_info.get('i_differential_parameter', None):
+                eps = 0.1*self.settings['fd_thrust_step'].value
+            else:
+                eps = self.settings['fd_angle_step'].value
+            x_pert = x.copy()
+            x_pert[i_var] += eps
+            jacobian[:, i_var] = (self.evaluate(x_pert) - totals)/eps
+
+        return jacobian
+
+    def linear_jacobian(self, x, jacobian):
+        """
+        Fills the columns of the Jacobian that are available from the linearised system in ``data.linear``:
+        rigid aerodynamic derivatives with respect to the angle of attack, sideslip and control surface deflections,
+        the change in the gravity forces due to the rotation of the aircraft with the angle of attack and sideslip,
+        and the thrust derivatives.
+
+        Args:
+            x (np.ndarray): trim variables
+            jacobian (np.ndarray): ``6 x n_variables`` Jacobian to be filled. Columns left as ``NaN`` are to be
+              computed by finite differences.
+        """
+        try:
+            uvlm = self.data.linear.linear_system.uvlm
+        except AttributeError:
+            cout.cout_wrap('No linear system found in data.linear. Using finite differences for the trim Jacobian', 3)
+        else:
+            self.uvlm_steady_state_jacobian(uvlm, jacobian)
+            self.gravity_jacobian(x, jacobian)
+
+        # thrust: the force is applied at the node in the material frame
+        if self.with_special_case:
+            return
+        tstep = self.data.structure.timestep_info[self.data.ts]
+        for i_thrust, i_var in enumerate(self.x_info['i_thrust']):
+            i_node = self.x_info['thrust_nodes'][i_thrust]
+            unit_force = np.zeros((self.data.structure.num_node, 6), order='F')
+            unit_force[i_node, 0:3] = self.x_info['thrust_direction'][i_thrust]
+            force_a = self.data.structure.nodal_b_for_2_a_for(unit_force, tstep)[i_node, 0:3]
+            jacobian[0:3, i_var] = force_a
+            jacobian[3:6, i_var] = np.cross(tstep.pos[i_node, :], force_a)
+
+    def gravity_jacobian(self, x, jacobian):
+        """
+        Adds to the angle of attack and sideslip columns the derivatives of the total gravity forces and moments in
+        the ``A`` frame with respect to the orientation of the aircraft.
+
+        The aircraft is taken as rigid for this purpose, hence the gravity forces rotate with the orientation and
+        act at the centre of gravity given by the rigid body mass matrix of the linear beam.
+
+        Args:
+            x (np.ndarray): trim variables
+            jacobian (np.ndarray): Jacobian to be updated
+        """
+        beam = self.data.linear.linear_system.beam.sys
+        if beam.use_euler:
+            rig_dof = 9
+        else:
+            rig_dof = 10
+        mass_rr = beam.Mstr[-rig_dof:, -rig_dof:]
+        if mass_rr[0, 0] == 0.:
+            return
+        xcg_a = -np.array([mass_rr[2, 4], mass_rr[0, 5], mass_rr[1, 3]])/mass_rr[0, 0]
+
+        # total gravity force in the inertial frame
+        tstep = self.data.structure.timestep_info[self.data.ts]
+        fgrav_g = algebra.quat2rotation(tstep.quat).dot(np.sum(tstep.gravity_forces[:, 0:3], axis=0))
+
+        euler = np.array([x[self.x_info['i_roll']], x[self.x_info['i_alpha']], x[self.x_info['i_beta']]])
+        delta = 1e-6
+        for i_euler, i_var in enumerate([self.x_info['i_alpha'], self.x_info['i_beta']], start=1):
+            euler_pert = euler.copy()
+            euler_pert[i_euler] += delta
+            fgrav_a_plus = algebra.quat2rotation(algebra.euler2quat(euler_pert)).T.dot(fgrav_g)
+            euler_pert[i_euler] -= 2*delta
+            fgrav_a_minus = algebra.quat2rotation(algebra.euler2quat(euler_pert)).T.dot(fgrav_g)
+            dfgrav_a = (fgrav_a_plus - fgrav_a_minus)/(2*delta)
+            jacobian[0:3, i_var] += dfgrav_a
+            jacobian[3:6, i_var] += np.cross(xcg_a, dfgrav_a)
+
+    def uvlm_steady_state_jacobian(self, uvlm, jacobian):
+        """
+        Steady state gain of the UVLM between the rigid body velocities and control surface inputs and the
+        rigid body forces, projected onto the trim variables.
+
+        Args:
+            uvlm (sharpy.linear.assembler.linearuvlm.LinearUVLM): linear UVLM in structural coordinates
+            jacobian (np.ndarray): Jacobian to be filled
+        """
+        if self.data.linear.linear_system.beam.sys.use_euler:
+            rig_dof = 9
+        else:
+            rig_dof = 10
+        try:
+            n_ctrl_sfc = uvlm.control_surface.n_control_surfaces
+        except AttributeError:
+            n_ctrl_sfc = 0
+        n_in = rig_dof + n_ctrl_sfc
+
+        A, B, C, D = uvlm.ss.get_mats()
+        B = B[:, -n_in:]
+        C = C[-rig_dof:-rig_dof + 6, :]
+        D = D[-rig_dof:-rig_dof + 6, -n_in:]
+        if scsp.issparse(A):
+            eye = scsp.eye(A.shape[0], format='csc')
+            if scsp.issparse(B):
+                B = B.toarray()
+            gain = C.dot(scsp.linalg.spsolve(eye - A, B).reshape(B.shape)) + D
+        else:
+            gain = C.dot(np.linalg.solve(np.eye(A.shape[0]) - A, B)) + D
+        if scsp.issparse(gain):
+            gain = gain.toarray()
+
+        u_inf = np.linalg.norm(self.data.linear.tsaero0.u_ext[0][:, 0, 0])
+        jacobian[:, self.x_info['i_alpha']] = gain[:, 2]*u_inf
+        jacobian[:, self.x_info['i_beta']] = gain[:, 1]*u_inf
+        for i_cs, i_var in enumerate(self.x_info['i_control_surfaces']):
+            cs_id = self.x_info['control_surfaces_id'][i_cs]
+            if cs_id < n_ctrl_sfc:
+                jacobian[:, i_var] = gain[:, rig_dof + cs_id]
 
     def optimise(self, func, tolerance, print_info, method, refine):
         args = (self.x_info, self, -2)
@@ -203,6 +203,28 @@ def skew(vector):
     return matrix
 
 
+def skew_array(vector):
+    r"""
+    Array version of :func:`skew` that computes the skew symmetric matrices of several vectors at once.
+
+    Args:
+        vector (np.ndarray): ``(n, 3)`` array of vectors
+
+    Returns:
+        np.array: ``(n, 3, 3)`` array of skew-symmetric matrices.
+    """
+    vector = np.asarray(vector).reshape(-1, 3)
+
+    matrix = np.zeros((vector.shape[0], 3, 3))
+    matrix[:, 1, 2] = -vector[:, 0]
+    matrix[:, 2, 0] = -vector[:, 1]
+    matrix[:, 0, 1] = -vector[:, 2]
+    matrix[:, 2, 1] = vector[:, 0]
+    matrix[:, 0, 2] = vector[:, 1]
+    matrix[:, 1, 0] = vector[:, 2]
+    return matrix
+
+
 def quadskew(vector):
     """
     Generates the matrix needed to obtain the quaternion in the following time step
@@ -542,6 +564,39 @@ def crv2rotation(psi):
     return rot_matrix
 
 
+def crv2rotation_array(psi):
+    r"""
+    Array version of :func:`crv2rotation` that computes the rotation matrices of several Cartesian rotation vectors
+    at once.
+
+    Args:
+        psi (np.array): ``(n, 3)`` array of Cartesian rotation vectors.
+
+    Returns:
+        np.array: ``(n, 3, 3)`` array of the equivalent rotation matrices
+    """
+    psi = np.asarray(psi, dtype=float).reshape(-1, 3)
+    norm_psi = np.linalg.norm(psi, axis=1)
+
+    skew_psi = np.zeros((psi.shape[0], 3, 3))
+    skew_psi[:, 0, 1] = -psi[:, 2]
+    skew_psi[:, 0, 2] = psi[:, 1]
+    skew_psi[:, 1, 0] = psi[:, 2]
+    skew_psi[:, 1, 2] = -psi[:, 0]
+    skew_psi[:, 2, 0] = -psi[:, 1]
+    skew_psi[:, 2, 1] = psi[:, 0]
+
+    small = norm_psi < 1e-15
+    coef_1 = np.ones_like(norm_psi)
+    coef_2 = 0.5*np.ones_like(norm_psi)
+    coef_1[~small] = np.sin(norm_psi[~small])/norm_psi[~small]
+    coef_2[~small] = (1.0 - np.cos(norm_psi[~small]))/norm_psi[~small]**2
+
+    return (np.eye(3) +
+            coef_1[:, None, None]*skew_psi +
+            coef_2[:, None, None]*np.matmul(skew_psi, skew_psi))
+
+
 def rotation2crv(Cab):
     r"""
     Given a rotation matrix :math:`C^{AB}` rotating the frame A onto B, the function returns
@@ -0,0 +1,186 @@
+"""Asynchronous Postprocessing
+
+Runs the online postprocessors of a time stepping solver in a background thread, such that the time loop does not
+wait for the file output of every step.
+
+A single worker thread processes the time steps in order and, for each of them, runs the postprocessors in the order
+in which they are given, so that postprocessors can read the output of the previous ones (for instance, ``BeamPlot``
+reads the loads written by ``BeamLoads``). The steps are handed over as a :func:`step_snapshot` of the data structure,
+in which the time step history is frozen at the finished step. The queue of the worker is bounded, so the solver
+blocks when the postprocessors fall ``queue_size`` steps behind.
+
+Postprocessors that modify the time step history, flagged with ``modifies_history``, cannot run in the background,
+since the steps of the snapshots still being processed are shared with the solver.
+"""
+import collections.abc
+import copy
+import queue
+import threading
+
+
+class AsyncPostprocessors(object):
+    """
+    Background worker running the online postprocessors.
+
+    Args:
+        postprocessors (dict): Initialised postprocessors, as ``{name: postprocessor}``, in the order they are run
+        queue_size (int): Maximum number of pending time steps
+
+    Raises:
+        ValueError: if any of the postprocessors modifies the time step history
+
+    Examples:
+
+        >>> pipeline = AsyncPostprocessors(postprocessors, queue_size=10)
+        >>> for ts in time_steps:
+        >>>     ...  # solve time step
+        >>>     pipeline.submit(data)
+        >>> pipeline.close()  # waits for the pending steps and raises any postprocessor error
+    """
+
+    def __init__(self, postprocessors, queue_size=10):
+        modifiers = history_modifiers(postprocessors)
+        if modifiers:
+            raise ValueError('Postprocessors modifying the time step history cannot be run asynchronously: '
+                             + ', '.join(modifiers))
+        self.postprocessors = postprocessors
+        self.queue = queue.Queue(maxsize=max(queue_size, 1))
+        self.error = None
+        self.closed = False
+
+        self.worker = threading.Thread(target=self.work, name='postprocessors', daemon=True)
+        self.worker.start()
+
+    def work(self):
+        while True:
+            snapshot = self.queue.get()
+            try:
+                if snapshot is None:
+                    return
+                if self.error is None:
+                    for postproc in self.postprocessors.values():
+                        postproc.data = snapshot
+                        snapshot = postproc.run(online=True)
+            except Exception as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def submit(self, data):
+        """
+        Hands the finished time step to the postprocessors. Blocks if the queue is full.
+
+        Args:
+            data (sharpy.presharpy.presharpy.PreSharpy): Data structure after the time step
+        """
+        self.check()
+        self.queue.put(step_snapshot(data))
+
+    def check(self):
+        """
+        Raises the first exception raised by a postprocessor, after stopping the worker.
+        """
+        if self.error is not None:
+            self.close()
+
+    def close(self):
+        """
+        Waits for the pending time steps to be processed and stops the worker.
+
+        Raises:
+            Exception: the first exception raised by any of the postprocessors
+        """
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+            self.worker.join()
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+
+
+def history_modifiers(postprocessors):
+    """
+    Args:
+        postprocessors (dict): Postprocessors, as ``{name: postprocessor}``
+
+    Returns:
+        list: Names of the postprocessors that modify the time step history, which have to be run synchronously
+    """
+    return [name for name, postproc in postprocessors.items() if getattr(postproc, 'modifies_history', False)]
+
+
+def step_snapshot(data):
+    """
+    Returns a shallow copy of ``data`` whose ``structure`` and ``aero`` time step histories are frozen at their
+    current length.
+
+    The current time step, whose arrays the solver keeps updating in place, is copied. The previous ones are not
+    modified by the solvers once they have been completed, hence the snapshot shares them with ``data`` instead of
+    copying them. What the postprocessors write to the copy of the current step is not seen by ``data``.
+
+    Args:
+        data (sharpy.presharpy.presharpy.PreSharpy): Data structure
+
+    Returns:
+        sharpy.presharpy.presharpy.PreSharpy: Snapshot of the data structure
+    """
+    snapshot = copy.copy(data)
+    for attr in ['structure', 'aero']:
+        model = getattr(data, attr, None)
+        if model is None:
+            continue
+        model_snapshot = copy.copy(model)
+        n_steps = len(model.timestep_info)
+        last_step = None
+        if n_steps:
+            last_step = model.timestep_info[n_steps - 1]
+            last_step = last_step.copy() if hasattr(last_step, 'copy') else copy.deepcopy(last_step)
+        model_snapshot.timestep_info = HistoryView(model.timestep_info, n_steps, last_step)
+        setattr(snapshot, attr, model_snapshot)
+    return snapshot
+
+
+class HistoryView(collections.abc.Sequence):
+    """
+    Read-only view of the first ``n_steps`` elements of a time step history, without copying it.
+
+    Args:
+        steps (list): Time step history
+        n_steps (int): Number of steps of the view
+        last_step: Replacement of the last step of the view, such as a copy of it. ``None`` to use the one in ``steps``
+    """
+
+    def __init__(self, steps, n_steps, last_step=None):
+        self.steps = steps
+        self.n_steps = n_steps
+        self.last_step = last_step
+
+    def step(self, i_step):
+        if self.last_step is not None and i_step == self.n_steps - 1:
+            return self.last_step
+        return self.steps[i_step]
+
+    def __len__(self):
+        return self.n_steps
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.step(i_step) for i_step in range(*item.indices(self.n_steps))]
+        if item < 0:
+            item += self.n_steps
+        if item < 0 or item >= self.n_steps:
+            raise IndexError('time step index out of range')
+        return self.step(item)
+
+    def __iter__(self):
+        for i_step in range(self.n_steps):
+            yield self.step(i_step)
+
+    def __reversed__(self):
+        for i_step in range(self.n_steps - 1, -1, -1):
+            yield self.step(i_step)
+
+    def __reduce__(self):
+        return list, (list(self),)
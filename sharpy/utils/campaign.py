@@ -0,0 +1,409 @@
+"""Case Campaigns
+
+Run a family of SHARPy cases generated from a template case and a parameter table.
+
+A campaign is defined by:
+
+    * A template ``.sharpy`` file. Any other input file of the template case that shares its case name (for instance
+      ``<case>.fem.h5`` and ``<case>.aero.h5``) is copied over to every generated case.
+
+    * A parameter table. This can be a ``.csv`` file, where each row is a case and each column is a setting given as
+      ``Solver.setting`` (nested settings are separated by further dots, such as
+      ``StaticCoupled.aero_solver_settings.rho``), or a ``.yaml`` file with a list of values for each of the settings,
+      in which case the full grid of combinations is run. An optional ``case`` column gives the name of each case.
+
+    * A set of scalar outputs to collect, given as ``name=expression`` where ``expression`` is evaluated with the
+      final ``data`` object (and ``np``) in scope, for example
+      ``tip_z=data.structure.timestep_info[-1].pos[-1, 2]``.
+
+The case files are written with :class:`sharpy.utils.generate_cases.SimulationInformation` in
+``<folder>/cases/<case>/``. The cases run in a local pool of ``num_cores`` processes, each of them writing its screen
+output to ``<case>.log`` and being terminated if it exceeds ``timeout`` seconds. The result of each case is recorded
+in ``<case>.status.yaml`` so that, if the campaign is run again, finished cases are skipped and failed ones are
+retried. The collected outputs are written to ``<folder>/campaign.csv`` and ``<folder>/campaign.h5``.
+
+Examples:
+
+    From the command line
+
+    .. code-block:: bash
+
+        sharpy campaign template.sharpy parameters.csv -f ./campaign -n 4 --timeout 3600 -o tip_z="data.structure.timestep_info[-1].pos[-1, 2]"
+
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import argparse
+import itertools
+import traceback
+import multiprocessing as mpr
+from collections import deque
+import numpy as np
+import pandas as pd
+import h5py as h5
+import yaml
+
+import sharpy.utils.exceptions as exceptions
+import sharpy.utils.cout_utils as cout
+
+
+class Campaign(object):
+    """
+    Campaign of SHARPy cases
+
+    Args:
+        template (str): Path to the template ``.sharpy`` file.
+        parameters (str or pandas.DataFrame): Path to the ``.csv`` or ``.yaml`` parameter table, or the table itself.
+        folder (str): Campaign output folder.
+        outputs (dict): Scalar outputs to collect as ``{name: expression}``.
+        num_cores (int): Number of cases run simultaneously.
+        timeout (float): Maximum wall time in seconds per case. No limit if ``None``.
+        max_attempts (int): Number of times a failed case is run within a single campaign run.
+
+    Attributes:
+        cases (pandas.DataFrame): Parameter table indexed by case name.
+    """
+    status_finished = 'finished'
+    status_failed = 'failed'
+    status_timeout = 'timeout'
+
+    def __init__(self, template, parameters, folder='./campaign', outputs=None, num_cores=1, timeout=None,
+                 max_attempts=1):
+        self.template = os.path.abspath(template)
+        self.folder = os.path.abspath(folder)
+        self.outputs = dict() if outputs is None else outputs
+        self.num_cores = max(num_cores, 1)
+        self.timeout = timeout
+        self.max_attempts = max(max_attempts, 1)
+        self.poll_time = 0.5
+
+        if isinstance(parameters, pd.DataFrame):
+            table = parameters.copy()
+        else:
+            table = read_parameter_table(parameters)
+        self.cases = self.name_cases(table)
+
+    def name_cases(self, table):
+        template_case = os.path.splitext(os.path.basename(self.template))[0]
+        if 'case' in table.columns:
+            names = [str(name) for name in table['case']]
+            table = table.drop(columns='case')
+        else:
+            n_digits = len(str(max(len(table) - 1, 0)))
+            names = ['%s_%0*d' % (template_case, n_digits, i_case) for i_case in range(len(table))]
+        if len(set(names)) != len(names):
+            raise exceptions.NotValidInputFile('Case names in the parameter table are not unique')
+        table.index = names
+        table.index.name = 'case'
+        return table
+
+    def case_folder(self, case_name):
+        return self.folder + '/cases/' + case_name + '/'
+
+    def status_file(self, case_name):
+        return self.case_folder(case_name) + case_name + '.status.yaml'
+
+    def read_status(self, case_name):
+        try:
+            with open(self.status_file(case_name), 'r') as f:
+                return yaml.load(f, Loader=yaml.Loader)
+        except FileNotFoundError:
+            return None
+
+    def write_status(self, case_name, status):
+        file_name = self.status_file(case_name)
+        with open(file_name + '.tmp', 'w') as f:
+            yaml.dump(status, f)
+        os.replace(file_name + '.tmp', file_name)
+
+    def generate(self, case_names=None):
+        """
+        Writes the ``.sharpy`` file of every case with ``generate_cases`` and copies the template input files.
+
+        Args:
+            case_names (list(str)): Cases to generate. If ``None``, all cases in the table are generated.
+        """
+        import sharpy.utils.generate_cases as gc
+        import sharpy.utils.settings as settings
+
+        template_config = settings.load_config_file(self.template)
+        template_route = os.path.dirname(self.template)
+        template_case = os.path.splitext(os.path.basename(self.template))[0]
+
+        base = gc.SimulationInformation()
+        base.set_default_values()
+        for solver in template_config:
+            try:
+                base.solvers[solver].update(template_config[solver].dict())
+            except KeyError:
+                raise exceptions.SolverNotFound(solver)
+        self.check_columns(base)
+
+        input_files = [f for f in glob.glob(template_route + '/' + template_case + '.*')
+                       if not f.endswith('.sharpy')]
+
+        if case_names is None:
+            case_names = list(self.cases.index)
+
+        for case_name, row in self.cases.loc[case_names].iterrows():
+            case_folder = self.case_folder(case_name)
+            os.makedirs(case_folder, exist_ok=True)
+
+            case = gc.SimulationInformation()
+            case.solvers = {solver: deepcopy_settings(value) for solver, value in base.solvers.items()}
+            for column, value in row.items():
+                set_setting(case.solvers, column, value)
+            case.solvers['SHARPy']['case'] = case_name
+            case.solvers['SHARPy']['route'] = case_folder
+            case.solvers['SHARPy']['log_folder'] = case_folder
+            case.set_variable_all_dicts('folder', case_folder + 'output/')
+            case.generate_solver_file()
+
+            for input_file in input_files:
+                suffix = os.path.basename(input_file)[len(template_case):]
+                shutil.copyfile(input_file, case_folder + case_name + suffix)
+
+    def check_columns(self, base):
+        for column in self.cases.columns:
+            keys = column.split('.')
+            if len(keys) < 2 or keys[0] not in base.solvers or keys[1] not in base.solvers[keys[0]]:
+                raise exceptions.NotValidInputFile('Parameter %s does not correspond to a solver setting' % column)
+
+    def pending_cases(self):
+        """
+        Returns:
+            list: Cases without a finished status record.
+        """
+        pending = []
+        for case_name in self.cases.index:
+            status = self.read_status(case_name)
+            if status is None or status['status'] != self.status_finished:
+                pending.append(case_name)
+        return pending
+
+    def run(self):
+        """
+        Runs the campaign. Finished cases are skipped and left untouched, the rest are generated and run in the
+        process pool.
+
+        Returns:
+            pandas.DataFrame: Campaign results table
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        pending = self.pending_cases()
+        cout.cout_wrap('Campaign with %u cases, %u already finished' % (len(self.cases),
+                                                                       len(self.cases) - len(pending)), 1)
+        if pending:
+            self.generate(pending)
+
+        context = mpr.get_context('fork')
+        queue = deque([(case_name, 1) for case_name in pending])
+        running = dict()
+        while queue or running:
+            while queue and len(running) < self.num_cores:
+                case_name, attempt = queue.popleft()
+                if os.path.isfile(self.status_file(case_name)):
+                    os.remove(self.status_file(case_name))
+                process = context.Process(target=_run_case,
+                                          args=(self.case_folder(case_name), case_name, self.outputs))
+                process.start()
+                running[case_name] = (process, time.time(), attempt)
+                cout.cout_wrap('Started case %s (attempt %u)' % (case_name, attempt), 1)
+
+            time.sleep(self.poll_time)
+
+            for case_name, (process, t0, attempt) in list(running.items()):
+                wall_time = time.time() - t0
+                if process.is_alive():
+                    if self.timeout is None or wall_time < self.timeout:
+                        continue
+                    process.terminate()
+                    process.join()
+                    self.write_status(case_name, {'status': self.status_timeout,
+                                                  'wall_time': wall_time,
+                                                  'attempt': attempt})
+                else:
+                    process.join()
+                    if self.read_status(case_name) is None:
+                        self.write_status(case_name, {'status': self.status_failed,
+                                                      'wall_time': wall_time,
+                                                      'attempt': attempt,
+                                                      'error': 'Process exited with code %d' % process.exitcode})
+                del running[case_name]
+
+                status = self.read_status(case_name)
+                status['attempt'] = attempt
+                self.write_status(case_name, status)
+                cout.cout_wrap('Case %s %s in %.1f s' % (case_name, status['status'], wall_time), 1)
+                if status['status'] != self.status_finished and attempt < self.max_attempts:
+                    queue.append((case_name, attempt + 1))
+
+        results = self.collect()
+        n_finished = np.sum(results['status'] == self.status_finished)
+        cout.cout_wrap('Campaign finished: %u of %u cases converged' % (n_finished, len(results)), 1)
+        return results
+
+    def collect(self):
+        """
+        Gathers the parameters, status and outputs of every case into ``campaign.csv`` and ``campaign.h5``.
+
+        Returns:
+            pandas.DataFrame: Campaign results table
+        """
+        results = self.cases.copy()
+        status_list = []
+        for output_name in self.outputs:
+            results[output_name] = np.nan
+        results['wall_time'] = np.nan
+        for case_name in results.index:
+            status = self.read_status(case_name)
+            if status is None:
+                status_list.append('not_run')
+                continue
+            status_list.append(status['status'])
+            results.loc[case_name, 'wall_time'] = status.get('wall_time', np.nan)
+            for output_name, value in status.get('outputs', dict()).items():
+                if output_name in self.outputs:
+                    results.loc[case_name, output_name] = value
+        results['status'] = status_list
+
+        results.to_csv(self.folder + '/campaign.csv')
+        with h5.File(self.folder + '/campaign.h5', 'w') as f:
+            f.create_dataset('case', data=np.array(results.index, dtype='S'))
+            for column in results.columns:
+                values = results[column].values
+                if values.dtype.kind in 'biuf':
+                    f.create_dataset(column, data=values)
+                else:
+                    f.create_dataset(column, data=np.array([str(v) for v in values], dtype='S'))
+        return results
+
+
+def _run_case(case_folder, case_name, outputs):
+    """
+    Runs a single case in a child process, redirecting its output to ``<case>.log`` and writing the status file.
+    """
+    import sharpy.sharpy_main
+
+    log = open(case_folder + case_name + '.log', 'w')
+    os.dup2(log.fileno(), sys.stdout.fileno())
+    os.dup2(log.fileno(), sys.stderr.fileno())
+
+    status_file = case_folder + case_name + '.status.yaml'
+    t0 = time.time()
+    try:
+        data = sharpy.sharpy_main.main(['sharpy', case_folder + case_name + '.sharpy'])
+        case_outputs = dict()
+        for output_name, expression in outputs.items():
+            case_outputs[output_name] = float(eval(expression, {'np': np}, {'data': data}))
+        status = {'status': Campaign.status_finished,
+                  'outputs': case_outputs}
+    except Exception:
+        traceback.print_exc()
+        status = {'status': Campaign.status_failed,
+                  'error': traceback.format_exc(limit=1)}
+    status['wall_time'] = time.time() - t0
+
+    with open(status_file + '.tmp', 'w') as f:
+        yaml.dump(status, f)
+    os.replace(status_file + '.tmp', status_file)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    log.close()
+
+
+def read_parameter_table(file_name):
+    """
+    Reads the campaign parameter table.
+
+    Args:
+        file_name (str): ``.csv`` file with a row per case or ``.yaml`` file with a list of values per setting that
+          is expanded into the full grid of combinations.
+
+    Returns:
+        pandas.DataFrame: Parameter table with a row per case
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == '.csv':
+        return pd.read_csv(file_name, skipinitialspace=True)
+    elif extension in ['.yaml', '.yml']:
+        with open(file_name, 'r') as f:
+            grid = yaml.load(f, Loader=yaml.Loader)
+        names = list(grid.keys())
+        values = [value if isinstance(value, list) else [value] for value in grid.values()]
+        return pd.DataFrame(list(itertools.product(*values)), columns=names)
+    else:
+        raise exceptions.NotValidInputFile('Campaign parameter table must be a .csv or .yaml file')
+
+
+def set_setting(solvers, column, value):
+    """
+    Sets the value of a ``Solver.setting[.subsetting]`` entry in a dictionary of solver settings.
+    """
+    keys = column.split('.')
+    settings = solvers
+    for key in keys[:-1]:
+        settings = settings.setdefault(key, dict())
+    if isinstance(value, (np.generic, np.ndarray)):
+        value = value.tolist()
+    settings[keys[-1]] = value
+
+
+def deepcopy_settings(value):
+    if isinstance(value, dict):
+        return {k: deepcopy_settings(v) for k, v in value.items()}
+    elif isinstance(value, np.ndarray):
+        return value.copy()
+    elif isinstance(value, list):
+        return [deepcopy_settings(v) for v in value]
+    return value
+
+
+def parse_outputs(output_list):
+    outputs = dict()
+    for entry in output_list:
+        try:
+            name, expression = entry.split('=', 1)
+        except ValueError:
+            raise exceptions.NotValidInputFile('Campaign outputs must be given as name=expression, got %s' % entry)
+        outputs[name.strip()] = expression.strip()
+    return outputs
+
+
+def main(args=None):
+    """
+    Command line entry point, called as ``sharpy campaign template.sharpy parameters.csv [options]``.
+
+    Args:
+        args (list): Command line arguments, where ``args[0]`` is the executable and ``args[1]`` is ``campaign``.
+
+    Returns:
+        pandas.DataFrame: Campaign results table
+    """
+    parser = argparse.ArgumentParser(prog='sharpy campaign',
+                                     description='Run a campaign of SHARPy cases generated from a template case '
+                                                 'and a parameter table.')
+    parser.add_argument('template', help='path to the template *.sharpy file', type=str)
+    parser.add_argument('parameters', help='path to the *.csv or *.yaml parameter table', type=str)
+    parser.add_argument('-f', '--folder', help='campaign output folder', type=str, default='./campaign')
+    parser.add_argument('-n', '--num_cores', help='number of cases run simultaneously', type=int, default=1)
+    parser.add_argument('-t', '--timeout', help='maximum wall time in seconds per case', type=float, default=None)
+    parser.add_argument('-a', '--max_attempts', help='number of attempts for each failed case', type=int, default=1)
+    parser.add_argument('-o', '--output', help='scalar output to collect as name=expression, with the final data '
+                                               'object available as data', action='append', default=[])
+    if args is not None:
+        args = parser.parse_args(args[2:])
+    else:
+        args = parser.parse_args(sys.argv[2:])
+
+    campaign = Campaign(args.template,
+                        args.parameters,
+                        folder=args.folder,
+                        outputs=parse_outputs(args.output),
+                        num_cores=args.num_cores,
+                        timeout=args.timeout,
+                        max_attempts=args.max_attempts)
+    return campaign.run()
@@ -2,7 +2,11 @@
 
 Classes for the Aerotimestep and Structuraltimestep, amongst others
 """
+import os
 import copy
+import pickle
+import collections
+import threading
 import ctypes as ct
 import numpy as np
 
@@ -720,3 +724,276 @@ class LinearTimeStepInfo(object):
         copied.u = self.u.copy()
         copied.t = self.t.copy()
 
+
+
+class TimeStepHistory(list):
+    """
+    Time step history with a bounded number of steps kept in memory.
+
+    Drop-in replacement of the ``timestep_info`` lists. The first time step (the initial or static state) and the
+    last ``n_resident`` time steps are kept in memory. Older steps are evicted to a file on disk, in which each of
+    them is pickled once, and are loaded on demand when indexed, such that postprocessors reading past steps keep
+    working with a fixed memory budget.
+
+    Up to ``n_resident`` steps loaded from disk are kept in memory, so indexing the same step again returns the same
+    object and what is written to it is kept. When a loaded step leaves memory, it is written back to the file if it
+    has been modified. Assigning a step replaces it and, if it is older than the last ``n_resident``, evicts it
+    again.
+
+    Slices, copies and pickles of the history keep the evicted steps on disk and share the file with the original
+    history. The file is removed when the original history is closed with :meth:`close`, after which the evicted
+    steps are no longer available, neither to its slices, copies nor unpickled histories. In-place reordering
+    (``sort``, ``reverse`` and repetition with ``*``) is not supported.
+
+    Args:
+        steps (list): Initial time steps.
+        n_resident (int): Number of most recent time steps kept in memory.
+        filename (str): File storing the evicted steps. It is overwritten unless ``history_file`` is given.
+        history_file (_HistoryFile): File shared with another history, for slices, copies and unpickling.
+    """
+
+    def __init__(self, steps, n_resident, filename, history_file=None):
+        super().__init__(steps)
+        self.n_resident = max(n_resident, 1)
+        self.filename = filename
+        if history_file is None:
+            history_file = _HistoryFile(filename)
+        self.history_file = history_file
+        self.n_evicted = 0
+        # evicted steps loaded in memory, as {i_step: (step, pickled step when loaded)}, least recently used first
+        self.loaded = collections.OrderedDict()
+        # steps may be loaded by the asynchronous postprocessors while the solver runs
+        self.lock = threading.RLock()
+        self.evict()
+
+    def raw_steps(self):
+        """
+        Returns:
+            list: The steps in memory and the placeholders of the evicted ones, without loading them.
+        """
+        self.write_back()
+        return list.__getitem__(self, slice(None))
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return TimeStepHistory(self.raw_steps()[item], self.n_resident, self.filename,
+                                   history_file=self.history_file)
+        value = super().__getitem__(item)
+        if isinstance(value, _EvictedStep):
+            return self.load(range(len(self))[item], value)
+        return value
+
+    def __setitem__(self, item, value):
+        if isinstance(item, slice):
+            raise TypeError('TimeStepHistory does not support slice assignment')
+        i_step = range(len(self))[item]
+        self.loaded.pop(i_step, None)
+        super().__setitem__(i_step, value)
+        if 0 < i_step < len(self) - self.n_resident:
+            self.n_evicted = min(self.n_evicted, i_step)
+            self.evict()
+
+    def __delitem__(self, item):
+        self.write_back()
+        super().__delitem__(item)
+        # indices have shifted, check for eviction from the start in the next call
+        self.n_evicted = 0
+
+    def __iter__(self):
+        for i_step in range(len(self)):
+            yield self[i_step]
+
+    def __reversed__(self):
+        for i_step in range(len(self) - 1, -1, -1):
+            yield self[i_step]
+
+    def __contains__(self, value):
+        return any(step is value or step == value for step in self)
+
+    def index(self, value, start=0, stop=None):
+        for i_step in range(*slice(start, stop).indices(len(self))):
+            step = self[i_step]
+            if step is value or step == value:
+                return i_step
+        raise ValueError('Step not in TimeStepHistory')
+
+    def count(self, value):
+        return sum(1 for step in self if step is value or step == value)
+
+    def pop(self, index=-1):
+        value = self[index]
+        del self[index]
+        return value
+
+    def remove(self, value):
+        del self[self.index(value)]
+
+    def insert(self, index, step):
+        self.write_back()
+        super().insert(index, step)
+        self.n_evicted = 0
+        self.evict()
+
+    def append(self, step):
+        super().append(step)
+        self.evict()
+
+    def extend(self, steps):
+        super().extend(steps)
+        self.evict()
+
+    def clear(self):
+        self.loaded.clear()
+        super().clear()
+        self.n_evicted = 0
+
+    def copy(self):
+        return self.__copy__()
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def __iadd__(self, steps):
+        self.extend(steps)
+        return self
+
+    def _not_supported(self, *args, **kwargs):
+        raise TypeError('Operation not supported by TimeStepHistory')
+
+    sort = reverse = __mul__ = __rmul__ = __imul__ = _not_supported
+
+    def __reduce__(self):
+        # the evicted steps stay in the file, only their placeholders are pickled
+        return _restore_time_step_history, (self.raw_steps(), self.n_resident, self.filename)
+
+    def __copy__(self):
+        return TimeStepHistory(self.raw_steps(), self.n_resident, self.filename, history_file=self.history_file)
+
+    def __deepcopy__(self, memo):
+        return TimeStepHistory(copy.deepcopy(self.raw_steps(), memo), self.n_resident, self.filename,
+                               history_file=self.history_file)
+
+    def load(self, i_step, evicted):
+        """
+        Returns the evicted step ``i_step``, keeping it in memory among the ``n_resident`` most recently loaded.
+        """
+        with self.lock:
+            try:
+                self.loaded.move_to_end(i_step)
+                return self.loaded[i_step][0]
+            except KeyError:
+                pass
+            value = self.history_file.read(evicted.offset)
+            self.loaded[i_step] = (value, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            while len(self.loaded) > self.n_resident:
+                self.unload(*self.loaded.popitem(last=False))
+            return value
+
+    def unload(self, i_step, loaded):
+        """
+        Drops a loaded step from memory, writing it back to the file if it has been modified since it was loaded.
+        """
+        value, pickled = loaded
+        new_pickled = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if new_pickled != pickled:
+            super().__setitem__(i_step, _EvictedStep(self.history_file.write(new_pickled)))
+
+    def write_back(self):
+        """
+        Writes the modified loaded steps back to the file and drops all of them from memory.
+        """
+        with self.lock:
+            while self.loaded:
+                self.unload(*self.loaded.popitem(last=False))
+
+    def evict(self):
+        """
+        Moves to disk the steps older than the last ``n_resident``, except for the first one.
+        """
+        for i_step in range(max(self.n_evicted, 1), len(self) - self.n_resident):
+            value = super().__getitem__(i_step)
+            if value is None or isinstance(value, _EvictedStep):
+                continue
+            super().__setitem__(i_step, _EvictedStep(
+                self.history_file.write(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))))
+        self.n_evicted = max(self.n_evicted, len(self) - self.n_resident)
+
+    def close(self):
+        """
+        Closes and removes the file with the evicted steps, which are then no longer available.
+        """
+        self.loaded.clear()
+        self.history_file.close()
+
+
+def _restore_time_step_history(steps, n_resident, filename):
+    return TimeStepHistory(steps, n_resident, filename, history_file=_HistoryFile(filename, overwrite=False))
+
+
+class _HistoryFile(object):
+    """
+    File of pickled time steps of a :class:`TimeStepHistory`, opened when the first step is written or read.
+
+    Args:
+        filename (str): Path to the file.
+        overwrite (bool): Start a new file rather than appending to an existing one. Only a history file that
+            started a new file removes it when closed.
+    """
+
+    def __init__(self, filename, overwrite=True):
+        self.filename = filename
+        self.overwrite = overwrite
+        self.file = None
+        self.closed = False
+        # the file may be read by the asynchronous postprocessors while the solver evicts steps
+        self.lock = threading.Lock()
+
+    def open(self):
+        if self.closed:
+            raise ValueError('The time step history file %s has been closed' % self.filename)
+        if self.file is None:
+            if self.overwrite or not os.path.isfile(self.filename):
+                os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+                self.file = open(self.filename, 'w+b')
+            else:
+                self.file = open(self.filename, 'r+b')
+        return self.file
+
+    def write(self, pickled):
+        """
+        Appends a pickled step to the file.
+
+        Returns:
+            int: Offset of the step in the file
+        """
+        with self.lock:
+            file = self.open()
+            file.seek(0, os.SEEK_END)
+            offset = file.tell()
+            file.write(pickled)
+            file.flush()
+        return offset
+
+    def read(self, offset):
+        with self.lock:
+            file = self.open()
+            file.seek(offset)
+            return pickle.load(file)
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            if self.overwrite and not self.closed and os.path.isfile(self.filename):
+                os.remove(self.filename)
+            self.closed = True
+
+
+class _EvictedStep(object):
+    """Placeholder of a step moved to disk, with its offset in the ``TimeStepHistory`` file."""
+
+    __slots__ = ('offset',)
+
+    def __init__(self, offset):
+        self.offset = offset
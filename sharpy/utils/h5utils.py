@@ -196,6 +196,237 @@ class ReadInto:
     pass
 
 
+def readh5_lazy(filename, GroupName=None):
+    """
+    Open the HDF5 file 'filename' for lazy reading.
+
+    The groups and datasets are exposed with the same attribute paths as in :func:`readh5`, but as proxies backed by
+    the ``h5py`` objects, such that nothing is read until a dataset is indexed. For instance,
+    ``readh5_lazy(f).data.structure.timestep_info[-1].pos[:, 2]`` only reads the vertical coordinate of the nodes at
+    the last time step.
+
+    The file is kept open while the returned object is in use. It can be closed with its ``close`` method or used as
+    a context manager.
+
+    Args:
+        filename (str): path to the HDF5 file
+        GroupName (str): if given, return directly the proxy of the group with this name
+
+    Returns:
+        LazyFile or LazyGroup: Proxy of the file or of the group ``GroupName``
+    """
+    check_file_exists(filename)
+    lazy_file = LazyFile(filename)
+    if GroupName is None:
+        return lazy_file
+    return lazy_file[GroupName]
+
+
+class LazyFile(object):
+    """
+    Lazy proxy of a SHARPy HDF5 file. See :func:`readh5_lazy`.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.hdfile = h5.File(filename, 'r')
+        self.root = LazyGroup(self.hdfile)
+
+    def __getattr__(self, name):
+        if name in ('hdfile', 'root', 'filename'):
+            raise AttributeError(name)
+        return getattr(self.root, name)
+
+    def __getitem__(self, key):
+        return self.root[key]
+
+    def __dir__(self):
+        return list(self.root.keys())
+
+    def keys(self):
+        return self.root.keys()
+
+    def close(self):
+        self.hdfile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class LazyGroup(object):
+    """
+    Lazy proxy of a group written by :func:`add_as_grp`.
+
+    Groups saved from classes and dictionaries expose their members as attributes and items. Groups saved from lists
+    and tuples support ``len``, integer indexing and iteration. Members are returned as :class:`LazyGroup` or
+    :class:`LazyDataset` proxies, except for scalar datasets, which are read directly.
+    """
+
+    def __init__(self, grp):
+        self.grp = grp
+        self.read_as = 'class'
+        if '_read_as' in grp:
+            self.read_as = decode_string(grp['_read_as'][()])
+
+    def keys(self):
+        return [name for name in self.grp.keys() if name != '_read_as']
+
+    def __dir__(self):
+        return self.keys()
+
+    def __len__(self):
+        if self.read_as in ('list', 'tuple') and '_as_array' in self.grp:
+            return self.grp['_as_array'].shape[0]
+        return len(self.keys())
+
+    def _child(self, name):
+        item = self.grp[name]
+        if isinstance(item, h5.Group):
+            return LazyGroup(item)
+        if item.shape == ():
+            return item[()]
+        return LazyDataset(item)
+
+    def __getattr__(self, name):
+        if name in ('grp', 'read_as'):
+            raise AttributeError(name)
+        try:
+            return self._child(name)
+        except KeyError:
+            raise AttributeError('%s has no member %s' % (self.grp.name, name))
+
+    def __getitem__(self, key):
+        if self.read_as in ('list', 'tuple') and not isinstance(key, str):
+            if isinstance(key, slice):
+                return [self[i_item] for i_item in range(*key.indices(len(self)))]
+            n_items = len(self)
+            if key < 0:
+                key += n_items
+            if key < 0 or key >= n_items:
+                raise IndexError('%s index out of range' % self.grp.name)
+            if '_as_array' in self.grp:
+                return self.grp['_as_array'][key]
+            return self._child('%.5d' % key)
+        return self._child(key)
+
+    def __iter__(self):
+        if self.read_as in ('list', 'tuple'):
+            for i_item in range(len(self)):
+                yield self[i_item]
+        else:
+            for name in self.keys():
+                yield name
+
+    def close(self):
+        """
+        Closes the file the group belongs to.
+        """
+        self.grp.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def time_history(self, path, index=Ellipsis, steps=None):
+        """
+        Assemble the history of a variable across the members of a list group, such as ``timestep_info``.
+
+        Only the requested slice of the variable is read at each step, the rest of the step groups is not touched.
+        Steps not saved as groups (for example ``None`` entries) are skipped.
+
+        Args:
+            path (str): Path of the variable within each member, with levels separated by ``.`` or ``/``,
+              for instance ``'pos'`` or ``'forces.00000'``.
+            index: Slice of the variable to read at each step. Reads the whole variable by default.
+            steps (list): Steps to read. All the steps by default.
+
+        Returns:
+            tuple: ``(steps, history)`` with the steps read and an array with the step as first dimension.
+        """
+        if steps is None:
+            steps = range(len(self))
+        keys = path.replace('/', '.').split('.')
+
+        read_steps = []
+        history = []
+        for i_step in steps:
+            member = self[i_step]
+            if not isinstance(member, LazyGroup):
+                continue
+            for key in keys:
+                if isinstance(member, LazyGroup) and member.read_as in ('list', 'tuple') and key.isdigit():
+                    member = member[int(key)]
+                else:
+                    member = member[key]
+            if isinstance(member, LazyDataset):
+                member = member[index]
+            elif index is not Ellipsis:
+                member = np.asarray(member)[index]
+            read_steps.append(i_step)
+            history.append(member)
+
+        return np.array(read_steps, dtype=int), np.array(history)
+
+
+class LazyDataset(object):
+    """
+    Lazy proxy of an HDF5 dataset. Data is only read from the file when the proxy is indexed or converted to an array.
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    @property
+    def shape(self):
+        return self.dataset.shape
+
+    @property
+    def dtype(self):
+        return self.dataset.dtype
+
+    @property
+    def ndim(self):
+        return self.dataset.ndim
+
+    def __len__(self):
+        return self.dataset.shape[0]
+
+    def __getitem__(self, item):
+        return self.dataset[item]
+
+    def __array__(self, dtype=None, copy=None):
+        value = self.dataset[()]
+        if dtype is not None:
+            value = value.astype(dtype)
+        return value
+
+    def memmap(self):
+        """
+        Maps the dataset to memory without reading it.
+
+        Only contiguous, uncompressed datasets can be mapped. Otherwise the dataset is read.
+
+        Returns:
+            np.ndarray: Memory map of the dataset, or its values if it cannot be mapped.
+        """
+        offset = self.dataset.id.get_offset()
+        if offset is None or self.dataset.chunks is not None or self.dataset.dtype.kind not in 'biufc':
+            return self.dataset[()]
+        return np.memmap(self.dataset.file.filename, dtype=self.dataset.dtype, mode='r',
+                         offset=offset, shape=self.dataset.shape, order='C')
+
+
+def decode_string(value):
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
+
+
 # ---------------------------------------------------------------- Saving tools
 
 
@@ -413,3 +644,91 @@ def save_list_as_array(list_obj, grp_target, compress_float=False):
 
                 return True
     return False
+
+
+class TimeSeriesWriter(object):
+    """
+    Appends time histories to a HDF5 group as extendible datasets with a leading time axis.
+
+    Each variable is stored in a chunked dataset of shape ``(n_steps, *shape)`` that is created the first time the
+    variable is appended and then grown by one slab per time step, such that the cost of writing a step does not
+    depend on the number of steps already written and the history of a variable is read back in a single slice.
+
+    Args:
+        grp (h5py.Group): Parent group of the time series datasets.
+        chunk_steps (int): Number of time steps per chunk.
+        compression (str): ``h5py`` compression filter (``'gzip'`` or ``'lzf'``). ``None`` for no compression.
+        compress_float (bool): Save 64-bit floats in single precision.
+    """
+
+    def __init__(self, grp, chunk_steps=100, compression=None, compress_float=False):
+        self.grp = grp
+        self.chunk_steps = max(chunk_steps, 1)
+        self.compression = compression
+        self.compress_float = compress_float
+        self.datasets = dict()
+
+    def append(self, name, value):
+        """
+        Appends one time step of a variable.
+
+        Lists and tuples of arrays (such as the per-surface aerodynamic variables) are appended as one dataset per
+        element, named ``name/00000``, ``name/00001``...
+
+        Args:
+            name (str): Dataset path relative to the group.
+            value (np.ndarray or float or list): Value of the variable at the current step.
+        """
+        if isinstance(value, (list, tuple)):
+            for i_elem, elem in enumerate(value):
+                self.append(name + '/%05d' % i_elem, elem)
+            return
+
+        if isinstance(value, (ct.c_bool, ct.c_double, ct.c_int)):
+            value = value.value
+        value = np.asarray(value)
+        if value.size == 0:
+            return
+
+        try:
+            dataset = self.datasets[name]
+        except KeyError:
+            dtype = value.dtype
+            if self.compress_float and dtype == float64:
+                dtype = float32
+            if name in self.grp:
+                dataset = self.grp[name]
+            else:
+                dataset = self.grp.create_dataset(name,
+                                                  shape=(0,) + value.shape,
+                                                  maxshape=(None,) + value.shape,
+                                                  chunks=(self.chunk_steps,) + value.shape,
+                                                  dtype=dtype,
+                                                  compression=self.compression)
+            self.datasets[name] = dataset
+
+        n_steps = dataset.shape[0]
+        dataset.resize(n_steps + 1, axis=0)
+        dataset[n_steps] = value
+
+    def extend(self, name, values):
+        """
+        Appends several time steps of a variable in a single write.
+
+        Args:
+            name (str): Dataset path relative to the group.
+            values (np.ndarray): Values of the variable with the time step as first dimension.
+        """
+        values = np.asarray(values)
+        if values.shape[0] == 0 or values[0].size == 0:
+            return
+        if name not in self.datasets:
+            self.append(name, values[0])
+            values = values[1:]
+            if values.shape[0] == 0:
+                return
+
+        dataset = self.datasets[name]
+        n_steps = dataset.shape[0]
+        dataset.resize(n_steps + values.shape[0], axis=0)
+        dataset[n_steps:] = values
@@ -39,6 +39,9 @@ class BaseSolver(metaclass=ABCMeta):
     settings_description = dict()
     settings_default = dict()
 
+    # Postprocessors that modify the time step history are not run in the background (see postprocessors_async)
+    modifies_history = False
+
     # Solver id for populating available_solvers[]
     @property
     def solver_id(self):
@@ -54,6 +57,10 @@ class BaseSolver(metaclass=ABCMeta):
     def run(self):
         pass
 
+    # Releases the resources kept between online runs, called at the end of the time stepping loop
+    def finalise(self):
+        pass
+
     # @property
     def __doc__(self):
         # Generate documentation table
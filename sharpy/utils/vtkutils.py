@@ -0,0 +1,219 @@
+"""VTK Output Utilities
+
+Array helpers and writers shared by the ``AerogridPlot`` and ``BeamPlot`` postprocessors.
+
+The grids are described as plain arrays (``points``, ``connectivity`` and dictionaries of point and cell data) that
+can be written as binary appended ``.vtu`` files with :func:`write_vtu` or added to an XDMF time series stored in a
+single HDF5 file with :class:`XdmfTimeSeries`.
+"""
+import os
+import numpy as np
+import h5py as h5
+
+
+def quad_connectivity(m, n):
+    """
+    Connectivity of the quadrilateral panels of a structured ``m x n`` panel grid.
+
+    Nodes and panels are numbered with the chordwise index running fastest, as in :func:`grid_points`.
+
+    Args:
+        m (int): Number of chordwise panels
+        n (int): Number of spanwise panels
+
+    Returns:
+        np.ndarray: ``(m*n, 4)`` array of node indices of each panel
+    """
+    i_n, i_m = np.meshgrid(np.arange(n), np.arange(m), indexing='ij')
+    first_node = (i_n * (m + 1) + i_m).ravel()
+    return np.column_stack((first_node,
+                            first_node + 1,
+                            first_node + m + 2,
+                            first_node + m + 1))
+
+
+def grid_points(grid):
+    """
+    Flattens a nodal variable of a structured grid into point data.
+
+    Args:
+        grid (np.ndarray): ``(k, m + 1, n + 1)`` array, such as ``zeta[i_surf]``, or ``(m + 1, n + 1)`` for scalars
+
+    Returns:
+        np.ndarray: ``((m + 1)*(n + 1), k)`` (or ``((m + 1)*(n + 1),)``) array with the chordwise index running fastest
+    """
+    if grid.ndim == 2:
+        return grid.T.ravel()
+    return grid.transpose(2, 1, 0).reshape(-1, grid.shape[0])
+
+
+def merge_grids(grids):
+    """
+    Merges several grids with the same data arrays into a single one.
+
+    Args:
+        grids (list(dict)): Grids with ``points``, ``connectivity``, ``cell_data`` and ``point_data`` entries
+
+    Returns:
+        dict: Merged grid
+    """
+    merged = {'points': np.concatenate([grid['points'] for grid in grids]),
+              'cell_type': grids[0]['cell_type'],
+              'vectors': grids[0].get('vectors', dict()),
+              'cell_data': dict(),
+              'point_data': dict()}
+    offsets = np.cumsum([0] + [grid['points'].shape[0] for grid in grids[:-1]])
+    merged['connectivity'] = np.concatenate([grid['connectivity'] + offset for grid, offset in zip(grids, offsets)])
+    for data_type in ['cell_data', 'point_data']:
+        for name in grids[0][data_type]:
+            merged[data_type][name] = np.concatenate([grid[data_type][name] for grid in grids])
+    return merged
+
+
+def write_vtu(grid, filename):
+    """
+    Writes a grid to a binary appended ``.vtu`` file.
+
+    Args:
+        grid (dict): Grid with ``points``, ``connectivity``, ``cell_type`` (``'quad'``, ``'line'`` or ``'vertex'``), ``cell_data``
+          and ``point_data`` entries. The first array of each data dictionary is set as the active scalars. The
+          optional ``vectors`` entry, as ``{'cell_data': name, 'point_data': name}``, sets the active vectors.
+        filename (str): File name, without extension
+    """
+    from tvtk.api import tvtk
+    from tvtk.common import configure_input
+
+    cell_types = {'quad': tvtk.Quad().cell_type,
+                  'line': tvtk.Line().cell_type,
+                  'vertex': tvtk.Vertex().cell_type}
+
+    ug = tvtk.UnstructuredGrid(points=grid['points'])
+    ug.set_cells(cell_types[grid['cell_type']], grid['connectivity'])
+    vectors = grid.get('vectors', dict())
+    for vtk_data, data_type in [(ug.cell_data, 'cell_data'), (ug.point_data, 'point_data')]:
+        for i_array, (name, values) in enumerate(grid[data_type].items()):
+            values = np.ascontiguousarray(values)
+            if i_array == 0:
+                vtk_data.scalars = values
+                vtk_data.scalars.name = name
+            elif name == vectors.get(data_type):
+                vtk_data.vectors = values
+                vtk_data.vectors.name = name
+            else:
+                index = vtk_data.add_array(values)
+                vtk_data.get_array(index).name = name
+
+    writer = tvtk.XMLUnstructuredGridWriter(file_name=filename + '.vtu')
+    writer.set_data_mode_to_appended()
+    writer.encode_appended_data = False
+    configure_input(writer, ug)
+    writer.write()
+
+
+class XdmfTimeSeries(object):
+    """
+    Time series of grids stored in a single HDF5 file and described by an XDMF file that ParaView can open.
+
+    The connectivity of each grid is saved once and only saved again when it changes (for example, when a wake grows),
+    while the points and data arrays of every time step are saved as datasets in ``/<grid>/<ts>/``. The ``.xmf`` file is updated after every time step by
+    rewriting only its closing tags, hence its cost does not grow with the number of time steps.
+
+    Args:
+        filename (str): File name, without extension. ``<filename>.h5`` and ``<filename>.xmf`` are overwritten.
+    """
+    xdmf_types = {'quad': 'TopologyType="Quadrilateral"',
+                  'line': 'TopologyType="Polyline" NodesPerElement="%u"',
+                  'vertex': 'TopologyType="Polyvertex" NodesPerElement="%u"'}
+    # attribute types of the arrays with several components per point or cell, by number of components. Six component
+    # arrays (forces and moments) are not Tensor6, which XDMF reads as a symmetric tensor, and are written as Matrix
+    attribute_types = {3: 'Vector',
+                       9: 'Tensor'}
+    footer = '  </Grid>\n </Domain>\n</Xdmf>\n'
+
+    def __init__(self, filename):
+        self.h5_filename = filename + '.h5'
+        self.h5_name = os.path.basename(self.h5_filename)
+        self.h5file = h5.File(self.h5_filename, 'w')
+        self.connectivity = dict()
+        self.xmf = open(filename + '.xmf', 'w')
+        self.xmf.write('<?xml version="1.0" ?>\n'
+                       '<Xdmf Version="3.0">\n'
+                       ' <Domain>\n'
+                       '  <Grid Name="TimeSeries" GridType="Collection" CollectionType="Temporal">\n')
+        self.footer_position = self.xmf.tell()
+        self.write_footer()
+
+    def write_footer(self):
+        self.xmf.seek(self.footer_position)
+        self.xmf.write(self.footer)
+        self.xmf.truncate()
+        self.xmf.flush()
+
+    def data_item(self, path, values):
+        values = np.asarray(values)
+        if values.dtype.kind in 'iub':
+            number_type = 'NumberType="Int" Precision="%u"' % values.dtype.itemsize
+        else:
+            number_type = 'NumberType="Float" Precision="%u"' % values.dtype.itemsize
+        if path not in self.h5file:
+            self.h5file.create_dataset(path, data=values)
+        return ('<DataItem Dimensions="%s" %s Format="HDF">%s:%s</DataItem>' %
+                (' '.join(str(dim) for dim in values.shape), number_type, self.h5_name, path))
+
+    def connectivity_item(self, ts, name, connectivity):
+        try:
+            last_connectivity, path = self.connectivity[name]
+        except KeyError:
+            last_connectivity, path = None, None
+        if not (connectivity is last_connectivity or
+                (last_connectivity is not None and np.array_equal(connectivity, last_connectivity))):
+            path = '/%s/connectivity_%06u' % (name, ts)
+            self.connectivity[name] = (connectivity, path)
+        return self.data_item(path, connectivity)
+
+    def add_step(self, ts, time, grids):
+        """
+        Adds a time step to the series.
+
+        Args:
+            ts (int): Time step index
+            time (float): Time value shown in ParaView
+            grids (dict): Grids of the time step, as ``{name: grid}`` with the format of :func:`write_vtu`
+        """
+        lines = ['   <Grid Name="ts_%06u" GridType="Collection" CollectionType="Spatial">' % ts,
+                 '    <Time Value="%.12g"/>' % time]
+        for name, grid in grids.items():
+            connectivity = np.asarray(grid['connectivity'])
+            topology = self.xdmf_types[grid['cell_type']]
+            if '%u' in topology:
+                topology = topology % connectivity.shape[1]
+            lines.append('    <Grid Name="%s" GridType="Uniform">' % name)
+            lines.append('     <Topology %s NumberOfElements="%u">' % (topology, connectivity.shape[0]))
+            lines.append('      ' + self.connectivity_item(ts, name, grid['connectivity']))
+            lines.append('     </Topology>')
+            lines.append('     <Geometry GeometryType="XYZ">')
+            lines.append('      ' + self.data_item('/%s/%06u/points' % (name, ts), grid['points']))
+            lines.append('     </Geometry>')
+            for center, data in [('Cell', grid['cell_data']), ('Node', grid['point_data'])]:
+                for data_name, values in data.items():
+                    values = np.asarray(values)
+                    if values.ndim == 1:
+                        attribute_type = 'Scalar'
+                    else:
+                        attribute_type = self.attribute_types.get(values.shape[1], 'Matrix')
+                    lines.append('     <Attribute Name="%s" AttributeType="%s" Center="%s">' %
+                                 (data_name, attribute_type, center))
+                    lines.append('      ' + self.data_item('/%s/%06u/%s' % (name, ts, data_name), values))
+                    lines.append('     </Attribute>')
+            lines.append('    </Grid>')
+        lines.append('   </Grid>')
+
+        self.xmf.seek(self.footer_position)
+        self.xmf.write('\n'.join(lines) + '\n')
+        self.footer_position = self.xmf.tell()
+        self.write_footer()
+        self.h5file.flush()
+
+    def close(self):
+        self.xmf.close()
+        self.h5file.close()
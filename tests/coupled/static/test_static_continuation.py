@@ -0,0 +1,71 @@
+import numpy as np
+import importlib
+import unittest
+import os
+
+
+class TestStaticContinuation(unittest.TestCase):
+    """
+    Marches the angle of attack of the Smith wing (no gravity) up to 2 degrees and compares the last point of the
+    branch with the direct ``StaticCoupled`` solution at 2 degrees.
+    """
+
+    case = 'smith_nog_2deg'
+    route = os.path.abspath(os.path.dirname(os.path.realpath(__file__)) + '/' + case)
+
+    @classmethod
+    def setUpClass(cls):
+        importlib.import_module('tests.coupled.static.' + cls.case + '.generate_' + cls.case)
+
+    def write_solver_file(self, flow, name, extra_settings=None):
+        import configobj
+        config = configobj.ConfigObj(self.route + '/' + self.case + '.sharpy')
+        config.filename = self.route + '/' + name + '.sharpy'
+        config['SHARPy']['flow'] = flow
+        if extra_settings is not None:
+            config.update(extra_settings)
+        config.write()
+        return config.filename
+
+    def test_alpha_continuation(self):
+        import sharpy.sharpy_main
+        import configobj
+
+        alpha_values = np.deg2rad([0., 1., 2.])
+        direct_file = self.write_solver_file(['BeamLoader', 'AerogridLoader', 'StaticCoupled'],
+                                             self.case + '_direct')
+        direct = sharpy.sharpy_main.main(['', direct_file])
+
+        coupled_settings = configobj.ConfigObj(direct_file)['StaticCoupled'].dict()
+        # a load ramp in the wrapped solver is overridden by the continuation
+        coupled_settings['n_load_steps'] = 4
+        continuation_file = self.write_solver_file(
+            ['BeamLoader', 'AerogridLoader', 'StaticContinuation'],
+            self.case + '_continuation',
+            {'StaticContinuation': {'print_info': 'off',
+                                    'solver': 'StaticCoupled',
+                                    'solver_settings': coupled_settings,
+                                    'parameter': 'alpha',
+                                    'parameter_values': alpha_values.tolist(),
+                                    'predictor': 'on',
+                                    'folder': self.route + '/output/'}})
+        continuation = sharpy.sharpy_main.main(['', continuation_file])
+
+        np.testing.assert_allclose(continuation.structure.timestep_info[-1].pos[20, :],
+                                   direct.structure.timestep_info[-1].pos[20, :],
+                                   rtol=1e-3, atol=1e-4)
+
+        import h5py
+        branch_file = self.route + '/output/' + self.case + '/continuation/' + self.case + '.continuation.h5'
+        with h5py.File(branch_file, 'r') as branch:
+            np.testing.assert_allclose(branch['parameter'][:], alpha_values)
+
+    @classmethod
+    def tearDownClass(cls):
+        for name in [cls.case + '_direct', cls.case + '_continuation']:
+            if os.path.isfile(cls.route + '/' + name + '.sharpy'):
+                os.remove(cls.route + '/' + name + '.sharpy')
+
+
+if __name__ == '__main__':
+    unittest.main()
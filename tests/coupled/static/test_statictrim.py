@@ -0,0 +1,130 @@
+import numpy as np
+import unittest
+import sharpy.utils.cout_utils as cout
+import sharpy.utils.settings as settings
+import sharpy.solvers.statictrim as statictrim
+
+
+class AnalyticState(object):
+
+    def __init__(self, x=None):
+        self.x = np.zeros((3,)) if x is None else np.array(x, dtype=float)
+
+    def copy(self):
+        return AnalyticState(self.x)
+
+
+class AnalyticData(object):
+
+    class Structure(object):
+        pass
+
+    def __init__(self):
+        self.structure = self.Structure()
+        self.structure.ini_info = AnalyticState()
+        self.structure.timestep_info = [AnalyticState()]
+
+
+class AnalyticSolver(object):
+    """
+    Stand-in for the static coupled solver with an analytic, mildly nonlinear and coupled residual of the trim
+    inputs. The residual also depends weakly on the structural state the evaluation starts from, so that
+    evaluations that do not start from the intended state give different results.
+    """
+    x_trim = np.array([0.05, 0.1, 3.])
+    jacobian = np.array([[200., 5., 0.1],
+                         [-10., -50., 0.],
+                         [-2., 0., 1.]])
+
+    def __init__(self, data):
+        self.data = data
+        self.inputs = None
+        self.start = None
+
+    def change_trim(self, alpha, thrust, thrust_nodes, tail_deflection, tail_cs_index, warm_start=False):
+        if warm_start:
+            start = self.data.structure.timestep_info[-1].copy()
+        else:
+            start = self.data.structure.ini_info.copy()
+        self.data.structure.timestep_info = [start]
+        self.start = start.x.copy()
+        self.inputs = np.array([alpha, alpha + tail_deflection, thrust])
+
+    def run(self):
+        self.data.structure.timestep_info[-1].x = self.inputs.copy()
+        return self.data
+
+    def extract_resultants(self):
+        dx = self.inputs - self.x_trim
+        f = self.jacobian.dot(dx) + 10.*dx[0]**2 + 1e-2*np.sum(self.start - self.x_trim)*dx
+        forces = np.array([f[2], 0., f[0]])
+        moments = np.array([0., f[1], 0.])
+        return forces, moments
+
+
+class TestStaticTrim(unittest.TestCase):
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+
+    def build_trim(self, trim_settings):
+        trim = statictrim.StaticTrim()
+        trim.settings = dict(trim_settings)
+        trim.settings.setdefault('initial_thrust', 2.)
+        trim.settings.setdefault('initial_angle_eps', 0.01)
+        trim.settings.setdefault('initial_thrust_eps', 0.5)
+        trim.settings.setdefault('fz_tolerance', 1e-6)
+        trim.settings.setdefault('m_tolerance', 1e-6)
+        trim.settings.setdefault('fx_tolerance', 1e-6)
+        settings.to_custom_types(trim.settings, trim.settings_types, trim.settings_default,
+                                 options=trim.settings_options)
+        trim.data = AnalyticData()
+        trim.solver = AnalyticSolver(trim.data)
+        trim.table = cout.TablePrinter(10, 8, ['g', 'f', 'f', 'f', 'f', 'f', 'f', 'f', 'f', 'f'])
+        return trim
+
+    def test_jacobian_update(self):
+        for jacobian_update in ['diagonal', 'broyden', 'finite_differences']:
+            with self.subTest(jacobian_update=jacobian_update):
+                trim = self.build_trim({'jacobian_update': jacobian_update,
+                                        'relaxation_factor': 0.})
+                trim.trim_algorithm()
+                np.testing.assert_allclose(trim.trimmed_values, AnalyticSolver.x_trim, atol=1e-4)
+
+    def test_relaxation_factor(self):
+        relaxation_factor = 0.4
+        trim = self.build_trim({'jacobian_update': 'broyden',
+                                'relaxation_factor': relaxation_factor})
+        trim.trim_algorithm()
+        np.testing.assert_allclose(trim.trimmed_values, AnalyticSolver.x_trim, atol=1e-4)
+
+        # the first Newton step is scaled by 1 - relaxation_factor
+        x0 = np.array(trim.input_history[0])
+        newton_step = np.array(trim.input_history[1]) - x0
+        trim_full = self.build_trim({'jacobian_update': 'broyden',
+                                     'relaxation_factor': 0.})
+        trim_full.trim_algorithm()
+        np.testing.assert_allclose(newton_step,
+                                   (1. - relaxation_factor)*(np.array(trim_full.input_history[1]) - x0),
+                                   rtol=1e-10)
+
+    def test_parallel_warm_start(self):
+        """
+        With fewer worker processes than perturbations, a worker evaluates several perturbations in sequence. All
+        of them must start from the base solution, as in the serial evaluation.
+        """
+        x = [0.02, 0.03, 2.]
+        jacobians = []
+        for num_cores in [1, 2]:
+            trim = self.build_trim({'warm_start': True,
+                                    'num_cores': num_cores})
+            trim.data.structure.timestep_info[-1].x = np.array([0.04, 0.08, 2.5])
+            f = trim.evaluate(*x)
+            trim.evaluate_gradients(x, f)
+            jacobians.append(trim.jacobian)
+
+        np.testing.assert_allclose(jacobians[1], jacobians[0], rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
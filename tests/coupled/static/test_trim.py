@@ -0,0 +1,166 @@
+import numpy as np
+import unittest
+import sharpy.utils.cout_utils as cout
+import sharpy.utils.settings as settings
+import sharpy.utils.algebra as algebra
+import sharpy.solvers.trim as trim
+
+
+class RigidState(object):
+
+    def __init__(self, num_node=1):
+        self.quat = np.array([1., 0., 0., 0.])
+        self.pos = np.zeros((num_node, 3))
+        self.steady_applied_forces = np.zeros((num_node, 6))
+        self.gravity_forces = np.zeros((num_node, 6))
+
+    def copy(self):
+        copied = RigidState(self.pos.shape[0])
+        copied.quat = self.quat.copy()
+        copied.pos = self.pos.copy()
+        copied.steady_applied_forces = self.steady_applied_forces.copy()
+        copied.gravity_forces = self.gravity_forces.copy()
+        return copied
+
+
+class RigidAircraftData(object):
+    """
+    Point masses in the ``A`` frame under gravity, with an analytic linear lift and side force and a parabolic drag
+    in terms of the incidence of the free stream on the body, and rolling and yawing moments proportional to the
+    sideslip. The free stream is along the ``G`` frame ``x`` axis.
+    """
+
+    class Container(object):
+        pass
+
+    def __init__(self, masses, positions):
+        self.ts = 0
+        self.structure = self.Container()
+        self.structure.num_node = len(masses)
+        self.structure.ini_info = RigidState(len(masses))
+        self.structure.ini_info.pos[:] = positions
+        self.structure.timestep_info = [self.structure.ini_info.copy()]
+        self.aero = self.Container()
+        self.aero.timestep_info = [None]
+        self.aero.aero_dict = {'control_surface_deflection': np.zeros((0,))}
+
+        self.masses = np.array(masses)
+        self.gravity_g = np.array([0., 0., -9.81])
+
+        # rigid body mass matrix as in the linear beam, with no flexible degrees of freedom
+        self.mass_rr = np.zeros((10, 10))
+        total_mass = np.sum(self.masses)
+        xcg_a = self.masses.dot(positions)/total_mass
+        self.mass_rr[0:3, 0:3] = total_mass*np.eye(3)
+        self.mass_rr[0:3, 3:6] = -total_mass*algebra.skew(xcg_a)
+        self.mass_rr[3:6, 0:3] = total_mass*algebra.skew(xcg_a)
+        self.linear = self.Container()
+        self.linear.linear_system = self.Container()
+        self.linear.linear_system.beam = self.Container()
+        self.linear.linear_system.beam.sys = self.Container()
+        self.linear.linear_system.beam.sys.use_euler = False
+        self.linear.linear_system.beam.sys.Mstr = self.mass_rr
+
+    def update_gravity(self, tstep):
+        cga = algebra.quat2rotation(tstep.quat)
+        tstep.gravity_forces[:, 0:3] = self.masses[:, None]*cga.T.dot(self.gravity_g)[None, :]
+
+    def gravity_totals(self, quat):
+        tstep = self.structure.timestep_info[self.ts].copy()
+        tstep.quat = quat
+        self.update_gravity(tstep)
+        forces = np.sum(tstep.gravity_forces[:, 0:3], axis=0)
+        moments = np.sum(np.cross(tstep.pos, tstep.gravity_forces[:, 0:3]), axis=0)
+        return np.concatenate((forces, moments))
+
+
+class RigidAircraftSolver(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    def run(self):
+        self.data.update_gravity(self.data.structure.timestep_info[self.data.ts])
+        return self.data
+
+    def extract_resultants(self):
+        tstep = self.data.structure.timestep_info[self.data.ts]
+        cga = algebra.quat2rotation(tstep.quat)
+        u_a = cga.T.dot(np.array([10., 0., 0.]))
+        alpha = np.arctan2(u_a[2], u_a[0])
+        beta = np.arcsin(u_a[1]/np.linalg.norm(u_a))
+        aero = np.array([2. + 50.*alpha**2, -30.*beta, 400.*alpha])
+        thrust = np.sum(self.data.structure.ini_info.steady_applied_forces[:, 0:3], axis=0)
+        gravity = np.sum(tstep.gravity_forces[:, 0:3], axis=0)
+        moments = np.array([-20.*beta, 0., 15.*beta]) + np.sum(np.cross(tstep.pos, tstep.gravity_forces[:, 0:3]), axis=0)
+        return aero + thrust + gravity, moments
+
+
+class TestTrim(unittest.TestCase):
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+
+    def build_trim(self, data, trim_settings):
+        solver = trim.Trim()
+        solver.settings = dict(trim_settings)
+        settings.to_custom_types(solver.settings, solver.settings_types, solver.settings_default,
+                                 options=solver.settings_options)
+        solver.data = data
+        solver.solver = RigidAircraftSolver(data)
+        solver.x_info = {'i_alpha': 0,
+                         'i_beta': 1,
+                         'i_roll': 2,
+                         'i_control_surfaces': [],
+                         'control_surfaces_id': [],
+                         'i_thrust': [3],
+                         'thrust_nodes': [0],
+                         'thrust_direction': [np.array([-1., 0., 0.])],
+                         'n_variables': 4}
+        solver.initial_state = np.array([0.02, 0.01, 0.01, 1.])
+        return solver
+
+    def test_gauss_newton(self):
+        data = RigidAircraftData([5., 3.], np.zeros((2, 3)))
+        solver = self.build_trim(data, {'print_info': False,
+                                        'trim_method': 'Gauss-Newton',
+                                        'residual_tolerance': 1e-8,
+                                        'tolerance': 1e-10,
+                                        'fd_angle_step': 1e-4,
+                                        'fd_thrust_step': 1e-2})
+        x = solver.gauss_newton(tolerance=solver.settings['tolerance'].value)
+        np.testing.assert_allclose(solver.evaluate(x), np.zeros((6,)), atol=1e-6)
+        self.assertAlmostEqual(x[solver.x_info['i_beta']], 0., places=6)
+
+    def test_gravity_jacobian(self):
+        """
+        Gravity terms of the angle of attack and sideslip columns of the Jacobian against finite differences of the
+        gravity forces and moments of a set of point masses.
+        """
+        data = RigidAircraftData([5., 3., 2.], np.array([[0., 0., 0.], [1., 2., -0.5], [-1., -2., 0.3]]))
+        solver = self.build_trim(data, {'print_info': False,
+                                        'trim_method': 'Gauss-Newton',
+                                        'jacobian_source': 'linear'})
+        x = np.array([0.1, -0.05, 0.2, 0.])
+        euler = np.array([x[2], x[0], x[1]])
+        # the current state need not be at x
+        data.structure.timestep_info[0].quat = algebra.euler2quat(np.array([0.05, 0.02, 0.]))
+        data.update_gravity(data.structure.timestep_info[0])
+
+        jacobian = np.zeros((6, 4))
+        solver.gravity_jacobian(x, jacobian)
+
+        delta = 1e-6
+        for i_euler, i_var in [(1, 0), (2, 1)]:
+            euler_pert = euler.copy()
+            euler_pert[i_euler] += delta
+            totals_plus = data.gravity_totals(algebra.euler2quat(euler_pert))
+            euler_pert[i_euler] -= 2*delta
+            totals_minus = data.gravity_totals(algebra.euler2quat(euler_pert))
+            np.testing.assert_allclose(jacobian[:, i_var], (totals_plus - totals_minus)/(2*delta),
+                                       rtol=1e-5, atol=1e-6)
+        np.testing.assert_array_equal(jacobian[:, 2:], 0.)
+
+
+if __name__ == '__main__':
+    unittest.main()
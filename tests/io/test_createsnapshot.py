@@ -0,0 +1,145 @@
+import sharpy.utils.cout_utils as cout
+import numpy as np
+import os
+import pickle
+import shutil
+import unittest
+
+
+class TimeStep(object):
+    def __init__(self, i_step):
+        self.pos = np.ones((4, 3)) * i_step
+
+
+class Container(object):
+    def __init__(self):
+        self.timestep_info = []
+
+
+class Data(object):
+    def __init__(self):
+        self.settings = {'SHARPy': {'case': 'snapshot'}}
+        self.ts = 0
+        self.structure = Container()
+        self.aero = Container()
+        self.controller_state = {'integral': 0.}
+
+
+class TestCreateSnapshot(unittest.TestCase):
+    """
+    Saves a simulation with ``CreateSnapshot`` and checks the restored data structure
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/createsnapshot_test/'
+    n_steps = 7
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+        os.makedirs(self.folder, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def run_snapshots(self, snapshot_format):
+        import sharpy.postproc.createsnapshot as createsnapshot
+
+        data = Data()
+        snapshot = createsnapshot.CreateSnapshot()
+        snapshot.initialise(data, {'folder': self.folder,
+                                   'frequency': 2,
+                                   'format': snapshot_format})
+        for ts in range(self.n_steps):
+            data.ts = ts
+            data.structure.timestep_info.append(TimeStep(ts))
+            data.aero.timestep_info.append(TimeStep(-ts))
+            data.controller_state['integral'] += ts
+            snapshot.run(online=True)
+        return data
+
+    def check_restored(self, restored, data):
+        # the last snapshot is at the last time step multiple of the frequency
+        last_ts = 6
+        self.assertEqual(restored.ts, last_ts)
+        self.assertEqual(len(restored.structure.timestep_info), last_ts + 1)
+        self.assertEqual(len(restored.aero.timestep_info), last_ts + 1)
+        for ts in range(last_ts + 1):
+            np.testing.assert_array_equal(restored.structure.timestep_info[ts].pos,
+                                          data.structure.timestep_info[ts].pos)
+            np.testing.assert_array_equal(restored.aero.timestep_info[ts].pos,
+                                          data.aero.timestep_info[ts].pos)
+        # non time step data is that of the last snapshot, not of the first one
+        self.assertEqual(restored.controller_state['integral'], sum(range(last_ts + 1)))
+
+    def test_incremental_round_trip(self):
+        import sharpy.postproc.createsnapshot as createsnapshot
+
+        data = self.run_snapshots('incremental')
+        restored = createsnapshot.load_checkpoint(self.folder + 'snapshot.checkpoint')
+        self.check_restored(restored, data)
+
+        # only the base file of the last checkpoint is kept
+        base_files = [f for f in os.listdir(self.folder + 'snapshot.checkpoint') if f.startswith('base')]
+        self.assertEqual(len(base_files), 1)
+
+        # the symlink points to the checkpoint folder
+        restored = createsnapshot.load_checkpoint(os.path.realpath(self.folder + 'snapshot.snapshot'))
+        self.check_restored(restored, data)
+
+    def test_incremental_restart(self):
+        import sharpy.postproc.createsnapshot as createsnapshot
+
+        data = self.run_snapshots('incremental')
+        restored = createsnapshot.load_checkpoint(self.folder + 'snapshot.checkpoint')
+        restored_base = [f for f in os.listdir(self.folder + 'snapshot.checkpoint') if f.startswith('base')][0]
+
+        # the restarted simulation continues from the last checkpoint and writes to the same folder
+        snapshot = createsnapshot.CreateSnapshot()
+        snapshot.initialise(restored, {'folder': self.folder,
+                                       'frequency': 2,
+                                       'format': 'incremental'})
+        for ts in range(restored.ts + 1, restored.ts + 5):
+            restored.ts = ts
+            restored.structure.timestep_info.append(TimeStep(ts))
+            restored.aero.timestep_info.append(TimeStep(-ts))
+            snapshot.run(online=True)
+
+        reloaded = createsnapshot.load_checkpoint(self.folder + 'snapshot.checkpoint')
+        self.assertEqual(reloaded.ts, 10)
+        self.assertEqual(len(reloaded.structure.timestep_info), 11)
+        for ts in range(11):
+            np.testing.assert_array_equal(reloaded.structure.timestep_info[ts].pos, TimeStep(ts).pos)
+            np.testing.assert_array_equal(reloaded.aero.timestep_info[ts].pos, TimeStep(-ts).pos)
+
+        # the base of the restored checkpoint is replaced as well
+        base_files = [f for f in os.listdir(self.folder + 'snapshot.checkpoint') if f.startswith('base')]
+        self.assertEqual(len(base_files), 1)
+        self.assertNotEqual(base_files[0], restored_base)
+
+    def test_incremental_other_simulation(self):
+        import sharpy.postproc.createsnapshot as createsnapshot
+
+        self.run_snapshots('incremental')
+        # a new simulation from scratch does not append to the previous checkpoint
+        data = self.run_snapshots('incremental')
+        restored = createsnapshot.load_checkpoint(self.folder + 'snapshot.checkpoint')
+        self.check_restored(restored, data)
+
+    def test_pickle_round_trip(self):
+        data = self.run_snapshots('pickle')
+        with open(self.folder + 'snapshot.snapshot', 'rb') as f:
+            restored = pickle.load(f)
+        self.check_restored(restored, data)
+
+    def test_format_options(self):
+        import sharpy.postproc.createsnapshot as createsnapshot
+        import sharpy.utils.exceptions as exceptions
+
+        snapshot = createsnapshot.CreateSnapshot()
+        with self.assertRaises(exceptions.NotValidSetting):
+            snapshot.initialise(Data(), {'folder': self.folder,
+                                         'format': 'h5'})
+
+
+if __name__ == '__main__':
+    unittest.main()
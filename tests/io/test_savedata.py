@@ -0,0 +1,160 @@
+import sharpy.utils.h5utils as h5utils
+import sharpy.utils.cout_utils as cout
+import numpy as np
+import ctypes as ct
+import h5py
+import os
+import shutil
+import unittest
+
+
+class TestTimeSeriesWriter(unittest.TestCase):
+    """
+    Tests the appendable time series written with ``TimeSeriesWriter``
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/savedata_test/'
+
+    def setUp(self):
+        os.makedirs(self.folder, exist_ok=True)
+        self.filename = self.folder + 'timeseries.h5'
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_write_read(self):
+        n_steps = 7
+        with h5py.File(self.filename, 'w') as hdfile:
+            writer = h5utils.TimeSeriesWriter(hdfile.create_group('timeseries'), chunk_steps=3,
+                                              compression='gzip')
+            for i_step in range(n_steps):
+                writer.append('ts', i_step)
+                writer.append('structure/pos', np.ones((5, 3)) * i_step)
+                writer.append('structure/dt', ct.c_double(0.1 * i_step))
+                writer.append('aero/gamma', [np.ones((2, 4)) * i_step, np.ones((3, 4)) * -i_step])
+                writer.append('aero/empty', np.zeros((0,)))
+
+        with h5py.File(self.filename, 'r') as hdfile:
+            grp = hdfile['timeseries']
+            np.testing.assert_array_equal(grp['ts'][:], np.arange(n_steps))
+            self.assertEqual(grp['structure/pos'].shape, (n_steps, 5, 3))
+            self.assertEqual(grp['structure/pos'].chunks, (3, 5, 3))
+            np.testing.assert_array_equal(grp['structure/pos'][:, -1, 2], np.arange(n_steps))
+            np.testing.assert_allclose(grp['structure/dt'][:], 0.1 * np.arange(n_steps))
+            np.testing.assert_array_equal(grp['aero/gamma/00000'][:, 0, 0], np.arange(n_steps))
+            np.testing.assert_array_equal(grp['aero/gamma/00001'][:, 2, 3], -np.arange(n_steps))
+            self.assertNotIn('empty', grp['aero'])
+
+    def test_append_to_existing(self):
+        with h5py.File(self.filename, 'w') as hdfile:
+            writer = h5utils.TimeSeriesWriter(hdfile.create_group('timeseries'), compress_float=True)
+            writer.append('pos', np.zeros((2, 3)))
+
+        with h5py.File(self.filename, 'a') as hdfile:
+            writer = h5utils.TimeSeriesWriter(hdfile['timeseries'])
+            writer.append('pos', np.ones((2, 3)))
+
+        with h5py.File(self.filename, 'r') as hdfile:
+            self.assertEqual(hdfile['timeseries/pos'].dtype, np.float32)
+            np.testing.assert_array_equal(hdfile['timeseries/pos'][:, 0, 0], [0., 1.])
+
+
+class TestSaveDataColumnar(unittest.TestCase):
+    """
+    Writes the time steps of a small structural and aerodynamic problem with the ``columnar`` layout of ``SaveData``
+    and reads them back
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/savedata_test/'
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+        os.makedirs(self.folder, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    @staticmethod
+    def build_data(n_steps):
+        import sharpy.presharpy.presharpy as presharpy
+        import sharpy.structure.models.beam as beam
+        import sharpy.aero.models.aerogrid as aerogrid
+        import sharpy.utils.datastructures as datastructures
+
+        data = presharpy.PreSharpy.__new__(presharpy.PreSharpy)
+        data.settings = {'SHARPy': {'case': 'columnar'}}
+        data.ts = 0
+
+        data.structure = beam.Beam.__new__(beam.Beam)
+        data.structure.num_node = 5
+        data.structure.timestep_info = []
+        data.aero = aerogrid.Aerogrid.__new__(aerogrid.Aerogrid)
+        data.aero.aero_dimensions = np.array([[2, 3], [1, 3]])
+        data.aero.timestep_info = []
+        for i_step in range(n_steps):
+            struct_tstep = datastructures.StructTimeStepInfo(5, 2, num_dof=ct.c_int(24))
+            struct_tstep.pos[:, 1] = i_step
+            struct_tstep.for_vel[0] = -i_step
+            data.structure.timestep_info.append(struct_tstep)
+            aero_tstep = datastructures.AeroTimeStepInfo(data.aero.aero_dimensions, data.aero.aero_dimensions)
+            for i_surf in range(aero_tstep.n_surf):
+                aero_tstep.gamma.append(np.ones(data.aero.aero_dimensions[i_surf]) * i_step * (i_surf + 1))
+            data.aero.timestep_info.append(aero_tstep)
+        return data
+
+    def test_round_trip(self):
+        import sharpy.postproc.savedata as savedata
+
+        n_steps = 4
+        data = self.build_data(n_steps)
+        saver = savedata.SaveData()
+        saver.initialise(data, {'folder': self.folder,
+                                'layout': 'columnar',
+                                'struct_variables': ['pos', 'for_vel'],
+                                'aero_variables': ['gamma'],
+                                'chunk_steps': 2})
+        for ts in range(n_steps):
+            data.ts = ts
+            saver.run(online=True)
+        saver.finalise()
+
+        with h5py.File(saver.filename, 'r') as hdfile:
+            self.assertNotIn('timestep_info', hdfile['data/structure'])
+            grp = hdfile['timeseries']
+            np.testing.assert_array_equal(grp['ts'][:], np.arange(n_steps))
+            self.assertEqual(grp['structure/pos'].shape, (n_steps, 5, 3))
+            for ts in range(n_steps):
+                np.testing.assert_array_equal(grp['structure/pos'][ts], data.structure.timestep_info[ts].pos)
+                np.testing.assert_array_equal(grp['structure/for_vel'][ts],
+                                              data.structure.timestep_info[ts].for_vel)
+                for i_surf in range(2):
+                    np.testing.assert_array_equal(grp['aero/gamma/%05d' % i_surf][ts],
+                                                  data.aero.timestep_info[ts].gamma[i_surf])
+
+    def test_offline_after_online(self):
+        import sharpy.postproc.savedata as savedata
+
+        n_steps = 3
+        data = self.build_data(n_steps)
+        saver = savedata.SaveData()
+        saver.initialise(data, {'folder': self.folder,
+                                'layout': 'columnar',
+                                'save_aero': False,
+                                'struct_variables': ['pos']})
+        # the offline call at the end of the simulation writes the remaining steps once and closes the file
+        data.ts = 0
+        saver.run(online=True)
+        data.ts = n_steps - 1
+        saver.run(online=False)
+        self.assertIsNone(saver.hdfile)
+
+        with h5py.File(saver.filename, 'r') as hdfile:
+            np.testing.assert_array_equal(hdfile['timeseries/ts'][:], np.arange(n_steps))
+            np.testing.assert_array_equal(hdfile['timeseries/structure/pos'][:, 0, 1], np.arange(n_steps))
+            self.assertNotIn('aero', hdfile['timeseries'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sharpy.utils.cout_utils as cout
+import numpy as np
+import gc
+import os
+import shutil
+import unittest
+
+
+class TimeStep(object):
+    def __init__(self, i_step):
+        self.for_pos = np.arange(6) + i_step
+        self.pos = np.ones((4, 3)) * i_step
+
+
+class Structure(object):
+    def __init__(self):
+        self.timestep_info = []
+
+
+class Data(object):
+    def __init__(self):
+        self.settings = {'SHARPy': {'case': 'variables'}}
+        self.ts = 0
+        self.structure = Structure()
+
+
+class TestWriteVariablesTime(unittest.TestCase):
+    """
+    Checks the contents of the output files after online runs, whether or not the postprocessor is finalised
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/writevariablestime_test/'
+    n_steps = 5
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+        os.makedirs(self.folder, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def run_online(self, custom_settings):
+        import sharpy.postproc.writevariablestime as writevariablestime
+
+        data = Data()
+        postproc = writevariablestime.WriteVariablesTime()
+        postproc.initialise(data, dict(custom_settings, folder=self.folder,
+                                       FoR_variables=['for_pos'],
+                                       structure_variables=['pos'],
+                                       structure_nodes=[-1],
+                                       cleanup_old_solution=True))
+        for ts in range(self.n_steps):
+            data.ts = ts
+            data.structure.timestep_info.append(TimeStep(ts))
+            postproc.run(online=True)
+        return postproc
+
+    def check_output(self, n_steps, ext='dat'):
+        output = self.folder + 'variables/WriteVariablesTime/'
+        if ext == 'dat':
+            for_pos = np.loadtxt(output + 'FoR_00_for_pos.dat', ndmin=2)
+            pos = np.loadtxt(output + 'struct_pos_node-1.dat', ndmin=2)
+        else:
+            for_pos = np.load(output + 'FoR_00_for_pos.npy')
+            pos = np.load(output + 'struct_pos_node-1.npy')
+        self.assertEqual(for_pos.shape, (n_steps, 7))
+        np.testing.assert_array_equal(for_pos[:, 0], np.arange(n_steps))
+        np.testing.assert_array_equal(for_pos[:, 1:], np.arange(6)[None, :] + np.arange(n_steps)[:, None])
+        np.testing.assert_array_equal(pos[:, 1:], np.arange(n_steps)[:, None] * np.ones((1, 3)))
+
+    def test_default_without_finalise(self):
+        postproc = self.run_online({})
+        self.check_output(self.n_steps)
+        postproc.finalise()
+        self.check_output(self.n_steps)
+
+    def test_buffered_with_finalise(self):
+        for ext in ['dat', 'npy']:
+            with self.subTest(format=ext):
+                postproc = self.run_online({'flush_steps': 3, 'format': ext})
+                # only the first block of steps has been written
+                self.check_output(3, ext)
+                postproc.finalise()
+                self.check_output(self.n_steps, ext)
+
+    def test_buffered_without_finalise(self):
+        postproc = self.run_online({'flush_steps': 3})
+        del postproc
+        gc.collect()
+        self.check_output(self.n_steps)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Test the GEBM-UVLM coupling gains assembled by LinearAeroelastic against the per vertex loop of LinAeroEla
+"""
+import types
+import unittest
+import numpy as np
+
+import sharpy.utils.algebra as algebra
+
+
+class TestAeroelasticGains(unittest.TestCase):
+    """
+    Synthetic model of two surfaces, one on each wing of a five node beam clamped at the root. The root node is
+    shared by both surfaces.
+    """
+
+    num_node = 5
+    M = 3
+
+    def build_model(self, quat, for_vel, track_body, use_euler):
+        np.random.seed(12)
+        num_node = self.num_node
+        M = self.M
+
+        structure = types.SimpleNamespace()
+        structure.num_node = num_node
+        structure.boundary_conditions = np.array([-1, 0, 1, 0, -1])
+        structure.vdof = np.array([0, 1, -1, 2, 3])
+        structure.node_master_elem = np.array([[0, 0], [0, 2], [0, 1], [1, 2], [1, 1]])
+
+        aero = types.SimpleNamespace()
+        # left wing: nodes 0 to 2, right wing: nodes 2 to 4
+        aero.aero_dimensions = np.array([[M, 2], [M, 2]])
+        aero.struct2aero_mapping = [[{'i_surf': 0, 'i_n': 0}],
+                                    [{'i_surf': 0, 'i_n': 1}],
+                                    [{'i_surf': 0, 'i_n': 2}, {'i_surf': 1, 'i_n': 0}],
+                                    [{'i_surf': 1, 'i_n': 1}],
+                                    [{'i_surf': 1, 'i_n': 2}]]
+
+        tsstr = types.SimpleNamespace()
+        tsstr.quat = quat / np.linalg.norm(quat)
+        tsstr.for_vel = for_vel
+        tsstr.pos = np.zeros((num_node, 3))
+        tsstr.pos[:, 1] = np.linspace(-2., 2., num_node)
+        tsstr.pos += 0.05 * np.random.rand(num_node, 3)
+        tsstr.psi = 0.1 * np.random.rand(2, 3, 3)
+        tsstr.psi_dot = 0.1 * np.random.rand(2, 3, 3)
+
+        tsaero = types.SimpleNamespace()
+        tsaero.zeta = []
+        tsaero.zeta_dot = []
+        tsaero.forces = []
+        for i_surf in range(2):
+            zeta = np.zeros((3, M + 1, 3))
+            zeta[0] = np.linspace(0., 1., M + 1)[:, None]
+            zeta[1] = tsstr.pos[2 * i_surf:2 * i_surf + 3, 1][None, :]
+            zeta += 0.05 * np.random.rand(3, M + 1, 3)
+            tsaero.zeta.append(zeta)
+            tsaero.zeta_dot.append(np.random.rand(3, M + 1, 3))
+            tsaero.forces.append(np.random.rand(6, M + 1, 3))
+
+        num_dof_flex = 6 * np.sum(structure.vdof >= 0)
+        num_dof_rig = 9 if use_euler else 10
+        KKzeta = [(M + 1) * 3] * 2
+
+        data = types.SimpleNamespace(structure=structure, aero=aero)
+        return data, tsstr, tsaero, num_dof_flex, num_dof_rig, KKzeta
+
+    def compare_gains(self, quat, for_vel, track_body, use_euler):
+        import sharpy.linear.assembler.linearaeroelastic as linearaeroelastic
+        import sharpy.linear.src.lin_aeroelastic as lin_aeroelastic
+
+        data, tsstr, tsaero, num_dof_flex, num_dof_rig, KKzeta = self.build_model(quat, for_vel,
+                                                                                   track_body, use_euler)
+        num_dof_str = num_dof_flex + num_dof_rig
+        ms = types.SimpleNamespace(KKzeta=KKzeta)
+
+        reference = lin_aeroelastic.LinAeroEla.__new__(lin_aeroelastic.LinAeroEla)
+        reference.data = data
+        reference.tsstr = tsstr
+        reference.tsaero = tsaero
+        reference.linuvlm = types.SimpleNamespace(Kzeta=sum(KKzeta), MS=ms)
+        reference.num_dof_str = num_dof_str
+        reference.num_dof_rig = num_dof_rig
+        reference.num_dof_flex = num_dof_flex
+        reference.use_euler = use_euler
+        reference.track_body = track_body
+        reference.get_gebm2uvlm_gains()
+
+        aeroelastic = linearaeroelastic.LinearAeroelastic.__new__(linearaeroelastic.LinearAeroelastic)
+        aeroelastic.settings = {'track_body': track_body}
+        aeroelastic.uvlm = types.SimpleNamespace(tsaero0=tsaero,
+                                                 sys=types.SimpleNamespace(Kzeta=sum(KKzeta), MS=ms))
+        aeroelastic.beam = types.SimpleNamespace(tsstruct0=tsstr,
+                                                 sys=types.SimpleNamespace(num_dof_str=num_dof_str,
+                                                                           num_dof_rig=num_dof_rig,
+                                                                           num_dof_flex=num_dof_flex,
+                                                                           use_euler=use_euler))
+        aeroelastic.get_gebm2uvlm_gains(data)
+
+        for name in ['Kdisp', 'Kvel_disp', 'Kvel_vel', 'Kforces', 'Kdisp_vel']:
+            np.testing.assert_allclose(getattr(aeroelastic, name).toarray(), getattr(reference, name), rtol=1e-12,
+                                       atol=1e-12, err_msg='%s differs from the reference' % name)
+        for name in ['Kss', 'Krs', 'Csr', 'Crs', 'Crr']:
+            np.testing.assert_allclose(getattr(aeroelastic, name), getattr(reference, name), rtol=1e-12,
+                                       atol=1e-12, err_msg='%s differs from the reference' % name)
+
+    def test_clamped(self):
+        self.compare_gains(np.array([1., 0., 0., 0.]), np.zeros(6), track_body=False, use_euler=False)
+
+    def test_free_flying(self):
+        self.compare_gains(np.array([0.99, 0.02, 0.08, -0.03]), np.array([10., 0.5, -0.2, 0.1, 0.05, -0.3]),
+                           track_body=True, use_euler=False)
+
+    def test_free_flying_not_tracked(self):
+        self.compare_gains(np.array([0.99, 0.02, 0.08, -0.03]), np.array([10., 0.5, -0.2, 0.1, 0.05, -0.3]),
+                           track_body=False, use_euler=False)
+
+    def test_euler(self):
+        self.compare_gains(algebra.euler2quat(np.array([0.05, 0.1, -0.02])),
+                           np.array([10., 0.5, -0.2, 0.1, 0.05, -0.3]), track_body=False, use_euler=True)
+
+    def test_euler_track_body(self):
+        self.compare_gains(algebra.euler2quat(np.array([0.05, 0.1, -0.02])),
+                           np.array([10., 0.5, -0.2, 0.1, 0.05, -0.3]), track_body=True, use_euler=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,7 @@ import unittest
 
 import sharpy.aero.utils.uvlmlib
 import sharpy.linear.src.lib_dbiot as dbiot
+import sharpy.linear.src.lib_ucdncdzeta as lib_ucdncdzeta
 import sharpy.linear.src.uvlmutils as uvlmutils
 
 
@@ -252,3 +253,56 @@ class Test_ders(unittest.TestCase):
                 'Error of derivative w.r.t. zetaP not decreasing monothonically'
             assert ErVer_max[ss + 1] < ErVer_max[ss], \
                 'Error of derivative w.r.t. ZetaPanel not decreasing monothonically'
+
+    def test_dbiot_panel_batch(self):
+        print('\n--------------------------- Testing dbiot.eval_panel_batch*')
+
+        np.random.seed(4)
+        ZetaPanel = np.array([self.zeta0, self.zeta1, self.zeta2, self.zeta3])
+        ZetaPanels = np.array([ZetaPanel + np.random.rand(4, 3) for _ in range(5)])
+        gammas = np.random.rand(5)
+        zetaPs = np.array([self.zetaP, 0.3 * self.zeta1 + 0.7 * self.zeta2, self.zeta0,
+                           self.zetaP + np.random.rand(3)])
+        # target points on a segment and on a vertex of the panels
+        zetaPs[1] = 0.3 * ZetaPanels[1, 1] + 0.7 * ZetaPanels[1, 2]
+        zetaPs[2] = ZetaPanels[2, 0]
+
+        DerP, DerVer = dbiot.eval_panel_batch(zetaPs, ZetaPanels, gammas)
+        DerP_coll = dbiot.eval_panel_batch_coll(zetaPs, ZetaPanels, gammas)
+
+        # the scalar functions are the reference
+        for pp in range(zetaPs.shape[0]):
+            for kk in range(ZetaPanels.shape[0]):
+                DerP_ref, DerVer_ref = dbiot.eval_panel_fast(zetaPs[pp], ZetaPanels[kk], gammas[kk])
+                DerP_coll_ref = dbiot.eval_panel_fast_coll(zetaPs[pp], ZetaPanels[kk], gammas[kk])
+                scale = max(np.max(np.abs(DerP_ref)), 1.)
+                er_max = max(np.max(np.abs(DerP[pp, kk] - DerP_ref)),
+                             np.max(np.abs(DerVer[pp, kk] - DerVer_ref)),
+                             np.max(np.abs(DerP_coll[pp, kk] - DerP_coll_ref)))
+                assert er_max < 1e-13 * scale, 'eval_panel_batch not matching with eval_panel_fast'
+
+        # segments derivatives
+        DerP_seg, DerA_seg, DerB_seg = dbiot.eval_seg_batch(
+            zetaPs[:, None, :], ZetaPanels[:, 0, :], ZetaPanels[:, 1, :], gammas)
+        for pp in range(zetaPs.shape[0]):
+            for kk in range(ZetaPanels.shape[0]):
+                Ders_ref = dbiot.eval_seg_exp(zetaPs[pp], ZetaPanels[kk, 0], ZetaPanels[kk, 1], gammas[kk])
+                Ders = (DerP_seg[pp, kk], DerA_seg[pp, kk], DerB_seg[pp, kk])
+                scale = max(np.max(np.abs(Ders_ref[0])), 1.)
+                er_max = max(np.max(np.abs(Ders[ii] - Ders_ref[ii])) for ii in range(3))
+                assert er_max < 1e-13 * scale, 'eval_seg_batch not matching with eval_seg_exp'
+
+    def test_ucdncdzeta_batch(self):
+        print('\n----------------------------- Testing lib_ucdncdzeta.eval_batch')
+
+        np.random.seed(5)
+        ZetaPanel = np.array([self.zeta0, self.zeta1, self.zeta2, self.zeta3])
+        ZetaPanels = np.array([ZetaPanel + np.random.rand(4, 3) for _ in range(6)])
+        Uc = np.random.rand(6, 3)
+
+        Der = lib_ucdncdzeta.eval_batch(ZetaPanels[:, 0], ZetaPanels[:, 1],
+                                        ZetaPanels[:, 2], ZetaPanels[:, 3], Uc)
+        for kk in range(ZetaPanels.shape[0]):
+            Der_ref = lib_ucdncdzeta.eval(*ZetaPanels[kk], Uc[kk])
+            assert np.max(np.abs(Der[kk] - Der_ref)) < 1e-14, \
+                'eval_batch not matching with eval'
@@ -1,8 +1,11 @@
 import copy
 import unittest
+import warnings
 import sharpy.linear.src.libss as libss
 import sharpy.rom.utils.librom as librom
 import numpy as np
+import scipy.linalg as sclalg
+import scipy.sparse as sparse
 import sharpy.linear.src.libsparse as libsp
 
 
@@ -45,3 +48,46 @@ class TestBalancing(unittest.TestCase):
         Yb2 = ssb2.freqresp(kv)
         er_max = np.max(np.abs(Yb2 - Y))
         assert er_max / np.max(np.abs(Y)) < 1e-10, 'Error too large'
+
+
+    def test_balreal_lradi(self):
+        np.random.seed(4)
+        Nx, Nu, Ny = 40, 2, 3
+        ss = libss.random_ss(Nx, Nu, Ny, dt=0.1, stable=True)
+
+        hsv_ref = librom.balreal_direct_py(ss.A, ss.B, ss.C, DLTI=True, full_outputs=False)[0]
+
+        # sparse plant matrix, never converted to a dense array. Both Gramians converge with the default settings
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            hsv, T, Ti, rc, ro = librom.balreal_lradi(libsp.csc_matrix(ss.A), ss.B, ss.C, DLTI=True)
+        self.assertEqual(len(hsv), len(hsv_ref))
+        np.testing.assert_allclose(hsv, hsv_ref, rtol=1e-4)
+
+        # balanced realisation: equal and diagonal Gramians
+        Ab, Bb, Cb = Ti.dot(ss.A.dot(T)), Ti.dot(ss.B), ss.C.dot(T)
+        Wc = sclalg.solve_discrete_lyapunov(Ab, Bb.dot(Bb.T))
+        Wo = sclalg.solve_discrete_lyapunov(Ab.T, Cb.T.dot(Cb))
+        np.testing.assert_allclose(np.diag(Wc), hsv, rtol=1e-4)
+        np.testing.assert_allclose(np.diag(Wo), hsv, rtol=1e-4)
+
+    def test_balanced_block(self):
+        import sharpy.rom.balanced as balanced
+
+        np.random.seed(4)
+        ss = libss.random_ss(20, 2, 3, dt=0.1, stable=True)
+        ss_block = libss.ss_block([[libsp.csc_matrix(ss.A)]], [[ss.B]], [[ss.C]], [[ss.D]],
+                                  S_states=[ss.states], S_inputs=[ss.inputs], S_outputs=[ss.outputs], dt=ss.dt)
+
+        hsv = dict()
+        for algorithm, algorithm_settings in [('Direct', {'tune': False}), ('LowRankADI', {})]:
+            rom = balanced.Balanced()
+            rom.initialise({'algorithm': algorithm,
+                            'algorithm_settings': algorithm_settings,
+                            'print_info': False})
+            rom.run(ss_block)
+            # the block system is only assembled as a sparse matrix for the low-rank ADI balancing
+            self.assertEqual(sparse.issparse(rom.ss.A), algorithm == 'LowRankADI')
+            hsv[algorithm] = np.sort(np.abs(np.linalg.eigvals(rom.ssrom.A)))
+
+        np.testing.assert_allclose(hsv['LowRankADI'], hsv['Direct'], rtol=1e-4)
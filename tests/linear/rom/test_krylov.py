@@ -78,6 +78,106 @@ class TestKrylov(unittest.TestCase):
                                  'frequency': algorithm_list[algorithm]['frequency']}
                 self.run_test(test_settings)
 
+    def test_sparse_multipoint(self):
+        test_settings = {'algorithm': 'mimo_rational_arnoldi',
+                         'r': 4,
+                         'frequency': np.array([0., 5j, 20j]),
+                         'single_side': 'controllability',
+                         'num_cores': 2}
+
+        ss_sparse = libss.ss(libsp.csc_matrix(self.ss.A), self.ss.B, self.ss.C, self.ss.D)
+        self.rom.initialise(test_settings)
+        ssrom_sparse = self.rom.run(ss_sparse)
+        lu_factors = self.rom.lu_factors
+        assert len(lu_factors) == 3, 'Missing LU factorisations'
+
+        # further runs on the same system reuse the factorisations
+        self.rom.run(ss_sparse)
+        for sigma, lu in self.rom.lu_factors.items():
+            assert lu is lu_factors[sigma], 'LU factorisation not reused'
+
+        rom_dense = krylov.Krylov()
+        rom_dense.initialise(test_settings)
+        ssrom_dense = rom_dense.run(self.ss)
+
+        np.testing.assert_allclose(np.sort(np.abs(np.linalg.eigvals(ssrom_sparse.A))),
+                                   np.sort(np.abs(np.linalg.eigvals(ssrom_dense.A))), rtol=1e-6)
+
+        # systems in block form are assembled at every run, but the factorisations are kept for the same blocks
+        ss_block = libss.ss_block([[libsp.csc_matrix(self.ss.A)]], [[self.ss.B]], [[self.ss.C]], [[self.ss.D]],
+                                  S_states=[self.ss.states], S_inputs=[self.ss.inputs], S_outputs=[self.ss.outputs])
+        rom_block = krylov.Krylov()
+        rom_block.initialise(test_settings)
+        ssrom_block = rom_block.run(ss_block)
+        lu_factors = dict(rom_block.lu_factors)
+        rom_block.run(ss_block)
+        for sigma, lu in rom_block.lu_factors.items():
+            assert lu is lu_factors[sigma], 'LU factorisation of the block system not reused'
+
+        np.testing.assert_allclose(np.sort(np.abs(np.linalg.eigvals(ssrom_block.A))),
+                                   np.sort(np.abs(np.linalg.eigvals(ssrom_dense.A))), rtol=1e-6)
+
+    def test_irka(self):
+        r = 8
+        self.rom.initialise({'algorithm': 'irka',
+                             'r': r,
+                             'frequency': np.array([1j])})
+        ssrom = self.rom.run(self.ss)
+
+        assert ssrom.states == r, 'IRKA ROM not of the requested order'
+        assert self.rom.irka_converged, 'IRKA did not converge'
+
+        # H2 optimal ROM interpolates the full order system at the mirror images of its poles
+        self.check_interpolation(self.ss, ssrom, -np.linalg.eigvals(ssrom.A))
+
+    def test_irka_discrete_time(self):
+        import scipy.signal as scsig
+
+        r = 8
+        dt = 0.1
+        ss_dt = libss.ss(*scsig.cont2discrete((np.array(self.ss.A), self.ss.B, self.ss.C, self.ss.D), dt,
+                                              method='bilinear')[:4], dt=dt)
+        self.rom.initialise({'algorithm': 'irka',
+                             'r': r,
+                             'frequency': np.array([1j])})
+        ssrom = self.rom.run(ss_dt)
+
+        assert ssrom.states == r, 'IRKA ROM not of the requested order'
+        assert self.rom.irka_converged, 'IRKA did not converge'
+
+        # the mirror images of the poles about the unit circle are the interpolation points in discrete time
+        self.check_interpolation(ss_dt, ssrom, 1. / np.linalg.eigvals(ssrom.A))
+
+    def test_irka_not_converged(self):
+        self.rom.initialise({'algorithm': 'irka',
+                             'r': 8,
+                             'frequency': np.array([1j]),
+                             'irka_max_iter': 2})
+        ssrom = self.rom.run(self.ss)
+
+        assert not self.rom.irka_converged, 'IRKA should not converge in 2 iterations'
+
+        # the ROM is the projection onto the stored bases
+        V, W = self.rom.V, self.rom.W
+        Tinv = np.linalg.inv(W.T.dot(V))
+        np.testing.assert_allclose(ssrom.A, W.T.dot(np.array(self.ss.A).dot(V.dot(Tinv))), atol=1e-10)
+        np.testing.assert_allclose(ssrom.B, W.T.dot(self.ss.B), atol=1e-10)
+        np.testing.assert_allclose(ssrom.C, self.ss.C.dot(V.dot(Tinv)), atol=1e-10)
+
+    def test_real_basis_rank(self):
+        V = np.random.rand(10, 2).dot(np.random.rand(2, 4))
+        with self.assertWarns(UserWarning):
+            basis = krylov.real_basis(V, 3)
+        assert basis.shape == (10, 2), 'Basis not of the rank of V'
+
+    @staticmethod
+    def check_interpolation(ss, ssrom, sigmas):
+        A = np.array(ss.A)
+        for sigma in sigmas:
+            H_fom = ss.C.dot(np.linalg.solve(sigma * np.eye(A.shape[0]) - A, ss.B))
+            H_rom = ssrom.C.dot(np.linalg.solve(sigma * np.eye(ssrom.states) - ssrom.A, ssrom.B))
+            np.testing.assert_allclose(H_rom, H_fom, rtol=1e-6)
+
     def tearDown(self):
         import shutil
         shutil.rmtree(self.test_dir + '/figs/')
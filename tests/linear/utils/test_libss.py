@@ -0,0 +1,78 @@
+import numpy as np
+import unittest
+
+import sharpy.linear.src.libss as libss
+import sharpy.linear.src.libsparse as libsp
+
+
+class TestLibss(unittest.TestCase):
+    """
+    Tests the interconnection of state-space systems with sparse matrices
+    """
+
+    def setUp(self):
+        np.random.seed(10)
+        self.ss01 = libss.ss(libsp.csc_matrix(np.diag(0.5 * np.random.rand(5), k=-1)[:5, :5]),
+                             libsp.csc_matrix(np.eye(5, 3)),
+                             libsp.csc_matrix(np.eye(4, 5)),
+                             libsp.csc_matrix(np.eye(4, 3)),
+                             dt=0.1)
+        self.ss02 = libss.ss(libsp.csc_matrix(0.3 * np.eye(6)),
+                             libsp.csc_matrix(np.random.rand(6, 4)),
+                             np.random.rand(2, 6),
+                             np.random.rand(2, 4),
+                             dt=0.1)
+
+    @staticmethod
+    def dense_ss(ss):
+        return libss.ss(*[libsp.dense(M) for M in (ss.A, ss.B, ss.C, ss.D)], dt=ss.dt)
+
+    def test_series(self):
+        ss_sparse = libss.series(self.ss01, self.ss02)
+        ss_dense = libss.series(self.dense_ss(self.ss01), self.dense_ss(self.ss02))
+
+        self.assertIs(type(ss_sparse.A), libsp.csc_matrix)
+        self.assertIs(type(ss_sparse.B), libsp.csc_matrix)
+        self.assertIs(type(ss_dense.A), np.ndarray)
+        for M_sparse, M_dense in zip((ss_sparse.A, ss_sparse.B, ss_sparse.C, ss_sparse.D),
+                                     (ss_dense.A, ss_dense.B, ss_dense.C, ss_dense.D)):
+            np.testing.assert_allclose(libsp.dense(M_sparse), M_dense)
+
+    def test_couple(self):
+        K12 = libsp.csc_matrix(np.random.rand(3, 2))
+        K21 = libsp.csc_matrix(np.eye(4))
+
+        ss_sparse = libss.couple(self.ss01, self.ss02, K12, K21, out_sparse=True)
+        ss_dense = libss.couple(self.dense_ss(self.ss01), self.dense_ss(self.ss02), K12.toarray(), K21.toarray())
+
+        self.assertIs(type(ss_sparse.A), libsp.csc_matrix)
+        self.assertIs(type(ss_dense.A), np.ndarray)
+        for M_sparse, M_dense in zip((ss_sparse.A, ss_sparse.B, ss_sparse.C, ss_sparse.D),
+                                     (ss_dense.A, ss_dense.B, ss_dense.C, ss_dense.D)):
+            np.testing.assert_allclose(libsp.dense(M_sparse), M_dense)
+
+        # the outputs of the coupled system satisfy the interconnection equations
+        x1, x2 = np.random.rand(5), np.random.rand(6)
+        u1, u2 = np.random.rand(3), np.random.rand(4)
+        y = ss_dense.C.dot(np.concatenate((x1, x2))) + ss_dense.D.dot(np.concatenate((u1, u2)))
+        y1, y2 = y[:4], y[4:]
+        np.testing.assert_allclose(y1, libsp.dense(self.ss01.C).dot(x1) +
+                                   libsp.dense(self.ss01.D).dot(u1 + K12.dot(y2)))
+        np.testing.assert_allclose(y2, self.ss02.C.dot(x2) + self.ss02.D.dot(u2 + K21.dot(y1)))
+
+    def test_couple_from_factors(self):
+        K12 = libsp.csc_matrix(np.random.rand(3, 2))
+        K21 = np.random.rand(4, 4)
+        factors = libss.couple_factors(self.ss01, K12, K21)
+
+        for scale in [1., 0.5]:
+            ss02 = libss.ss(self.ss02.A, self.ss02.B, self.ss02.C, scale * self.ss02.D, dt=self.ss02.dt)
+            ss_factors = libss.couple_from_factors(factors, ss02)
+            ss_couple = libss.couple(self.dense_ss(self.ss01), self.dense_ss(ss02), K12.toarray(), K21)
+            for M_factors, M_couple in zip((ss_factors.A, ss_factors.B, ss_factors.C, ss_factors.D),
+                                           (ss_couple.A, ss_couple.B, ss_couple.C, ss_couple.D)):
+                np.testing.assert_allclose(M_factors, M_couple, atol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import numpy as np
+import types
+import unittest
+
+import sharpy.linear.assembler.lincontrolsurfacedeflector as lincontrolsurfacedeflector
+import sharpy.utils.algebra as algebra
+
+
+class TestLinControlSurfaceDeflector(unittest.TestCase):
+    """
+    Tests the linearised rotation of the control surface vertices about the hinge axis
+    """
+
+    def test_der_R_arbitrary_axis_times_v(self):
+        np.random.seed(2)
+        u = np.random.rand(6, 3) - 0.5
+        v = np.random.rand(6, 3)
+        theta = np.random.rand(6)
+
+        dRv = lincontrolsurfacedeflector.der_R_arbitrary_axis_times_v_array(u, theta, v)
+
+        step = 1e-7
+        for i in range(6):
+            axis = u[i] / np.linalg.norm(u[i])
+            dRv_num = (algebra.crv2rotation((theta[i] + step) * axis).dot(v[i]) -
+                       algebra.crv2rotation(theta[i] * axis).dot(v[i])) / step
+            np.testing.assert_allclose(dRv[i], dRv_num, atol=1e-6)
+            np.testing.assert_allclose(lincontrolsurfacedeflector.der_R_arbitrary_axis_times_v(u[i], theta[i], v[i]),
+                                       dRv[i], atol=1e-12)
+
+    def build_model(self, use_sparse):
+        """
+        Two surfaces on a five node beam, one on each wing, with a control surface on the outer nodes of each of them.
+        The hinge is at the third of five chordwise vertices, and the lattice is swept and twisted.
+        """
+        np.random.seed(4)
+        M, N = 4, 2
+
+        structure = types.SimpleNamespace()
+        structure.num_node = 5
+        structure.num_elem = 2
+        structure.connectivities = np.array([[0, 2, 1], [2, 4, 3]])
+        structure.frame_of_reference_delta = np.zeros((2, 3, 3))
+        structure.frame_of_reference_delta[0, :, 0] = -1.
+        structure.frame_of_reference_delta[1, :, 0] = 1.
+
+        aero = types.SimpleNamespace()
+        aero.aero_dimensions = np.array([[M, N], [M, N]])
+        aero.struct2aero_mapping = [[{'i_surf': 0, 'i_n': 0}],
+                                    [{'i_surf': 0, 'i_n': 1}],
+                                    [{'i_surf': 0, 'i_n': 2}, {'i_surf': 1, 'i_n': 0}],
+                                    [{'i_surf': 1, 'i_n': 1}],
+                                    [{'i_surf': 1, 'i_n': 2}]]
+        aero.aero_dict = {'control_surface': np.array([[0, -1, 0], [-1, 1, 1]]),
+                          'control_surface_chord': np.array([2, 2])}
+        aero.timestep_info = [types.SimpleNamespace(n_surf=2)]
+
+        tsaero0 = types.SimpleNamespace(zeta=[])
+        for i_surf, span in enumerate([np.linspace(-2., 0., N + 1), np.linspace(0., 2., N + 1)]):
+            zeta = np.zeros((3, M + 1, N + 1))
+            zeta[0] = np.linspace(0., 1., M + 1)[:, None] + 0.2 * np.abs(span)[None, :]
+            zeta[1] = span[None, :]
+            zeta[2] = -0.1 * np.linspace(0., 1., M + 1)[:, None] * np.abs(span)[None, :]
+            tsaero0.zeta.append(zeta + 0.01 * np.random.rand(3, M + 1, N + 1))
+
+        tsstruct0 = types.SimpleNamespace()
+        tsstruct0.quat = algebra.euler2quat(np.array([0.02, 0.05, -0.01]))
+        tsstruct0.psi = 0.1 * np.random.rand(2, 3, 3)
+
+        KKzeta = [(M + 1) * (N + 1)] * 2
+        linuvlm = types.SimpleNamespace(Kzeta=sum(KKzeta), MS=types.SimpleNamespace(KKzeta=KKzeta),
+                                        use_sparse=use_sparse)
+
+        return linuvlm, tsaero0, tsstruct0, aero, structure
+
+    @staticmethod
+    def generate_loop(linuvlm, tsaero0, tsstruct0, aero, structure, n_control_surfaces):
+        """
+        Per vertex evaluation of the gains, as done before they were vectorised
+        """
+        aero_dict = aero.aero_dict
+        n_surf = aero.timestep_info[0].n_surf
+
+        Kdisp = np.zeros((3 * linuvlm.Kzeta, n_control_surfaces))
+        Kvel = np.zeros((3 * linuvlm.Kzeta, n_control_surfaces))
+        zeta0 = np.concatenate([tsaero0.zeta[i_surf].reshape(-1, order='C') for i_surf in range(n_surf)])
+
+        Cga = algebra.quat2rotation(tsstruct0.quat).T
+        Cag = Cga.T
+
+        hinge_axis = None
+        with_control_surface = False
+        for global_node in range(structure.num_node):
+            for i_elem in range(structure.num_elem):
+                if global_node in structure.connectivities[i_elem, :]:
+                    i_local_node = np.where(structure.connectivities[i_elem, :] == global_node)[0][0]
+                    for_delta = structure.frame_of_reference_delta[i_elem, :, 0]
+                    Cab = algebra.crv2rotation(tsstruct0.psi[i_elem, i_local_node])
+                    Cbg = np.dot(Cab.T, Cag)
+                    Cgb = Cbg.T
+
+                    for structure2aero_node in aero.struct2aero_mapping[global_node]:
+                        i_surf, i_node_span = structure2aero_node['i_surf'], structure2aero_node['i_n']
+                        M, N = aero.aero_dimensions[i_surf]
+                        K_zeta_start = 3 * sum(linuvlm.MS.KKzeta[:i_surf])
+                        shape_zeta = (3, M + 1, N + 1)
+
+                        i_control_surface = aero_dict['control_surface'][i_elem, i_local_node]
+                        if i_control_surface >= 0:
+                            if not with_control_surface:
+                                i_start_of_cs = i_node_span
+                                with_control_surface = True
+                            i_node_hinge = M - aero_dict['control_surface_chord'][i_control_surface]
+                            i_vertex_hinge = [K_zeta_start + np.ravel_multi_index((i_axis, i_node_hinge, i_node_span),
+                                                                                  shape_zeta) for i_axis in range(3)]
+                            i_vertex_next_hinge = [K_zeta_start +
+                                                   np.ravel_multi_index((i_axis, i_node_hinge, i_start_of_cs + 1),
+                                                                        shape_zeta) for i_axis in range(3)]
+                            zeta_hinge = zeta0[i_vertex_hinge]
+                            if hinge_axis is None:
+                                hinge_axis = zeta0[i_vertex_next_hinge] - zeta_hinge
+                                hinge_axis = hinge_axis / np.linalg.norm(hinge_axis)
+                            for i_node_chord in range(i_node_hinge + 1, M + 1):
+                                i_vertex = [K_zeta_start + np.ravel_multi_index((i_axis, i_node_chord, i_node_span),
+                                                                                shape_zeta) for i_axis in range(3)]
+                                chord_vec = zeta0[i_vertex] - zeta_hinge
+                                Kdisp[i_vertex, i_control_surface] = \
+                                    Cgb.dot(lincontrolsurfacedeflector.der_R_arbitrary_axis_times_v(
+                                        Cbg.dot(hinge_axis), 0, -for_delta * Cbg.dot(chord_vec)))
+                                Kvel[i_vertex, i_control_surface] = -algebra.skew(chord_vec).dot(hinge_axis)
+                        else:
+                            with_control_surface = False
+                            hinge_axis = None
+
+        return Kdisp, Kvel
+
+    def test_generate(self):
+        for use_sparse in [False, True]:
+            with self.subTest(use_sparse=use_sparse):
+                model = self.build_model(use_sparse)
+                deflector = lincontrolsurfacedeflector.LinControlSurfaceDeflector()
+                deflector.n_control_surfaces = 2
+                Kdisp, Kvel = deflector.generate(*model)
+                Kdisp_ref, Kvel_ref = self.generate_loop(*model, n_control_surfaces=2)
+
+                if use_sparse:
+                    Kdisp = Kdisp.toarray()
+                    Kvel = Kvel.toarray()
+                # both control surfaces deflect some vertices
+                self.assertTrue(np.all(np.any(Kdisp_ref != 0, axis=0)))
+                np.testing.assert_allclose(Kdisp, Kdisp_ref, rtol=1e-12, atol=1e-14)
+                np.testing.assert_allclose(Kvel, Kvel_ref, rtol=1e-12, atol=1e-14)
+
+
+if __name__ == '__main__':
+    unittest.main()
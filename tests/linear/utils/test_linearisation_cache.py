@@ -0,0 +1,141 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import h5py
+import numpy as np
+
+import sharpy.linear.src.libss as libss
+import sharpy.linear.src.libsparse as libsp
+import sharpy.linear.utils.linearisation_cache as linearisation_cache
+
+
+class TestLinearisationCache(unittest.TestCase):
+    """
+    Tests the on-disk cache of linearised systems
+    """
+
+    def setUp(self):
+        np.random.seed(2)
+        self.folder = tempfile.mkdtemp()
+        self.ss = libss.ss(libsp.csc_matrix(np.diag(np.random.rand(6))),
+                           libsp.csc_matrix(np.random.rand(6, 2)),
+                           np.random.rand(3, 6),
+                           np.zeros((3, 2)),
+                           dt=0.1)
+        self.V = np.random.rand(6, 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_key(self):
+        settings = {'aero_settings': {'dt': 0.1, 'density': 1.225}, 'track_body': True}
+        hash_1 = self.hash(settings)
+        self.assertEqual(hash_1, self.hash({'track_body': True, 'aero_settings': {'density': 1.225, 'dt': 0.1}}))
+        self.assertNotEqual(hash_1, self.hash({'aero_settings': {'dt': 0.1, 'density': 1.226}, 'track_body': True}))
+        self.assertNotEqual(self.hash(np.zeros(3)), self.hash(np.zeros(4)))
+
+    def test_operating_point_key(self):
+        data = self.operating_point()
+        key = linearisation_cache.operating_point_key(data, {'track_body': True})
+        self.assertEqual(key, linearisation_cache.operating_point_key(self.operating_point(), {'track_body': True}))
+
+        # a different control surface is a cache miss
+        data.aero.aero_dict['control_surface_chord'][0] = 2
+        self.assertNotEqual(key, linearisation_cache.operating_point_key(data, {'track_body': True}))
+        data = self.operating_point()
+        data.aero.aero_dict['control_surface_hinge_coords'][0] = 0.25
+        self.assertNotEqual(key, linearisation_cache.operating_point_key(data, {'track_body': True}))
+
+        # as is a different orientation of the elements
+        data = self.operating_point()
+        data.structure.frame_of_reference_delta[0, 0] = -1.
+        self.assertNotEqual(key, linearisation_cache.operating_point_key(data, {'track_body': True}))
+
+    def test_key_unsupported_type(self):
+        self.assertEqual(self.hash({'a': np.float64(1.), 'b': None}), self.hash({'a': 1., 'b': None}))
+        with self.assertRaises(TypeError):
+            self.hash({'rom_settings': {'callback': lambda x: x}})
+        with self.assertRaises(TypeError):
+            self.hash([object()])
+
+    @staticmethod
+    def operating_point():
+        class Container(object):
+            pass
+
+        data = Container()
+        data.structure = Container()
+        for name in ['num_node', 'num_elem', 'connectivities', 'boundary_conditions', 'elem_stiffness',
+                     'stiffness_db', 'elem_mass', 'mass_db', 'frame_of_reference_delta']:
+            setattr(data.structure, name, np.ones((2, 3)))
+        data.aero = Container()
+        data.aero.aero_dimensions = np.array([[4, 6]])
+        data.aero.aero_dimensions_star = np.array([[20, 6]])
+        data.aero.aero_dict = {'chord': np.ones((3, 3)),
+                               'control_surface': np.array([[-1, -1, -1], [0, 0, 0], [0, 0, 0]]),
+                               'control_surface_type': np.array([0]),
+                               'control_surface_chord': np.array([1]),
+                               'control_surface_hinge_coords': np.array([0.]),
+                               'airfoils': {'0': np.zeros((10, 2))}}
+        data.linear = Container()
+        data.linear.tsstruct0 = Container()
+        for name in ['pos', 'pos_dot', 'psi', 'psi_dot', 'quat', 'for_vel', 'for_acc']:
+            setattr(data.linear.tsstruct0, name, np.zeros((3, 3)))
+        data.linear.tsaero0 = Container()
+        for name in ['zeta', 'zeta_dot', 'zeta_star', 'gamma', 'gamma_star', 'gamma_dot', 'u_ext', 'u_ext_star',
+                     'forces', 'dynamic_forces']:
+            setattr(data.linear.tsaero0, name, [np.zeros((3, 5, 7))])
+        return data
+
+    @staticmethod
+    def hash(value):
+        import hashlib
+        hash_obj = hashlib.sha256()
+        linearisation_cache.update_hash(hash_obj, value)
+        return hash_obj.hexdigest()
+
+    def test_save_load(self):
+        cache = linearisation_cache.LinearisationCache(self.folder, 'a' * 64)
+        self.assertFalse(cache.hit())
+
+        cache.save(ss={'uvlm': self.ss}, matrices={'Kas': libsp.csc_matrix(np.eye(2))},
+                   rom_bases={'Krylov': {'V': self.V}})
+        self.assertTrue(cache.hit())
+
+        entry = cache.load()
+        ss = entry['ss']['uvlm']
+        self.assertIs(type(ss.A), libsp.csc_matrix)
+        self.assertIs(type(ss.C), np.ndarray)
+        self.assertEqual(ss.dt, self.ss.dt)
+        for M_cache, M in zip(ss.get_mats(), self.ss.get_mats()):
+            np.testing.assert_array_equal(libsp.dense(M_cache), libsp.dense(M))
+        np.testing.assert_array_equal(entry['matrices']['Kas'].toarray(), np.eye(2))
+        np.testing.assert_array_equal(entry['rom_bases']['Krylov']['V'], self.V)
+
+        # an entry with a different key is invalid and removed
+        with h5py.File(cache.filename, 'a') as f:
+            f.attrs['key'] = 'b' * 64
+        self.assertFalse(cache.hit())
+        self.assertFalse(os.path.isfile(cache.filename))
+
+    def test_size_limit_and_clear(self):
+        caches = [linearisation_cache.LinearisationCache(self.folder, str(i_key) * 64, max_size=0.)
+                  for i_key in range(3)]
+        for cache in caches:
+            cache.save(ss={'uvlm': self.ss})
+        entry_size = os.path.getsize(caches[0].filename) / 1024 ** 2
+
+        # oldest entry removed
+        os.utime(caches[0].filename, (0, 0))
+        caches[1].max_size = 2.5 * entry_size
+        caches[1].enforce_size_limit()
+        self.assertEqual([cache.hit() for cache in caches], [False, True, True])
+
+        self.assertEqual(linearisation_cache.clear(self.folder), 2)
+        self.assertFalse(any(cache.hit() for cache in caches))
+
+
+if __name__ == '__main__':
+    unittest.main()
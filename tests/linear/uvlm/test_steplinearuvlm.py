@@ -0,0 +1,119 @@
+import sharpy.utils.cout_utils as cout
+import sharpy.utils.algebra as algebra
+import numpy as np
+import unittest
+
+
+class Container(object):
+    pass
+
+
+def loop_input_vector(aero_tstep, Cuvlm_g=None):
+    """
+    Input vector of the previous implementation, concatenating the surfaces and rotating vertex by vertex
+    """
+    blocks = []
+    for name in ['zeta', 'zeta_dot', 'u_ext']:
+        for i_surf in range(aero_tstep.n_surf):
+            values = getattr(aero_tstep, name)[i_surf].copy()
+            if Cuvlm_g is not None:
+                for mm in range(values.shape[1]):
+                    for nn in range(values.shape[2]):
+                        values[:, mm, nn] = np.dot(Cuvlm_g, values[:, mm, nn])
+            blocks.append(values.reshape(-1, order='C'))
+    return np.concatenate(blocks)
+
+
+def loop_state_vector(aero_tstep, aero_tstep_m1, dt):
+    """
+    Second order state vector of the previous implementation
+    """
+    gamma = np.concatenate([aero_tstep.gamma[ss].reshape(-1, order='C') for ss in range(aero_tstep.n_surf)])
+    gamma_star = np.concatenate([aero_tstep.gamma_star[ss].reshape(-1, order='C') for ss in range(aero_tstep.n_surf)])
+    gamma_dot = np.concatenate([aero_tstep.gamma_dot[ss].reshape(-1, order='C') for ss in range(aero_tstep.n_surf)])
+    if aero_tstep_m1:
+        gamma_m1 = np.concatenate([aero_tstep_m1.gamma[ss].reshape(-1, order='C') for ss in range(aero_tstep.n_surf)])
+    else:
+        gamma_m1 = gamma - dt*gamma_dot
+    return np.concatenate((gamma, gamma_star, dt*gamma_dot, gamma_m1))
+
+
+class TestStepLinearUVLM(unittest.TestCase):
+    """
+    Packs and unpacks the state-space vectors of the linear UVLM through the precomputed index maps
+    """
+
+    dimensions = np.array([[2, 3], [3, 2]])
+    dimensions_star = np.array([[4, 3], [5, 2]])
+    dt = 0.05
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+
+    def random_tstep(self):
+        import sharpy.utils.datastructures as datastructures
+
+        aero_tstep = datastructures.AeroTimeStepInfo(self.dimensions, self.dimensions_star)
+        for name in ['zeta', 'zeta_dot', 'u_ext', 'gamma', 'gamma_dot', 'gamma_star']:
+            for values in getattr(aero_tstep, name):
+                values[:] = np.random.rand(*values.shape)
+        return aero_tstep
+
+    def build_solver(self, track_body):
+        import sharpy.solvers.steplinearuvlm as steplinearuvlm
+        import sharpy.linear.src.linuvlm as linuvlm
+
+        np.random.seed(4)
+        solver = steplinearuvlm.StepLinearUVLM()
+        solver.settings = {'track_body': track_body}
+        solver.data = Container()
+        solver.data.aero = Container()
+        solver.data.aero.aero_dimensions = self.dimensions
+        solver.data.aero.aero_dimensions_star = self.dimensions_star
+        solver.data.aero.timestep_info = [self.random_tstep(), self.random_tstep()]
+
+        # only the sizes of the system are needed to unpack the state
+        system = linuvlm.DynamicBlock.__new__(linuvlm.DynamicBlock)
+        system.K = int(np.sum(np.prod(self.dimensions, axis=1)))
+        system.K_star = int(np.sum(np.prod(self.dimensions_star, axis=1)))
+        system.dt = self.dt
+        solver.data.aero.linear = {'System': system}
+
+        if track_body:
+            solver.Cga0 = algebra.euler2rot(np.array([0.1, 0.2, -0.1]))
+            solver.Cga = algebra.euler2rot(np.array([-0.3, 0.1, 0.4]))
+        solver.build_index_maps(solver.data.aero.timestep_info[-1])
+        return solver
+
+    def test_pack_unpack(self):
+        for track_body in [False, True]:
+            with self.subTest(track_body=track_body):
+                solver = self.build_solver(track_body)
+                aero_tstep_m1, aero_tstep = solver.data.aero.timestep_info
+                Cuvlm_g = np.dot(solver.Cga0, solver.Cga.T) if track_body else None
+
+                u = solver.pack_input_vector()
+                np.testing.assert_allclose(u, loop_input_vector(aero_tstep, Cuvlm_g), rtol=1e-14)
+
+                for tstep_m1 in [None, aero_tstep_m1]:
+                    x = solver.pack_state_vector(aero_tstep, tstep_m1, self.dt, 2)
+                    np.testing.assert_allclose(x, loop_state_vector(aero_tstep, tstep_m1, self.dt), rtol=1e-14)
+                x = solver.pack_state_vector(aero_tstep, None, self.dt, 1)
+                np.testing.assert_allclose(x, loop_state_vector(aero_tstep, None, self.dt)[:x.size], rtol=1e-14)
+
+                # the output vector has the layout of zeta in the input, in the linearisation frame
+                y = u[:u.size//3]
+                y_copy = y.copy()
+                forces, gamma, gamma_dot, gamma_star = solver.unpack_ss_vectors(y, x, u, aero_tstep)
+                np.testing.assert_array_equal(y, y_copy)
+                for i_surf in range(aero_tstep.n_surf):
+                    self.assertEqual(forces[i_surf].shape, (6,) + aero_tstep.zeta[i_surf].shape[1:])
+                    np.testing.assert_allclose(forces[i_surf][0:3], aero_tstep.zeta[i_surf], rtol=1e-12)
+                    np.testing.assert_array_equal(forces[i_surf][3:6], 0.)
+                    np.testing.assert_allclose(gamma[i_surf], aero_tstep.gamma[i_surf], rtol=1e-14)
+                    np.testing.assert_allclose(gamma_dot[i_surf], aero_tstep.gamma_dot[i_surf], rtol=1e-12)
+                    np.testing.assert_allclose(gamma_star[i_surf], aero_tstep.gamma_star[i_surf], rtol=1e-14)
+
+
+if __name__ == '__main__':
+    unittest.main()
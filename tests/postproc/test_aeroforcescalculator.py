@@ -0,0 +1,149 @@
+import sharpy.utils.cout_utils as cout
+import sharpy.utils.algebra as algebra
+import numpy as np
+import os
+import shutil
+import unittest
+
+
+class Container(object):
+    pass
+
+
+class StructStep(object):
+    def __init__(self, quat):
+        self.quat = quat
+
+
+def synthetic_data(n_steps, dimensions):
+    """
+    Aerodynamic grids of ``dimensions`` with random coordinates and nodal forces and moments, attached to a body
+    with a different orientation at every time step
+    """
+    import sharpy.utils.datastructures as datastructures
+
+    np.random.seed(1)
+    data = Container()
+    data.settings = {'SHARPy': {'case': 'synthetic'}}
+    data.ts = n_steps - 1
+    data.structure = Container()
+    data.structure.settings = {'unsteady': False}
+    data.structure.timestep_info = []
+    data.aero = Container()
+    data.aero.timestep_info = []
+    for ts in range(n_steps):
+        data.structure.timestep_info.append(
+            StructStep(algebra.euler2quat(np.array([0.1, -0.2, 0.3]) * (ts + 1))))
+        aero_tstep = datastructures.AeroTimeStepInfo(dimensions, dimensions)
+        for i_surf in range(aero_tstep.n_surf):
+            aero_tstep.zeta[i_surf][:] = np.random.rand(*aero_tstep.zeta[i_surf].shape)
+            aero_tstep.forces[i_surf][:] = np.random.rand(*aero_tstep.forces[i_surf].shape) - 0.5
+            aero_tstep.dynamic_forces[i_surf][:] = np.random.rand(*aero_tstep.dynamic_forces[i_surf].shape) - 0.5
+        data.aero.timestep_info.append(aero_tstep)
+    return data
+
+
+def loop_totals(data, ts):
+    """
+    Totals of the panel loop of the previous implementation, with the moments about the origin of ``A``
+
+    Returns:
+        tuple: inertial steady, inertial unsteady, body steady and body unsteady loads, each ``(n_surf, 6)``
+    """
+    rot = algebra.quat2rotation(data.structure.timestep_info[ts].quat)
+    aero_tstep = data.aero.timestep_info[ts]
+    totals = []
+    for forces in [aero_tstep.forces, aero_tstep.dynamic_forces]:
+        inertial = np.zeros((len(forces), 6))
+        for i_surf in range(len(forces)):
+            _, n_rows, n_cols = forces[i_surf].shape
+            for i_m in range(n_rows):
+                for i_n in range(n_cols):
+                    inertial[i_surf, 0:3] += forces[i_surf][0:3, i_m, i_n]
+                    inertial[i_surf, 3:6] += (np.cross(aero_tstep.zeta[i_surf][:, i_m, i_n],
+                                                       forces[i_surf][0:3, i_m, i_n]) +
+                                              forces[i_surf][3:6, i_m, i_n])
+        totals.append(inertial)
+    for inertial in totals[:2]:
+        body = np.zeros_like(inertial)
+        for i_surf in range(inertial.shape[0]):
+            body[i_surf, 0:3] = np.dot(rot.T, inertial[i_surf, 0:3])
+            body[i_surf, 3:6] = np.dot(rot.T, inertial[i_surf, 3:6])
+        totals.append(body)
+    return totals
+
+
+class TestAeroForcesCalculator(unittest.TestCase):
+    """
+    Compares the vectorised totals and output file with the panel by panel loop on a small synthetic grid
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/aeroforcescalculator_test/'
+    n_steps = 3
+    dimensions = np.array([[2, 3], [3, 2]])
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+        os.makedirs(self.folder, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def build_postproc(self, data, text_file_name):
+        import sharpy.postproc.aeroforcescalculator as aeroforcescalculator
+
+        postproc = aeroforcescalculator.AeroForcesCalculator()
+        postproc.initialise(data, {'folder': self.folder,
+                                   'write_text_file': True,
+                                   'text_file_name': text_file_name,
+                                   'screen_output': False})
+        return postproc
+
+    def check_totals(self, data):
+        for ts in range(self.n_steps):
+            aero_tstep = data.aero.timestep_info[ts]
+            for computed, expected in zip([aero_tstep.inertial_steady_forces,
+                                           aero_tstep.inertial_unsteady_forces,
+                                           aero_tstep.body_steady_forces,
+                                           aero_tstep.body_unsteady_forces],
+                                          loop_totals(data, ts)):
+                np.testing.assert_allclose(computed, expected, rtol=1e-12, atol=1e-14)
+
+    def check_file(self, data, filename):
+        output = np.loadtxt(self.folder + 'synthetic/forces/' + filename, delimiter=',', ndmin=2)
+        self.assertEqual(output.shape, (self.n_steps, 25))
+        np.testing.assert_array_equal(output[:, 0], np.arange(self.n_steps))
+        for ts in range(self.n_steps):
+            totals = [np.sum(loads, axis=0) for loads in loop_totals(data, ts)]
+            # the force columns are those of the previous file, followed by the moments in the same order
+            np.testing.assert_allclose(output[ts, 1:13], np.concatenate([total[0:3] for total in totals]),
+                                       rtol=1e-6, atol=1e-12)
+            np.testing.assert_allclose(output[ts, 13:25], np.concatenate([total[3:6] for total in totals]),
+                                       rtol=1e-6, atol=1e-12)
+
+    def test_offline(self):
+        data = synthetic_data(self.n_steps, self.dimensions)
+        self.build_postproc(data, 'offline.txt').run()
+        self.check_totals(data)
+        self.check_file(data, 'offline.txt')
+
+    def test_online(self):
+        full_data = synthetic_data(self.n_steps, self.dimensions)
+        data = synthetic_data(self.n_steps, self.dimensions)
+        data.structure.timestep_info = []
+        data.aero.timestep_info = []
+        postproc = self.build_postproc(data, 'online.txt')
+        for ts in range(self.n_steps):
+            data.ts = ts
+            data.structure.timestep_info.append(full_data.structure.timestep_info[ts])
+            data.aero.timestep_info.append(full_data.aero.timestep_info[ts])
+            postproc.run(online=True)
+        postproc.finalise()
+
+        self.check_totals(data)
+        self.check_file(data, 'online.txt')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import sharpy.utils.cout_utils as cout
+import numpy as np
+import os
+import shutil
+import unittest
+
+
+class Container(object):
+    pass
+
+
+def synthetic_data(n_steps, dimensions):
+    """
+    Aerodynamic grids with random coordinates, nodal forces and free stream velocities
+    """
+    import sharpy.utils.datastructures as datastructures
+
+    np.random.seed(3)
+    data = Container()
+    data.settings = {'SHARPy': {'case': 'synthetic'}}
+    data.structure = Container()
+    data.structure.timestep_info = [None]*n_steps
+    data.aero = Container()
+    data.aero.aero2struct_mapping = [np.arange(dimensions[i_surf, 1] + 1) + 10*i_surf
+                                     for i_surf in range(len(dimensions))]
+    data.aero.timestep_info = []
+    for ts in range(n_steps):
+        aero_tstep = datastructures.AeroTimeStepInfo(dimensions, dimensions)
+        for i_surf in range(aero_tstep.n_surf):
+            aero_tstep.zeta[i_surf][:] = np.random.rand(*aero_tstep.zeta[i_surf].shape)
+            aero_tstep.forces[i_surf][:] = np.random.rand(*aero_tstep.forces[i_surf].shape) - 0.5
+            aero_tstep.dynamic_forces[i_surf][:] = np.random.rand(*aero_tstep.dynamic_forces[i_surf].shape) - 0.5
+            aero_tstep.u_ext[i_surf][:] = np.array([10., 1., 2.])[:, None, None] + \
+                np.random.rand(*aero_tstep.u_ext[i_surf].shape)
+        data.aero.timestep_info.append(aero_tstep)
+    return data
+
+
+def loop_lift(aero_tstep, norm):
+    """
+    Node by node lift of each spanwise strip: the resultant of the steady and unsteady forces of the strip, without
+    its component along the mean free stream of the strip
+    """
+    lift = []
+    for i_surf in range(aero_tstep.n_surf):
+        _, n_m, n_n = aero_tstep.zeta[i_surf].shape
+        lift.append(np.zeros((n_n,)))
+        for i_n in range(n_n):
+            strip_force = np.zeros((3,))
+            u_inf = np.zeros((3,))
+            for i_m in range(n_m):
+                strip_force += aero_tstep.forces[i_surf][0:3, i_m, i_n] + aero_tstep.dynamic_forces[i_surf][0:3, i_m, i_n]
+                u_inf += aero_tstep.u_ext[i_surf][:, i_m, i_n]/n_m
+            u_inf_dir = u_inf/np.linalg.norm(u_inf)
+            lift[i_surf][i_n] = np.linalg.norm(strip_force - np.dot(strip_force, u_inf_dir)*u_inf_dir)/norm
+    return lift
+
+
+class TestLiftDistribution(unittest.TestCase):
+    """
+    Compares the lift distribution with a node by node loop on a small synthetic grid
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/liftdistribution_test/'
+    n_steps = 3
+    dimensions = np.array([[2, 3], [3, 2]])
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+        os.makedirs(self.folder, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_lift_distribution(self):
+        import sharpy.postproc.liftdistribution as liftdistribution
+
+        data = synthetic_data(self.n_steps, self.dimensions)
+        postproc = liftdistribution.LiftDistribution()
+        postproc.initialise(data, {'folder': self.folder,
+                                   'write_text_file': True})
+        postproc.run()
+
+        output = np.loadtxt(self.folder + 'synthetic/lift_distribution/synthetic_lift_distribution.txt',
+                            delimiter=',', ndmin=2)
+        with open(self.folder + 'synthetic/lift_distribution/synthetic_lift_distribution.txt', 'r') as text_file:
+            self.assertIn('s1_n2_node12', text_file.readline())
+        np.testing.assert_array_equal(output[:, 0], np.arange(self.n_steps))
+        for ts in range(self.n_steps):
+            aero_tstep = data.aero.timestep_info[ts]
+            chord = np.linalg.norm(aero_tstep.zeta[0][:, -1, 0] - aero_tstep.zeta[0][:, 0, 0])
+            expected = loop_lift(aero_tstep, chord)
+            self.assertNotIn('lift_distribution', aero_tstep.postproc_cell)
+            for i_surf in range(aero_tstep.n_surf):
+                np.testing.assert_allclose(aero_tstep.postproc_node['lift_distribution'][i_surf], expected[i_surf],
+                                           rtol=1e-12)
+            np.testing.assert_allclose(output[ts, 1:], np.concatenate(expected), rtol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
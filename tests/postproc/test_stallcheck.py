@@ -0,0 +1,121 @@
+import sharpy.utils.cout_utils as cout
+import numpy as np
+import os
+import shutil
+import unittest
+import unittest.mock
+
+
+class Container(object):
+    pass
+
+
+def synthetic_data(n_steps, m, n_elem_surf, n_surf=2):
+    """
+    Straight surfaces of ``m`` chordwise panels over beams of ``n_elem_surf`` three-noded elements each, with one
+    spanwise strip per structural node and random airfoils
+    """
+    import sharpy.utils.datastructures as datastructures
+
+    np.random.seed(2)
+    n_node_surf = 2*n_elem_surf + 1
+    n = n_node_surf - 1
+    data = Container()
+    data.settings = {'SHARPy': {'case': 'synthetic'}}
+    data.structure = Container()
+    data.structure.num_node_elem = 3
+    data.structure.num_elem = n_surf*n_elem_surf
+    data.structure.connectivities = np.zeros((data.structure.num_elem, 3), dtype=int)
+    data.structure.timestep_info = [None]*n_steps
+    data.aero = Container()
+    data.aero.struct2aero_mapping = [None]*(n_surf*n_node_surf)
+    data.aero.aero_dict = {'airfoil_distribution': np.random.randint(0, 2, size=(data.structure.num_elem, 3))}
+    for i_surf in range(n_surf):
+        for i_elem in range(n_elem_surf):
+            first = i_surf*n_node_surf + 2*i_elem
+            data.structure.connectivities[i_surf*n_elem_surf + i_elem, :] = [first, first + 2, first + 1]
+        for i_n in range(n_node_surf):
+            data.aero.struct2aero_mapping[i_surf*n_node_surf + i_n] = [{'i_surf': i_surf, 'i_n': i_n}]
+
+    dimensions = np.array([[m, n]]*n_surf)
+    data.aero.timestep_info = [datastructures.AeroTimeStepInfo(dimensions, dimensions) for ts in range(n_steps)]
+    incidence_angles = [[np.random.uniform(-0.3, 0.3, size=(m, n)) for i_surf in range(n_surf)]
+                        for ts in range(n_steps)]
+    return data, incidence_angles
+
+
+def loop_stalled_panels(data, incidence_angle, stall_angles):
+    """
+    Panel loop of the previous implementation, with each strip counted once and by its chordwise panels
+    """
+    dimensions = data.aero.timestep_info[0].dimensions
+    stalled_surfs = np.zeros((len(dimensions),), dtype=int)
+    added_panels = [[] for i_surf in range(len(dimensions))]
+    for i_elem in range(data.structure.num_elem):
+        for i_local_node in range(data.structure.num_node_elem):
+            airfoil_id = data.aero.aero_dict['airfoil_distribution'][i_elem, i_local_node]
+            i_global_node = data.structure.connectivities[i_elem, i_local_node]
+            for i_dict in data.aero.struct2aero_mapping[i_global_node]:
+                i_surf = i_dict['i_surf']
+                i_n = i_dict['i_n']
+                if i_n in added_panels[i_surf] or i_n == dimensions[i_surf][1]:
+                    continue
+                added_panels[i_surf].append(i_n)
+                limits = stall_angles[str(airfoil_id)]
+                if incidence_angle[i_surf][0, i_n] < float(limits[0]) or \
+                        incidence_angle[i_surf][0, i_n] > float(limits[1]):
+                    stalled_surfs[i_surf] += incidence_angle[i_surf].shape[0]
+    return stalled_surfs
+
+
+class TestStallCheck(unittest.TestCase):
+    """
+    Compares the stalled panel counts with the panel loop on synthetic incidence angles
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/stallcheck_test/'
+    n_steps = 4
+    stall_angles = {'0': [-0.1, 0.15], '1': [-0.2, 0.05]}
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+        os.makedirs(self.folder, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_stalled_panels(self):
+        import sharpy.postproc.stallcheck as stallcheck
+
+        data, incidence_angles = synthetic_data(self.n_steps, m=3, n_elem_surf=3)
+
+        def calculate_incidence_angle(aero_tstep, struct_tstep):
+            ts = data.aero.timestep_info.index(aero_tstep)
+            for i_surf in range(aero_tstep.n_surf):
+                aero_tstep.postproc_cell['incidence_angle'][i_surf][:] = incidence_angles[ts][i_surf]
+
+        postproc = stallcheck.StallCheck()
+        postproc.initialise(data, {'print_info': False,
+                                   'airfoil_stall_angles': self.stall_angles,
+                                   'output_degrees': True,
+                                   'folder': self.folder,
+                                   'write_text_file': True})
+        with unittest.mock.patch.object(stallcheck.uvlmlib, 'uvlm_calculate_incidence_angle',
+                                        side_effect=calculate_incidence_angle):
+            postproc.run()
+
+        output = np.loadtxt(self.folder + 'synthetic/stallcheck/synthetic_stalled_panels.txt',
+                            delimiter=',', ndmin=2)
+        np.testing.assert_array_equal(output[:, 0], np.arange(self.n_steps))
+        for ts in range(self.n_steps):
+            expected = loop_stalled_panels(data, incidence_angles[ts], self.stall_angles)
+            self.assertTrue(expected.any())
+            np.testing.assert_array_equal(output[ts, 1:], expected)
+            for i_surf in range(2):
+                np.testing.assert_allclose(data.aero.timestep_info[ts].postproc_cell['incidence_angle'][i_surf],
+                                           np.rad2deg(incidence_angles[ts][i_surf]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -142,6 +142,15 @@ class TestAlgebra(unittest.TestCase):
         assert np.linalg.norm(Cgb - Cgb_exp) < 1e-15, \
             'combined rotation not as expected!'
 
+        ### array version
+        psi_array = np.pi * (2. * np.random.rand(20, 3) - 1)
+        psi_array[0, :] = 0.
+        psi_array[1, :] = 1e-16
+        Cab_array = algebra.crv2rotation_array(psi_array)
+        for i_psi in range(psi_array.shape[0]):
+            assert np.linalg.norm(Cab_array[i_psi] - algebra.crv2rotation(psi_array[i_psi])) < 1e-14, \
+                'crv2rotation_array not consistent with crv2rotation'
+
     def test_rotation_matrices_derivatives(self):
         """
         Checks derivatives of rotation matrix derivatives with respect to
@@ -0,0 +1,218 @@
+import sharpy.utils.cout_utils as cout
+import sharpy.utils.asyncpostproc as asyncpostproc
+import collections.abc
+import numpy as np
+import os
+import pickle
+import shutil
+import unittest
+
+
+class TimeStep(object):
+    def __init__(self, i_step):
+        self.for_pos = np.arange(6) + i_step
+        self.pos = np.ones((4, 3)) * i_step
+
+
+class Structure(object):
+    def __init__(self):
+        self.timestep_info = []
+
+
+class Data(object):
+    def __init__(self, case):
+        self.settings = {'SHARPy': {'case': case}}
+        self.ts = 0
+        self.structure = Structure()
+        self.aero = Structure()
+
+
+class TestAsyncPostprocessors(unittest.TestCase):
+    """
+    Runs online postprocessors in the background and after every time step, as in ``DynamicCoupled``
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/asyncpostproc_test/'
+    n_steps = 20
+
+    def setUp(self):
+        cout.cout_wrap.initialise(False, False)
+        os.makedirs(self.folder, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def build_postprocessors(self, data, with_cleanup=False):
+        import sharpy.postproc.writevariablestime as writevariablestime
+        import sharpy.postproc.cleanup as cleanup
+
+        postprocessors = dict()
+        postprocessors['WriteVariablesTime'] = writevariablestime.WriteVariablesTime()
+        postprocessors['WriteVariablesTime'].initialise(data, {'folder': self.folder,
+                                                               'FoR_variables': ['for_pos'],
+                                                               'structure_variables': ['pos'],
+                                                               'structure_nodes': [-1],
+                                                               'cleanup_old_solution': True})
+        if with_cleanup:
+            postprocessors['Cleanup'] = cleanup.Cleanup()
+            postprocessors['Cleanup'].initialise(data, {'remaining_steps': 3})
+        return postprocessors
+
+    def run_case(self, case, run_async, with_cleanup=False):
+        data = Data(case)
+        postprocessors = self.build_postprocessors(data, with_cleanup)
+        pipeline = None
+        if run_async:
+            pipeline = asyncpostproc.AsyncPostprocessors(postprocessors, queue_size=2)
+        for ts in range(self.n_steps):
+            data.ts = ts
+            data.structure.timestep_info.append(TimeStep(ts))
+            data.aero.timestep_info.append(None)
+            if pipeline is not None:
+                pipeline.submit(data)
+            else:
+                for postproc in postprocessors:
+                    data = postprocessors[postproc].run(online=True)
+        if pipeline is not None:
+            pipeline.close()
+        for postproc in postprocessors.values():
+            postproc.finalise()
+        return data
+
+    def load_output(self, case):
+        output = self.folder + case + '/WriteVariablesTime/'
+        return np.loadtxt(output + 'FoR_00_for_pos.dat'), np.loadtxt(output + 'struct_pos_node-1.dat')
+
+    def test_async_output(self):
+        self.run_case('sync', run_async=False)
+        self.run_case('async', run_async=True)
+
+        for sync_output, async_output in zip(self.load_output('sync'), self.load_output('async')):
+            self.assertEqual(async_output.shape[0], self.n_steps)
+            np.testing.assert_array_equal(async_output, sync_output)
+
+    def test_cleanup(self):
+        postprocessors = self.build_postprocessors(Data('cleanup'), with_cleanup=True)
+        self.assertEqual(asyncpostproc.history_modifiers(postprocessors), ['Cleanup'])
+        with self.assertRaises(ValueError):
+            asyncpostproc.AsyncPostprocessors(postprocessors)
+
+        # run after every time step instead, as in DynamicCoupled
+        data = self.run_case('cleanup', run_async=False, with_cleanup=True)
+        self.assertTrue(all(step is None for step in data.structure.timestep_info[:-3]))
+        for_pos, _ = self.load_output('cleanup')
+        np.testing.assert_array_equal(for_pos[:, 0], np.arange(self.n_steps))
+
+
+class LoadsWriter(object):
+    """
+    Writes to the current step what ``LoadsReader`` reads, as ``BeamLoads`` does for the plotting postprocessors
+    """
+    def __init__(self):
+        self.data = None
+
+    def run(self, online=False):
+        tstep = self.data.structure.timestep_info[-1]
+        tstep.loads = 2.*tstep.pos
+        return self.data
+
+
+class LoadsReader(object):
+    def __init__(self, started=None, release=None):
+        self.data = None
+        self.loads = []
+        self.positions = []
+        self.started = started
+        self.release = release
+
+    def run(self, online=False):
+        if self.started is not None:
+            self.started.set()
+            self.release.wait()
+        tstep = self.data.structure.timestep_info[-1]
+        self.loads.append(tstep.loads.copy())
+        self.positions.append(tstep.pos.copy())
+        return self.data
+
+
+class TestAsyncOrder(unittest.TestCase):
+    """
+    Postprocessors of the same step run in list order, on a copy of the current step
+    """
+
+    n_steps = 10
+
+    def test_list_order(self):
+        data = Data('order')
+        reader = LoadsReader()
+        pipeline = asyncpostproc.AsyncPostprocessors({'LoadsWriter': LoadsWriter(), 'LoadsReader': reader},
+                                                     queue_size=3)
+        for ts in range(self.n_steps):
+            data.structure.timestep_info.append(TimeStep(ts))
+            pipeline.submit(data)
+        pipeline.close()
+
+        self.assertEqual(len(reader.loads), self.n_steps)
+        for ts in range(self.n_steps):
+            np.testing.assert_array_equal(reader.loads[ts], 2.*ts)
+
+    def test_current_step_copied(self):
+        import threading
+
+        data = Data('copy')
+        started = threading.Event()
+        release = threading.Event()
+        reader = LoadsReader(started, release)
+        pipeline = asyncpostproc.AsyncPostprocessors({'LoadsWriter': LoadsWriter(), 'LoadsReader': reader})
+        data.structure.timestep_info.append(TimeStep(1))
+        pipeline.submit(data)
+
+        # the solver keeps updating the step in place while it is being postprocessed
+        started.wait()
+        data.structure.timestep_info[-1].pos[:] = -1.
+        release.set()
+        pipeline.close()
+
+        np.testing.assert_array_equal(reader.positions[0], 1.)
+        self.assertFalse(hasattr(data.structure.timestep_info[-1], 'loads'))
+
+
+class TestHistoryView(unittest.TestCase):
+
+    def setUp(self):
+        self.steps = list(range(5))
+        self.view = asyncpostproc.HistoryView(self.steps, 3)
+        self.steps.append(5)
+
+    def test_read_only_sequence(self):
+        self.assertIsInstance(self.view, collections.abc.Sequence)
+        self.assertNotIsInstance(self.view, list)
+        self.assertEqual(len(self.view), 3)
+        self.assertEqual(list(self.view), [0, 1, 2])
+        self.assertEqual(list(reversed(self.view)), [2, 1, 0])
+        self.assertEqual(self.view[-1], 2)
+        self.assertEqual(self.view[1:], [1, 2])
+        self.assertIn(2, self.view)
+        self.assertNotIn(3, self.view)
+        self.assertEqual(self.view.index(2), 2)
+        with self.assertRaises(IndexError):
+            self.view[3]
+        with self.assertRaises(TypeError):
+            self.view[0] = None
+        with self.assertRaises(AttributeError):
+            self.view.append(None)
+
+    def test_pickle(self):
+        self.assertEqual(pickle.loads(pickle.dumps(self.view)), [0, 1, 2])
+
+    def test_last_step(self):
+        view = asyncpostproc.HistoryView(self.steps, 3, last_step=-2)
+        self.assertEqual(list(view), [0, 1, -2])
+        self.assertEqual(view[-1], -2)
+        self.assertEqual(view[1:], [1, -2])
+        self.assertEqual(list(reversed(view)), [-2, 1, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import sharpy.utils.campaign as campaign
+import sharpy.utils.exceptions as exceptions
+import sharpy.utils.cout_utils as cout
+import os
+import shutil
+import unittest
+
+
+class TestCampaign(unittest.TestCase):
+    """
+    Tests the parameter table handling of the campaign runner
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/campaign_test/'
+
+    def setUp(self):
+        cout.start_writer()
+        os.makedirs(self.folder, exist_ok=True)
+
+    def tearDown(self):
+        cout.finish_writer()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_yaml_grid(self):
+        with open(self.folder + 'grid.yaml', 'w') as f:
+            f.write('StaticCoupled.n_load_steps: [1, 2, 4]\n'
+                    'StaticCoupled.aero_solver_settings.rho: [1.225, 0.9]\n')
+
+        case_campaign = campaign.Campaign(self.folder + 'template.sharpy',
+                                          self.folder + 'grid.yaml',
+                                          folder=self.folder)
+        self.assertEqual(len(case_campaign.cases), 6)
+        self.assertEqual(case_campaign.cases.index[-1], 'template_5')
+        self.assertEqual(case_campaign.pending_cases(), list(case_campaign.cases.index))
+
+        solvers = {'StaticCoupled': {'n_load_steps': 0}}
+        campaign.set_setting(solvers, 'StaticCoupled.aero_solver_settings.rho',
+                             case_campaign.cases.iloc[-1]['StaticCoupled.aero_solver_settings.rho'])
+        self.assertEqual(solvers['StaticCoupled']['aero_solver_settings']['rho'], 0.9)
+
+    def test_csv_case_names(self):
+        with open(self.folder + 'table.csv', 'w') as f:
+            f.write('case, StaticCoupled.n_load_steps\n'
+                    'a, 1\n'
+                    'a, 2\n')
+
+        with self.assertRaises(exceptions.NotValidInputFile):
+            campaign.Campaign(self.folder + 'template.sharpy',
+                              self.folder + 'table.csv',
+                              folder=self.folder)
+
+    def test_finished_cases_skipped(self):
+        with open(self.folder + 'table.csv', 'w') as f:
+            f.write('case, StaticCoupled.n_load_steps\n'
+                    'a, 1\n'
+                    'b, 2\n')
+
+        case_campaign = campaign.Campaign(self.folder + 'template.sharpy',
+                                          self.folder + 'table.csv',
+                                          folder=self.folder,
+                                          outputs={'tip_z': '0.'})
+        for case_name, status in zip(['a', 'b'], ['finished', 'failed']):
+            os.makedirs(case_campaign.case_folder(case_name))
+            case_campaign.write_status(case_name, {'status': status, 'outputs': {'tip_z': 1.}})
+        self.assertEqual(case_campaign.pending_cases(), ['b'])
+
+        results = case_campaign.collect()
+        self.assertEqual(results.loc['a', 'tip_z'], 1.)
+        self.assertTrue(os.path.isfile(self.folder + 'campaign.h5'))
+
+    def test_generate_pending_only(self):
+        with open(self.folder + 'template.sharpy', 'w') as f:
+            f.write('[SHARPy]\n'
+                    'case = template\n'
+                    'flow = StaticCoupled,\n'
+                    '[StaticCoupled]\n'
+                    'n_load_steps = 0\n')
+        with open(self.folder + 'template.fem.h5', 'w') as f:
+            f.write('')
+        with open(self.folder + 'table.csv', 'w') as f:
+            f.write('case, StaticCoupled.n_load_steps\n'
+                    'a, 1\n'
+                    'b, 2\n')
+
+        case_campaign = campaign.Campaign(self.folder + 'template.sharpy',
+                                          self.folder + 'table.csv',
+                                          folder=self.folder)
+        case_campaign.generate(case_campaign.pending_cases()[1:])
+        self.assertFalse(os.path.isdir(case_campaign.case_folder('a')))
+        self.assertTrue(os.path.isfile(case_campaign.case_folder('b') + 'b.sharpy'))
+        self.assertTrue(os.path.isfile(case_campaign.case_folder('b') + 'b.fem.h5'))
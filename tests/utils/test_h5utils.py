@@ -0,0 +1,55 @@
+import sharpy.utils.h5utils as h5utils
+import numpy as np
+import h5py
+import os
+import shutil
+import unittest
+
+
+class TimeStep(object):
+    def __init__(self, i_step):
+        self.pos = np.ones((5, 3)) * i_step
+        self.forces = [np.ones((6, 3, 2)) * i_step, np.ones((6, 2, 2)) * i_step]
+        self.ts = i_step
+
+
+class Results(object):
+    def __init__(self, n_steps):
+        self.timestep_info = [TimeStep(i_step) for i_step in range(n_steps)]
+        self.settings = {'case': 'lazy'}
+
+
+class TestLazyReader(unittest.TestCase):
+    """
+    Tests the lazy reader against the files written with ``add_as_grp``
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/h5utils_test/'
+
+    def setUp(self):
+        os.makedirs(self.folder, exist_ok=True)
+        self.filename = self.folder + 'lazy.data.h5'
+        with h5py.File(self.filename, 'w') as hdfile:
+            h5utils.add_as_grp(Results(4), hdfile, grpname='data', ClassesToSave=(Results, TimeStep))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_attribute_paths(self):
+        with h5utils.readh5_lazy(self.filename) as lazy:
+            tstep = lazy.data.timestep_info[-1]
+            self.assertIsInstance(tstep.pos, h5utils.LazyDataset)
+            np.testing.assert_array_equal(tstep.pos[:, 2], 3 * np.ones(5))
+            self.assertEqual(tstep.ts, 3)
+            self.assertEqual(len(lazy.data.timestep_info), 4)
+            np.testing.assert_array_equal(tstep.forces[1][0], 3 * np.ones((2, 2)))
+
+    def test_time_history(self):
+        with h5utils.readh5_lazy(self.filename, 'data') as data:
+            steps, history = data.timestep_info.time_history('pos', index=(-1, 2))
+            np.testing.assert_array_equal(steps, np.arange(4))
+            np.testing.assert_array_equal(history, np.arange(4))
+
+            steps, history = data.timestep_info.time_history('forces.00000', steps=[1, 2])
+            self.assertEqual(history.shape, (2, 6, 3, 2))
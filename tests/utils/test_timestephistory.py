@@ -0,0 +1,162 @@
+import sharpy.utils.datastructures as datastructures
+import numpy as np
+import copy
+import os
+import pickle
+import shutil
+import unittest
+
+
+class Step(object):
+    def __init__(self, i_step):
+        self.i_step = i_step
+        self.pos = np.ones((3, 3)) * i_step
+
+    def __eq__(self, other):
+        return isinstance(other, Step) and self.i_step == other.i_step
+
+
+class TestTimeStepHistory(unittest.TestCase):
+    """
+    Tests the bounded memory time step history against a plain list
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/timestephistory_test/'
+    n_steps = 10
+    n_resident = 3
+
+    def setUp(self):
+        os.makedirs(self.folder, exist_ok=True)
+        self.filename = self.folder + 'history.pkl'
+        self.history = datastructures.TimeStepHistory([Step(0)], self.n_resident, self.filename)
+        for i_step in range(1, self.n_steps):
+            self.history.append(Step(i_step))
+
+    def tearDown(self):
+        self.history.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def assert_steps(self, history, steps):
+        self.assertEqual(len(history), len(steps))
+        self.assertEqual([step.i_step for step in history], steps)
+
+    def test_eviction(self):
+        raw = self.history.raw_steps()
+        n_evicted = sum(isinstance(step, datastructures._EvictedStep) for step in raw)
+        # the first step and the last n_resident are kept in memory
+        self.assertEqual(n_evicted, self.n_steps - 1 - self.n_resident)
+        self.assertIsInstance(raw[0], Step)
+        self.assertTrue(all(isinstance(step, Step) for step in raw[-self.n_resident:]))
+        self.assertTrue(os.path.isfile(self.filename))
+
+    def test_indexing(self):
+        for i_step in range(self.n_steps):
+            self.assertEqual(self.history[i_step].i_step, i_step)
+            np.testing.assert_array_equal(self.history[i_step].pos, np.ones((3, 3)) * i_step)
+            self.assertEqual(self.history[i_step - self.n_steps].i_step, i_step)
+        with self.assertRaises(IndexError):
+            self.history[self.n_steps]
+        self.assert_steps(self.history, list(range(self.n_steps)))
+        self.assertEqual([step.i_step for step in reversed(self.history)], list(range(self.n_steps))[::-1])
+
+    def test_slicing(self):
+        for item in [slice(1, None), slice(-4, None), slice(2, 8, 3), slice(None, None, -1)]:
+            with self.subTest(item=item):
+                sliced = self.history[item]
+                self.assertIsInstance(sliced, datastructures.TimeStepHistory)
+                self.assert_steps(sliced, list(range(self.n_steps))[item])
+
+    def test_list_methods(self):
+        self.assertIn(Step(2), self.history)
+        self.assertNotIn(Step(self.n_steps), self.history)
+        self.assertEqual(self.history.index(Step(2)), 2)
+        self.assertEqual(self.history.count(Step(2)), 1)
+        with self.assertRaises(ValueError):
+            self.history.index(Step(2), 3)
+
+        self.assertEqual(self.history.pop(2).i_step, 2)
+        self.history.remove(Step(1))
+        self.assertEqual(self.history.pop().i_step, self.n_steps - 1)
+        self.assert_steps(self.history, [0] + list(range(3, self.n_steps - 1)))
+
+        with self.assertRaises(TypeError):
+            self.history.sort()
+
+    def test_write_evicted_step(self):
+        # postprocessors write to past steps and read them back, as BeamLoads does with postproc_cell
+        step = self.history[2]
+        step.pos[:] = -1.
+        self.assertIs(self.history[2], step)
+
+        # loading more steps than n_resident writes the modified step back to the file
+        file_size = os.path.getsize(self.filename)
+        for i_step in range(3, 3 + self.n_resident + 1):
+            self.history[i_step]
+        self.assertIsInstance(self.history.raw_steps()[2], datastructures._EvictedStep)
+        self.assertGreater(os.path.getsize(self.filename), file_size)
+        np.testing.assert_array_equal(self.history[2].pos, -1.)
+
+        # steps that are not modified are not written again
+        file_size = os.path.getsize(self.filename)
+        for i_step in range(self.n_steps):
+            self.history[i_step]
+        self.assertEqual(os.path.getsize(self.filename), file_size)
+
+        # slices, copies and pickles see the modified step
+        self.history[1].i_step = -1
+        self.assertEqual(self.history[1:][0].i_step, -1)
+        self.assertEqual(copy.copy(self.history)[1].i_step, -1)
+        restored = pickle.loads(pickle.dumps(self.history))
+        self.assertEqual(restored[1].i_step, -1)
+        restored.close()
+
+    def test_setitem(self):
+        self.history[2] = None
+        self.assertIsNone(self.history[2])
+        self.history[1] = Step(-1)
+        self.assertIsInstance(self.history.raw_steps()[1], datastructures._EvictedStep)
+        self.assertEqual(self.history[1].i_step, -1)
+        self.history[-1] = Step(-2)
+        self.assertEqual(self.history[-1].i_step, -2)
+
+    def test_delete(self):
+        del self.history[1:]
+        self.assert_steps(self.history, [0])
+        for i_step in range(1, self.n_steps):
+            self.history.append(Step(i_step))
+        del self.history[-1]
+        del self.history[3]
+        self.assert_steps(self.history, [0, 1, 2] + list(range(4, self.n_steps - 1)))
+
+    def test_pickle(self):
+        restored = pickle.loads(pickle.dumps(self.history))
+        self.assertIsInstance(restored, datastructures.TimeStepHistory)
+        # the evicted steps are not pickled but read from the history file
+        self.assertLess(len(pickle.dumps(self.history)), len(pickle.dumps(list(self.history))))
+        self.assert_steps(restored, list(range(self.n_steps)))
+        restored.append(Step(self.n_steps))
+        self.assert_steps(restored, list(range(self.n_steps + 1)))
+        self.assert_steps(self.history, list(range(self.n_steps)))
+        # the restored history does not own the file
+        restored.close()
+        self.assertTrue(os.path.isfile(self.filename))
+
+    def test_copy(self):
+        for copied in [copy.copy(self.history), copy.deepcopy(self.history), self.history.copy()]:
+            self.assertIsInstance(copied, datastructures.TimeStepHistory)
+            self.assert_steps(copied, list(range(self.n_steps)))
+        deep = copy.deepcopy(self.history)
+        self.assertIsNot(deep[-1], self.history[-1])
+
+    def test_close(self):
+        self.history.close()
+        self.assertFalse(os.path.isfile(self.filename))
+        # the steps in memory are still available
+        self.assertEqual(self.history[-1].i_step, self.n_steps - 1)
+        with self.assertRaises(ValueError):
+            self.history[1]
+
+
+if __name__ == '__main__':
+    unittest.main()
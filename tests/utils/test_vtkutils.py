@@ -0,0 +1,89 @@
+import sharpy.utils.vtkutils as vtkutils
+import numpy as np
+import h5py as h5
+import os
+import shutil
+import unittest
+
+
+class TestVtkUtils(unittest.TestCase):
+    """
+    Tests the array helpers and the XDMF writer used by the Paraview postprocessors
+    """
+
+    route_test_dir = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
+    folder = route_test_dir + '/vtkutils_test/'
+
+    def setUp(self):
+        os.makedirs(self.folder, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+    def test_structured_grid(self):
+        m, n = 3, 2
+        zeta = np.random.rand(3, m + 1, n + 1)
+        gamma = np.random.rand(m, n)
+        points = vtkutils.grid_points(zeta)
+        connectivity = vtkutils.quad_connectivity(m, n)
+        panel_gamma = vtkutils.grid_points(gamma)
+
+        i_panel = -1
+        for i_n in range(n):
+            for i_m in range(m):
+                i_panel += 1
+                np.testing.assert_array_equal(points[connectivity[i_panel, 0]], zeta[:, i_m, i_n])
+                np.testing.assert_array_equal(points[connectivity[i_panel, 2]], zeta[:, i_m + 1, i_n + 1])
+                self.assertEqual(panel_gamma[i_panel], gamma[i_m, i_n])
+
+    def test_xdmf_time_series(self):
+        connectivity = vtkutils.quad_connectivity(2, 2)
+        series = vtkutils.XdmfTimeSeries(self.folder + 'series')
+        for ts in range(3):
+            series.add_step(ts, ts, {'body': {'points': np.random.rand(9, 3),
+                                              'connectivity': connectivity,
+                                              'cell_type': 'quad',
+                                              'cell_data': {'gamma': np.random.rand(4)},
+                                              'point_data': dict()}})
+        series.close()
+
+        with open(self.folder + 'series.xmf', 'r') as xmf:
+            self.assertEqual(xmf.read().count('<Time Value='), 3)
+        with h5.File(self.folder + 'series.h5', 'r') as h5file:
+            self.assertEqual(list(h5file['body'].keys()), ['000000', '000001', '000002', 'connectivity_000000'])
+
+    def test_xdmf_attribute_types(self):
+        series = vtkutils.XdmfTimeSeries(self.folder + 'attributes')
+        series.add_step(0, 0, {'beam': {'points': np.random.rand(3, 3),
+                                        'connectivity': np.array([[0, 1, 2]]),
+                                        'cell_type': 'line',
+                                        'cell_data': dict(),
+                                        'point_data': {'node_id': np.arange(3),
+                                                       'pos': np.random.rand(3, 3),
+                                                       'forces': np.random.rand(3, 6),
+                                                       'cab': np.random.rand(3, 9),
+                                                       'psi_dot_ab': np.random.rand(3, 2)}}})
+        series.close()
+
+        with open(self.folder + 'attributes.xmf', 'r') as xmf:
+            xmf_text = xmf.read()
+        for name, attribute_type in [('node_id', 'Scalar'),
+                                     ('pos', 'Vector'),
+                                     ('forces', 'Matrix'),
+                                     ('cab', 'Tensor'),
+                                     ('psi_dot_ab', 'Matrix')]:
+            self.assertIn('<Attribute Name="%s" AttributeType="%s"' % (name, attribute_type), xmf_text)
+
+    def test_merge_grids(self):
+        connectivity = vtkutils.quad_connectivity(1, 1)
+        grids = [{'points': np.random.rand(4, 3),
+                  'connectivity': connectivity,
+                  'cell_type': 'quad',
+                  'cell_data': {'panel_n_id': np.arange(1), 'panel_normal': np.random.rand(1, 3)},
+                  'point_data': {'n_id': np.arange(4)},
+                  'vectors': {'cell_data': 'panel_normal'}} for i_surf in range(2)]
+        merged = vtkutils.merge_grids(grids)
+
+        np.testing.assert_array_equal(merged['connectivity'], np.vstack((connectivity, connectivity + 4)))
+        self.assertEqual(merged['cell_data']['panel_normal'].shape, (2, 3))
+        self.assertEqual(merged['vectors'], {'cell_data': 'panel_normal'})
@@ -0,0 +1,47 @@
+import sharpy.aero.utils.farfield as farfield
+import numpy as np
+import unittest
+
+
+class TestFarField(unittest.TestCase):
+    """
+    Tests the tree-based far-field approximation of the velocity induced by vortex rings
+    """
+
+    def setUp(self):
+        np.random.seed(0)
+        m, n = 20, 16
+        x, y = np.meshgrid(np.linspace(0., 20., m + 1), np.linspace(-8., 8., n + 1), indexing='ij')
+        self.zeta = np.array([x, y, 0.3*np.sin(x)])
+        self.gamma = np.random.rand(m, n)
+        self.targets = np.column_stack((40.*np.random.rand(500) - 10.,
+                                        20.*np.random.rand(500) - 10.,
+                                        6.*np.random.rand(500) - 3.))
+
+    def test_ring_velocity(self):
+        rings, gamma = farfield.surface_rings(self.zeta, self.gamma)
+        np.testing.assert_array_equal(rings[self.gamma.shape[1] + 1], self.zeta[:, [1, 2, 2, 1], [1, 1, 2, 2]].T)
+
+        # a single segment of an infinitely long straight vortex, seen from its middle
+        target = np.array([[0., 0., 1.]])
+        ring = np.array([[[-1e4, 0., 0.], [1e4, 0., 0.], [1e4, 1e8, 0.], [-1e4, 1e8, 0.]]])
+        np.testing.assert_allclose(farfield.ring_velocity(target, ring, np.array([2.*np.pi])),
+                                   np.array([[0., -1., 0.]]), atol=1e-3)
+
+        # a ring far away behaves as a dipole
+        target = np.array([[30., 40., 50.]])
+        moment = 0.5*gamma[0]*np.cross(rings[0, 2] - rings[0, 0], rings[0, 3] - rings[0, 1])
+        np.testing.assert_allclose(farfield.ring_velocity(target, rings[:1], gamma[:1]),
+                                   farfield.dipole_velocity(target, np.mean(rings[0], axis=0), moment),
+                                   rtol=1e-3)
+
+    def test_tree_accuracy(self):
+        rings, gamma = farfield.surface_rings(self.zeta, self.gamma)
+        exact = farfield.ring_velocity(self.targets, rings, gamma)
+        tree = farfield.VortexRingTree(rings, gamma, leaf_size=16)
+
+        np.testing.assert_allclose(tree.velocity(self.targets, theta=0.), exact, atol=1e-12)
+        error = [np.linalg.norm(tree.velocity(self.targets, theta) - exact)/np.linalg.norm(exact)
+                 for theta in [0.3, 0.5]]
+        self.assertLess(error[0], 1e-2)
+        self.assertLess(error[1], 5e-2)